@@ -1,4 +1,8 @@
 from .client import FeathrClient
+from .online.async_client import AsyncFeathrOnlineClient
+from .online.online_store import OnlineStore
+from .online.redis_store import RedisOnlineStore
+from .online.sqlite_store import SqliteOnlineStore
 from .spark_provider.feathr_configurations import SparkExecutionConfiguration
 from .definition.feature_derivations import *
 from .definition.anchor import *
@@ -34,6 +38,10 @@ __all__ = [
     'FeatureJoinJobParams',
     'FeatureGenerationJobParams',
     'FeathrClient',
+    'AsyncFeathrOnlineClient',
+    'OnlineStore',
+    'RedisOnlineStore',
+    'SqliteOnlineStore',
     'DerivedFeature',
     'FeatureAnchor',
     'Feature',
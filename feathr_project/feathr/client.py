@@ -1,10 +1,11 @@
-import base64
 import logging
 import os
 import tempfile
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 from feathr.definition.feature import FeatureBase
 
 import redis
@@ -22,12 +23,41 @@ from feathr.constants import *
 from feathr.spark_provider.feathr_configurations import SparkExecutionConfiguration
 from feathr.definition.feature_derivations import DerivedFeature
 from feathr.definition.materialization_settings import MaterializationSettings
+from feathr.definition.sink import RedisSink
 from feathr.definition.monitoring_settings import MonitoringSettings
-from feathr.protobuf.featureValue_pb2 import FeatureValue
+from feathr.definition.dtype import FeatureType
+from feathr.online.ann import COSINE_METRIC, ONLINE_SOURCE, IvfIndex, read_offline_vectors, read_online_vectors
+from feathr.online.assembler import OnlineFeatureAssembler
+from feathr.online.async_client import AsyncFeathrOnlineClient
+from feathr.online.cache import OnlineFeatureCache
+from feathr.online._chunked import _map_chunks_in_order
+from feathr.online._cluster import _parse_redis_startup_nodes
+from feathr.online._multi_table import TableRequest, _merge_table_results, _normalize_table_requests
+from feathr.online.deadline import CircuitBreaker, DeadlineFetcher, OnlineFetchResult
+from feathr.online.decoder import decode_feature_columns, decode_feature_values
+from feathr.online.codec import BASE64_CODEC, RAW_CODEC, ValueEncoder
+from feathr.online.encoder import encode_feature_value, is_missing
+from feathr.online.export import export_online_table
+from feathr.online.handle import OnlineLookupHandle
+from feathr.online.loader import load_online_table
+from feathr.online.metrics import OnlineMetricsHook, OnlineRequestMetrics
+from feathr.online.online_store import OnlineStore
+from feathr.online.planner import MemoryEstimate, calibrate_memory_model, estimate_online_memory
+from feathr.online.reader import OnlineReader
+from feathr.online.packed import PackedSchemas
+from feathr.online.redis_store import RedisOnlineStore
+from feathr.online.single_flight import SingleFlight
+from feathr.online.shared_cache import SharedOnlineFeatureCache
+from feathr.online.sqlite_store import SqliteOnlineStore
+from feathr.online.streaming import StreamingIngestionWorker, kafka_consumer_config
+from feathr.online.versions import DEFAULT_RECLAIM_KEYS_PER_SECOND, TableAliases, new_table_version, \
+    start_reclaiming_table_versions, swap_table_alias
+from feathr.online.window import OnlineWindowAggregator
 from feathr.definition.query_feature_list import FeatureQuery
 from feathr.definition.settings import ObservationSettings
 from feathr.definition.feature_derivations import DerivedFeature
 from feathr.definition.anchor import FeatureAnchor
+from feathr.definition.source import KafKaSource
 from feathr.spark_provider.feathr_configurations import SparkExecutionConfiguration
 from feathr.utils._envvariableutil import _EnvVaraibleUtil
 from feathr.utils._file_utils import write_to_file
@@ -73,7 +103,8 @@ class FeathrClient(object):
 
     For offline storage and compute engine, Azure ADLS, AWS S3 and Azure Synapse are supported.
 
-    For online storage, currently only Redis is supported.
+    For online storage, Redis is supported, and features can also be served from an embedded SQLite store
+    (`online_store.sqlite.path`) or any other `OnlineStore`.
     The users of this client is responsible for set up all the necessary information needed to start a Redis client via
     environment variable or a Spark cluster. Host address, port and password are needed to start the Redis client.
 
@@ -82,15 +113,16 @@ class FeathrClient(object):
         local_workspace_dir (str, optional): set where is the local work space dir. If not set, Feathr will create a temporary folder to store local workspace related files.
         credential (optional): credential to access cloud resources,  most likely to be the returned result of DefaultAzureCredential(). If not set, Feathr will initialize DefaultAzureCredential() inside the __init__ function to get credentials.
         project_registry_tag (Dict[str, str]): adding tags for project in Feathr registry. This might be useful if you want to tag your project as deprecated, or allow certain customizations on project leve. Default is empty
+        online_store (OnlineStore, optional): the store to fetch online features from. If not set, it's the SQLite store if `online_store.sqlite.path` is configured, and otherwise the configured Redis.
 
     Raises:
         RuntimeError: Fail to create the client since necessary environment variables are not set for Redis
         client creation.
     """
-    def __init__(self, config_path:str = "./feathr_config.yaml", local_workspace_dir: str = None, credential=None, project_registry_tag: Dict[str, str]=None):
+    def __init__(self, config_path:str = "./feathr_config.yaml", local_workspace_dir: str = None, credential=None, project_registry_tag: Dict[str, str]=None, online_store: OnlineStore=None):
         self.logger = logging.getLogger(__name__)
         # Redis key separator
-        self._KEY_SEPARATOR = ':'
+        self._KEY_SEPARATOR = REDIS_KEY_SEPARATOR
         self.envutils = _EnvVaraibleUtil(config_path)
         if local_workspace_dir:
             self.local_workspace_dir = local_workspace_dir
@@ -114,6 +146,21 @@ class FeathrClient(object):
             'online_store', 'redis', 'port')
         self.redis_ssl_enabled = self.envutils.get_environment_variable_with_default(
             'online_store', 'redis', 'ssl_enabled')
+        # Optional Redis connection pool configs
+        self.redis_max_connections = self.envutils.get_environment_variable_with_default(
+            'online_store', 'redis', 'max_connections')
+        self.redis_socket_timeout = self.envutils.get_environment_variable_with_default(
+            'online_store', 'redis', 'socket_timeout')
+        self.redis_health_check_interval = self.envutils.get_environment_variable_with_default(
+            'online_store', 'redis', 'health_check_interval')
+        # Optional Redis Cluster configs
+        self.redis_cluster_enabled = self.envutils.get_environment_variable_with_default(
+            'online_store', 'redis', 'cluster_enabled')
+        self.redis_read_from_replicas = self.envutils.get_environment_variable_with_default(
+            'online_store', 'redis', 'read_from_replicas')
+        # Optional embedded SQLite online store configs
+        self.sqlite_online_store_path = self.envutils.get_environment_variable_with_default(
+            'online_store', 'sqlite', 'path')
 
         # S3 configs
         self.s3_endpoint = self.envutils.get_environment_variable_with_default(
@@ -173,11 +220,57 @@ class FeathrClient(object):
             )
 
         self._construct_redis_client()
+        self._init_online_state(online_store or self._construct_online_store())
 
 
         # initialize registry
         self.registry = default_registry_client(self.project_name, config_path=config_path, credential=self.credential)
 
+    @classmethod
+    def from_online_store(cls, online_store: OnlineStore) -> "FeathrClient":
+        """Creates a client that only fetches and pushes online features, e.g. in a model server. It needs no config
+        file, Spark cluster or registry, but only the online store APIs can be used with it.
+
+        Args:
+            online_store: the store to fetch online features from, e.g. a `RedisOnlineStore` or `SqliteOnlineStore`
+        """
+        client = cls.__new__(cls)
+        client.logger = logging.getLogger(__name__)
+        client._KEY_SEPARATOR = REDIS_KEY_SEPARATOR
+        client.redis_clint = getattr(online_store, "redis_client", None)
+        client._init_online_state(online_store)
+        return client
+
+    def _init_online_state(self, online_store: OnlineStore):
+        """Sets up the online store, and the caches and settings of the online reads and writes."""
+        self.online_store = online_store
+        # optional in-process cache of online feature values, see `enable_online_cache`
+        self.online_cache = None
+        # concurrent identical `get_online_features` calls share one fetch. Set to None to disable.
+        self.online_single_flight = SingleFlight()
+        # schemas of the feature tables with the packed-row layout, see `RedisSink(layout="packed")`
+        self.packed_schemas = PackedSchemas()
+        # aliases of the versioned feature tables, see `RedisSink(versioned=True)`
+        self.table_aliases = TableAliases()
+        # read path of the online features, sharing the schemas and aliases above
+        self.online_reader = OnlineReader(online_store, self.packed_schemas, self.table_aliases)
+        # alias -> version written by the running materialization job, swapped in when it succeeds
+        self._pending_table_versions: Dict[str, str] = {}
+        # nearest neighbour indexes of the embedding features by (feature table, feature), see `build_ann_index`
+        self.ann_indexes: Dict[Tuple[str, str], IvfIndex] = {}
+        # indexes rebuilt in the background after their online table is written, see `build_ann_index`
+        self._auto_refreshed_ann_indexes: Set[Tuple[str, str]] = set()
+        # running background rebuilds by index, and the indexes to rebuild again once they are done
+        self._ann_refreshes: Dict[Tuple[str, str], threading.Thread] = {}
+        self._pending_ann_refreshes: Set[Tuple[str, str]] = set()
+        self._ann_refresh_lock = threading.Lock()
+        # online tables written by the running materialization job, whose indexes are rebuilt when it succeeds
+        self._materialized_tables: List[str] = []
+        # hooks receiving the measurements of the online reads, see `add_online_metrics_hook`
+        self.online_metrics_hooks: List[OnlineMetricsHook] = []
+        # hedging and circuit breaking of the reads with a latency budget, see `configure_online_deadlines`
+        self.online_deadline_fetcher: Optional[DeadlineFetcher] = None
+
     def _check_required_environment_variables_exist(self):
         """Checks if the required environment variables(form feathr_config.yaml) is set.
 
@@ -275,18 +368,37 @@ class FeathrClient(object):
             [None, None, None, None].
             If a feature doesn't exist, then a None is returned for that feature. For example:
             [None, b'4.0', b'31.0', b'23.0'].
+            Concurrent calls for the same feature table, key and feature names(e.g. from several threads asking for a
+            hot entity) share a single fetch from the online store.
             """
-        redis_key = self._construct_redis_key(feature_table, key)
-        res = self.redis_clint.hmget(redis_key, *feature_names)
-        return self._decode_proto(res)
-
-    def multi_get_online_features(self, feature_table, keys, feature_names):
+        request = (feature_table, key, feature_names)
+        start = time.perf_counter()
+        if self.online_single_flight is None:
+            res = self._fetch_online_features([request])[0]
+        else:
+            res = self.online_single_flight.do((feature_table, key, tuple(feature_names)),
+                                               lambda: self._fetch_online_features([request])[0])
+        fetched = time.perf_counter()
+        result = self._decode_proto(res)
+        if self.online_metrics_hooks:
+            self._record_online_metrics("get_online_features", feature_table, [key], feature_names, [res],
+                                        start, fetched)
+        return result
+
+    def multi_get_online_features(self, feature_table, keys, feature_names, output_format: Optional[str] = None,
+                                  feature_types: Optional[Dict[str, FeatureType]] = None):
         """Fetches feature value for a list of keys from a online feature table. This is the batch version of the get API.
 
         Args:
             feature_table: the name of the feature table.
             keys: list of keys for the entities
             feature_names: list of feature names to fetch
+            output_format: optional columnar output format, one of `numpy`, `pandas` or `arrow`. If set, the values
+                are decoded column by column, which is much faster for large batches. See
+                `feathr.online.decode_feature_columns` for the layout of each format.
+            feature_types: optional mapping from feature name to FeatureType used to type the columnar output.
+                Defaults to the types of the features built by `build_features`, and otherwise inferred from the
+                stored values.
 
         Return:
             A list of feature values for the requested entities. It's ordered by the requested feature names. For
@@ -296,89 +408,747 @@ class FeathrClient(object):
             are returned. For example, {'12': [None, None, None, None], '24': [None, None, None, None]} If a feature
             doesn't exist, then a None is returned for that feature. For example: {'12': [None, b'4.0', b'31.0',
             b'23.0'], '24': [b'true', b'4.0', b'31.0', b'23.0']}.
+            If `output_format` is set, the columnar result in that format is returned instead, with rows in the same
+            order as `keys`.
+        """
+        start = time.perf_counter()
+        pipeline_result = self._fetch_online_features([(feature_table, key, feature_names) for key in keys])
+        fetched = time.perf_counter()
+
+        if output_format:
+            if feature_types is None:
+                feature_types = self._get_built_feature_types(feature_names)
+            result = decode_feature_columns(pipeline_result, feature_names, feature_types, output_format, keys=keys)
+        else:
+            decoded_pipeline_result = []
+            for feature_list in pipeline_result:
+                decoded_pipeline_result.append(self._decode_proto(feature_list))
+            result = dict(zip(keys, decoded_pipeline_result))
+
+        if self.online_metrics_hooks:
+            self._record_online_metrics("multi_get_online_features", feature_table, list(keys), feature_names,
+                                        pipeline_result, start, fetched)
+        return result
+
+    def add_online_metrics_hook(self, hook: OnlineMetricsHook):
+        """Adds a hook receiving the measurements of each `get_online_features` and `multi_get_online_features`
+        call: fetch(round trip) and decode times, payload bytes, and missing keys and values. Feathr includes
+        `PrometheusOnlineMetricsHook` to export them to Prometheus, and `SlowRequestLogHook` to log the slow requests.
+        """
+        self.online_metrics_hooks.append(hook)
+
+    def _record_online_metrics(self, api: str, feature_table: str, keys: List[str], feature_names: List[str],
+                               rows: List[List[Optional[bytes]]], start: float, fetched: float):
+        metrics = OnlineRequestMetrics.from_rows(api, feature_table, keys, feature_names, rows,
+                                                 fetch_seconds=fetched - start,
+                                                 decode_seconds=time.perf_counter() - fetched)
+        for hook in self.online_metrics_hooks:
+            try:
+                hook.on_request(metrics)
+            except Exception as e:
+                self.logger.warning("Online metrics hook %s failed: %s", type(hook).__name__, e)
+
+    def multi_get_online_features_within(self, feature_table: str, keys: List[str], feature_names: List[str],
+                                         budget_seconds: float,
+                                         defaults: Optional[Dict[str, Any]] = None) -> OnlineFetchResult:
+        """Fetches features of several keys like `multi_get_online_features`, but returns within a latency budget,
+        e.g. the part of an inference SLO left for the features, even if a Redis node is slow or failing.
+
+        The keys are fetched in chunks: the slow chunks are hedged to the replicas, and the ones that don't arrive
+        within the budget are returned as missing, see `configure_online_deadlines`. Cached values are always returned.
+        The metadata of the table(its alias, packed-row schemas and zstd dictionaries) is read within the same budget,
+        from the same endpoints as the values.
+
+        Args:
+            feature_table: the name of the feature table.
+            keys: list of keys for the entities
+            feature_names: list of feature names to fetch
+            budget_seconds: max seconds spent fetching the features
+            defaults: optional mapping from feature name to the value of the feature when it's missing, either
+                because it doesn't exist or because it wasn't fetched in time
+
+        Return:
+            The feature values of each key, and the keys that were not fetched in time.
+        """
+        if self.online_deadline_fetcher is None:
+            self.configure_online_deadlines()
+        deadline = time.monotonic() + budget_seconds
+        keys = list(keys)
+        if self._load_table_aliases_within([feature_table], budget_seconds):
+            rows = self._fetch_online_features([(feature_table, key, feature_names) for key in keys],
+                                               fetch=lambda requests: self.online_deadline_fetcher.fetch_within(
+                                                   requests, deadline - time.monotonic()),
+                                               load_aliases=False)
+        else:
+            # the current version of the table is unknown until its alias is loaded
+            rows = [None] * len(keys)
+        defaults = defaults or {}
+        values = {}
+        missing_keys = []
+        for key, row in zip(keys, rows):
+            if row is None:
+                missing_keys.append(key)
+                values[key] = [defaults.get(feature_name) for feature_name in feature_names]
+                continue
+            values[key] = [defaults.get(feature_name) if value is None else value
+                           for feature_name, value in zip(feature_names, self._decode_proto(row))]
+        return OnlineFetchResult(values, missing_keys)
+
+    def _load_table_aliases_within(self, feature_tables: List[str], budget_seconds: float) -> bool:
+        """Loads the stale aliases of the tables from the endpoints of the deadline fetcher, within a latency budget.
+        The aliases that can't be loaded in time, e.g. while the circuit of the primary is open and there is no
+        healthy replica, are served from the cache even if they are stale. As a stale alias can still be used, its
+        refresh takes at most half of the budget, and the rest is left for the feature values.
+
+        Return:
+            Whether the aliases of all the tables are loaded, so that the tables can be read.
+        """
+        stale_tables = self.table_aliases.stale_aliases(feature_tables)
+        if stale_tables:
+            cached = all(self.table_aliases.is_loaded(feature_table) for feature_table in stale_tables)
+            self.online_deadline_fetcher.run_within(
+                lambda online_store: self.online_reader.load_table_aliases(stale_tables, online_store),
+                budget_seconds / 2 if cached else budget_seconds)
+        return all(self.table_aliases.is_loaded(feature_table) for feature_table in feature_tables)
+
+    def configure_online_deadlines(self, replicas: Optional[List[OnlineStore]] = None,
+                                   hedge_percentile: float = 95.0, min_hedge_seconds: float = 0.002,
+                                   failure_threshold: int = 5, reset_seconds: float = 10.0,
+                                   chunk_size: int = 100) -> DeadlineFetcher:
+        """Configures how `multi_get_online_features_within` fetches the features within a latency budget.
+
+        Args:
+            replicas: online stores holding the same tables as the online store, e.g.
+                `RedisOnlineStore(redis.Redis(host=<replica host>))`, for the hedged and retried requests
+            hedge_percentile: a chunk of keys is also requested from a replica once it took longer than this
+                percentile of the recent fetch latencies
+            min_hedge_seconds: min delay before a chunk of keys is hedged
+            failure_threshold: consecutive failures or missed deadlines after which no request is sent to an
+                endpoint, for `reset_seconds`
+            reset_seconds: seconds a failing endpoint is skipped
+            chunk_size: number of keys fetched at a time
+        """
+        if self.online_deadline_fetcher is not None:
+            self.online_deadline_fetcher.close()
+        self.online_deadline_fetcher = DeadlineFetcher(
+            lambda online_store, requests: self.online_reader.read(requests, online_store), self.online_store,
+            replicas or [], hedge_percentile=hedge_percentile, min_hedge_seconds=min_hedge_seconds,
+            circuit_breaker=CircuitBreaker(failure_threshold, reset_seconds), chunk_size=chunk_size)
+        return self.online_deadline_fetcher
+
+    def multi_get_online_features_iter(self, feature_table: str, keys: List[str], feature_names: List[str],
+                                       chunk_size: int = 1000, parallelism: int = 4,
+                                       output_format: Optional[str] = None,
+                                       feature_types: Optional[Dict[str, FeatureType]] = None) -> Iterator[Any]:
+        """Fetches feature value for a very large list of keys, e.g. for batch scoring, as a stream of chunks.
+
+        `multi_get_online_features` sends all the keys in one pipeline, so both the client and Redis buffer the whole
+        reply, and other clients of the same Redis wait for it. This API splits the keys into chunks of `chunk_size`
+        keys, each fetched in its own pipelined round trip, and fetches `parallelism` chunks at a time on pooled
+        connections. At most `parallelism` chunks are buffered, so the memory stays bounded however many keys there
+        are.
+
+        Args:
+            feature_table: the name of the feature table.
+            keys: list of keys for the entities
+            feature_names: list of feature names to fetch
+            chunk_size: number of keys fetched in each round trip
+            parallelism: number of chunks fetched concurrently. 1 to fetch them one after the other.
+            output_format: optional columnar output format, see `multi_get_online_features`
+            feature_types: optional mapping from feature name to FeatureType, see `multi_get_online_features`
+
+        Return:
+            An iterator of the results of each chunk of keys, in the same order as `keys`. Each result has the format
+            of `multi_get_online_features` for the keys of the chunk.
+        """
+        if output_format and feature_types is None:
+            feature_types = self._get_built_feature_types(feature_names)
+
+        def fetch_chunk(chunk_keys):
+            rows = self._fetch_online_features([(feature_table, key, feature_names) for key in chunk_keys])
+            if output_format:
+                return decode_feature_columns(rows, feature_names, feature_types, output_format, keys=chunk_keys)
+            return dict(zip(chunk_keys, [self._decode_proto(feature_list) for feature_list in rows]))
+
+        return _map_chunks_in_order(fetch_chunk, list(keys), chunk_size, parallelism)
+
+    def multi_table_get_online_features(self, requests: List[TableRequest],
+                                        defaults: Optional[Dict[str, Any]] = None) -> Dict[str, List[Any]]:
+        """Fetches features of several online feature tables, e.g. one table per materialization job, in a single
+        pipelined round trip, and merges them into one result per entity.
+
+        Args:
+            requests: list of (feature_table, keys, feature_names) where feature_names can also be a FeatureQuery.
+                Feature names must be unique across all the requests.
+            defaults: optional mapping from feature name to the value used when the feature is missing for an
+                entity. Features without a default are None when missing.
+
+        Return:
+            A dict from each requested key to its feature values, ordered by the feature names of all the requests in
+            request order. For example, requests = [('trips', ['265'], ['f_trip_count']), ('locations', ['265', '266'],
+            ['f_avg_fare'])] and defaults = {'f_trip_count': 0} then the result is: {'265': [12, 9.5], '266': [0, 7.3]}.
+        """
+        normalized = _normalize_table_requests(requests)
+        rows = self._fetch_online_features([(feature_table, key, feature_names)
+                                            for feature_table, keys, feature_names in normalized
+                                            for key in keys])
+        return _merge_table_results(normalized, rows, defaults)
+
+    def push_online_features(self, feature_table: str, records, key_column: Union[str, List[str]],
+                             feature_types: Optional[Dict[str, FeatureType]] = None,
+                             ttl_seconds: Optional[int] = None, chunk_size: int = 1000,
+                             value_codec: str = BASE64_CODEC) -> int:
+        """Writes feature values straight to an online feature table, e.g. from a real-time service, without running
+        a materialization job. The values are encoded like the materialization job does, and written in chunks of
+        `chunk_size` entities, each in one pipelined round trip(`HSET`s on Redis). Features of the entities that are
+        not pushed are kept.
+
+        Args:
+            feature_table: the name of the feature table.
+            records: a pandas DataFrame, or a list of dicts from column name to value, with one entity per row. All
+                the columns but the key columns are features. None and NaN values are not written.
+            key_column: the column of the entity key, or a list of columns for a compound key, whose values are joined
+                with `#` like the materialization job does.
+            feature_types: optional mapping from feature name to FeatureType used to encode the values. Defaults to
+                the types of the features built by `build_features`, and otherwise inferred from the values: Python
+                ints are INT64 and floats are DOUBLE, lists and 1-D arrays are dense arrays, and (indices, values)
+                tuples are sparse arrays.
+            ttl_seconds: if set, the pushed entities expire, with all their features, after this many seconds
+            chunk_size: number of entities written in each round trip
+            value_codec: how the values are encoded, `base64`(default) or `raw`, see `RedisSink`. zstd isn't
+                supported since it needs a dictionary trained on the whole table.
+
+        Return:
+            The number of entities written.
+        """
+        if value_codec not in (BASE64_CODEC, RAW_CODEC):
+            raise RuntimeError(f"Unsupported value codec {value_codec} for pushed features. "
+                               f"Supported ones are {[BASE64_CODEC, RAW_CODEC]}.")
+        # the values are pushed to the current version of a versioned table
+        feature_table = self._resolve_online_table(feature_table)
+        self.online_reader.load_packed_schemas([feature_table])
+        if self.packed_schemas.is_packed(feature_table):
+            raise RuntimeError(f"Feature table {feature_table} has the packed-row layout. Features can only be pushed "
+                               f"to feature tables with the hash layout.")
+        if hasattr(records, "to_dict"):
+            records = records.to_dict("records")
+        key_columns = [key_column] if isinstance(key_column, str) else list(key_column)
+        encoder = ValueEncoder(value_codec)
+
+        rows = {}
+        for record in records:
+            missing_columns = [column for column in key_columns if column not in record]
+            if missing_columns:
+                raise RuntimeError(f"Key columns {missing_columns} are missing from the pushed record {record}.")
+            key = "#".join(str(record[column]) for column in key_columns)
+            values = rows.setdefault(key, {})
+            for feature_name, value in record.items():
+                if feature_name not in key_columns and not is_missing(value):
+                    values[feature_name] = value
+        if feature_types is None:
+            feature_types = self._get_built_feature_types(list({name for values in rows.values() for name in values}))
+
+        keys = list(rows)
+        for start in range(0, len(keys), chunk_size):
+            chunk = {}
+            for key in keys[start:start + chunk_size]:
+                chunk[key] = {feature_name: encoder.encode(
+                    encode_feature_value(value, feature_types.get(feature_name)).SerializeToString())
+                    for feature_name, value in rows[key].items()}
+            self.online_store.batch_put(feature_table, chunk, ttl_seconds=ttl_seconds)
+            if self.online_cache is not None:
+                for key, values in chunk.items():
+                    self.online_cache.put(feature_table, key, list(values), list(values.values()))
+        return len(keys)
+
+    def load_online_features(self, feature_table: str, path: str, key_column: Union[str, List[str]],
+                             format: str = "parquet", feature_names: Optional[List[str]] = None,
+                             feature_types: Optional[Dict[str, FeatureType]] = None,
+                             ttl_seconds: Optional[int] = None, parallelism: int = 4,
+                             value_codec: str = BASE64_CODEC, progress: bool = True, versioned: bool = False) -> int:
+        """Loads a local offline dataset, e.g. the downloaded output of a feature join job, into an online feature
+        table without a Spark job. This is much faster than materialization for small and medium tables. See
+        `feathr.online.load_online_table` for how the dataset is streamed and written.
+
+        Args:
+            feature_table: the name of the feature table.
+            path: a Parquet or Avro file, a directory of them, or a Delta table directory
+            key_column: the column of the entity key, or a list of columns for a compound key
+            format: `parquet`, `avro` or `delta`, the formats `get_result_df` reads
+            feature_names: the columns to load as features. Defaults to all the columns but the key columns.
+            feature_types: optional mapping from feature name to FeatureType used to encode the values. Defaults to
+                the types of the features built by `build_features`, and otherwise to the types of the columns.
+            ttl_seconds: if set, the loaded entities expire after this many seconds
+            parallelism: number of chunks of entities written concurrently
+            value_codec: how the values are encoded, `base64`(default) or `raw`, see `RedisSink`
+            progress: whether to show a progress bar of the loaded rows
+            versioned: whether to load the dataset into a new version of the table, which replaces the current
+                version once it's fully loaded, see `swap_online_table_version`. Otherwise the entities are written
+                in place, to the current version.
+
+        Return:
+            The number of loaded rows.
+        """
+        table = new_table_version(feature_table) if versioned else self._resolve_online_table(feature_table)
+        self.online_reader.load_packed_schemas([table])
+        if self.packed_schemas.is_packed(table):
+            raise RuntimeError(f"Feature table {feature_table} has the packed-row layout. Features can only be loaded "
+                               f"into feature tables with the hash layout.")
+        if feature_types is None:
+            feature_types = self._get_built_feature_types(feature_names)
+        loaded = load_online_table(self.online_store, table, path, key_column, format=format,
+                                   feature_names=feature_names, feature_types=feature_types, value_codec=value_codec,
+                                   ttl_seconds=ttl_seconds, parallelism=parallelism, progress=progress)
+        if versioned:
+            self.swap_online_table_version(feature_table, table)
+        elif self.online_cache is not None:
+            self.online_cache.invalidate(table)
+        self._refresh_ann_indexes([feature_table])
+        return loaded
+
+    def export_online_features(self, feature_table: str, path: str, feature_names: Optional[List[str]] = None,
+                               feature_types: Optional[Dict[str, FeatureType]] = None,
+                               max_keys_per_second: Optional[float] = None, batch_size: int = 1000,
+                               rows_per_file: int = 1000000, progress: bool = True) -> int:
+        """Exports a snapshot of an online feature table to Parquet files, e.g. to debug what is served or to check
+        the consistency of the online and offline features. The table is walked with non-blocking SCAN cursors, one
+        per node, and the values are fetched in pipelined batches, decoded and streamed to the files. See
+        `feathr.online.export_online_table`.
+
+        Args:
+            feature_table: the name of the feature table.
+            path: the directory of the Parquet files
+            feature_names: the features to export. Defaults to the features found in the first batch of entities.
+            feature_types: optional mapping from feature name to FeatureType used to type the columns. Defaults to
+                the types of the features built by `build_features`, and otherwise inferred from the stored values.
+            max_keys_per_second: if set, limits the number of entities read per second, so that the export doesn't
+                disturb the live reads
+            batch_size: number of keys scanned and fetched at a time
+            rows_per_file: max number of rows of a Parquet file
+            progress: whether to show a progress bar of the exported entities
+
+        Return:
+            The number of exported entities.
         """
-        with self.redis_clint.pipeline() as redis_pipeline:
-            for key in keys:
-                redis_key = self._construct_redis_key(feature_table, key)
-                redis_pipeline.hmget(redis_key, *feature_names)
-            pipeline_result = redis_pipeline.execute()
+        feature_table = self._resolve_online_table(feature_table)
+        self.online_reader.load_packed_schemas([feature_table])
+        if feature_types is None:
+            feature_types = self._get_built_feature_types(feature_names)
+        return export_online_table(self.online_store, feature_table, path, feature_names=feature_names,
+                                   feature_types=feature_types, max_keys_per_second=max_keys_per_second,
+                                   batch_size=batch_size, rows_per_file=rows_per_file,
+                                   packed_schemas=self.packed_schemas,
+                                   prepare=self.online_reader.load_codec_dictionaries, progress=progress)
+
+    def estimate_online_memory(self, settings: MaterializationSettings, num_rows: Optional[int] = None, sample=None,
+                               key_column: Union[str, List[str], None] = None, num_entities: Optional[int] = None,
+                               feature_types: Optional[Dict[str, FeatureType]] = None,
+                               calibration_tables: Optional[List[str]] = None) -> List[MemoryEstimate]:
+        """Predicts the Redis memory taken by the online feature tables of a materialization before running it, from
+        a sample of the materialized data or an estimate of its number of rows, e.g. to size the Redis cluster and to
+        choose the value codec, quantizations and layout of the `RedisSink`. See `feathr.online.estimate_online_memory`.
+
+        The model is calibrated with the MEMORY USAGE of some entities of existing tables, by default the tables of the
+        sinks when the materialization already ran, so that the estimates account for the Redis version and config.
+
+        Args:
+            settings: the materialization settings
+            num_rows: estimated number of rows materialized per backfill step. Defaults to the number of rows of the
+                sample.
+            sample: optional pandas DataFrame or pyarrow Table of materialized rows, e.g. the output of
+                `get_offline_features` on a small observation dataset
+            key_column: the key column of the sample, or a list of columns for a compound key
+            num_entities: the number of distinct keys, if known
+            feature_types: optional mapping from feature name to FeatureType. Defaults to the types of the features
+                built by `build_features`.
+            calibration_tables: existing online feature tables to calibrate the model with. Defaults to the tables of
+                the Redis sinks of `settings`.
 
-        decoded_pipeline_result = []
-        for feature_list in pipeline_result:
-            decoded_pipeline_result.append(self._decode_proto(feature_list))
+        Return:
+            The estimate of each Redis sink of the settings.
+        """
+        feature_types = {**self._get_built_feature_types(settings.feature_names), **(feature_types or {})}
+        if calibration_tables is None:
+            calibration_tables = [sink.table_name for sink in settings.sinks if isinstance(sink, RedisSink)]
+        calibration = calibrate_memory_model(self.online_store, calibration_tables)
+        return estimate_online_memory(settings, feature_types, num_rows=num_rows, sample=sample,
+                                      key_column=key_column, num_entities=num_entities,
+                                      calibration=calibration if calibration is not None else 1.0)
+
+    def build_ann_index(self, feature_table: str, feature: str, path: Optional[str] = None,
+                        dataset_path: Optional[str] = None, key_column: Union[str, List[str], None] = None,
+                        format: str = "parquet", metric: str = COSINE_METRIC, num_lists: Optional[int] = None,
+                        num_probes: Optional[int] = None, auto_refresh: bool = False) -> IvfIndex:
+        """Builds an approximate nearest neighbour index of a dense array feature, e.g. item embeddings, so that
+        `nearest_features` can retrieve the entities whose vectors are the nearest to a query vector. See
+        `feathr.online.IvfIndex` for how it works.
+
+        By default the index is built from the entities of the online feature table. Call `refresh_ann_index` to
+        rebuild it after the table is written, or set `auto_refresh` to rebuild it in a background thread after each
+        materialization of the table(when `wait_job_to_finish` returns) and each `load_online_features` into it. It
+        can also be built from an offline dataset, e.g. the output of `get_offline_features` downloaded with
+        `get_result_df`.
 
-        return dict(zip(keys, decoded_pipeline_result))
+        Args:
+            feature_table: the name of the feature table
+            feature: the dense array feature to index
+            path: the directory of the index files. Defaults to `ann_indexes/<feature_table>/<feature>` in the
+                local workspace.
+            dataset_path: optional Parquet or Avro file, directory of them, or Delta table directory to read the
+                vectors from, instead of the online feature table
+            key_column: the key column of the dataset, or a list of columns for a compound key
+            format: the format of the dataset, `parquet`, `avro` or `delta`
+            metric: `cosine`(default), `dot` or `l2`
+            num_lists: number of clusters of the index. Defaults to the square root of the number of vectors.
+            num_probes: number of clusters scanned by a lookup by default
+            auto_refresh: whether to rebuild the index in the background after the online table is written, see
+                `refresh_ann_index` for its cost. Only for an index built from the online feature table.
+
+        Return:
+            The index, which is also used by `nearest_features`.
+        """
+        if auto_refresh and dataset_path is not None:
+            raise RuntimeError("Only an index built from the online feature table can be refreshed automatically.")
+        path = path or os.path.join(self.local_workspace_dir, "ann_indexes", feature_table, feature)
+        if dataset_path is None:
+            keys, vectors = self._read_online_vectors(feature_table, feature)
+            source = ONLINE_SOURCE
+        else:
+            if key_column is None:
+                raise RuntimeError("key_column is required to build an index from a dataset.")
+            keys, vectors = read_offline_vectors(dataset_path, key_column, feature, format)
+            source = dataset_path
+        index = IvfIndex.build(path, keys, vectors, metric, num_lists, num_probes,
+                               metadata={"feature_table": feature_table, "feature": feature, "source": source})
+        self._set_ann_index(feature_table, feature, index, auto_refresh)
+        return index
+
+    def load_ann_index(self, feature_table: str, feature: str, path: str, auto_refresh: bool = False) -> IvfIndex:
+        """Loads an index built by `build_ann_index`, e.g. in another process, to use it with `nearest_features`.
+        Set `auto_refresh` to rebuild it in the background after its online table is written, as `build_ann_index`.
+        """
+        index = IvfIndex.load(path)
+        if auto_refresh and index.metadata.get("source") != ONLINE_SOURCE:
+            raise RuntimeError("Only an index built from the online feature table can be refreshed automatically.")
+        self._set_ann_index(feature_table, feature, index, auto_refresh)
+        return index
+
+    def refresh_ann_index(self, feature_table: str, feature: str) -> IvfIndex:
+        """Rebuilds an index built from the online feature table with the current entities of the table, e.g. after
+        it's materialized again. The rebuild keeps the clusters of the index until the table has twice as many
+        vectors as they were trained on, so it only trains k-means again then.
+
+        This is a full pass over the table: it scans all its keys and fetches the vector of each entity, like
+        `export_online_features` of the feature, then assigns each vector to its nearest cluster and writes the new
+        index files. On a large table it takes minutes and loads the online store, so run it off the request path.
+        The lookups keep using the previous version of the index until the new one is written.
+
+        Return:
+            The new index, which is also used by `nearest_features`.
+        """
+        index = self.ann_indexes.get((feature_table, feature))
+        if index is None or index.metadata.get("source") != ONLINE_SOURCE:
+            raise RuntimeError(f"There is no nearest neighbour index of feature {feature} of feature table "
+                               f"{feature_table} built from the online feature table.")
+        keys, vectors = self._read_online_vectors(feature_table, feature)
+        if not len(keys):
+            self.logger.warning("Online feature table %s has no vectors of feature %s, its nearest neighbour index "
+                                "is not rebuilt.", feature_table, feature)
+            return index
+        index = index.rebuild(keys, vectors)
+        self.ann_indexes[(feature_table, feature)] = index
+        return index
+
+    def nearest_features(self, feature_table: str, feature: str, query_vector, k: int = 10,
+                         num_probes: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Finds the entities of a feature table whose vectors of a feature are the nearest to a query vector, e.g.
+        the candidate items of a user embedding, with the index built by `build_ann_index`. Fetch their other features
+        with `multi_get_online_features`.
+
+        Args:
+            feature_table: the name of the feature table
+            feature: the indexed dense array feature
+            query_vector: the query vector, with the dimension of the feature
+            k: number of entities to return
+            num_probes: number of clusters scanned. More clusters find more of the true nearest neighbours, but are
+                slower. Defaults to the `num_probes` of the index.
+
+        Return:
+            The (key, score) of the `k` nearest entities, nearest first. The score is the similarity for the cosine
+            and dot metrics, and the Euclidean distance for the l2 metric.
+        """
+        index = self.ann_indexes.get((feature_table, feature))
+        if index is None:
+            raise RuntimeError(f"There is no nearest neighbour index of feature {feature} of feature table "
+                               f"{feature_table}. Build it with `build_ann_index` or load it with `load_ann_index`.")
+        return index.search(query_vector, k, num_probes)
+
+    def _read_online_vectors(self, feature_table: str, feature: str):
+        table = self._resolve_online_table(feature_table)
+        self.online_reader.load_packed_schemas([table])
+        feature_type = self._get_built_feature_types([feature]).get(feature)
+        return read_online_vectors(self.online_store, table, feature, feature_type, self.packed_schemas,
+                                   self.online_reader.load_codec_dictionaries)
+
+    def _set_ann_index(self, feature_table: str, feature: str, index: IvfIndex, auto_refresh: bool):
+        self.ann_indexes[(feature_table, feature)] = index
+        if auto_refresh:
+            self._auto_refreshed_ann_indexes.add((feature_table, feature))
+        else:
+            self._auto_refreshed_ann_indexes.discard((feature_table, feature))
+
+    def _refresh_ann_indexes(self, feature_tables: List[str]):
+        """Rebuilds in background threads the auto refreshed indexes of the online tables that were just written.
+        An index already being rebuilt is rebuilt again once it's done, so it sees the last write."""
+        for index_name in list(self._auto_refreshed_ann_indexes):
+            if index_name[0] not in feature_tables:
+                continue
+            with self._ann_refresh_lock:
+                self._pending_ann_refreshes.add(index_name)
+                if index_name in self._ann_refreshes:
+                    continue
+                thread = threading.Thread(target=self._run_ann_refreshes, args=(index_name,), daemon=True,
+                                          name=f"feathr-ann-refresh-{index_name[0]}-{index_name[1]}")
+                self._ann_refreshes[index_name] = thread
+            thread.start()
+
+    def _run_ann_refreshes(self, index_name: Tuple[str, str]):
+        while True:
+            with self._ann_refresh_lock:
+                if index_name not in self._pending_ann_refreshes:
+                    del self._ann_refreshes[index_name]
+                    return
+                self._pending_ann_refreshes.discard(index_name)
+            try:
+                self.refresh_ann_index(*index_name)
+            except Exception as e:
+                self.logger.error("Failed to rebuild the nearest neighbour index of feature %s of feature table %s: "
+                                  "%s", index_name[1], index_name[0], e)
+
+    def swap_online_table_version(self, feature_table: str, table_version: str, reclaim: bool = True,
+                                  reclaim_keys_per_second: Optional[float] = DEFAULT_RECLAIM_KEYS_PER_SECOND
+                                  ) -> Optional[threading.Thread]:
+        """Makes a fully written version of a feature table its current version, e.g. the table written by a versioned
+        materialization(see `RedisSink(versioned=True)`). The switch is atomic: the readers go from the values of the
+        previous version to the values of the new version, and never see a mix of both. The clients pick up the new
+        version within `TableAliases.refresh_seconds`.
+
+        Args:
+            feature_table: the name of the feature table, i.e. the alias the clients read
+            table_version: the physical table of the new version, see `feathr.online.versions.new_table_version`
+            reclaim: whether to delete the retired versions in a background thread, once the clients stopped reading
+                them. Otherwise they are kept until `feathr.online.versions.reclaim_table_versions` is called.
+            reclaim_keys_per_second: max number of keys deleted per second by the reclaim
+
+        Return:
+            The thread reclaiming the retired versions, if any.
+        """
+        previous = swap_table_alias(self.online_store, feature_table, table_version)
+        self.logger.info("Online feature table %s switched from version %s to %s.", feature_table, previous,
+                         table_version)
+        self.table_aliases.invalidate(feature_table)
+        if not reclaim:
+            return None
+        return start_reclaiming_table_versions(self.online_store, feature_table, reclaim_keys_per_second,
+                                               delay_seconds=2 * self.table_aliases.refresh_seconds)
+
+    def start_streaming_ingestion(self, anchor: FeatureAnchor, feature_table: str, num_consumers: int = 1,
+                                  batch_size: int = 1000, flush_interval_seconds: float = 1.0,
+                                  ttl_seconds: Optional[int] = None, group_id: Optional[str] = None,
+                                  consumer_factory=None, max_retries: Optional[int] = None,
+                                  on_failure=None) -> StreamingIngestionWorker:
+        """Starts ingesting the features of an anchor with a `KafKaSource` into an online feature table, from
+        consumers running in this process. This is a lightweight alternative to materializing the anchor with
+        `RedisSink(streaming=True)` for low-volume topics, see `StreamingIngestionWorker`. Call `stop()` on the
+        returned worker to stop it, and `is_healthy()` to check that its consumers are still running.
+
+        Args:
+            anchor: the feature anchor, whose source must be a `KafKaSource`
+            feature_table: the name of the feature table.
+            num_consumers: number of consumers, each one consuming some of the partitions of the topics
+            batch_size: max number of messages written at a time
+            flush_interval_seconds: max seconds a consumed message waits before being written
+            ttl_seconds: if set, the written entities expire after this many seconds
+            group_id: the Kafka consumer group. Defaults to one per project and feature table.
+            consumer_factory: optional function creating a consumer from its config, with the interface of
+                `confluent_kafka.Consumer`
+            max_retries: if set, a consumer stops after this many retries of a micro-batch that failed to be written
+                to the online store. Otherwise it retries until the worker is stopped.
+            on_failure: optional function called with the error when a consumer stops on an error, e.g. to exit the
+                process so that it gets restarted
+        """
+        if not isinstance(anchor.source, KafKaSource):
+            raise RuntimeError(f"The source of anchor {anchor.name} must be a KafKaSource to be ingested, but it's "
+                               f"{type(anchor.source).__name__}.")
+        consumer_config = kafka_consumer_config(anchor.source.config.brokers,
+                                                group_id or f"feathr_{self.project_name}_{feature_table}",
+                                                self.envutils.get_environment_variable('KAFKA_SASL_JAAS_CONFIG'))
+        worker = StreamingIngestionWorker(self.online_store, feature_table, anchor, consumer_config,
+                                          num_consumers=num_consumers, batch_size=batch_size,
+                                          flush_interval_seconds=flush_interval_seconds, ttl_seconds=ttl_seconds,
+                                          consumer_factory=consumer_factory, max_retries=max_retries,
+                                          on_failure=on_failure)
+        return worker.start()
+
+    def online_window_aggregator(self, anchor: FeatureAnchor, feature_table: str,
+                                 bucket_seconds: Optional[int] = None) -> OnlineWindowAggregator:
+        """Gets an aggregator serving the window aggregation features of an anchor from events appended online, e.g.
+        "sum of the amounts of the last hour" fresh to the second, rather than as of the last materialization. Append
+        the events with `append` and read the features with `get`, see `OnlineWindowAggregator`.
+
+        Args:
+            anchor: the anchor of the `WindowAggTransformation` features
+            feature_table: the online feature table holding the time buckets of the events. Use a table of its own,
+                not the table materialized from the anchor.
+            bucket_seconds: length of the time buckets. Defaults to 1/60 of the shortest window.
+        """
+        return OnlineWindowAggregator(self.online_store, feature_table, anchor, bucket_seconds=bucket_seconds)
+
+    def _fetch_online_features(self, requests: List[Tuple[str, str, List[str]]], fetch: Optional[Callable] = None,
+                               load_aliases: bool = True) -> List[List[Optional[bytes]]]:
+        """Fetches the raw(encoded) feature values of each (feature_table, key, feature_names) request, ordered by
+        its feature names. Values in the online feature cache are served from it, and only the others are fetched
+        from Redis(in one pipelined round trip), or with `fetch` if set, e.g. by `DeadlineFetcher.fetch_within`.
+        `fetch` returns None for the requests it couldn't fetch, which are None in the result. With `load_aliases`
+        False, the versioned tables are resolved with the cached aliases only.
+        """
+        requests = self.online_reader.resolve(requests, load=load_aliases)
+        fetch = fetch or self.online_reader.read
+        if self.online_cache is None:
+            return fetch(requests)
+
+        rows = []
+        uncached_requests = []
+        uncached_rows = []
+        for request_index, (feature_table, key, feature_names) in enumerate(requests):
+            values, uncached_features = self.online_cache.get(feature_table, key, feature_names)
+            rows.append(values)
+            if uncached_features:
+                uncached_requests.append((feature_table, key, uncached_features))
+                uncached_rows.append((request_index, feature_names, values))
+        if uncached_requests:
+            fetched = fetch(uncached_requests)
+            for (feature_table, key, uncached_features), (request_index, feature_names, row), fetched_values in \
+                    zip(uncached_requests, uncached_rows, fetched):
+                if fetched_values is None:
+                    rows[request_index] = None
+                    continue
+                self.online_cache.put(feature_table, key, uncached_features, fetched_values)
+                fetched_by_name = dict(zip(uncached_features, fetched_values))
+                for index, feature_name in enumerate(feature_names):
+                    if feature_name in fetched_by_name:
+                        row[index] = fetched_by_name[feature_name]
+        return rows
+
+    def _resolve_online_table(self, feature_table: str) -> str:
+        """Get the physical table of the current version of a feature table, itself if it's not versioned."""
+        return self.online_reader.resolve([(feature_table, "", [])])[0][0]
+
+    def enable_online_cache(self, max_size: int = 100000, ttl_seconds: float = 300,
+                            negative_ttl_seconds: float = 30) -> OnlineFeatureCache:
+        """Enables an in-process cache in front of `get_online_features` and `multi_get_online_features`.
+
+        Feature values in the online store only change when a materialization job runs, so they can be served from
+        memory for a while instead of going to Redis on every call. Use `OnlineFeatureCache.stats()` on the returned
+        cache to get the hit and miss counters.
+
+        Args:
+            max_size: maximum number of cached feature values. The least recently used ones are evicted first.
+            ttl_seconds: seconds a fetched value is cached
+            negative_ttl_seconds: seconds a missing value(key or feature doesn't exist) is cached. 0 to disable.
+        """
+        self.online_cache = OnlineFeatureCache(max_size, ttl_seconds, negative_ttl_seconds)
+        return self.online_cache
+
+    def enable_shared_online_cache(self, name: str, max_size: int = 100000, ttl_seconds: float = 300,
+                                   negative_ttl_seconds: float = 30,
+                                   max_value_bytes: int = 256) -> SharedOnlineFeatureCache:
+        """Enables a cache in front of `get_online_features` and `multi_get_online_features` that is shared by all the
+        processes of the host opening it with the same `name`, e.g. the workers of a pre-forking model server, so that
+        they share one warm cache instead of each caching the same hot entities. See `SharedOnlineFeatureCache`.
+
+        Args:
+            name: name of the cache, the same in all the processes
+            max_size: maximum number of cached feature values, allocated upfront in shared memory
+            ttl_seconds: seconds a fetched value is cached
+            negative_ttl_seconds: seconds a missing value(key or feature doesn't exist) is cached. 0 to disable.
+            max_value_bytes: max bytes of a cached raw value. Larger values are always fetched from the online store.
+        """
+        self.online_cache = SharedOnlineFeatureCache(name, max_size, ttl_seconds, negative_ttl_seconds,
+                                                     max_value_bytes=max_value_bytes)
+        return self.online_cache
+
+    def disable_online_cache(self):
+        """Disables the online feature cache. Features are fetched from the online store on every call again."""
+        self.online_cache = None
+
+    def warmup_online_cache(self, feature_table: str, keys: List[str], batch_size: int = 1000):
+        """Bulk loads all the features of the keys into the online feature cache, e.g. the hot keys at startup.
+        Keys that don't exist in the online store are cached as missing. A versioned table is warmed up from its
+        current version.
+
+        Args:
+            feature_table: the name of the feature table.
+            keys: list of keys for the entities
+            batch_size: number of keys fetched in each pipelined round trip
+        """
+        if self.online_cache is None:
+            raise RuntimeError("Please call FeathrClient.enable_online_cache() first in order to warm up the cache")
+        # the cached values are keyed by the physical table the reads are resolved to
+        feature_table = self._resolve_online_table(feature_table)
+        for start in range(0, len(keys), batch_size):
+            batch_keys = keys[start:start + batch_size]
+            self.online_reader.load_packed_schemas([feature_table])
+            if self.packed_schemas.is_packed(feature_table):
+                batch_values = [self.packed_schemas.select_all(feature_table, blob)
+                                for blob in self.online_store.batch_get_rows(feature_table, batch_keys)]
+            else:
+                batch_values = self.online_store.batch_get_all(feature_table, batch_keys)
+            self.online_reader.load_codec_dictionaries([values.values() for values in batch_values])
+            for key, values in zip(batch_keys, batch_values):
+                self.online_cache.put_key(feature_table, key, values)
+
+    def get_online_assembler(self, feature_tables: Dict[str, str]) -> OnlineFeatureAssembler:
+        """Creates an assembler to get derived, lookup and `INPUT_CONTEXT` features online, computed from the base
+        features in the online store, so that only the base features need to be materialized. It uses the anchors and
+        derived features built by `build_features`. See `OnlineFeatureAssembler` for the supported features.
+
+        Args:
+            feature_tables: dict from the name of each materialized feature to its online feature table
+        """
+        anchors = self.anchor_list if 'anchor_list' in dir(self) else []
+        derived_features = self.derived_feature_list if 'derived_feature_list' in dir(self) else []
+        return OnlineFeatureAssembler(self._fetch_online_features, feature_tables, anchors, derived_features)
+
+    def _get_built_feature_types(self, feature_names: Optional[List[str]]) -> Dict[str, FeatureType]:
+        """Get the types of the requested features(all of them if None) from the features built by `build_features`,
+        if any."""
+        built_features = []
+        if 'anchor_list' in dir(self) and 'derived_feature_list' in dir(self):
+            for anchor in self.anchor_list:
+                built_features.extend(anchor.features)
+            built_features.extend(self.derived_feature_list)
+        requested = None if feature_names is None else set(feature_names)
+        return {feature.name: feature.feature_type for feature in built_features
+                if requested is None or feature.name in requested}
 
     def _decode_proto(self, feature_list):
         """Decode the bytes(in string form) via base64 decoder. For dense array, it will be returned as Python List.
         For sparse array, it will be returned as tuple of index array and value array. The order of elements in the
         arrays won't be changed.
         """
-        typed_result = []
-        for raw_feature in feature_list:
-            if raw_feature:
-                feature_value = FeatureValue()
-                decoded = base64.b64decode(raw_feature)
-                feature_value.ParseFromString(decoded)
-                if feature_value.WhichOneof('FeatureValueOneOf') == 'boolean_value':
-                    typed_result.append(feature_value.boolean_value)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'string_value':
-                    typed_result.append(feature_value.string_value)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'float_value':
-                    typed_result.append(feature_value.float_value)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'double_value':
-                    typed_result.append(feature_value.double_value)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'int_value':
-                    typed_result.append(feature_value.int_value)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'long_value':
-                    typed_result.append(feature_value.long_value)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'int_array':
-                    typed_result.append(feature_value.int_array.integers)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'string_array':
-                    typed_result.append(feature_value.string_array.strings)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'float_array':
-                    typed_result.append(feature_value.float_array.floats)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'double_array':
-                    typed_result.append(feature_value.double_array.doubles)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'boolean_array':
-                    typed_result.append(feature_value.boolean_array.booleans)
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'sparse_string_array':
-                    typed_result.append((feature_value.sparse_string_array.index_integers, feature_value.sparse_string_array.value_strings))
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'sparse_bool_array':
-                    typed_result.append((feature_value.sparse_bool_array.index_integers, feature_value.sparse_bool_array.value_booleans))
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'sparse_float_array':
-                    typed_result.append((feature_value.sparse_float_array.index_integers, feature_value.sparse_float_array.value_floats))
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'sparse_double_array':
-                    typed_result.append((feature_value.sparse_double_array.index_integers, feature_value.sparse_double_array.value_doubles))
-                elif feature_value.WhichOneof('FeatureValueOneOf') == 'sparse_long_array':
-                    typed_result.append((feature_value.sparse_long_array.index_integers, feature_value.sparse_long_array.value_longs))
-                else:
-                    self.logger.debug("Fail to load the feature type. Maybe a new type that is not supported by this "
-                                      "client version")
-                    self.logger.debug(f"The raw feature is {raw_feature}.")
-                    self.logger.debug(f"The loaded feature is {feature_value}")
-                    typed_result.append(None)
-            else:
-                typed_result.append(raw_feature)
-        return typed_result
+        return decode_feature_values(feature_list)
 
     def _clean_test_data(self, feature_table):
         """
         WARNING: THIS IS ONLY USED FOR TESTING
-        Clears a namespace in redis cache.
+        Clears a feature table in the online store.
         This may be very time consuming.
 
         Args:
           feature_table: str, feature_table i.e your prefix before the separator in the Redis database.
         """
-        cursor = '0'
-        ns_keys = feature_table + '*'
-        while cursor != 0:
-            # 5000 count at a scan seems reasonable faster for our testing data
-            cursor, keys = self.redis_clint.scan(
-                cursor=cursor, match=ns_keys, count=5000)
-            if keys:
-                self.redis_clint.delete(*keys)
+        self.online_store.delete_table(feature_table)
 
     def _construct_redis_key(self, feature_table, key):
         return feature_table + self._KEY_SEPARATOR + key
@@ -392,14 +1162,106 @@ class FeathrClient(object):
         port = self.redis_port
         ssl_enabled = self.redis_ssl_enabled
 
-        redis_clint = redis.Redis(
-            host=host,
-            port=port,
-            password=password,
-            ssl=ssl_enabled)
+        pool_kwargs = self._get_redis_pool_kwargs()
+        if self._is_redis_cluster_enabled():
+            # the other nodes of the cluster are discovered from the startup nodes
+            startup_nodes = [redis.cluster.ClusterNode(node_host, node_port)
+                             for node_host, node_port in _parse_redis_startup_nodes(host, port)]
+            redis_clint = redis.cluster.RedisCluster(startup_nodes=startup_nodes,
+                                                     password=password,
+                                                     ssl=self._is_redis_ssl_enabled(),
+                                                     read_from_replicas=self._is_redis_read_from_replicas(),
+                                                     **pool_kwargs)
+        elif pool_kwargs:
+            # wait for a free connection rather than failing when all the pooled connections are in use
+            connection_class = redis.SSLConnection if self._is_redis_ssl_enabled() else redis.Connection
+            connection_pool = redis.BlockingConnectionPool(host=host,
+                                                           port=port,
+                                                           password=password,
+                                                           connection_class=connection_class,
+                                                           **pool_kwargs)
+            redis_clint = redis.Redis(connection_pool=connection_pool)
+        else:
+            redis_clint = redis.Redis(
+                host=host,
+                port=port,
+                password=password,
+                ssl=ssl_enabled)
         self.logger.info('Redis connection is successful and completed.')
         self.redis_clint = redis_clint
 
+    def _construct_online_store(self) -> OnlineStore:
+        """Constructs the online store from the config: the embedded SQLite store if its path is set, otherwise Redis."""
+        if self.sqlite_online_store_path:
+            self.logger.info(f'Serving online features from the SQLite store at {self.sqlite_online_store_path}.')
+            return SqliteOnlineStore(self.sqlite_online_store_path)
+        return RedisOnlineStore(self.redis_clint, self._KEY_SEPARATOR)
+
+    def _is_redis_ssl_enabled(self) -> bool:
+        return str(self.redis_ssl_enabled).lower() == 'true'
+
+    def _is_redis_cluster_enabled(self) -> bool:
+        return str(self.redis_cluster_enabled).lower() == 'true'
+
+    def _is_redis_read_from_replicas(self) -> bool:
+        return str(self.redis_read_from_replicas).lower() == 'true'
+
+    def _get_redis_pool_kwargs(self) -> Dict:
+        """Get the optional connection pool settings of the online store from the config."""
+        pool_kwargs = {}
+        if self.redis_max_connections:
+            pool_kwargs['max_connections'] = int(self.redis_max_connections)
+        if self.redis_socket_timeout:
+            pool_kwargs['socket_timeout'] = float(self.redis_socket_timeout)
+        if self.redis_health_check_interval:
+            pool_kwargs['health_check_interval'] = int(self.redis_health_check_interval)
+        return pool_kwargs
+
+    def get_async_online_client(self, **kwargs) -> AsyncFeathrOnlineClient:
+        """Creates an asyncio client to fetch features from the online store, with the same Redis configs as this
+        client. It has its own connection pool, sized by `online_store.redis.max_connections` in the config.
+
+        Args:
+            kwargs: optional overrides of the `AsyncFeathrOnlineClient` arguments, e.g. `max_connections=256`
+        """
+        client_kwargs = dict(host=self.redis_host,
+                             port=self.redis_port,
+                             password=self.envutils.get_environment_variable(REDIS_PASSWORD),
+                             ssl_enabled=self._is_redis_ssl_enabled(),
+                             cluster_enabled=self._is_redis_cluster_enabled(),
+                             read_from_replicas=self._is_redis_read_from_replicas())
+        client_kwargs.update(self._get_redis_pool_kwargs())
+        client_kwargs.update(kwargs)
+        return AsyncFeathrOnlineClient(**client_kwargs)
+
+    def get_online_lookup_handle(self, feature_types: Optional[Dict[str, FeatureType]] = None,
+                                 **kwargs) -> OnlineLookupHandle:
+        """Creates a picklable handle to fetch online features from the tasks of distributed jobs, e.g. Spark
+        `mapInArrow` or pandas UDFs, with the same online store configs as this client. Unlike the client, the handle
+        is cheap to ship to the executors, and opens one connection pool per executor process. See
+        `OnlineLookupHandle`.
+
+        Args:
+            feature_types: types of the features, used to decode the Arrow and pandas columns. Defaults to the types
+                of the features built by `build_features`.
+            kwargs: optional overrides of the `OnlineLookupHandle` arguments, e.g. `pool_kwargs={"max_connections": 8}`
+        """
+        if feature_types is None:
+            feature_types = self._get_built_feature_types(None)
+        if self.sqlite_online_store_path:
+            handle_kwargs = dict(sqlite_path=self.sqlite_online_store_path)
+        else:
+            handle_kwargs = dict(host=self.redis_host,
+                                 port=self.redis_port,
+                                 password=self.envutils.get_environment_variable(REDIS_PASSWORD),
+                                 ssl_enabled=self._is_redis_ssl_enabled(),
+                                 cluster_enabled=self._is_redis_cluster_enabled(),
+                                 read_from_replicas=self._is_redis_read_from_replicas(),
+                                 pool_kwargs=self._get_redis_pool_kwargs())
+        handle_kwargs.update(key_separator=self._KEY_SEPARATOR, feature_types=feature_types)
+        handle_kwargs.update(kwargs)
+        return OnlineLookupHandle(**handle_kwargs)
+
 
     def get_offline_features(self,
                              observation_settings: ObservationSettings,
@@ -521,14 +1383,6 @@ class FeathrClient(object):
         """
         return self.feathr_spark_launcher.get_job_tags()
 
-    def wait_job_to_finish(self, timeout_sec: int = 300):
-        """Waits for the job to finish in a blocking way unless it times out
-        """
-        if self.feathr_spark_launcher.wait_for_completion(timeout_sec):
-            return
-        else:
-            raise RuntimeError('Spark job failed.')
-
     def monitor_features(self, settings: MonitoringSettings, execution_configurations: Union[SparkExecutionConfiguration ,Dict[str,str]] = {}, verbose: bool = False):
         """Create a offline job to generate statistics to monitor feature data
 
@@ -545,6 +1399,13 @@ class FeathrClient(object):
             settings: Feature materialization settings
             execution_configurations: a dict that will be passed to spark job when the job starts up, i.e. the "spark configurations". Note that not all of the configuration will be honored since some of the configurations are managed by the Spark platform, such as Databricks or Azure Synapse. Refer to the [spark documentation](https://spark.apache.org/docs/latest/configuration.html) for a complete list of spark configurations.
         """
+        self._materialized_tables = [sink.table_name for sink in settings.sinks
+                                     if isinstance(sink, RedisSink) and not sink.streaming]
+        # a versioned sink writes all the backfill steps to a new version, swapped in by `wait_job_to_finish`
+        for sink in settings.sinks:
+            if isinstance(sink, RedisSink) and sink.versioned:
+                sink.table_version = new_table_version(sink.table_name)
+                self._pending_table_versions[sink.table_name] = sink.table_version
         # produce materialization config
         for end in settings.get_backfill_cutoff_time():
             settings.backfill_time.end = end
@@ -623,13 +1484,26 @@ class FeathrClient(object):
 
 
     def wait_job_to_finish(self, timeout_sec: int = 300):
-        """Waits for the job to finish in a blocking way unless it times out
+        """Waits for the job to finish in a blocking way unless it times out. The versions of the versioned tables
+        written by the job(see `RedisSink(versioned=True)`) are swapped in once it succeeds, and the auto refreshed
+        nearest neighbour indexes of the tables it materialized are rebuilt in the background(see `build_ann_index`).
         """
         if self.feathr_spark_launcher.wait_for_completion(timeout_sec):
+            self._swap_pending_table_versions()
+            materialized_tables, self._materialized_tables = self._materialized_tables, []
+            self._refresh_ann_indexes(materialized_tables)
             return
         else:
+            self._pending_table_versions = {}
+            self._materialized_tables = []
             raise RuntimeError('Spark job failed.')
 
+    def _swap_pending_table_versions(self):
+        """Swaps in the table versions written by the materialization job that just succeeded."""
+        pending, self._pending_table_versions = self._pending_table_versions, {}
+        for feature_table, table_version in pending.items():
+            self.swap_online_table_version(feature_table, table_version)
+
     def _getRedisConfigStr(self):
         """Construct the Redis config string. The host, port, credential and other parameters can be set via environment
         variables."""
@@ -642,7 +1516,9 @@ class FeathrClient(object):
         REDIS_HOST: "{REDIS_HOST}"
         REDIS_PORT: {REDIS_PORT}
         REDIS_SSL_ENABLED: {REDIS_SSL_ENABLED}
-        """.format(REDIS_PASSWORD=password, REDIS_HOST=host, REDIS_PORT=port, REDIS_SSL_ENABLED=ssl_enabled)
+        REDIS_CLUSTER_ENABLED: {REDIS_CLUSTER_ENABLED}
+        """.format(REDIS_PASSWORD=password, REDIS_HOST=host, REDIS_PORT=port, REDIS_SSL_ENABLED=ssl_enabled,
+                   REDIS_CLUSTER_ENABLED=str(self._is_redis_cluster_enabled()).lower())
         return config_str
 
     def _get_s3_config_str(self):
@@ -2,6 +2,8 @@ OUTPUT_PATH_TAG = "output_path"
 # spark config for output format setting
 OUTPUT_FORMAT = "spark.feathr.outputFormat"
 REDIS_PASSWORD = 'REDIS_PASSWORD'
+# separator between the feature table name and the entity key in Redis keys
+REDIS_KEY_SEPARATOR = ':'
 
 # 1MB = 1024*1024
 MB_BYTES = 1048576
@@ -1,6 +1,8 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from jinja2 import Template
 from feathr.definition.feathrconfig import HoconConvertible
+from feathr.online.codec import BASE64_CODEC, QUANTIZATIONS, VALUE_CODECS
+from feathr.online.packed import HASH_LAYOUT, LAYOUTS
 
 
 class Sink(HoconConvertible):
@@ -32,16 +34,57 @@ class MonitoringSqlSink(Sink):
 
 class RedisSink(Sink):
     """Redis-based sink use to store online feature data, can be used in batch job or streaming job.
+    The Redis endpoint is the `online_store.redis` config. If it is a Redis Cluster(`cluster_enabled`), the writes are
+    spread across all the shards of the cluster.
 
     Attributes:
         table_name: output table name
         streaming: whether it is used in streaming mode
         streamingTimeoutMs: maximum running time for streaming mode. It is not used in batch mode.
+        value_codec: how the feature values of the table are encoded, see `feathr.online.codec`:
+            - base64(default): base64 encoded protobuf, readable by all Feathr versions
+            - raw: raw protobuf bytes behind a header byte, about 25% smaller than base64 and faster to decode
+            - zstd: zstd compressed protobuf, with a dictionary trained on a sample of the table. Best for tables
+              with array features.
+            The online clients detect the codec of each value, so the codec of a table can be changed at any time.
+        quantization: reduced precision storage of dense float/double array features, e.g. embeddings, from feature
+            name to `float16`(half the size) or `int8`(a quarter of the size, with a scale per vector). They are
+            dequantized by the online clients. See `feathr.online.codec.quantization_error` to measure the precision
+            loss on a sample of the feature.
+        layout: how the entities of the table are stored:
+            - hash(default): one Redis hash per entity, with one field per feature
+            - packed: one blob per entity, with all the features of the materialization in a fixed column order.
+              The column order(schema) is stored once per table, and the clients fetch an entity with one GET. Best
+              for wide tables, where the per field overhead of hashes dominates.
+        versioned: whether each materialization writes a new version of the table, instead of overwriting the
+            entities in place. `table_name` is then an alias of the current version: it's switched to the new
+            version by `FeathrClient.wait_job_to_finish` once the job succeeds, and the previous version is deleted
+            in the background. See `feathr.online.versions`. Not supported in streaming mode.
+        table_version: the physical table of the version written by the materialization, set by
+            `FeathrClient.materialize_features` for a versioned sink
     """
-    def __init__(self, table_name: str, streaming: bool=False, streamingTimeoutMs: Optional[int]=None) -> None:
+    def __init__(self, table_name: str, streaming: bool=False, streamingTimeoutMs: Optional[int]=None,
+                 value_codec: str = BASE64_CODEC, quantization: Optional[Dict[str, str]] = None,
+                 layout: str = HASH_LAYOUT, versioned: bool = False) -> None:
+        if value_codec not in VALUE_CODECS:
+            raise RuntimeError(f"Unsupported value codec {value_codec}. Supported codecs are {VALUE_CODECS}.")
+        if layout not in LAYOUTS:
+            raise RuntimeError(f"Unsupported layout {layout}. Supported layouts are {LAYOUTS}.")
+        for feature_name, quantization_type in (quantization or {}).items():
+            if quantization_type not in QUANTIZATIONS:
+                raise RuntimeError(f"Unsupported quantization {quantization_type} of feature {feature_name}. "
+                                   f"Supported ones are {list(QUANTIZATIONS)}.")
+        if versioned and streaming:
+            raise RuntimeError(f"Table {table_name} can't be versioned in streaming mode, since a streaming job "
+                               f"never finishes loading a version.")
         self.table_name = table_name
         self.streaming = streaming
         self.streamingTimeoutMs = streamingTimeoutMs
+        self.value_codec = value_codec
+        self.quantization = quantization or {}
+        self.layout = layout
+        self.versioned = versioned
+        self.table_version: Optional[str] = None
 
     def to_feature_config(self) -> str:
         """Produce the config used in feature materialization"""
@@ -49,13 +92,26 @@ class RedisSink(Sink):
             {
                 name: REDIS
                 params: {
-                    table_name: "{{source.table_name}}"
+                    table_name: "{{source.table_version or source.table_name}}"
                     {% if source.streaming %}
                     streaming: true
                     {% endif %}
                     {% if source.streamingTimeoutMs %}
                     timeoutMs: {{source.streamingTimeoutMs}}
                     {% endif %}
+                    {% if source.value_codec != "base64" %}
+                    value_codec: "{{source.value_codec}}"
+                    {% endif %}
+                    {% if source.layout != "hash" %}
+                    layout: "{{source.layout}}"
+                    {% endif %}
+                    {% if source.quantization %}
+                    quantization: {
+                        {% for feature_name, quantization_type in source.quantization.items() %}
+                        "{{feature_name}}": "{{quantization_type}}"
+                        {% endfor %}
+                    }
+                    {% endif %}
                 }
             }
         """)
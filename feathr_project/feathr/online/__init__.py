@@ -0,0 +1,22 @@
+from .ann import ANN_METRICS, IvfIndex, read_offline_vectors, read_online_vectors
+from .assembler import OnlineFeatureAssembler
+from .async_client import AsyncFeathrOnlineClient
+from .cache import OnlineFeatureCache
+from .codec import VALUE_CODECS, ValueEncoder, quantization_error, quantize, train_dictionary
+from .deadline import CircuitBreaker, DeadlineFetcher, OnlineFetchResult
+from .decoder import ONLINE_OUTPUT_FORMATS, decode_feature_columns, decode_feature_values
+from .encoder import arrow_feature_type, encode_feature_column, encode_feature_value
+from .export import export_online_table
+from .handle import OnlineLookupHandle
+from .loader import LOAD_FORMATS, load_online_table
+from .metrics import OnlineMetricsHook, OnlineRequestMetrics, PrometheusOnlineMetricsHook, SlowRequestLogHook
+from .online_store import ACCUMULATE_OPERATIONS, OnlineStore
+from .planner import MemoryEstimate, calibrate_memory_model, estimate_online_memory
+from .reader import OnlineReader
+from .redis_store import RedisOnlineStore
+from .shared_cache import SharedOnlineFeatureCache
+from .single_flight import AsyncSingleFlight, SingleFlight
+from .sqlite_store import SqliteOnlineStore
+from .streaming import StreamingIngestionMetrics, StreamingIngestionWorker, kafka_consumer_config
+from .versions import TableAliases, new_table_version, reclaim_table_versions, swap_table_alias
+from .window import WINDOW_AGG_FUNCTIONS, OnlineWindowAggregator, parse_window
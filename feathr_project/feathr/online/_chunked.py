@@ -0,0 +1,44 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _iter_chunks(items: Sequence[T], chunk_size: int) -> Iterator[Sequence[T]]:
+    if chunk_size <= 0:
+        raise RuntimeError("chunk_size must be positive.")
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def _map_chunks_in_order(fetch_chunk: Callable[[Sequence[T]], R], items: Sequence[T], chunk_size: int,
+                         parallelism: int) -> Iterator[R]:
+    """Apply `fetch_chunk` to consecutive chunks of `items` on `parallelism` threads, and yield the results in chunk
+    order.
+
+    At most `parallelism` chunks are in flight at any time, so the memory used by pending replies is bounded by
+    `parallelism * chunk_size` items, however many items there are and however slowly the results are consumed.
+    """
+    if parallelism <= 0:
+        raise RuntimeError("parallelism must be positive.")
+    chunks = _iter_chunks(items, chunk_size)
+    if parallelism == 1:
+        for chunk in chunks:
+            yield fetch_chunk(chunk)
+        return
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        in_flight = deque()
+        try:
+            for chunk in chunks:
+                if len(in_flight) == parallelism:
+                    yield in_flight.popleft().result()
+                in_flight.append(executor.submit(fetch_chunk, chunk))
+            while in_flight:
+                yield in_flight.popleft().result()
+        finally:
+            # the consumer stopped early or a chunk failed, don't fetch the remaining chunks
+            for future in in_flight:
+                future.cancel()
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from redis.exceptions import RedisError
+
+# A HMGET of some fields of one Redis key: (redis_key, fields)
+HmgetRequest = Tuple[str, Sequence[str]]
+
+
+def _parse_redis_startup_nodes(host: str, port) -> List[Tuple[str, int]]:
+    """Parse the Redis host config into (host, port) nodes.
+
+    The host can be a single host name, or a comma separated list of `host:port` cluster endpoints, e.g.
+    `node1:6379,node2:6379`. Nodes without a port use `port`.
+    """
+    nodes = []
+    for endpoint in str(host).split(","):
+        endpoint = endpoint.strip()
+        if not endpoint:
+            continue
+        node_host, _, node_port = endpoint.rpartition(":") if ":" in endpoint else (endpoint, "", port)
+        nodes.append((node_host, int(node_port)))
+    if not nodes:
+        raise RuntimeError(f"Invalid Redis host config: {host}")
+    return nodes
+
+
+def _cluster_hmget_many(cluster_client, requests: List[HmgetRequest], read_from_replicas: bool = False,
+                        parallelism: Optional[int] = None) -> List[List[Optional[bytes]]]:
+    """Runs HMGET for each (redis_key, fields) request on a Redis Cluster, and return the results in request order.
+
+    The keys are grouped by the node that owns their hash slot, and each node gets one pipeline with all its keys.
+    The pipelines of the nodes run in parallel, so a batch costs about one round trip to the slowest node instead of
+    one round trip per node. If the slots moved(e.g. during resharding) or a node failed, the requests of that node
+    are retried with the cluster pipeline of redis-py, which follows the redirections and refreshes the slot map.
+
+    Args:
+        cluster_client: a `redis.cluster.RedisCluster`
+        requests: list of (redis_key, fields)
+        read_from_replicas: read from a replica of the slot if it has one, to spread the reads over the replicas
+        parallelism: max number of nodes queried concurrently. Defaults to all the nodes of the batch.
+    """
+    requests_by_node: Dict[str, Tuple[object, List[int]]] = {}
+    for index, (redis_key, _) in enumerate(requests):
+        node = cluster_client.get_node_from_key(redis_key, replica=read_from_replicas) if read_from_replicas else None
+        node = node or cluster_client.get_node_from_key(redis_key)
+        requests_by_node.setdefault(node.name, (node, []))[1].append(index)
+
+    def fetch_node(node, indices):
+        try:
+            with cluster_client.get_redis_connection(node).pipeline(transaction=False) as redis_pipeline:
+                for index in indices:
+                    redis_key, fields = requests[index]
+                    redis_pipeline.hmget(redis_key, *fields)
+                return redis_pipeline.execute()
+        except RedisError:
+            with cluster_client.pipeline() as redis_pipeline:
+                for index in indices:
+                    redis_key, fields = requests[index]
+                    redis_pipeline.hmget(redis_key, *fields)
+                return redis_pipeline.execute()
+
+    groups = list(requests_by_node.values())
+    if len(groups) <= 1:
+        node_results = [fetch_node(node, indices) for node, indices in groups]
+    else:
+        with ThreadPoolExecutor(max_workers=parallelism or len(groups)) as executor:
+            node_results = list(executor.map(lambda group: fetch_node(*group), groups))
+
+    results = [None] * len(requests)
+    for (_, indices), node_result in zip(groups, node_results):
+        for index, values in zip(indices, node_result):
+            results[index] = values
+    return results
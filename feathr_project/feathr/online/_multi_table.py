@@ -0,0 +1,49 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from feathr.definition.query_feature_list import FeatureQuery
+from feathr.online.decoder import decode_feature_values
+
+# A request for features of several entities in one feature table: (feature_table, keys, feature names or query)
+TableRequest = Tuple[str, List[str], Union[List[str], FeatureQuery]]
+
+
+def _normalize_table_requests(requests: Sequence[TableRequest]) -> List[Tuple[str, List[str], List[str]]]:
+    """Resolve the FeatureQuery of the requests into feature names, and check the feature names are unique, since
+    they identify the values in the merged result."""
+    normalized = []
+    seen_features = {}
+    for feature_table, keys, features in requests:
+        feature_names = features.feature_list if isinstance(features, FeatureQuery) else list(features)
+        for feature_name in feature_names:
+            if feature_name in seen_features:
+                raise RuntimeError(f"Feature {feature_name} is requested from both {seen_features[feature_name]} and "
+                                   f"{feature_table}. Feature names must be unique across the requested tables.")
+            seen_features[feature_name] = feature_table
+        normalized.append((feature_table, list(keys), feature_names))
+    return normalized
+
+
+def _merge_table_results(requests: List[Tuple[str, List[str], List[str]]],
+                         rows: List[List[Optional[bytes]]],
+                         defaults: Optional[Dict[str, Any]] = None) -> Dict[str, List[Any]]:
+    """Merge the raw values fetched for each (request, key), in request order, into one list of values per entity.
+
+    The values of each entity are ordered by the feature names of all the requests, in request order. Features that
+    are missing, or that come from a request which doesn't contain the entity, get their value in `defaults`(None if
+    not set).
+    """
+    defaults = defaults or {}
+    all_feature_names = [feature_name for _, _, feature_names in requests for feature_name in feature_names]
+    default_row = [defaults.get(feature_name) for feature_name in all_feature_names]
+    merged = {}
+    row_iter = iter(rows)
+    offset = 0
+    for _, keys, feature_names in requests:
+        for key in keys:
+            values = decode_feature_values(next(row_iter))
+            merged_values = merged.setdefault(key, list(default_row))
+            for index, value in enumerate(values):
+                if value is not None:
+                    merged_values[offset + index] = value
+        offset += len(feature_names)
+    return merged
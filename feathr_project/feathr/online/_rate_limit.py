@@ -0,0 +1,28 @@
+import threading
+import time
+from typing import Optional
+
+
+class _TokenBucket(object):
+    """Thread-safe token bucket limiting the rate of some work, e.g. keys read per second.
+
+    `acquire` takes tokens and waits until the bucket is refilled if there weren't enough. The bucket can go into
+    debt, so that a batch larger than the burst still passes, and delays the following ones instead.
+    """
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise RuntimeError(f"The rate limit must be positive, but it's {rate}.")
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate) - tokens
+            self._updated = now
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
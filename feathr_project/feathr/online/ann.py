@@ -0,0 +1,345 @@
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pyarrow.compute as pc
+
+from feathr.definition.dtype import FeatureType
+from feathr.online.decoder import decode_feature_columns
+from feathr.online.export import PrepareFunction, _unpack_batch
+from feathr.online.loader import _read_batches
+from feathr.online.online_store import OnlineStore
+from feathr.online.packed import PackedSchemas
+
+# Similarity metrics of the indexes. Cosine and dot rank by decreasing similarity, l2 by increasing distance.
+COSINE_METRIC = "cosine"
+DOT_METRIC = "dot"
+L2_METRIC = "l2"
+ANN_METRICS = [COSINE_METRIC, DOT_METRIC, L2_METRIC]
+
+# Source of an index built from the online feature table, which is rebuilt after each materialization of the table
+ONLINE_SOURCE = "online"
+
+# File holding the name of the directory of the current version of an index
+_CURRENT_FILE = "CURRENT"
+# seconds the replaced versions of an index are kept, for the processes still loading or reading them
+_VERSION_GRACE_SECONDS = 600
+# max number of vectors k-means is trained on, per list
+_TRAINING_VECTORS_PER_LIST = 256
+_KMEANS_ITERATIONS = 20
+# number of vectors assigned to their nearest centroids at a time, to bound the memory of the score matrix
+_ASSIGN_CHUNK_SIZE = 16384
+# the centroids are trained again when an index is rebuilt with this many times the vectors they were trained on
+_RETRAIN_GROWTH = 2
+
+
+class IvfIndex(object):
+    """Inverted file(IVF) index of the embedding vectors of a feature, for approximate nearest neighbour lookups.
+
+    The vectors are clustered with k-means into `num_lists` lists. A lookup scores the query against the centroids of
+    the lists, and then only against the vectors of the `num_probes` nearest lists, so it reads a small part of the
+    vectors. Probing more lists is slower but finds more of the true nearest neighbours, and probing all of them is
+    an exact search.
+
+    The index is stored in a directory: the vectors sorted by list, the list offsets and the centroids as `.npy`
+    files, which are memory-mapped rather than read, the keys as JSON and the settings in `index.json`. Each build
+    writes a new version of the files, and switches the `CURRENT` file to it atomically, so a process can rebuild an
+    index while others read it.
+
+    Attributes:
+        path: the directory of the index
+        metric: `cosine`, `dot` or `l2`
+        num_probes: number of lists scanned by a lookup by default
+        keys: the entity key of each vector, in the order of `vectors`
+        vectors: the float32 vectors, normalized for the cosine metric, sorted by list
+        offsets: start offset of each list in `vectors`, followed by the number of vectors
+        centroids: the centroid of each list
+        metadata: the settings of the index, and where its vectors come from
+    """
+    def __init__(self, path: str, keys: List[str], vectors: np.ndarray, offsets: np.ndarray, centroids: np.ndarray,
+                 metadata: Dict[str, Any]):
+        self.path = path
+        self.keys = keys
+        self.vectors = vectors
+        self.offsets = offsets
+        self.centroids = centroids
+        self.metadata = metadata
+        self.metric = metadata["metric"]
+        self.num_probes = metadata["num_probes"]
+
+    @property
+    def dimension(self) -> int:
+        return self.centroids.shape[1]
+
+    @property
+    def num_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, path: str, keys: Sequence[str], vectors: np.ndarray, metric: str = COSINE_METRIC,
+              num_lists: Optional[int] = None, num_probes: Optional[int] = None,
+              centroids: Optional[np.ndarray] = None, metadata: Optional[Dict[str, Any]] = None,
+              seed: int = 0) -> "IvfIndex":
+        """Builds an index of some vectors, and writes it to `path`.
+
+        Args:
+            path: the directory of the index. A new version of the index is written if it already exists.
+            keys: the entity key of each vector
+            vectors: 2-D array with one vector per key
+            metric: `cosine`(default), `dot` or `l2`
+            num_lists: number of lists. Defaults to the square root of the number of vectors.
+            num_probes: number of lists scanned by a lookup by default. Defaults to the square root of the number of
+                lists.
+            centroids: the centroids of the lists, e.g. of a previous build, so that k-means isn't trained again
+            metadata: extra settings stored with the index, e.g. the feature table it's built from
+            seed: seed of the k-means initialization
+
+        Return:
+            The built index, memory-mapped from its files.
+        """
+        if metric not in ANN_METRICS:
+            raise RuntimeError(f"Unsupported metric {metric}. Supported metrics are {ANN_METRICS}.")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or not len(vectors):
+            raise RuntimeError(f"An index needs a non-empty 2-D array of vectors, got shape {vectors.shape}.")
+        if len(keys) != len(vectors):
+            raise RuntimeError(f"Got {len(keys)} keys for {len(vectors)} vectors.")
+        if metric == COSINE_METRIC:
+            vectors = _normalize(vectors)
+        metadata = dict(metadata or {})
+        if centroids is None:
+            num_lists = min(num_lists or max(1, int(np.sqrt(len(vectors)))), len(vectors))
+            centroids = _train_centroids(vectors, num_lists, metric, np.random.default_rng(seed))
+            metadata["trained_vectors"] = len(vectors)
+        elif centroids.shape[1] != vectors.shape[1]:
+            raise RuntimeError(f"The centroids have dimension {centroids.shape[1]}, but the vectors have dimension "
+                               f"{vectors.shape[1]}.")
+        assignments = _assign(vectors, centroids, metric)
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1)).astype(np.int64)
+        metadata.update(metric=metric, num_probes=num_probes or max(1, int(np.sqrt(len(centroids)))),
+                        num_vectors=len(vectors), built_at=time.time())
+        metadata.setdefault("trained_vectors", len(vectors))
+
+        version = f"v{time.time_ns()}"
+        version_path = os.path.join(path, version)
+        os.makedirs(version_path)
+        np.save(os.path.join(version_path, "vectors.npy"), vectors[order])
+        np.save(os.path.join(version_path, "offsets.npy"), offsets)
+        np.save(os.path.join(version_path, "centroids.npy"), centroids.astype(np.float32))
+        with open(os.path.join(version_path, "keys.json"), "w") as keys_file:
+            json.dump([keys[index] for index in order.tolist()], keys_file)
+        with open(os.path.join(version_path, "index.json"), "w") as metadata_file:
+            json.dump(metadata, metadata_file)
+        # switch to the new version atomically, then remove the old ones
+        current_file = os.path.join(path, _CURRENT_FILE)
+        with open(current_file + ".tmp", "w") as current:
+            current.write(version)
+        os.replace(current_file + ".tmp", current_file)
+        _remove_old_versions(path)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str) -> "IvfIndex":
+        """Loads the current version of an index written by `build`. The vectors are memory-mapped."""
+        current_file = os.path.join(path, _CURRENT_FILE)
+        if not os.path.exists(current_file):
+            raise RuntimeError(f"There is no ANN index at {path}.")
+        with open(current_file) as current:
+            version_path = os.path.join(path, current.read().strip())
+        with open(os.path.join(version_path, "keys.json")) as keys_file:
+            keys = json.load(keys_file)
+        with open(os.path.join(version_path, "index.json")) as metadata_file:
+            metadata = json.load(metadata_file)
+        return cls(path, keys,
+                   np.load(os.path.join(version_path, "vectors.npy"), mmap_mode="r"),
+                   np.load(os.path.join(version_path, "offsets.npy")),
+                   np.load(os.path.join(version_path, "centroids.npy")),
+                   metadata)
+
+    def rebuild(self, keys: Sequence[str], vectors: np.ndarray) -> "IvfIndex":
+        """Builds a new version of the index with new vectors, e.g. after the feature table is materialized again.
+
+        The centroids are kept, so only the vectors are assigned to the lists, which is much faster than training
+        k-means. They are trained again once there are `_RETRAIN_GROWTH` times more vectors than they were trained
+        on.
+        """
+        retrain = len(vectors) > _RETRAIN_GROWTH * self.metadata.get("trained_vectors", len(vectors))
+        metadata = {name: value for name, value in self.metadata.items()
+                    if name not in ("num_vectors", "built_at", "trained_vectors")}
+        if not retrain:
+            metadata["trained_vectors"] = self.metadata.get("trained_vectors")
+        return IvfIndex.build(self.path, keys, vectors, self.metric, self.num_lists, self.num_probes,
+                              centroids=None if retrain else np.asarray(self.centroids), metadata=metadata)
+
+    def search(self, query_vector: Union[Sequence[float], np.ndarray], k: int = 10,
+               num_probes: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Finds the approximate `k` nearest vectors of a query vector.
+
+        Args:
+            query_vector: the query vector, with the dimension of the index
+            k: number of neighbours to return
+            num_probes: number of lists to scan. Defaults to the `num_probes` of the index.
+
+        Return:
+            The (key, score) of the neighbours, nearest first. The score is the similarity for the cosine and dot
+            metrics, and the Euclidean distance for the l2 metric.
+        """
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        if query.shape[0] != self.dimension:
+            raise RuntimeError(f"The query vector has dimension {query.shape[0]}, but the index has dimension "
+                               f"{self.dimension}.")
+        if self.metric == COSINE_METRIC:
+            query = _normalize(query[np.newaxis])[0]
+        num_probes = min(num_probes or self.num_probes, self.num_lists)
+        centroid_scores = _scores(self.centroids, query, self.metric)
+        lists = np.argpartition(-centroid_scores, num_probes - 1)[:num_probes]
+        # the vectors of a list are contiguous, so each probed list is one slice of the memory-mapped file
+        candidates = np.concatenate([np.arange(self.offsets[index], self.offsets[index + 1]) for index in lists])
+        if not len(candidates):
+            return []
+        vectors = np.concatenate([self.vectors[self.offsets[index]:self.offsets[index + 1]] for index in lists])
+        scores = _scores(vectors, query, self.metric)
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        if self.metric == L2_METRIC:
+            return [(self.keys[candidates[index]], float(np.sqrt(max(-scores[index], 0.0)))) for index in top]
+        return [(self.keys[candidates[index]], float(scores[index])) for index in top]
+
+
+def read_online_vectors(online_store: OnlineStore, feature_table: str, feature: str,
+                        feature_type: Optional[FeatureType] = None, packed_schemas: Optional[PackedSchemas] = None,
+                        prepare: Optional[PrepareFunction] = None,
+                        batch_size: int = 1000) -> Tuple[List[str], np.ndarray]:
+    """Reads the vectors of a dense array feature from all the entities of an online feature table, like
+    `export_online_table` does. Entities without the feature are left out.
+
+    Return:
+        (the keys, 2-D float32 array with the vector of each key)
+    """
+    keys = []
+    blocks = []
+    for shard in online_store.scan_shards(feature_table, batch_size):
+        for batch in shard:
+            batch_keys, entity_values = _unpack_batch(batch, feature_table, packed_schemas)
+            rows = [[values[feature]] for values in entity_values if values.get(feature)]
+            if not rows:
+                continue
+            if prepare is not None:
+                prepare(rows)
+            block = decode_feature_columns(rows, [feature], {feature: feature_type} if feature_type else None,
+                                           "numpy")[feature]
+            if block.ndim != 2:
+                raise RuntimeError(f"Feature {feature} of online feature table {feature_table} is not a dense array "
+                                   f"feature with vectors of the same dimension.")
+            keys.extend(key for key, values in zip(batch_keys, entity_values) if values.get(feature))
+            blocks.append(block.astype(np.float32))
+    return keys, _stack(blocks, feature)
+
+
+def read_offline_vectors(path: str, key_column: Union[str, List[str]], feature: str, format: str = "parquet",
+                         batch_size: int = 100000) -> Tuple[List[str], np.ndarray]:
+    """Reads the vectors of a dense array feature from an offline dataset, e.g. the output of `get_offline_features`
+    downloaded with `get_result_df`. Rows without the feature are left out.
+
+    Args:
+        path: a Parquet or Avro file, a directory of them, or a Delta table directory
+        key_column: the column of the entity key, or a list of columns for a compound key, whose values are joined
+            with `#` like the materialization job does
+        feature: the column of the vectors
+        format: `parquet`, `avro` or `delta`
+
+    Return:
+        (the keys, 2-D float32 array with the vector of each key)
+    """
+    key_columns = [key_column] if isinstance(key_column, str) else list(key_column)
+    _, batches = _read_batches(path, format.casefold(), batch_size, key_columns + [feature])
+    keys = []
+    blocks = []
+    for batch in batches:
+        column = batch.column(feature)
+        valid = column.is_valid()
+        column = column.filter(valid)
+        if not len(column):
+            continue
+        lengths = pc.unique(pc.list_value_length(column)).to_pylist()
+        if len(lengths) != 1:
+            raise RuntimeError(f"The vectors of feature {feature} don't have the same dimension: {sorted(lengths)}.")
+        blocks.append(column.flatten().to_numpy(zero_copy_only=False).astype(np.float32).reshape(-1, lengths[0]))
+        key_values = [batch.column(name).filter(valid).to_pylist() for name in key_columns]
+        keys.extend("#".join(str(value) for value in values) for values in zip(*key_values))
+    return keys, _stack(blocks, feature)
+
+
+def _remove_old_versions(path: str):
+    """Removes the versions of an index that were replaced more than `_VERSION_GRACE_SECONDS` ago. The previous
+    version is always kept, so that a process which read `CURRENT` before the switch can still load it, and the
+    processes that memory-mapped the old versions keep reading them until they load a newer one. A version that
+    can't be removed yet, e.g. while it's memory-mapped on Windows, is removed by a later build."""
+    versions = sorted((name for name in os.listdir(path)
+                       if name.startswith("v") and name[1:].isdigit() and os.path.isdir(os.path.join(path, name))),
+                      key=lambda name: int(name[1:]))
+    now = time.time_ns()
+    # a version was replaced when the next one was built, which is the timestamp in the name of the next version
+    for name, successor in zip(versions[:-2], versions[1:-1]):
+        if now - int(successor[1:]) >= _VERSION_GRACE_SECONDS * 1e9:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+
+def _stack(blocks: List[np.ndarray], feature: str) -> np.ndarray:
+    if not blocks:
+        return np.zeros((0, 0), dtype=np.float32)
+    if len({block.shape[1] for block in blocks}) != 1:
+        raise RuntimeError(f"The vectors of feature {feature} don't have the same dimension.")
+    return np.concatenate(blocks)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1).astype(vectors.dtype)
+
+
+def _scores(vectors: np.ndarray, query: np.ndarray, metric: str) -> np.ndarray:
+    """Score vectors against a query, higher is nearer. For l2, it's the negative squared distance."""
+    scores = vectors @ query
+    if metric == L2_METRIC:
+        scores = 2 * scores - np.einsum("ij,ij->i", vectors, vectors) - query @ query
+    return scores
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, metric: str) -> np.ndarray:
+    """Get the index of the nearest centroid of each vector."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    # the squared norm of the vector is the same for all the centroids, so it doesn't change the nearest one
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids) if metric == L2_METRIC else None
+    for start in range(0, len(vectors), _ASSIGN_CHUNK_SIZE):
+        scores = vectors[start:start + _ASSIGN_CHUNK_SIZE] @ centroids.T
+        if centroid_norms is not None:
+            scores = 2 * scores - centroid_norms
+        assignments[start:start + _ASSIGN_CHUNK_SIZE] = scores.argmax(axis=1)
+    return assignments
+
+
+def _train_centroids(vectors: np.ndarray, num_lists: int, metric: str, rng: np.random.Generator) -> np.ndarray:
+    """Cluster a sample of the vectors with k-means."""
+    sample_size = min(len(vectors), num_lists * _TRAINING_VECTORS_PER_LIST)
+    sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    centroids = sample[rng.choice(sample_size, num_lists, replace=False)].copy()
+    for _ in range(_KMEANS_ITERATIONS):
+        assignments = _assign(sample, centroids, metric)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=num_lists)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = np.add.reduceat(sample[order], starts, axis=0) / counts[filled, np.newaxis]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            # restart the empty lists from random vectors
+            centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+        if metric == COSINE_METRIC:
+            centroids = _normalize(centroids)
+    return centroids
@@ -0,0 +1,264 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from feathr.definition.aggregation import Aggregation
+from feathr.definition.anchor import FeatureAnchor
+from feathr.definition.feature import FeatureBase
+from feathr.definition.feature_derivations import DerivedFeature
+from feathr.definition.lookup_feature import LookupFeature
+from feathr.definition.source import INPUT_CONTEXT
+from feathr.definition.transformation import ExpressionTransformation
+from feathr.online.decoder import decode_feature_values
+from feathr.online.online_store import FeatureRequest
+
+# fetches the raw values of a batch of requests, e.g. `FeathrClient._fetch_online_features`
+FetchFunction = Callable[[List[FeatureRequest]], List[List[Optional[bytes]]]]
+
+# Feathr expression operators that have another spelling in pandas expressions
+_EXPRESSION_REWRITES = [(re.compile(r"&&"), " & "), (re.compile(r"\|\|"), " | "), (re.compile(r"!(?!=)"), " ~")]
+
+
+def _aggregate(values: List[Any], aggregation: Aggregation) -> Any:
+    """Aggregate the expansion feature values looked up for one entity."""
+    values = [value for value in values if value is not None]
+    if aggregation == Aggregation.NOP:
+        return values
+    if not values:
+        return None
+    if aggregation == Aggregation.AVG:
+        return float(np.mean(values))
+    if aggregation == Aggregation.MAX:
+        return max(values)
+    if aggregation == Aggregation.MIN:
+        return min(values)
+    if aggregation == Aggregation.SUM:
+        return sum(values)
+    if aggregation == Aggregation.UNION:
+        union = []
+        for value in values:
+            for element in (value if isinstance(value, (list, tuple)) else [value]):
+                if element not in union:
+                    union.append(element)
+        return union
+    elementwise = {Aggregation.ELEMENTWISE_AVG: np.mean,
+                   Aggregation.ELEMENTWISE_MIN: np.min,
+                   Aggregation.ELEMENTWISE_MAX: np.max,
+                   Aggregation.ELEMENTWISE_SUM: np.sum}
+    if aggregation in elementwise:
+        return elementwise[aggregation](np.array(values, dtype=float), axis=0).tolist()
+    raise RuntimeError(f"Aggregation {aggregation.name} is not supported online, since the online store doesn't keep "
+                       f"the timestamps of the feature values.")
+
+
+def _lookup_keys(base_value: Any) -> List[str]:
+    """Get the keys of the expansion feature from a base feature value, e.g. a list of item ids."""
+    if base_value is None:
+        return []
+    if isinstance(base_value, tuple):
+        # sparse array, the values are the keys
+        base_value = base_value[1]
+    if isinstance(base_value, (str, bytes)):
+        base_value = [base_value]
+    try:
+        # the decoded arrays are protobuf repeated containers, which are sequences but not lists
+        base_value = list(base_value)
+    except TypeError:
+        base_value = [base_value]
+    return [str(int(key)) if isinstance(key, float) and float(key).is_integer() else str(key) for key in base_value]
+
+
+class OnlineFeatureAssembler(object):
+    """Assembles derived and request-time features online, on top of the base features in the online store.
+
+    Only the base features need to be materialized: the assembler fetches them, in one pipelined round for all the
+    requested entities, and computes the others after the fetch:
+    - features anchored to `INPUT_CONTEXT` are evaluated on the request data passed by the caller,
+    - `DerivedFeature`s with an `ExpressionTransformation` are evaluated vectorized over the whole batch, with
+      `pandas.DataFrame.eval`, on the columns of their input features(named by their feature alias),
+    - `LookupFeature`s use the values of their base feature as keys of their expansion feature, which are fetched in a
+      second pipelined round for all the entities, and are then aggregated with their `Aggregation`.
+
+    A feature that is in `feature_tables` is always fetched from the online store, even if it could be computed.
+    Derived features are computed for the requested keys, so all their input features must be keyed by the same
+    entity, except for the expansion features of lookup features.
+
+    Attributes:
+        fetch: function fetching the raw values of a list of (feature_table, key, feature_names) requests, e.g.
+            `FeathrClient._fetch_online_features`
+        feature_tables: dict from the name of each materialized feature to its online feature table
+        anchors: the feature anchors, used to find the features anchored to `INPUT_CONTEXT`
+        derived_features: the derived and lookup features that can be computed online
+    """
+    def __init__(self, fetch: FetchFunction, feature_tables: Dict[str, str], anchors: List[FeatureAnchor] = [],
+                 derived_features: List[FeatureBase] = []):
+        self.fetch = fetch
+        self.feature_tables = dict(feature_tables)
+        self._features: Dict[str, FeatureBase] = {}
+        self._request_features = set()
+        for anchor in anchors:
+            for feature in anchor.features:
+                self._features[feature.name] = feature
+                if anchor.source == INPUT_CONTEXT:
+                    self._request_features.add(feature.name)
+        for feature in derived_features:
+            self._features[feature.name] = feature
+
+    def get_online_features(self, keys: List[str], feature_names: List[str],
+                            request_data: Optional[Dict[str, Sequence[Any]]] = None) -> Dict[str, List[Any]]:
+        """Fetches and computes the features of several entities.
+
+        Args:
+            keys: list of keys for the entities
+            feature_names: list of feature names to get. They can be materialized, derived, lookup or
+                `INPUT_CONTEXT` features.
+            request_data: the request-time columns used by the `INPUT_CONTEXT` features, e.g.
+                {'trip_distance': [3.2, 12.5]}, with one value per key
+
+        Return:
+            A dict from each key to its feature values, ordered by the requested feature names, like
+            `FeathrClient.multi_get_online_features`.
+        """
+        keys = list(keys)
+        columns: Dict[str, List[Any]] = {}
+        request_data = request_data or {}
+        stored, lookups = self._plan(feature_names)
+        self._fetch_stored(keys, stored, columns)
+        self._fetch_lookups(keys, lookups, columns, request_data)
+        for feature_name in feature_names:
+            self._resolve(feature_name, keys, columns, request_data)
+        return {key: [columns[feature_name][row] for feature_name in feature_names] for row, key in enumerate(keys)}
+
+    def _plan(self, feature_names: List[str]):
+        """Find the stored features and the lookup features needed to get the requested features."""
+        stored = []
+        lookups = []
+        seen = set()
+
+        def visit(feature_name: str):
+            if feature_name in seen:
+                return
+            seen.add(feature_name)
+            feature = self._features.get(feature_name)
+            if feature_name in self.feature_tables:
+                stored.append(feature_name)
+            elif isinstance(feature, LookupFeature):
+                visit(feature.base_feature.name)
+                lookups.append(feature)
+            elif isinstance(feature, DerivedFeature):
+                for input_feature in feature.input_features:
+                    visit(input_feature.name)
+
+        for feature_name in feature_names:
+            visit(feature_name)
+        return stored, lookups
+
+    def _fetch_stored(self, keys: List[str], feature_names: List[str], columns: Dict[str, List[Any]]):
+        """Fetches the stored features of the keys, with one request per (table, key) in a single round trip."""
+        names_by_table: Dict[str, List[str]] = {}
+        for feature_name in feature_names:
+            names_by_table.setdefault(self.feature_tables[feature_name], []).append(feature_name)
+        requests = [(table, key, table_names) for table, table_names in names_by_table.items() for key in keys]
+        if not requests:
+            return
+        rows = iter(self.fetch(requests))
+        for table, table_names in names_by_table.items():
+            table_columns = [[] for _ in table_names]
+            for _ in keys:
+                for column, value in zip(table_columns, decode_feature_values(next(rows))):
+                    column.append(value)
+            columns.update(zip(table_names, table_columns))
+
+    def _fetch_lookups(self, keys: List[str], lookups: List[LookupFeature], columns: Dict[str, List[Any]],
+                       request_data: Dict[str, Sequence[Any]]):
+        """Fetches the expansion features of all the lookup features in a single round trip, and aggregates them."""
+        if not lookups:
+            return
+        lookup_keys = {}
+        requests = []
+        request_index = {}
+        for lookup in lookups:
+            expansion_name = lookup.expansion_feature.name
+            if expansion_name not in self.feature_tables:
+                raise RuntimeError(f"The expansion feature {expansion_name} of lookup feature {lookup.name} must be "
+                                   f"materialized to be looked up online.")
+            base_column = self._resolve(lookup.base_feature.name, keys, columns, request_data)
+            lookup_keys[lookup.name] = [_lookup_keys(value) for value in base_column]
+            for entity_lookup_keys in lookup_keys[lookup.name]:
+                for lookup_key in entity_lookup_keys:
+                    request = (self.feature_tables[expansion_name], lookup_key, expansion_name)
+                    if request not in request_index:
+                        request_index[request] = len(requests)
+                        requests.append(request)
+        rows = self.fetch([(table, key, [name]) for table, key, name in requests]) if requests else []
+        values = [decode_feature_values(row)[0] for row in rows]
+        for lookup in lookups:
+            table = self.feature_tables[lookup.expansion_feature.name]
+            columns[lookup.name] = [
+                _aggregate([values[request_index[(table, lookup_key, lookup.expansion_feature.name)]]
+                            for lookup_key in entity_lookup_keys], lookup.aggregation)
+                for entity_lookup_keys in lookup_keys[lookup.name]]
+
+    def _resolve(self, feature_name: str, keys: List[str], columns: Dict[str, List[Any]],
+                 request_data: Dict[str, Sequence[Any]]) -> List[Any]:
+        """Get the column of a feature, computing it from its inputs if needed."""
+        if feature_name in columns:
+            return columns[feature_name]
+        feature = self._features.get(feature_name)
+        if feature is None:
+            raise RuntimeError(f"Feature {feature_name} is neither materialized in the online store nor defined in "
+                               f"the anchors or derived features of the assembler.")
+        if feature_name in self._request_features:
+            for column_name, column in request_data.items():
+                if len(column) != len(keys):
+                    raise RuntimeError(f"Request data {column_name} has {len(column)} values for {len(keys)} keys.")
+            column = _evaluate_expression(feature, pd.DataFrame(dict(request_data), index=range(len(keys))))
+        elif isinstance(feature, DerivedFeature):
+            inputs = pd.DataFrame({input_feature.feature_alias: pd.Series(
+                                       self._resolve(input_feature.name, keys, columns, request_data), dtype=object)
+                                   for input_feature in feature.input_features}, index=range(len(keys)))
+            column = _evaluate_expression(feature, inputs.infer_objects())
+        else:
+            raise RuntimeError(f"Feature {feature_name} is not materialized in the online store, and can't be "
+                               f"computed online.")
+        columns[feature_name] = column
+        return column
+
+
+def _evaluate_expression(feature: FeatureBase, inputs: pd.DataFrame) -> List[Any]:
+    """Evaluate the expression of a feature on all the rows of `inputs` at once. The feature is None in the rows
+    where any input used by the expression is missing, rather than e.g. False for a comparison with NaN."""
+    if not isinstance(feature.transform, ExpressionTransformation):
+        raise RuntimeError(f"Only expression transformations can be evaluated online, but feature {feature.name} "
+                           f"uses {type(feature.transform).__name__}.")
+    result = _evaluate_column(feature.transform.expr, feature.name, inputs)
+    missing = np.zeros(len(inputs), dtype=bool)
+    for column_name in inputs.columns:
+        if re.search(rf"\b{re.escape(str(column_name))}\b", feature.transform.expr):
+            missing |= inputs[column_name].map(_is_missing).to_numpy(dtype=bool)
+    return [None if row_missing or _is_missing(value) else _to_python(value)
+            for row_missing, value in zip(missing, result.tolist())]
+
+
+def _evaluate_column(expr: str, feature_name: str, inputs: pd.DataFrame) -> pd.Series:
+    """Evaluate a Feathr expression of a feature on all the rows of `inputs`, as a pandas expression."""
+    pandas_expr = expr
+    for pattern, replacement in _EXPRESSION_REWRITES:
+        pandas_expr = pattern.sub(replacement, pandas_expr)
+    try:
+        result = inputs.eval(pandas_expr, engine="python")
+    except Exception as e:
+        raise RuntimeError(f"Failed to evaluate the expression '{expr}' of feature {feature_name} online: {e}")
+    if not isinstance(result, pd.Series):
+        result = pd.Series([result] * len(inputs), index=inputs.index)
+    return result
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, (float, np.floating)) and np.isnan(value))
+
+
+def _to_python(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
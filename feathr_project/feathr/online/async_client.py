@@ -0,0 +1,204 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from feathr.constants import REDIS_KEY_SEPARATOR
+from feathr.definition.dtype import FeatureType
+from feathr.online._cluster import _parse_redis_startup_nodes
+from feathr.online._multi_table import TableRequest, _merge_table_results, _normalize_table_requests
+from feathr.online.decoder import decode_feature_columns, decode_feature_values
+from feathr.online.online_store import FeatureRequest
+from feathr.online.reader import OnlineReader, ReadPlan, StoreRead
+from feathr.online.single_flight import AsyncSingleFlight
+
+
+class AsyncFeathrOnlineClient(object):
+    """Asyncio client to fetch features from the online store(Redis).
+
+    It is meant for asyncio model servers, which can't block their event loop on every Redis call. All connections
+    come from a bounded connection pool: when all of them are busy, new requests wait for a free connection(up to
+    `pool_timeout` seconds) instead of opening more connections, so one process can keep thousands of lookups in
+    flight. The values are read and decoded the same way as `FeathrClient.get_online_features`: the client runs the
+    read plans of an `OnlineReader`, which resolves the table aliases, selects the packed rows and loads the zstd
+    dictionaries, and only sends their reads with `redis.asyncio`.
+
+    Use `FeathrClient.get_async_online_client()` to create one from the Feathr config, and close it with
+    `await client.close()`, or use it as an async context manager.
+
+    Attributes:
+        host: Redis host
+        port: Redis port
+        password: Redis password
+        ssl_enabled: whether SSL is used to connect to Redis
+        max_connections: maximum number of connections in the pool
+        pool_timeout: seconds to wait for a free connection before failing. None to wait forever.
+        socket_timeout: seconds to wait for a Redis reply before failing
+        socket_connect_timeout: seconds to wait for a connection to be established
+        health_check_interval: idle seconds after which a connection is checked with a PING before it is used
+        cluster_enabled: whether the online store is a Redis Cluster. `host` can then be a comma separated list of
+            `host:port` cluster endpoints.
+        read_from_replicas: on a Redis Cluster, whether reads can be served by the replicas
+        redis_client: an existing `redis.asyncio.Redis` client to use instead of creating a new pool
+    """
+    def __init__(self,
+                 host: str = "localhost",
+                 port: int = 6379,
+                 password: Optional[str] = None,
+                 ssl_enabled: bool = False,
+                 max_connections: int = 64,
+                 pool_timeout: Optional[float] = 20,
+                 socket_timeout: Optional[float] = None,
+                 socket_connect_timeout: Optional[float] = None,
+                 health_check_interval: int = 30,
+                 cluster_enabled: bool = False,
+                 read_from_replicas: bool = False,
+                 redis_client=None):
+        import redis.asyncio as aioredis
+        if redis_client is None and cluster_enabled:
+            from redis.asyncio.cluster import ClusterNode, RedisCluster
+            # the cluster pipeline sends the commands of each node concurrently
+            startup_nodes = [ClusterNode(node_host, node_port)
+                             for node_host, node_port in _parse_redis_startup_nodes(host, port)]
+            redis_client = RedisCluster(startup_nodes=startup_nodes,
+                                        password=password,
+                                        ssl=ssl_enabled,
+                                        read_from_replicas=read_from_replicas,
+                                        max_connections=max_connections,
+                                        socket_timeout=socket_timeout,
+                                        socket_connect_timeout=socket_connect_timeout,
+                                        health_check_interval=health_check_interval)
+        elif redis_client is None:
+            connection_class = aioredis.SSLConnection if ssl_enabled else aioredis.Connection
+            pool = aioredis.BlockingConnectionPool(host=host,
+                                                   port=int(port),
+                                                   password=password,
+                                                   connection_class=connection_class,
+                                                   max_connections=max_connections,
+                                                   timeout=pool_timeout,
+                                                   socket_timeout=socket_timeout,
+                                                   socket_connect_timeout=socket_connect_timeout,
+                                                   health_check_interval=health_check_interval)
+            redis_client = aioredis.Redis(connection_pool=pool)
+        self.redis_client = redis_client
+        # concurrent identical `get_online_features` calls share one fetch. Set to None to disable.
+        self.single_flight = AsyncSingleFlight()
+        # read path of the online features, whose reads are sent by `_run`
+        self.online_reader = OnlineReader(None)
+        # schemas of the feature tables with the packed-row layout, see `RedisSink(layout="packed")`
+        self.packed_schemas = self.online_reader.packed_schemas
+        # aliases of the versioned feature tables, see `RedisSink(versioned=True)`
+        self.table_aliases = self.online_reader.table_aliases
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Close the client and disconnect all the connections of its pool."""
+        close = getattr(self.redis_client, "aclose", None) or self.redis_client.close
+        await close()
+        connection_pool = getattr(self.redis_client, "connection_pool", None)
+        if connection_pool is not None:
+            # a Redis Cluster client has no single pool, and closing it disconnects all its nodes
+            await connection_pool.disconnect()
+
+    async def get_online_features(self, feature_table: str, key: str, feature_names: List[str]) -> List[Any]:
+        """Fetches feature value for a certain key from a online feature table.
+        See `FeathrClient.get_online_features` for the format of the result. Concurrent calls for the same feature
+        table, key and feature names share a single HMGET.
+        """
+        await self._run(self.online_reader.plan_load_table_aliases([feature_table]))
+        request = self.online_reader.resolve_loaded([(feature_table, key, feature_names)])[0]
+
+        async def fetch():
+            return (await self._run(self.online_reader.plan_read([request])))[0]
+
+        if self.single_flight is None:
+            res = await fetch()
+        else:
+            res = await self.single_flight.do((self._construct_redis_key(request[0], key), tuple(feature_names)),
+                                              fetch)
+        return decode_feature_values(res)
+
+    async def multi_get_online_features(self, feature_table: str, keys: List[str], feature_names: List[str],
+                                        output_format: Optional[str] = None,
+                                        feature_types: Optional[Dict[str, FeatureType]] = None):
+        """Fetches feature value for a list of keys from a online feature table in one pipelined round trip.
+        See `FeathrClient.multi_get_online_features` for the arguments and the format of the result.
+        """
+        pipeline_result = await self._hmget_many([(feature_table, key, feature_names) for key in keys])
+        if output_format:
+            return decode_feature_columns(pipeline_result, feature_names, feature_types, output_format, keys=keys)
+        return dict(zip(keys, [decode_feature_values(feature_list) for feature_list in pipeline_result]))
+
+    async def gather_online_features(self, requests: List[Tuple[str, List[str], List[str]]],
+                                     output_format: Optional[str] = None) -> List[Any]:
+        """Fetches features from several online feature tables concurrently.
+
+        Args:
+            requests: list of (feature_table, keys, feature_names)
+            output_format: optional columnar output format, see `multi_get_online_features`
+
+        Return:
+            The result of `multi_get_online_features` for each request, in the same order as `requests`.
+        """
+        return list(await asyncio.gather(*[
+            self.multi_get_online_features(feature_table, keys, feature_names, output_format)
+            for feature_table, keys, feature_names in requests]))
+
+    async def multi_table_get_online_features(self, requests: List[TableRequest],
+                                              defaults: Optional[Dict[str, Any]] = None) -> Dict[str, List[Any]]:
+        """Fetches features of several online feature tables in a single pipelined round trip, and merges them into
+        one result per entity. See `FeathrClient.multi_table_get_online_features` for the format of the result.
+        """
+        normalized = _normalize_table_requests(requests)
+        rows = await self._hmget_many([(feature_table, key, feature_names)
+                                       for feature_table, keys, feature_names in normalized
+                                       for key in keys])
+        return _merge_table_results(normalized, rows, defaults)
+
+    async def _hmget_many(self, requests: List[FeatureRequest]) -> List[List[Optional[bytes]]]:
+        return await self._run(self.online_reader.plan_fetch(requests))
+
+    async def _run(self, plan: ReadPlan) -> Any:
+        """Runs a read plan of the online reader, sending each list of reads in one pipelined round trip."""
+        try:
+            reads = next(plan)
+            while True:
+                async with self.redis_client.pipeline(transaction=False) as redis_pipeline:
+                    sizes = [self._queue_read(redis_pipeline, read) for read in reads]
+                    replies = await redis_pipeline.execute() if any(sizes) else []
+                results = []
+                offset = 0
+                for (method, _), size in zip(reads, sizes):
+                    result = replies[offset:offset + size]
+                    if method == "batch_get_all":
+                        result = [{name.decode() if isinstance(name, bytes) else name: value
+                                   for name, value in values.items()} for values in result]
+                    results.append(result)
+                    offset += size
+                reads = plan.send(results)
+        except StopIteration as e:
+            return e.value
+
+    def _queue_read(self, redis_pipeline, read: StoreRead) -> int:
+        """Queues the commands of a read of the online store in a pipeline, and returns their number."""
+        method, args = read
+        if method == "batch_get":
+            (requests,) = args
+            for feature_table, key, feature_names in requests:
+                redis_pipeline.hmget(self._construct_redis_key(feature_table, key), *feature_names)
+            return len(requests)
+        feature_table, keys = args
+        for key in keys:
+            redis_key = self._construct_redis_key(feature_table, key)
+            if method == "batch_get_rows":
+                # one GET of the packed row of the entity, instead of one HMGET field per feature
+                redis_pipeline.get(redis_key)
+            else:
+                redis_pipeline.hgetall(redis_key)
+        return len(keys)
+
+    def _construct_redis_key(self, feature_table: str, key: str) -> str:
+        return feature_table + REDIS_KEY_SEPARATOR + key
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Marker of an entity key that doesn't exist in the online store at all, cached by `put_key`.
+_ALL_FEATURES = None
+
+
+class OnlineFeatureCache(object):
+    """In-process cache of online feature values, keyed by (feature_table, key, feature name).
+
+    The values are kept in their raw(encoded) form, so the cached and the fetched values are decoded the same way.
+    Entries expire `ttl_seconds` after they are loaded, and the least recently used entries are evicted once the cache
+    holds `max_size` entries. Missing values(the key or the feature doesn't exist) are cached as well, for
+    `negative_ttl_seconds`, so that lookups of unknown entities don't go to the online store every time.
+
+    Attributes:
+        max_size: maximum number of cached feature values
+        ttl_seconds: seconds a fetched value is kept
+        negative_ttl_seconds: seconds a missing value is kept. 0 to disable negative caching.
+    """
+    def __init__(self, max_size: int = 100000, ttl_seconds: float = 300, negative_ttl_seconds: float = 30):
+        if max_size <= 0:
+            raise RuntimeError("max_size of the online feature cache must be positive.")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, feature_table: str, key: str, feature_names: List[str]) -> Tuple[List[Optional[bytes]], List[str]]:
+        """Look up the cached values of the features of an entity.
+
+        Return:
+            The cached raw values, ordered by `feature_names`(None if not cached), and the names of the features that
+            are not cached and need to be fetched from the online store.
+        """
+        values = []
+        uncached = []
+        now = time.monotonic()
+        with self._lock:
+            missing_key = self._lookup((feature_table, key, _ALL_FEATURES), now)
+            for feature_name in feature_names:
+                entry = missing_key or self._lookup((feature_table, key, feature_name), now)
+                if entry:
+                    self.hits += 1
+                    values.append(entry[1])
+                else:
+                    self.misses += 1
+                    values.append(None)
+                    uncached.append(feature_name)
+        return values, uncached
+
+    def put(self, feature_table: str, key: str, feature_names: List[str], values: List[Optional[bytes]]):
+        """Cache the raw values of the features of an entity, as returned by the online store."""
+        now = time.monotonic()
+        with self._lock:
+            if any(values):
+                self._entries.pop((feature_table, key, _ALL_FEATURES), None)
+            for feature_name, value in zip(feature_names, values):
+                self._store((feature_table, key, feature_name), value, now)
+
+    def put_key(self, feature_table: str, key: str, values: Dict[str, bytes]):
+        """Cache all the stored features of an entity. An empty `values` means the key doesn't exist, which is cached
+        for all the features of the key."""
+        now = time.monotonic()
+        with self._lock:
+            if values:
+                self._entries.pop((feature_table, key, _ALL_FEATURES), None)
+            else:
+                self._store((feature_table, key, _ALL_FEATURES), None, now)
+            for feature_name, value in values.items():
+                if isinstance(feature_name, bytes):
+                    feature_name = feature_name.decode()
+                self._store((feature_table, key, feature_name), value, now)
+
+    def invalidate(self, feature_table: Optional[str] = None):
+        """Remove the cached values of a feature table, or of all tables if `feature_table` is None. Call it after a
+        materialization job updated the table, if its values must be visible before the cached ones expire."""
+        with self._lock:
+            if feature_table is None:
+                self._entries.clear()
+            else:
+                for cache_key in [k for k in self._entries if k[0] == feature_table]:
+                    del self._entries[cache_key]
+
+    def stats(self) -> Dict[str, float]:
+        """Get the hit and miss counters of the cache, counted per feature value."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "hit_ratio": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions,
+                    "size": len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, cache_key, now: float):
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[cache_key]
+            return None
+        self._entries.move_to_end(cache_key)
+        return entry
+
+    def _store(self, cache_key, value: Optional[bytes], now: float):
+        ttl = self.ttl_seconds if value else self.negative_ttl_seconds
+        if ttl <= 0:
+            return
+        self._entries[cache_key] = (now + ttl, value)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,256 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from feathr.online.online_store import FeatureRequest, OnlineStore
+
+# fetches the raw values of a batch of requests from a store, e.g. `OnlineReader.read`
+StoreFetchFunction = Callable[[OnlineStore, List[FeatureRequest]], List[List[Optional[bytes]]]]
+
+PRIMARY_ENDPOINT = "primary"
+
+_CLOSED = "closed"
+_OPEN = "open"
+_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker(object):
+    """Tracks the health of the endpoints of the online store, and stops sending requests to the failing ones.
+
+    An endpoint's circuit opens after `failure_threshold` consecutive failed requests, and no request is sent to it for `reset_seconds`. Then one trial request is let through(half open): it
+    closes the circuit if it succeeds, and opens it again otherwise.
+
+    Attributes:
+        failure_threshold: consecutive failures that open the circuit of an endpoint
+        reset_seconds: seconds an open circuit rejects the requests before letting a trial request through
+    """
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        # endpoint -> [state, consecutive failures, time the circuit opened]
+        self._endpoints: Dict[str, List[Any]] = {}
+
+    def allow(self, endpoint: str) -> bool:
+        """Whether a request can be sent to an endpoint now."""
+        with self._lock:
+            state = self._endpoints.setdefault(endpoint, [_CLOSED, 0, 0.0])
+            if state[0] == _OPEN and time.monotonic() - state[2] >= self.reset_seconds:
+                state[0] = _HALF_OPEN
+                return True
+            return state[0] == _CLOSED
+
+    def record_success(self, endpoint: str):
+        with self._lock:
+            self._endpoints[endpoint] = [_CLOSED, 0, 0.0]
+
+    def record_failure(self, endpoint: str):
+        with self._lock:
+            state = self._endpoints.setdefault(endpoint, [_CLOSED, 0, 0.0])
+            state[1] += 1
+            if state[0] == _HALF_OPEN or (state[0] == _CLOSED and state[1] >= self.failure_threshold):
+                if state[0] == _CLOSED:
+                    logger.warning("Online store endpoint {} failed {} times in a row, not sending it requests for "
+                                   "{} seconds.", endpoint, state[1], self.reset_seconds)
+                state[0] = _OPEN
+                state[2] = time.monotonic()
+
+    def state(self, endpoint: str) -> str:
+        """Get the state of the circuit of an endpoint: `closed`, `open` or `half_open`."""
+        with self._lock:
+            return self._endpoints.get(endpoint, [_CLOSED])[0]
+
+
+class DeadlineFetcher(object):
+    """Fetches batches of online feature requests within a latency budget, so that a slow or failing Redis node
+    doesn't stall the callers until the socket times out.
+
+    The requests are split into chunks of `chunk_size`, fetched in parallel from the primary store. A chunk that
+    didn't arrive after the `hedge_percentile` latency of the recent primary fetches(at least `min_hedge_seconds`) is
+    also requested from a replica, and the first reply wins. A chunk whose fetch failed is retried on the next
+    endpoint at once. When the budget runs out, the chunks that arrived are returned, and the others are missing.
+
+    `fetch` reads everything a chunk needs from the store it's given, e.g. the packed-row schemas and zstd dictionaries
+    of the tables, so a store that hangs on them is hedged like a slow value read.
+
+    The endpoints whose circuit is open in `circuit_breaker` get no requests: the chunks go straight to a replica,
+    or are missing at once when no endpoint is healthy. The fetches still running at the deadline can't be cancelled,
+    they finish in the background within the socket timeout of the store: they are counted in `missed_deadlines`, and
+    only count as failures of their endpoint if they eventually fail.
+
+    The latency of a fetch is measured in the fetch thread, so the time a fetch waits for a free thread doesn't make
+    the primary store look slow.
+
+    Attributes:
+        fetch: fetches the raw values of a batch of requests from a store
+        primary: the store the requests are sent to first
+        replicas: stores holding the same tables, e.g. Redis replicas, for the hedged and retried requests
+        hedge_percentile: percentile of the recent primary latencies after which a request is hedged
+        min_hedge_seconds: min delay before a request is hedged, also used until enough latencies are recorded
+        circuit_breaker: health of the endpoints, named `primary` and `replica-<index>`
+        chunk_size: max number of requests fetched at a time
+        max_workers: max number of fetches running at the same time
+        hedged: number of chunks requested from a replica because the primary store was slow
+        timed_out: number of requests not fetched within their budget
+        missed_deadlines: dict from endpoint to the number of its fetches still running at their deadline
+    """
+    def __init__(self, fetch: StoreFetchFunction, primary: OnlineStore, replicas: Sequence[OnlineStore] = (),
+                 hedge_percentile: float = 95.0, min_hedge_seconds: float = 0.002,
+                 circuit_breaker: Optional[CircuitBreaker] = None, chunk_size: int = 100, max_workers: int = 32):
+        if chunk_size <= 0:
+            raise RuntimeError("chunk_size must be positive.")
+        self.fetch = fetch
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_seconds = min_hedge_seconds
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self._endpoints = [(PRIMARY_ENDPOINT, primary)] + [(f"replica-{index}", replica)
+                                                           for index, replica in enumerate(self.replicas)]
+        self._latencies = deque(maxlen=1000)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="feathr-online-fetch")
+        self.hedged = 0
+        self.timed_out = 0
+        self.missed_deadlines: Dict[str, int] = {}
+        self._missed_deadlines_lock = threading.Lock()
+
+    def hedge_delay(self) -> float:
+        """Get the seconds after which a request to the primary store is hedged."""
+        latencies = list(self._latencies)
+        if len(latencies) < 20:
+            return self.min_hedge_seconds
+        return max(self.min_hedge_seconds, float(np.percentile(latencies, self.hedge_percentile)))
+
+    def fetch_within(self, requests: List[FeatureRequest],
+                     budget_seconds: float) -> List[Optional[List[Optional[bytes]]]]:
+        """Fetches the raw values of each request, like `OnlineStore.batch_get`, within `budget_seconds`.
+
+        Return:
+            The raw values of each request, in the same order as `requests`. None for the requests that were not
+            fetched within the budget.
+        """
+        chunks = [requests[index:index + self.chunk_size] for index in range(0, len(requests), self.chunk_size)]
+        results = self._run_within(self.fetch, chunks, budget_seconds)
+        missing = sum(len(chunk) for chunk, result in zip(chunks, results) if result is None)
+        if missing:
+            self.timed_out += missing
+        return [row for chunk, result in zip(chunks, results) for row in (result or [None] * len(chunk))]
+
+    def run_within(self, function: Callable[[OnlineStore], Any], budget_seconds: float) -> bool:
+        """Runs `function` on a store within `budget_seconds`, hedged and retried on the replicas like the fetches,
+        e.g. to load the metadata of the tables.
+
+        Return:
+            Whether `function` completed on one of the stores within the budget.
+        """
+        def run(store: OnlineStore, _) -> bool:
+            function(store)
+            return True
+        return self._run_within(run, [None], budget_seconds)[0] is not None
+
+    def _run_within(self, function: Callable[[OnlineStore, Any], Any], chunks: List[Any],
+                    budget_seconds: float) -> List[Any]:
+        """Runs `function(store, chunk)` for each chunk on the healthy endpoints, and returns the result of each
+        chunk, None for the chunks that didn't complete within `budget_seconds`."""
+        results: List[Any] = [None] * len(chunks)
+        if budget_seconds <= 0:
+            return results
+        start = time.monotonic()
+        deadline = start + budget_seconds
+        # future -> (chunk index, endpoint)
+        attempts: Dict[Future, tuple] = {}
+        # chunk index -> endpoints already tried
+        tried: Dict[int, List[str]] = {index: [] for index in range(len(chunks))}
+
+        def submit(index: int) -> bool:
+            for endpoint, store in self._endpoints:
+                if endpoint not in tried[index] and self.circuit_breaker.allow(endpoint):
+                    tried[index].append(endpoint)
+                    attempts[self._executor.submit(_timed, function, store, chunks[index])] = (index, endpoint)
+                    return True
+            return False
+
+        for index in range(len(chunks)):
+            submit(index)
+        hedge_at = start + self.hedge_delay()
+        hedged = False
+        while attempts and any(result is None for result in results):
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            timeout = deadline - now if hedged else min(hedge_at, deadline) - now
+            done, _ = wait(list(attempts), timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                index, endpoint = attempts.pop(future)
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    logger.warning("Failed to fetch online features from endpoint {}: {}", endpoint, e)
+                    self.circuit_breaker.record_failure(endpoint)
+                    if results[index] is None and not any(attempt[0] == index for attempt in attempts.values()):
+                        submit(index)
+                    continue
+                self.circuit_breaker.record_success(endpoint)
+                if endpoint == PRIMARY_ENDPOINT:
+                    self._latencies.append(seconds)
+                if results[index] is None:
+                    results[index] = result
+            if not hedged and time.monotonic() >= hedge_at:
+                hedged = True
+                pending = {attempt[0] for attempt in attempts.values()}
+                for index in pending:
+                    if results[index] is None and submit(index):
+                        self.hedged += 1
+        for future, (index, endpoint) in attempts.items():
+            if results[index] is None:
+                with self._missed_deadlines_lock:
+                    self.missed_deadlines[endpoint] = self.missed_deadlines.get(endpoint, 0) + 1
+                future.add_done_callback(self._record_late_reply(endpoint))
+        return results
+
+    def close(self):
+        """Stops the fetch threads, without waiting for the running fetches."""
+        self._executor.shutdown(wait=False)
+
+    def _record_late_reply(self, endpoint: str) -> Callable[[Future], None]:
+        """Records the outcome of a fetch that missed its deadline in the circuit breaker: a failure if it failed,
+        nothing if it eventually succeeded, as the endpoint is slow but up."""
+        def record(future: Future):
+            if not future.cancelled() and future.exception() is not None:
+                self.circuit_breaker.record_failure(endpoint)
+        return record
+
+
+def _timed(function: Callable[[OnlineStore, Any], Any], store: OnlineStore, chunk: Any) -> tuple:
+    """Runs `function(store, chunk)`, and returns its result and the seconds it took."""
+    start = time.monotonic()
+    result = function(store, chunk)
+    return result, time.monotonic() - start
+
+
+class OnlineFetchResult(object):
+    """Features fetched within a latency budget, see `FeathrClient.multi_get_online_features_within`.
+
+    Attributes:
+        values: dict from key to the list of feature values, like `multi_get_online_features`. The features of the
+            keys that were not fetched in time have their default value, or None.
+        missing_keys: the keys that were not fetched within the budget
+    """
+    def __init__(self, values: Dict[str, List[Any]], missing_keys: List[str]):
+        self.values = values
+        self.missing_keys = missing_keys
+
+    @property
+    def complete(self) -> bool:
+        """Whether all the keys were fetched within the budget."""
+        return not self.missing_keys
+
+    def __repr__(self):
+        return f"OnlineFetchResult(keys={len(self.values)}, missing_keys={len(self.missing_keys)})"
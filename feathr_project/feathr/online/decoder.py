@@ -0,0 +1,427 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from loguru import logger
+
+from feathr.definition.dtype import FeatureType, ValueType
+from feathr.online.codec import (RAW_HEADER, ZSTD_HEADER, decode_value, decode_values, dequantize_many,
+                                 dequantized_feature_value, is_quantized)
+from feathr.protobuf.featureValue_pb2 import FeatureValue
+
+# Supported values of `output_format` for the columnar (batch) decode mode
+ONLINE_OUTPUT_FORMATS = ["numpy", "pandas", "arrow"]
+
+_ONEOF_NAME = 'FeatureValueOneOf'
+
+# oneof case -> (value type, field of the message holding the values)
+_SCALAR_FIELDS = {
+    'boolean_value': ValueType.BOOL,
+    'string_value': ValueType.STRING,
+    'float_value': ValueType.FLOAT,
+    'double_value': ValueType.DOUBLE,
+    'int_value': ValueType.INT32,
+    'long_value': ValueType.INT64,
+}
+_DENSE_FIELDS = {
+    'boolean_array': (ValueType.BOOL, 'booleans'),
+    'string_array': (ValueType.STRING, 'strings'),
+    'float_array': (ValueType.FLOAT, 'floats'),
+    'double_array': (ValueType.DOUBLE, 'doubles'),
+    'int_array': (ValueType.INT32, 'integers'),
+    'long_array': (ValueType.INT64, 'longs'),
+    'byte_array': (ValueType.BYTES, 'bytes'),
+}
+_SPARSE_FIELDS = {
+    'sparse_string_array': (ValueType.STRING, 'value_strings'),
+    'sparse_bool_array': (ValueType.BOOL, 'value_booleans'),
+    'sparse_integer_array': (ValueType.INT32, 'value_integers'),
+    'sparse_long_array': (ValueType.INT64, 'value_longs'),
+    'sparse_double_array': (ValueType.DOUBLE, 'value_doubles'),
+    'sparse_float_array': (ValueType.FLOAT, 'value_floats'),
+}
+
+_NUMPY_DTYPES = {
+    ValueType.BOOL: np.bool_,
+    ValueType.INT32: np.int32,
+    ValueType.INT64: np.int64,
+    ValueType.FLOAT: np.float32,
+    ValueType.DOUBLE: np.float64,
+    ValueType.STRING: object,
+    ValueType.BYTES: object,
+}
+_ARROW_TYPES = {
+    ValueType.BOOL: pa.bool_(),
+    ValueType.INT32: pa.int32(),
+    ValueType.INT64: pa.int64(),
+    ValueType.FLOAT: pa.float32(),
+    ValueType.DOUBLE: pa.float64(),
+    ValueType.STRING: pa.string(),
+    ValueType.BYTES: pa.binary(),
+}
+
+_SCALAR = "SCALAR"
+_DENSE = "DENSE"
+_SPARSE = "SPARSE"
+
+
+def _python_value(feature_value: FeatureValue) -> Any:
+    """Convert a parsed FeatureValue into the Python value returned by the row based online APIs."""
+    case = feature_value.WhichOneof(_ONEOF_NAME)
+    if case in _SCALAR_FIELDS:
+        return getattr(feature_value, case)
+    if case in _DENSE_FIELDS:
+        return getattr(getattr(feature_value, case), _DENSE_FIELDS[case][1])
+    if case in _SPARSE_FIELDS:
+        sparse = getattr(feature_value, case)
+        return (sparse.index_integers, getattr(sparse, _SPARSE_FIELDS[case][1]))
+    logger.debug("Fail to load the feature type. Maybe a new type that is not supported by this client version")
+    logger.debug("The loaded feature is {}", feature_value)
+    return None
+
+
+def _parse_feature_value(raw_feature: bytes, feature_value: Optional[FeatureValue] = None) -> FeatureValue:
+    """Parse a raw(encoded) value of the online store into a FeatureValue message, reusing `feature_value` if set."""
+    if is_quantized(raw_feature):
+        return dequantized_feature_value(raw_feature, feature_value)
+    if feature_value is None:
+        feature_value = FeatureValue()
+    feature_value.ParseFromString(decode_value(raw_feature))
+    return feature_value
+
+
+def decode_feature_values(raw_features: Sequence[Optional[bytes]]) -> List[Any]:
+    """Decode the raw values of the online store, whatever their codec(see `feathr.online.codec`). For dense array, it will be returned as Python List.
+    For sparse array, it will be returned as tuple of index array and value array. The order of elements in the
+    arrays won't be changed. Missing values(None or empty) are returned as is.
+    """
+    typed_result = []
+    for raw_feature in raw_features:
+        if raw_feature:
+            typed_result.append(_python_value(_parse_feature_value(raw_feature)))
+        else:
+            typed_result.append(raw_feature)
+    return typed_result
+
+
+def _layout_of(feature_type: FeatureType) -> str:
+    if not feature_type.dimension_type:
+        return _SCALAR
+    return _SPARSE if feature_type.tensor_category.upper() == "SPARSE" else _DENSE
+
+
+# value types that can be decoded into each other's arrays
+_NUMERIC_VALUE_TYPES = {ValueType.BOOL, ValueType.INT32, ValueType.INT64, ValueType.FLOAT, ValueType.DOUBLE}
+
+
+def _check_column_type(feature_name: str, column: "_Column", feature_value: FeatureValue, registered: bool):
+    """Check that a stored value has the layout and value type of its column, i.e. of the registered FeatureType of
+    the feature, or of its first value."""
+    layout, value_type = _infer_column_type(feature_value)
+    if layout == column.layout and (value_type == column.value_type or
+                                    {value_type, column.value_type} <= _NUMERIC_VALUE_TYPES):
+        return
+    expected = "registered as" if registered else "first stored as"
+    raise RuntimeError(f"Online feature {feature_name} is {expected} a {column.layout.lower()} "
+                       f"{column.value_type.name} feature, but one of its stored values is a {layout.lower()} "
+                       f"{value_type.name}({feature_value.WhichOneof(_ONEOF_NAME)}). Please check its FeatureType.")
+
+
+def _infer_column_type(feature_value: FeatureValue):
+    """Infer the (layout, value type) of a column from one of its values when no FeatureType is registered."""
+    case = feature_value.WhichOneof(_ONEOF_NAME)
+    if case in _SCALAR_FIELDS:
+        return _SCALAR, _SCALAR_FIELDS[case]
+    if case in _DENSE_FIELDS:
+        return _DENSE, _DENSE_FIELDS[case][0]
+    if case in _SPARSE_FIELDS:
+        return _SPARSE, _SPARSE_FIELDS[case][0]
+    raise RuntimeError(f"Unsupported online feature value type {case}.")
+
+
+class _Column:
+    """Decoded values of a single feature, kept as flat buffers so that they can be turned into arrays in one go.
+
+    Attributes:
+        valid: whether each row has a value
+        values: flattened feature values
+        lengths: number of values of each row, only used by array features
+        indices: flattened indices of sparse features
+    """
+    def __init__(self, num_rows: int):
+        self.layout = None
+        self.value_type = None
+        self.valid = np.zeros(num_rows, dtype=np.bool_)
+        self.values = []
+        self.lengths = np.zeros(num_rows, dtype=np.int64)
+        self.indices = []
+
+
+# Lookup table from base64 characters to their 6-bit values, 255 marks characters outside of the alphabet.
+_BASE64_TABLE = np.full(256, 255, dtype=np.uint8)
+_BASE64_TABLE[np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/", dtype=np.uint8)] = np.arange(64)
+_BASE64_TABLE[ord("=")] = 0
+
+# Wire format tags of the FeatureValue fields that have a fixed width encoding.
+_FIXED_WIDTH_SCALAR_TAGS = {0x1d: (ValueType.FLOAT, '<f4'), 0x21: (ValueType.DOUBLE, '<f8')}
+_FIXED_WIDTH_ARRAY_TAGS = {0x62: (ValueType.FLOAT, '<f4'), 0x6a: (ValueType.DOUBLE, '<f8')}
+
+
+def _base64_decode_fixed_width(raw_values: List[bytes]) -> Optional[np.ndarray]:
+    """Base64 decode values of the same encoded length at once, one row of bytes per value.
+    Returns None if the values can't be decoded this way.
+    """
+    width = len(raw_values[0])
+    if width == 0 or width % 4 or any(len(raw) != width for raw in raw_values):
+        return None
+    encoded = np.frombuffer(b"".join(raw_values), dtype=np.uint8).reshape(len(raw_values), width)
+    padding = (encoded[:, -1] == ord("=")).astype(np.int64) + (encoded[:, -2] == ord("="))
+    if (padding != padding[0]).any():
+        return None
+    sextets = _BASE64_TABLE[encoded]
+    if (sextets == 255).any():
+        return None
+    sextets = sextets.reshape(len(raw_values), width // 4, 4).astype(np.uint32)
+    triples = (sextets[..., 0] << 18) | (sextets[..., 1] << 12) | (sextets[..., 2] << 6) | sextets[..., 3]
+    decoded = np.empty(triples.shape + (3,), dtype=np.uint8)
+    decoded[..., 0] = triples >> 16
+    decoded[..., 1] = triples >> 8
+    decoded[..., 2] = triples
+    decoded = decoded.reshape(len(raw_values), -1)
+    return decoded[:, :decoded.shape[1] - int(padding[0])]
+
+
+def _decode_fixed_width(raw_values: List[bytes]) -> Optional[np.ndarray]:
+    """Get the serialized values of the same length as one row of bytes per value, whatever their codec.
+    Returns None if the values can't be decoded this way.
+    """
+    first = raw_values[0]
+    if isinstance(first, bytes) and first[:1] in (bytes((RAW_HEADER,)), bytes((ZSTD_HEADER,))):
+        serialized = decode_values(raw_values)
+        width = len(serialized[0])
+        if width == 0 or any(len(value) != width for value in serialized):
+            return None
+        return np.frombuffer(b"".join(serialized), dtype=np.uint8).reshape(len(serialized), width)
+    return _base64_decode_fixed_width(raw_values)
+
+
+def _read_varint(buffer: np.ndarray, position: int):
+    result, shift = 0, 0
+    while position < len(buffer):
+        byte = int(buffer[position])
+        result |= (byte & 0x7f) << shift
+        position += 1
+        if not byte & 0x80:
+            return result, position
+        shift += 7
+    return None, position
+
+
+def _decode_fixed_width_column(raw_values: List[bytes]):
+    """Decode float/double scalars and float/double dense arrays of the same length without parsing each protobuf
+    message. All values then share the same wire format header, followed by fixed width little endian values.
+
+    Returns (layout, value type, 2-D array of values with one row per raw value) or None if not applicable.
+    """
+    if is_quantized(raw_values[0]):
+        dequantized = dequantize_many(raw_values)
+        if dequantized is None:
+            return None
+        double, values = dequantized
+        return _DENSE, ValueType.DOUBLE if double else ValueType.FLOAT, values
+    decoded = _decode_fixed_width(raw_values)
+    if decoded is None or decoded.shape[1] < 2:
+        return None
+    tag = int(decoded[0, 0])
+    if tag in _FIXED_WIDTH_SCALAR_TAGS:
+        value_type, dtype = _FIXED_WIDTH_SCALAR_TAGS[tag]
+        layout, header_length = _SCALAR, 1
+    elif tag in _FIXED_WIDTH_ARRAY_TAGS:
+        value_type, dtype = _FIXED_WIDTH_ARRAY_TAGS[tag]
+        # outer field tag, message length, packed field tag(0x0a), packed payload length, payload
+        _, position = _read_varint(decoded[0], 1)
+        if position >= decoded.shape[1] or decoded[0, position] != 0x0a:
+            return None
+        payload_length, header_length = _read_varint(decoded[0], position + 1)
+        if payload_length is None or header_length + payload_length != decoded.shape[1]:
+            return None
+        layout = _DENSE
+    else:
+        return None
+    if (decoded[:, :header_length] != decoded[0, :header_length]).any():
+        return None
+    payload = np.ascontiguousarray(decoded[:, header_length:])
+    itemsize = np.dtype(dtype).itemsize
+    if payload.shape[1] % itemsize or (layout == _SCALAR and payload.shape[1] != itemsize):
+        return None
+    return layout, value_type, payload.view(dtype)
+
+
+def _decode_column(raw_values: Sequence[Optional[bytes]], feature_type: Optional[FeatureType],
+                   feature_name: str = "") -> _Column:
+    column = _Column(len(raw_values))
+    # without a value type, the type is inferred from the stored values like for the unregistered features
+    registered = feature_type is not None and feature_type.val_type in _NUMPY_DTYPES
+    if registered:
+        column.layout = _layout_of(feature_type)
+        column.value_type = feature_type.val_type
+    present_rows = [row for row, raw in enumerate(raw_values) if raw]
+    if present_rows:
+        fixed_width = _decode_fixed_width_column([raw_values[row] for row in present_rows])
+        if fixed_width is not None and (not registered or (column.layout, column.value_type) == fixed_width[:2]):
+            column.layout, column.value_type, values = fixed_width
+            column.valid[present_rows] = True
+            column.lengths[present_rows] = values.shape[1]
+            column.values = values.reshape(-1)
+            return column
+    # A single message is reused for the whole column; ParseFromString clears it before each parse.
+    feature_value = FeatureValue()
+    values = column.values
+    # the values of a column usually have the same oneof case, which is only checked once
+    checked_case = None
+    for row, raw in enumerate(raw_values):
+        if not raw:
+            continue
+        _parse_feature_value(raw, feature_value)
+        case = feature_value.WhichOneof(_ONEOF_NAME)
+        if case is None:
+            continue
+        if column.layout is None:
+            column.layout, column.value_type = _infer_column_type(feature_value)
+        elif case != checked_case:
+            _check_column_type(feature_name, column, feature_value, registered)
+            checked_case = case
+        column.valid[row] = True
+        if column.layout == _SCALAR:
+            values.append(getattr(feature_value, case))
+        elif column.layout == _DENSE:
+            repeated = getattr(getattr(feature_value, case), _DENSE_FIELDS[case][1])
+            column.lengths[row] = len(repeated)
+            values.extend(repeated)
+        else:
+            sparse = getattr(feature_value, case)
+            column.lengths[row] = len(sparse.index_integers)
+            column.indices.extend(sparse.index_integers)
+            values.extend(getattr(sparse, _SPARSE_FIELDS[case][1]))
+    if column.layout is None:
+        # every row is missing and there is no registered type to fall back on
+        column.layout, column.value_type = _SCALAR, ValueType.DOUBLE
+    return column
+
+
+def _to_numpy_values(column: _Column) -> np.ndarray:
+    return np.asarray(column.values, dtype=_NUMPY_DTYPES[column.value_type])
+
+
+def _missing_value_dtype(column: _Column):
+    """Integers and booleans can't hold NaN, so they are promoted to float64 when some rows are missing."""
+    dtype = np.dtype(_NUMPY_DTYPES[column.value_type])
+    if column.valid.all() or dtype.kind in 'fO':
+        return dtype
+    return np.dtype(np.float64)
+
+
+def _column_to_numpy(column: _Column, num_rows: int):
+    dtype = _missing_value_dtype(column)
+    # the fill value is only visible when some rows are missing, and the dtype can always hold it in that case
+    fill = None if dtype.kind == 'O' else (np.nan if dtype.kind == 'f' else 0)
+    if column.layout == _SCALAR:
+        result = np.full(num_rows, fill, dtype=dtype)
+        result[column.valid] = _to_numpy_values(column)
+        return result
+    if column.layout == _DENSE:
+        flat = _to_numpy_values(column)
+        widths = set(column.lengths[column.valid].tolist())
+        if len(widths) <= 1:
+            width = widths.pop() if widths else 0
+            result = np.full((num_rows, width), fill, dtype=dtype)
+            result[column.valid] = flat.reshape(int(column.valid.sum()), width)
+            return result
+        # ragged arrays can't be stacked into a 2-D array, so one 1-D array per row is returned instead
+        offsets = np.concatenate([[0], np.cumsum(column.lengths)])
+        result = np.empty(num_rows, dtype=object)
+        for row in range(num_rows):
+            result[row] = flat[offsets[row]:offsets[row + 1]] if column.valid[row] else None
+        return result
+    if column.value_type in (ValueType.STRING, ValueType.BYTES):
+        # scipy sparse matrices only hold numeric values, so fall back to (indices, values) per row
+        offsets = np.concatenate([[0], np.cumsum(column.lengths)])
+        indices = np.array(column.indices, dtype=np.int32)
+        flat = _to_numpy_values(column)
+        result = np.empty(num_rows, dtype=object)
+        for row in range(num_rows):
+            if column.valid[row]:
+                result[row] = (indices[offsets[row]:offsets[row + 1]], flat[offsets[row]:offsets[row + 1]])
+        return result
+    try:
+        from scipy.sparse import csr_matrix
+    except ImportError:
+        raise RuntimeError("scipy is required to decode sparse features into numpy format. Please install scipy.")
+    indices = np.array(column.indices, dtype=np.int32)
+    indptr = np.concatenate([[0], np.cumsum(column.lengths)])
+    num_cols = int(indices.max()) + 1 if len(indices) else 0
+    return csr_matrix((_to_numpy_values(column), indices, indptr), shape=(num_rows, num_cols))
+
+
+def _column_to_arrow(column: _Column) -> pa.Array:
+    value_type = _ARROW_TYPES[column.value_type]
+    mask = ~column.valid
+    if column.layout == _SCALAR:
+        values = np.zeros(len(column.valid), dtype=_NUMPY_DTYPES[column.value_type])
+        values[column.valid] = _to_numpy_values(column)
+        return pa.array(values, type=value_type, mask=mask)
+    offsets = pa.array(np.concatenate([[0], np.cumsum(column.lengths)]).astype(np.int32))
+    flat = pa.array(column.values, type=value_type)
+    if column.layout == _DENSE:
+        return pa.ListArray.from_arrays(offsets, flat, mask=pa.array(mask))
+    indices = pa.ListArray.from_arrays(offsets, pa.array(column.indices, type=pa.int32()))
+    values = pa.ListArray.from_arrays(offsets, flat)
+    return pa.StructArray.from_arrays([indices, values], names=["indices", "values"], mask=pa.array(mask))
+
+
+def decode_feature_columns(rows: Sequence[Sequence[Optional[bytes]]],
+                           feature_names: List[str],
+                           feature_types: Optional[Dict[str, FeatureType]] = None,
+                           output_format: str = "numpy",
+                           keys: Optional[List[Any]] = None):
+    """Decode the raw online feature values of many entities column by column.
+
+    Rather than building a Python list per entity, each feature is decoded into flat buffers and converted to an
+    array at once. Column types come from `feature_types` and are inferred from the stored values otherwise.
+
+    Args:
+        rows: raw values for each entity, ordered by `feature_names`. e.g. the result of a Redis pipeline of `HMGET`.
+        feature_names: names of the requested features
+        feature_types: optional mapping from feature name to its registered FeatureType
+        output_format: one of `numpy`, `pandas` or `arrow`
+            - numpy: a dict from feature name to array. Scalar features are 1-D arrays, dense array features are
+              2-D arrays (one row per entity) and numeric sparse array features are `scipy.sparse.csr_matrix`.
+              Missing values are NaN(None for strings), so integer and boolean columns with missing values are
+              promoted to float64.
+            - pandas: a DataFrame indexed by `keys`, one column per feature.
+            - arrow: a `pyarrow.Table` with one column per feature. Array features are list columns and sparse
+              features are struct<indices, values> columns. Missing values are nulls.
+        keys: entity keys of the rows, used as the index of the pandas DataFrame
+
+    Return:
+        The decoded features, with rows in the same order as `rows`.
+    """
+    if output_format not in ONLINE_OUTPUT_FORMATS:
+        raise RuntimeError(f"Unsupported output format {output_format}. Supported formats are {ONLINE_OUTPUT_FORMATS}.")
+    feature_types = feature_types or {}
+    num_rows = len(rows)
+    columns = []
+    for index, feature_name in enumerate(feature_names):
+        raw_values = [row[index] for row in rows]
+        columns.append(_decode_column(raw_values, feature_types.get(feature_name), feature_name))
+
+    if output_format == "numpy":
+        return {name: _column_to_numpy(column, num_rows) for name, column in zip(feature_names, columns)}
+    table = pa.Table.from_arrays([_column_to_arrow(column) for column in columns], names=feature_names)
+    if output_format == "arrow":
+        return table
+    dataframe = table.to_pandas()
+    if keys is not None:
+        dataframe.index = pd.Index(keys)
+    return dataframe
@@ -0,0 +1,220 @@
+import math
+from typing import Any, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from feathr.definition.dtype import FeatureType, ValueType
+from feathr.online.decoder import (_ARROW_TYPES, _DENSE, _DENSE_FIELDS, _SCALAR, _SCALAR_FIELDS, _SPARSE,
+                                   _SPARSE_FIELDS, _layout_of)
+from feathr.protobuf.featureValue_pb2 import FeatureValue
+
+# value type -> oneof case of the FeatureValue, the reverse of the decoder tables
+_SCALAR_CASES = {value_type: case for case, value_type in _SCALAR_FIELDS.items()}
+_DENSE_CASES = {value_type: (case, field) for case, (value_type, field) in _DENSE_FIELDS.items()}
+_SPARSE_CASES = {value_type: (case, field) for case, (value_type, field) in _SPARSE_FIELDS.items()}
+
+# Fixed width encodings of the serialized FeatureValues, used to encode whole columns with NumPy.
+# scalar value type -> (field tag, little endian dtype of the value)
+_FIXED_WIDTH_SCALARS = {
+    ValueType.BOOL: (b"\x08", "u1"),
+    ValueType.FLOAT: (b"\x1d", "<f4"),
+    ValueType.DOUBLE: (b"\x21", "<f8"),
+}
+# dense array value type -> (field tag of the array message, little endian dtype of the packed values)
+_FIXED_WIDTH_ARRAYS = {
+    ValueType.FLOAT: (b"\x62", "<f4"),
+    ValueType.DOUBLE: (b"\x6a", "<f8"),
+}
+# field tag of the packed repeated values in the array messages
+_PACKED_VALUES_TAG = b"\x0a"
+_VALUE_TYPES = {arrow_type: value_type for value_type, arrow_type in _ARROW_TYPES.items()}
+
+
+def _infer_value_type(value: Any) -> ValueType:
+    if isinstance(value, (bool, np.bool_)):
+        return ValueType.BOOL
+    if isinstance(value, np.int32):
+        return ValueType.INT32
+    if isinstance(value, (int, np.integer)):
+        return ValueType.INT64
+    if isinstance(value, np.float32):
+        return ValueType.FLOAT
+    if isinstance(value, (float, np.floating)):
+        return ValueType.DOUBLE
+    if isinstance(value, str):
+        return ValueType.STRING
+    if isinstance(value, bytes):
+        return ValueType.BYTES
+    raise RuntimeError(f"Can't infer the feature type of value {value!r} of type {type(value).__name__}.")
+
+
+def _infer_layout(value: Any) -> str:
+    if isinstance(value, tuple) and len(value) == 2:
+        return _SPARSE
+    if isinstance(value, (list, np.ndarray)):
+        return _DENSE
+    return _SCALAR
+
+
+def is_missing(value: Any) -> bool:
+    """Whether a value is missing, i.e. None or NaN. Missing values are not written to the online store."""
+    return value is None or (isinstance(value, (float, np.floating)) and math.isnan(value))
+
+
+def encode_feature_value(value: Any, feature_type: Optional[FeatureType] = None) -> FeatureValue:
+    """Encode a Python value into the FeatureValue protobuf stored in the online store, i.e. the inverse of
+    `decode_feature_values`.
+
+    Args:
+        value: a scalar, a list or 1-D array for dense array features, or a tuple of (indices, values) for sparse
+            array features
+        feature_type: the declared type of the feature. If not set, the type is inferred from the value: Python ints
+            are INT64, floats are DOUBLE, and numpy scalars keep their width.
+    """
+    if feature_type is not None and feature_type.val_type != ValueType.UNSPECIFIED:
+        layout, value_type = _layout_of(feature_type), feature_type.val_type
+    else:
+        layout = _infer_layout(value)
+        if layout == _SCALAR:
+            sample = value
+        else:
+            elements = value[1] if layout == _SPARSE else value
+            sample = elements[0] if len(elements) else 0.0
+        value_type = _infer_value_type(sample)
+
+    feature_value = FeatureValue()
+    try:
+        if layout == _SCALAR and value_type == ValueType.BYTES:
+            # there is no bytes scalar in the protobuf, so it's an array of one element
+            feature_value.byte_array.bytes.append(value)
+        elif layout == _SCALAR:
+            setattr(feature_value, _SCALAR_CASES[value_type], _to_python(value))
+        elif layout == _DENSE:
+            case, field = _DENSE_CASES[value_type]
+            getattr(getattr(feature_value, case), field).extend(_to_python(v) for v in value)
+        else:
+            case, field = _SPARSE_CASES[value_type]
+            indices, values = value
+            sparse = getattr(feature_value, case)
+            sparse.index_integers.extend(int(index) for index in indices)
+            getattr(sparse, field).extend(_to_python(v) for v in values)
+    except KeyError:
+        raise RuntimeError(f"Feature values of type {value_type.name} with layout {layout} can't be stored online.")
+    except (TypeError, ValueError) as e:
+        raise RuntimeError(f"Can't encode value {value!r} as a {layout} {value_type.name} feature: {e}")
+    return feature_value
+
+
+def encode_feature_column(column, feature_type: Optional[FeatureType] = None) -> List[Optional[bytes]]:
+    """Encode a column of values of a feature into serialized FeatureValue protobufs, e.g. a column of an offline
+    dataset. Bool, float and double features and dense float and double arrays of a fixed length are encoded with
+    NumPy for the whole column at once, and the other values one by one with `encode_feature_value`.
+
+    Args:
+        column: a pyarrow Array or ChunkedArray
+        feature_type: the type of the feature. Defaults to the type matching the Arrow type of the column, see
+            `arrow_feature_type`.
+
+    Return:
+        The serialized FeatureValue of each value, None for the null and NaN values.
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    if feature_type is None:
+        feature_type = arrow_feature_type(column.type)
+    encoded = None
+    if feature_type is not None and len(column):
+        layout, value_type = _layout_of(feature_type), feature_type.val_type
+        if layout == _SCALAR and value_type in _FIXED_WIDTH_SCALARS:
+            encoded = _encode_fixed_width_scalars(column, *_FIXED_WIDTH_SCALARS[value_type])
+        elif layout == _DENSE and value_type in _FIXED_WIDTH_ARRAYS and pa.types.is_list(column.type):
+            encoded = _encode_fixed_width_arrays(column, *_FIXED_WIDTH_ARRAYS[value_type])
+    if encoded is None:
+        encoded = [None if is_missing(value) else encode_feature_value(value, feature_type).SerializeToString()
+                   for value in column.to_pylist()]
+    else:
+        # like in `encode_feature_value`, NaN is a missing value
+        missing = pc.is_null(column, nan_is_null=pa.types.is_floating(column.type))
+        for index in np.flatnonzero(missing.to_numpy(zero_copy_only=False)):
+            encoded[index] = None
+    return encoded
+
+
+def arrow_feature_type(arrow_type: pa.DataType) -> Optional[FeatureType]:
+    """Get the feature type of a column of an offline dataset from its Arrow type, e.g. FLOAT_VECTOR for a list of
+    floats. None if there is no matching feature type."""
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type):
+        value_type = _arrow_value_type(arrow_type.value_type)
+        return FeatureType(value_type, dimension_type=[ValueType.INT32]) if value_type else None
+    value_type = _arrow_value_type(arrow_type)
+    return FeatureType(value_type) if value_type else None
+
+
+def _arrow_value_type(arrow_type: pa.DataType) -> Optional[ValueType]:
+    if pa.types.is_integer(arrow_type):
+        return ValueType.INT64 if arrow_type.bit_width > 32 else ValueType.INT32
+    if pa.types.is_large_string(arrow_type):
+        return ValueType.STRING
+    if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return ValueType.BYTES
+    return _VALUE_TYPES.get(arrow_type)
+
+
+def _encode_fixed_width_scalars(column: pa.Array, tag: bytes, dtype: str) -> Optional[List[bytes]]:
+    try:
+        values = column.cast(_ARROW_TYPES[_dtype_value_type(dtype)])
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+    values = np.asarray(values.fill_null(False if dtype == "u1" else 0).to_numpy(zero_copy_only=False), dtype=dtype)
+    return _concat_records(tag, values.reshape(len(values), 1))
+
+
+def _encode_fixed_width_arrays(column: pa.Array, tag: bytes, dtype: str) -> Optional[List[bytes]]:
+    lengths = column.value_lengths().fill_null(0).to_numpy(zero_copy_only=False)
+    flattened = column.flatten()
+    # the arrays must have the same length, and no null elements
+    if lengths[0] == 0 or (lengths != lengths[0]).any() or flattened.null_count:
+        return None
+    try:
+        flattened = flattened.cast(_ARROW_TYPES[_dtype_value_type(dtype)])
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+    values = np.asarray(flattened.to_numpy(zero_copy_only=False), dtype=dtype)
+    if column.null_count:
+        # the null arrays have no values, encode them as zeros and drop them afterwards
+        padded = np.zeros((len(column), int(lengths[0])), dtype=dtype)
+        padded[np.flatnonzero(column.is_valid().to_numpy(zero_copy_only=False))] = values.reshape(-1, lengths[0])
+        values = padded
+    values = values.reshape(len(column), int(lengths[0]))
+    packed_size = values.shape[1] * values.itemsize
+    message = _PACKED_VALUES_TAG + _varint(packed_size)
+    return _concat_records(tag + _varint(len(message) + packed_size) + message, values)
+
+
+def _concat_records(prefix: bytes, values: np.ndarray) -> List[bytes]:
+    """Serialize each row of a 2-D array behind the same prefix."""
+    row_size = len(prefix) + values.shape[1] * values.itemsize
+    records = np.empty((len(values), row_size), dtype=np.uint8)
+    records[:, :len(prefix)] = np.frombuffer(prefix, dtype=np.uint8)
+    records[:, len(prefix):] = np.ascontiguousarray(values).view(np.uint8).reshape(len(values), -1)
+    data = records.tobytes()
+    return [data[start:start + row_size] for start in range(0, len(data), row_size)]
+
+
+def _dtype_value_type(dtype: str) -> ValueType:
+    return {"u1": ValueType.BOOL, "<f4": ValueType.FLOAT, "<f8": ValueType.DOUBLE}[dtype]
+
+
+def _varint(value: int) -> bytes:
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _to_python(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
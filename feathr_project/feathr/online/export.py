@@ -0,0 +1,194 @@
+import os
+import queue
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+from loguru import logger
+from tqdm import tqdm
+
+from feathr.definition.dtype import FeatureType
+from feathr.online._rate_limit import _TokenBucket
+from feathr.online.decoder import decode_feature_columns
+from feathr.online.online_store import PACKED_ROW_FIELD, OnlineStore
+from feathr.online.packed import PackedSchemas
+
+# called with the raw values of each batch before they are decoded, e.g. to load the zstd dictionaries they use
+PrepareFunction = Callable[[List[Sequence[Optional[bytes]]]], None]
+
+# marks the end of the batches of a shard in the queue
+_END_OF_SHARD = object()
+
+
+def export_online_table(online_store: OnlineStore, feature_table: str, path: str,
+                        feature_names: Optional[List[str]] = None,
+                        feature_types: Optional[Dict[str, FeatureType]] = None, key_column: str = "key",
+                        max_keys_per_second: Optional[float] = None, batch_size: int = 1000,
+                        rows_per_file: int = 1000000, packed_schemas: Optional[PackedSchemas] = None,
+                        prepare: Optional[PrepareFunction] = None, progress: bool = True) -> int:
+    """Exports the entities of an online feature table to Parquet files, e.g. to check what is actually served.
+
+    The table is scanned with one SCAN cursor per shard of the store(per node of a Redis Cluster), in parallel. Each
+    cursor fetches the values of its keys in pipelined batches of `batch_size`. The batches are decoded column by
+    column and appended to Parquet files of up to `rows_per_file` rows, `part-00000.parquet`, `part-00001.parquet`,
+    etc. At most two batches per shard are buffered, so the memory stays bounded however large the table is. The
+    entities are exported in no particular order, and the entities written during the export may or may not be in it.
+
+    Args:
+        online_store: the store to export from
+        feature_table: the name of the feature table
+        path: the directory of the Parquet files. It's created if needed.
+        feature_names: the features to export. Defaults to the features of the first batch of entities: features
+            that only appear later are left out, with a warning.
+        feature_types: optional mapping from feature name to FeatureType used to type the columns. Types are inferred
+            from the stored values otherwise.
+        key_column: the name of the column of the entity keys
+        max_keys_per_second: if set, the number of entities read per second is limited to this, across all the
+            shards, so that the export doesn't disturb the live reads
+        batch_size: number of keys scanned and fetched at a time
+        rows_per_file: max number of rows of a Parquet file
+        packed_schemas: the schemas of the packed tables, loaded for `feature_table` if it's packed
+        prepare: optional function called with the raw values of each batch before they are decoded
+        progress: whether to show a progress bar of the exported entities
+
+    Return:
+        The number of exported entities.
+    """
+    shards = online_store.scan_shards(feature_table, batch_size)
+    batches = queue.Queue(maxsize=2 * len(shards))
+    rate_limit = _TokenBucket(max_keys_per_second, burst=max(max_keys_per_second, batch_size)) \
+        if max_keys_per_second else None
+    stop = threading.Event()
+    errors = []
+
+    def scan_shard(shard):
+        try:
+            for batch in shard:
+                if rate_limit is not None:
+                    rate_limit.acquire(len(batch))
+                if not _put(batches, batch, stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(batches, _END_OF_SHARD, stop)
+
+    threads = [threading.Thread(target=scan_shard, args=(shard,), daemon=True, name=f"feathr-export-{index}")
+               for index, shard in enumerate(shards)]
+    for thread in threads:
+        thread.start()
+    writer = _ParquetFilesWriter(path, rows_per_file)
+    exported = 0
+    discover_features = feature_names is None
+    dropped_features = set()
+    try:
+        with tqdm(desc=f"Exporting {feature_table}", unit="entities", disable=not progress) as progress_bar:
+            remaining_shards = len(shards)
+            while remaining_shards:
+                batch = batches.get()
+                if batch is _END_OF_SHARD:
+                    remaining_shards -= 1
+                    continue
+                keys, entity_values = _unpack_batch(batch, feature_table, packed_schemas)
+                if feature_names is None:
+                    feature_names = list(dict.fromkeys(name for values in entity_values for name in values))
+                if discover_features:
+                    dropped_features.update(name for values in entity_values for name in values
+                                            if name not in feature_names)
+                rows = [[values.get(name) for name in feature_names] for values in entity_values]
+                if prepare is not None:
+                    prepare(rows)
+                table = decode_feature_columns(rows, feature_names, feature_types, "arrow")
+                writer.write(table.add_column(0, key_column, pa.array(keys, type=pa.string())))
+                exported += len(keys)
+                progress_bar.update(len(keys))
+    finally:
+        stop.set()
+        writer.close()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise RuntimeError(f"Failed to export online feature table {feature_table}: {errors[0]}")
+    if dropped_features:
+        logger.warning("Features {} of online feature table {} were not exported, since they were not in the first "
+                       "batch of entities. Pass feature_names to export them.", sorted(dropped_features),
+                       feature_table)
+    return exported
+
+
+def _put(batches: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put an item in the queue unless the export stopped, e.g. because writing failed."""
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _unpack_batch(batch: List[Tuple[str, Dict[str, bytes]]], feature_table: str,
+                  packed_schemas: Optional[PackedSchemas]) -> Tuple[List[str], List[Dict[str, bytes]]]:
+    keys = []
+    entity_values = []
+    for key, values in batch:
+        if PACKED_ROW_FIELD in values and packed_schemas is not None:
+            values = packed_schemas.select_all(feature_table, values[PACKED_ROW_FIELD])
+        keys.append(key)
+        entity_values.append(values)
+    return keys, entity_values
+
+
+class _ParquetFilesWriter(object):
+    """Appends tables to Parquet files of up to `rows_per_file` rows. A file is also rolled when the schema of the
+    tables changes, e.g. when a column that was all nulls gets a type."""
+    def __init__(self, path: str, rows_per_file: int):
+        self.path = path
+        self.rows_per_file = rows_per_file
+        self._writer = None
+        self._schema: Optional[pa.Schema] = None
+        self._rows = 0
+        self._files = 0
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, table: pa.Table):
+        schema = self._merge_schema(table.schema)
+        if self._writer is None or schema != self._schema or self._rows >= self.rows_per_file:
+            self._open(schema)
+        try:
+            table = table.cast(schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise RuntimeError(f"The inferred types of the exported features changed between batches: {e}. "
+                               f"Pass feature_types to export them with fixed types.")
+        start = 0
+        while start < table.num_rows:
+            length = min(table.num_rows - start, self.rows_per_file - self._rows)
+            self._writer.write_table(table.slice(start, length))
+            self._rows += length
+            start += length
+            if start < table.num_rows:
+                self._open(schema)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _merge_schema(self, schema: pa.Schema) -> pa.Schema:
+        if self._schema is None:
+            return schema
+        fields = []
+        for field in schema:
+            index = self._schema.get_field_index(field.name)
+            known = self._schema.field(index) if index >= 0 else None
+            # keep the known type of the column, unless it was only nulls so far
+            fields.append(known if known is not None and not pa.types.is_null(known.type) else field)
+        return pa.schema(fields)
+
+    def _open(self, schema: pa.Schema):
+        from pyarrow.parquet import ParquetWriter
+        self.close()
+        self._writer = ParquetWriter(os.path.join(self.path, f"part-{self._files:05d}.parquet"), schema)
+        self._schema = schema
+        self._rows = 0
+        self._files += 1
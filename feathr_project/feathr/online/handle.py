@@ -0,0 +1,184 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+
+from feathr.constants import REDIS_KEY_SEPARATOR
+from feathr.definition.dtype import FeatureType
+from feathr.online._cluster import _parse_redis_startup_nodes
+from feathr.online.decoder import decode_feature_columns, decode_feature_values
+from feathr.online.online_store import OnlineStore
+from feathr.online.reader import OnlineReader
+
+# per-process readers of the handles, by (pid, settings of the handle), so that all the tasks of an executor share
+# one connection pool
+_READERS: Dict[Tuple[int, tuple], OnlineReader] = {}
+_READERS_LOCK = threading.Lock()
+
+
+class OnlineLookupHandle(object):
+    """Lightweight handle to fetch online features from distributed jobs, e.g. Spark `mapPartitions`, `mapInArrow` or
+    pandas UDFs, without creating a `FeathrClient` in every task.
+
+    The handle only holds the settings of the online store, so it's cheap to pickle and ship to the executors. The
+    connection pool, and the packed-row schemas, table aliases and zstd dictionaries of the tables, are created once
+    per executor process, the first time a task of the process uses a handle with the same settings, and shared by
+    all its later tasks. A forked process creates its own. The values are decoded the same way as
+    `FeathrClient.multi_get_online_features`.
+
+    Use `FeathrClient.get_online_lookup_handle()` to create one from the Feathr config. The Redis password is part of
+    the pickled settings, so it's sent to the executors with the tasks.
+
+    Attributes:
+        host: Redis host, or comma separated `host:port` endpoints of a Redis Cluster
+        port: Redis port
+        password: Redis password
+        ssl_enabled: whether SSL is used to connect to Redis
+        cluster_enabled: whether the online store is a Redis Cluster
+        read_from_replicas: on a Redis Cluster, whether reads can be served by the replicas
+        pool_kwargs: other settings of the Redis connection pool, e.g. `max_connections` or `socket_timeout`
+        sqlite_path: path of an embedded SQLite online store, readable from the executors, instead of Redis
+        online_store_factory: picklable function creating the online store in each executor process, instead of
+            Redis or SQLite
+        key_separator: separator between the feature table and the key in the Redis keys
+        feature_types: types of the features, e.g. from `build_features`, used to decode the Arrow and pandas columns
+    """
+    def __init__(self, host: Optional[str] = None, port: int = 6379, password: Optional[str] = None,
+                 ssl_enabled: bool = False, cluster_enabled: bool = False, read_from_replicas: bool = False,
+                 pool_kwargs: Optional[Dict[str, Any]] = None, sqlite_path: Optional[str] = None,
+                 online_store_factory: Optional[Callable[[], OnlineStore]] = None,
+                 key_separator: str = REDIS_KEY_SEPARATOR, feature_types: Optional[Dict[str, FeatureType]] = None):
+        if host is None and sqlite_path is None and online_store_factory is None:
+            raise RuntimeError("The online lookup handle needs a Redis host, a SQLite path or an online store factory.")
+        self.host = host
+        self.port = port
+        self.password = password
+        self.ssl_enabled = ssl_enabled
+        self.cluster_enabled = cluster_enabled
+        self.read_from_replicas = read_from_replicas
+        self.pool_kwargs = dict(pool_kwargs or {})
+        self.sqlite_path = sqlite_path
+        self.online_store_factory = online_store_factory
+        self.key_separator = key_separator
+        self.feature_types = dict(feature_types or {})
+
+    def multi_get(self, feature_table: str, keys: List[str], feature_names: List[str],
+                  output_format: Optional[str] = None):
+        """Fetches features of several keys in one pipelined round trip, like `FeathrClient.multi_get_online_features`.
+
+        Return:
+            A dict from key to the list of feature values, or the decoded columns with `output_format`(`numpy`,
+            `pandas` or `arrow`, see `feathr.online.decode_feature_columns`).
+        """
+        keys = list(keys)
+        rows = self._reader().fetch([(feature_table, key, feature_names) for key in keys])
+        if output_format:
+            return decode_feature_columns(rows, feature_names, self._feature_types(feature_names), output_format,
+                                          keys=keys)
+        return dict(zip(keys, [decode_feature_values(row) for row in rows]))
+
+    def lookup_batch(self, batch: Union[pa.RecordBatch, pa.Table, pd.DataFrame], feature_table: str,
+                     key_column: Union[str, List[str]], feature_names: List[str]):
+        """Fetches the features of the keys of a batch of rows, and appends them to the batch as columns.
+
+        Args:
+            batch: an Arrow record batch or table, or a pandas DataFrame, e.g. a batch of `mapInArrow` or
+                `mapInPandas`
+            feature_table: the name of the feature table
+            key_column: the column of the keys, or the columns of a compound key(joined with `#`, like in the
+                materialized tables)
+            feature_names: the features to fetch
+
+        Return:
+            The batch, of the same kind, with one more column per feature. The features of the missing keys are
+            nulls.
+        """
+        key_columns = [key_column] if isinstance(key_column, str) else list(key_column)
+        if isinstance(batch, pd.DataFrame):
+            key_values = [batch[column].tolist() for column in key_columns]
+        else:
+            key_values = [batch.column(column).to_pylist() for column in key_columns]
+        keys = ["#".join(str(value) for value in values) for values in zip(*key_values)]
+        rows = self._reader().fetch([(feature_table, key, feature_names) for key in keys])
+        feature_types = self._feature_types(feature_names)
+        if isinstance(batch, pd.DataFrame):
+            features = decode_feature_columns(rows, feature_names, feature_types, "pandas", keys=keys)
+            features.index = batch.index
+            return pd.concat([batch, features], axis=1)
+        features = decode_feature_columns(rows, feature_names, feature_types, "arrow")
+        columns = list(batch.columns) + [features.column(feature_name) for feature_name in feature_names]
+        names = list(batch.schema.names) + list(feature_names)
+        if isinstance(batch, pa.RecordBatch):
+            return pa.RecordBatch.from_arrays([column.combine_chunks() if isinstance(column, pa.ChunkedArray)
+                                               else column for column in columns], names=names)
+        return pa.Table.from_arrays(columns, names=names)
+
+    def lookup_batches(self, batches: Iterator, feature_table: str, key_column: Union[str, List[str]],
+                       feature_names: List[str], batch_size: int = 1000) -> Iterator:
+        """Appends the features to each batch of an iterator, e.g. in the function given to `mapInArrow` or
+        `mapInPandas`. Batches larger than `batch_size` rows are fetched `batch_size` keys at a time, so a pipeline
+        never holds too many replies.
+
+        Example:
+            handle = client.get_online_lookup_handle()
+            scored = df.mapInArrow(lambda batches: handle.lookup_batches(batches, "userFeatures", "user_id",
+                                                                         ["f_age"]), schema)
+        """
+        for batch in batches:
+            num_rows = len(batch) if isinstance(batch, pd.DataFrame) else batch.num_rows
+            for start in range(0, num_rows, batch_size):
+                chunk = batch.iloc[start:start + batch_size] if isinstance(batch, pd.DataFrame) \
+                    else batch.slice(start, batch_size)
+                yield self.lookup_batch(chunk, feature_table, key_column, feature_names)
+
+    def close(self):
+        """Closes the connections of this process for the handle. The next lookup opens new ones."""
+        with _READERS_LOCK:
+            reader = _READERS.pop((os.getpid(), self._settings()), None)
+        if reader is not None:
+            reader.online_store.close()
+
+    def _feature_types(self, feature_names: List[str]) -> Dict[str, FeatureType]:
+        return {feature_name: self.feature_types[feature_name] for feature_name in feature_names
+                if feature_name in self.feature_types}
+
+    def _settings(self) -> tuple:
+        return (self.host, self.port, self.password, self.ssl_enabled, self.cluster_enabled, self.read_from_replicas,
+                tuple(sorted(self.pool_kwargs.items())), self.sqlite_path, self.online_store_factory,
+                self.key_separator)
+
+    def _reader(self) -> OnlineReader:
+        reader_key = (os.getpid(), self._settings())
+        reader = _READERS.get(reader_key)
+        if reader is None:
+            with _READERS_LOCK:
+                reader = _READERS.get(reader_key)
+                if reader is None:
+                    reader = OnlineReader(self._create_online_store())
+                    _READERS[reader_key] = reader
+        return reader
+
+    def _create_online_store(self) -> OnlineStore:
+        if self.online_store_factory is not None:
+            return self.online_store_factory()
+        if self.sqlite_path is not None:
+            from feathr.online.sqlite_store import SqliteOnlineStore
+            return SqliteOnlineStore(self.sqlite_path, read_only=True)
+        import redis
+        from feathr.online.redis_store import RedisOnlineStore
+        if self.cluster_enabled:
+            startup_nodes = [redis.cluster.ClusterNode(node_host, node_port)
+                             for node_host, node_port in _parse_redis_startup_nodes(self.host, self.port)]
+            redis_client = redis.cluster.RedisCluster(startup_nodes=startup_nodes, password=self.password,
+                                                      ssl=self.ssl_enabled, read_from_replicas=self.read_from_replicas,
+                                                      **self.pool_kwargs)
+        else:
+            connection_class = redis.SSLConnection if self.ssl_enabled else redis.Connection
+            # the tasks of an executor wait for a free connection rather than opening more of them
+            connection_pool = redis.BlockingConnectionPool(host=self.host, port=int(self.port),
+                                                           password=self.password,
+                                                           connection_class=connection_class, **self.pool_kwargs)
+            redis_client = redis.Redis(connection_pool=connection_pool)
+        return RedisOnlineStore(redis_client, self.key_separator)
@@ -0,0 +1,138 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import pyarrow as pa
+from tqdm import tqdm
+
+from feathr.definition.dtype import FeatureType
+from feathr.online.codec import BASE64_CODEC, RAW_CODEC, ValueEncoder
+from feathr.online.encoder import encode_feature_column
+from feathr.online.online_store import OnlineStore
+from feathr.online.sqlite_store import SqliteOnlineStore
+
+# Formats of the offline datasets that can be loaded, the same ones `get_result_df` reads
+LOAD_FORMATS = ["parquet", "avro", "delta"]
+
+
+def load_online_table(online_store: OnlineStore, feature_table: str, path: str, key_column: Union[str, List[str]],
+                      format: str = "parquet", feature_names: Optional[List[str]] = None,
+                      feature_types: Optional[Dict[str, FeatureType]] = None, value_codec: str = BASE64_CODEC,
+                      ttl_seconds: Optional[int] = None, batch_size: int = 100000, chunk_size: int = 1000,
+                      parallelism: int = 4, progress: bool = True) -> int:
+    """Loads an offline dataset, e.g. the output of a feature join job, into an online feature table without Spark.
+
+    The dataset is streamed in batches of `batch_size` rows. The values of each batch are encoded column by column
+    (see `encode_feature_column`), and written in chunks of `chunk_size` entities, each in one pipelined round trip.
+    `parallelism` chunks are written at a time, each on its own connection, and reading waits for the writes when
+    they fall behind, so at most about two batches are held in memory.
+
+    Args:
+        online_store: the store to write to
+        feature_table: the name of the feature table
+        path: a Parquet or Avro file, a directory of them, or a Delta table directory
+        key_column: the column of the entity key, or a list of columns for a compound key, whose values are joined
+            with `#` like the materialization job does
+        format: `parquet`, `avro` or `delta`
+        feature_names: the columns to load as features. Defaults to all the columns but the key columns.
+        feature_types: optional mapping from feature name to FeatureType used to encode the values. Defaults to the
+            type matching the type of the column, e.g. FLOAT_VECTOR for a list of floats.
+        value_codec: how the values are encoded, `base64`(default) or `raw`, see `RedisSink`
+        ttl_seconds: if set, the loaded entities expire after this many seconds
+        batch_size: number of rows read and encoded at a time
+        chunk_size: number of entities written in each round trip
+        parallelism: number of chunks written concurrently. SQLite has a single writer, so it's always 1 for the
+            SQLite store.
+        progress: whether to show a progress bar of the loaded rows
+
+    Return:
+        The number of loaded rows.
+    """
+    if format.casefold() not in LOAD_FORMATS:
+        raise RuntimeError(f"Unsupported format {format}. Supported formats are {LOAD_FORMATS}.")
+    if value_codec not in (BASE64_CODEC, RAW_CODEC):
+        raise RuntimeError(f"Unsupported value codec {value_codec} for loaded features. "
+                           f"Supported ones are {[BASE64_CODEC, RAW_CODEC]}.")
+    key_columns = [key_column] if isinstance(key_column, str) else list(key_column)
+    columns = key_columns + list(feature_names) if feature_names else None
+    total_rows, batches = _read_batches(path, format.casefold(), batch_size, columns)
+    if isinstance(online_store, SqliteOnlineStore):
+        parallelism = 1
+    encoder = ValueEncoder(value_codec)
+    feature_types = feature_types or {}
+
+    loaded = 0
+    pending = []
+    with ThreadPoolExecutor(max_workers=parallelism) as executor, \
+            tqdm(total=total_rows, desc=f"Loading {feature_table}", unit="rows", disable=not progress) as progress_bar:
+        for batch in batches:
+            missing_columns = [column for column in key_columns if column not in batch.schema.names]
+            if missing_columns:
+                raise RuntimeError(f"Key columns {missing_columns} are missing from the dataset at {path}.")
+            rows = _encode_batch(batch, key_columns, feature_types, encoder)
+            # wait for the writes of the previous batch, so that at most two batches are in memory
+            for future in pending:
+                future.result()
+            keys = list(rows)
+            pending = [executor.submit(online_store.batch_put, feature_table,
+                                       {key: rows[key] for key in keys[start:start + chunk_size]},
+                                       ttl_seconds=ttl_seconds)
+                       for start in range(0, len(keys), chunk_size)]
+            loaded += batch.num_rows
+            progress_bar.update(batch.num_rows)
+        for future in pending:
+            future.result()
+    return loaded
+
+
+def _encode_batch(batch: pa.RecordBatch, key_columns: List[str], feature_types: Dict[str, FeatureType],
+                  encoder: ValueEncoder) -> Dict[str, Dict[str, bytes]]:
+    """Encode the features of a batch of rows into the raw values of each entity key."""
+    key_values = [batch.column(column).to_pylist() for column in key_columns]
+    keys = ["#".join(str(value) for value in values) for values in zip(*key_values)]
+    rows = {key: {} for key in keys}
+    for feature_name, column in zip(batch.schema.names, batch.columns):
+        if feature_name in key_columns:
+            continue
+        for key, serialized in zip(keys, encode_feature_column(column, feature_types.get(feature_name))):
+            if serialized is not None:
+                rows[key][feature_name] = encoder.encode(serialized)
+    return rows
+
+
+def _read_batches(path: str, format: str, batch_size: int,
+                  columns: Optional[List[str]]) -> Tuple[Optional[int], Iterator[pa.RecordBatch]]:
+    """Open a dataset as a stream of record batches.
+
+    Return:
+        (the number of rows if it's known upfront, iterator of the batches)
+    """
+    if format == "delta":
+        from deltalake import DeltaTable
+        dataset = DeltaTable(path).to_pyarrow_dataset()
+        return dataset.count_rows(), iter(dataset.to_batches(columns=columns, batch_size=batch_size))
+    files = [path] if os.path.isfile(path) else sorted(glob.glob(os.path.join(path, f"*.{format}")))
+    if not files:
+        raise RuntimeError(f"No {format} files found at {path}.")
+    if format == "parquet":
+        from pyarrow.parquet import ParquetFile
+        parquet_files = [ParquetFile(file) for file in files]
+        total_rows = sum(parquet_file.metadata.num_rows for parquet_file in parquet_files)
+        return total_rows, (batch for parquet_file in parquet_files
+                            for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns))
+    return None, _read_avro_batches(files, batch_size, columns)
+
+
+def _read_avro_batches(files: List[str], batch_size: int, columns: Optional[List[str]]) -> Iterator[pa.RecordBatch]:
+    import fastavro
+    for file in files:
+        with open(file, "rb") as avro_file:
+            records = []
+            for record in fastavro.reader(avro_file):
+                records.append({column: record.get(column) for column in columns} if columns else record)
+                if len(records) == batch_size:
+                    yield pa.RecordBatch.from_pylist(records)
+                    records = []
+            if records:
+                yield pa.RecordBatch.from_pylist(records)
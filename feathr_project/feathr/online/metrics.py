@@ -0,0 +1,158 @@
+import random
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+
+from loguru import logger
+
+# buckets of the Prometheus histograms
+_SECONDS_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5)
+_BYTES_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class OnlineRequestMetrics(object):
+    """Measurements of one call of an online read API, passed to the `OnlineMetricsHook`s of the client.
+
+    Attributes:
+        api: the name of the API, e.g. `multi_get_online_features`
+        feature_table: the feature table that is read
+        keys: the requested keys
+        feature_names: the requested feature names
+        fetch_seconds: time spent fetching the raw values: the round trips to the online store, and the lookups in the
+            online feature cache if it's enabled
+        decode_seconds: time spent decoding the raw values
+        payload_bytes: total size of the fetched raw values
+        missing_keys: number of keys that have none of the requested features
+        missing_fields: number of requested values that are missing, including those of the missing keys
+    """
+    def __init__(self, api: str, feature_table: str, keys: List[str], feature_names: List[str], fetch_seconds: float,
+                 decode_seconds: float, payload_bytes: int, missing_keys: int, missing_fields: int):
+        self.api = api
+        self.feature_table = feature_table
+        self.keys = keys
+        self.feature_names = feature_names
+        self.fetch_seconds = fetch_seconds
+        self.decode_seconds = decode_seconds
+        self.payload_bytes = payload_bytes
+        self.missing_keys = missing_keys
+        self.missing_fields = missing_fields
+
+    @classmethod
+    def from_rows(cls, api: str, feature_table: str, keys: List[str], feature_names: List[str],
+                  rows: Sequence[Sequence[Optional[bytes]]], fetch_seconds: float,
+                  decode_seconds: float) -> "OnlineRequestMetrics":
+        """Measures the sizes and the missing values of the fetched raw values."""
+        payload_bytes = 0
+        missing_keys = 0
+        missing_fields = 0
+        for row in rows:
+            present = [raw for raw in row if raw]
+            payload_bytes += sum(len(raw) for raw in present)
+            missing_fields += len(row) - len(present)
+            if not present:
+                missing_keys += 1
+        return cls(api, feature_table, keys, feature_names, fetch_seconds, decode_seconds, payload_bytes,
+                   missing_keys, missing_fields)
+
+    @property
+    def num_keys(self) -> int:
+        return len(self.keys)
+
+    @property
+    def num_fields(self) -> int:
+        return len(self.keys) * len(self.feature_names)
+
+    @property
+    def total_seconds(self) -> float:
+        return self.fetch_seconds + self.decode_seconds
+
+
+class OnlineMetricsHook(ABC):
+    """Receives the measurements of each online read of a client, see `FeathrClient.add_online_metrics_hook`.
+
+    Hooks are called synchronously on the read path, so they should be cheap. Their exceptions are logged and
+    otherwise ignored.
+    """
+
+    @abstractmethod
+    def on_request(self, metrics: OnlineRequestMetrics):
+        pass
+
+
+class PrometheusOnlineMetricsHook(OnlineMetricsHook):
+    """Exports the online read metrics to Prometheus.
+
+    Metrics, labeled by API and feature table:
+        <namespace>_fetch_seconds: histogram of the time spent fetching the raw values(network round trips)
+        <namespace>_decode_seconds: histogram of the time spent decoding the values
+        <namespace>_payload_bytes: histogram of the size of the fetched values per request
+        <namespace>_requests_total, <namespace>_keys_total, <namespace>_fields_total: counters of the requests, the
+            requested keys and the requested values
+        <namespace>_missing_keys_total, <namespace>_missing_fields_total: counters of the missing keys and values.
+            The missing ratios are e.g. `rate(feathr_online_missing_keys_total[5m]) / rate(feathr_online_keys_total[5m])`
+
+    Attributes:
+        registry: the Prometheus registry of the metrics. Defaults to the global registry of `prometheus_client`.
+        namespace: prefix of the metric names
+    """
+    def __init__(self, registry=None, namespace: str = "feathr_online"):
+        try:
+            from prometheus_client import REGISTRY, Counter, Histogram
+        except ImportError:
+            raise RuntimeError("prometheus_client is required to export the online metrics to Prometheus. "
+                               "Please install prometheus_client.")
+        self.registry = registry or REGISTRY
+        labels = ["api", "feature_table"]
+        self.fetch_seconds = Histogram(f"{namespace}_fetch_seconds", "Time spent fetching online feature values",
+                                       labels, buckets=_SECONDS_BUCKETS, registry=self.registry)
+        self.decode_seconds = Histogram(f"{namespace}_decode_seconds", "Time spent decoding online feature values",
+                                        labels, buckets=_SECONDS_BUCKETS, registry=self.registry)
+        self.payload_bytes = Histogram(f"{namespace}_payload_bytes", "Size of the online feature values of a request",
+                                       labels, buckets=_BYTES_BUCKETS, registry=self.registry)
+        self.requests = Counter(f"{namespace}_requests", "Online feature requests", labels, registry=self.registry)
+        self.keys = Counter(f"{namespace}_keys", "Requested online entity keys", labels, registry=self.registry)
+        self.fields = Counter(f"{namespace}_fields", "Requested online feature values", labels,
+                              registry=self.registry)
+        self.missing_keys = Counter(f"{namespace}_missing_keys", "Requested keys without any of the features",
+                                    labels, registry=self.registry)
+        self.missing_fields = Counter(f"{namespace}_missing_fields", "Requested feature values that are missing",
+                                      labels, registry=self.registry)
+
+    def on_request(self, metrics: OnlineRequestMetrics):
+        labels = (metrics.api, metrics.feature_table)
+        self.fetch_seconds.labels(*labels).observe(metrics.fetch_seconds)
+        self.decode_seconds.labels(*labels).observe(metrics.decode_seconds)
+        self.payload_bytes.labels(*labels).observe(metrics.payload_bytes)
+        self.requests.labels(*labels).inc()
+        self.keys.labels(*labels).inc(metrics.num_keys)
+        self.fields.labels(*labels).inc(metrics.num_fields)
+        self.missing_keys.labels(*labels).inc(metrics.missing_keys)
+        self.missing_fields.labels(*labels).inc(metrics.missing_fields)
+
+    def serve(self, port: int, addr: str = "0.0.0.0"):
+        """Serves the metrics for Prometheus to scrape at `http://<addr>:<port>/metrics`, from a background thread."""
+        from prometheus_client import start_http_server
+        start_http_server(port, addr=addr, registry=self.registry)
+
+
+class SlowRequestLogHook(OnlineMetricsHook):
+    """Logs a sample of the slow online reads, with their timings and sizes.
+
+    Attributes:
+        threshold_ms: requests that take at least this many milliseconds are slow
+        sample_rate: fraction of the slow requests that are logged
+        max_logged_keys: max number of keys of a request included in the log
+    """
+    def __init__(self, threshold_ms: float = 100, sample_rate: float = 1.0, max_logged_keys: int = 10):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.max_logged_keys = max_logged_keys
+
+    def on_request(self, metrics: OnlineRequestMetrics):
+        if metrics.total_seconds * 1000 < self.threshold_ms or random.random() >= self.sample_rate:
+            return
+        logger.warning("Slow online request {} on table {}: {:.1f}ms (fetch {:.1f}ms, decode {:.1f}ms), {} keys, "
+                       "{} features, {} bytes, {} missing keys, {} missing values. Keys: {}",
+                       metrics.api, metrics.feature_table, metrics.total_seconds * 1000,
+                       metrics.fetch_seconds * 1000, metrics.decode_seconds * 1000, metrics.num_keys,
+                       len(metrics.feature_names), metrics.payload_bytes, metrics.missing_keys,
+                       metrics.missing_fields, metrics.keys[:self.max_logged_keys])
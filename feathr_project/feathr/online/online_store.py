@@ -0,0 +1,161 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# A request for some features of one entity: (feature_table, key, feature_names)
+FeatureRequest = Tuple[str, str, List[str]]
+
+# Operations merging a value into a stored partial aggregate, see `OnlineStore.batch_accumulate`
+ACCUMULATE_OPERATIONS = ("sum", "max", "min")
+
+# Field holding the packed row of an entity, in the stores without a native packed-row layout
+PACKED_ROW_FIELD = "__feathr_row__"
+
+
+class OnlineStore(ABC):
+    """This is the abstract class for all the online stores, where the materialized features are served from.
+
+    An online feature table maps each entity key to its features, and each feature name to the raw(encoded) value of
+    the feature, in the format written by the materialization job. Decoding the values is up to the caller, so all
+    the stores return the same bytes for the same feature.
+    """
+
+    @abstractmethod
+    def batch_get(self, requests: List[FeatureRequest]) -> List[List[Optional[bytes]]]:
+        """Fetches the raw values of some features of several entities, in as few round trips as possible.
+
+        Args:
+            requests: list of (feature_table, key, feature_names)
+
+        Return:
+            The raw values of each request, in the same order as `requests`, and ordered by its feature names. A
+            missing feature or key is None.
+        """
+        pass
+
+    @abstractmethod
+    def batch_get_all(self, feature_table: str, keys: List[str]) -> List[Dict[str, bytes]]:
+        """Fetches all the stored features of several entities of a feature table.
+
+        Return:
+            A dict from feature name to raw value for each key, in the same order as `keys`. It's empty if the key
+            doesn't exist.
+        """
+        pass
+
+    @abstractmethod
+    def batch_put(self, feature_table: str, rows: Dict[str, Dict[str, bytes]], ttl_seconds: Optional[int] = None):
+        """Writes the raw values of the features of several entities. Features of the entities that are not in `rows`
+        are kept.
+
+        Args:
+            feature_table: the name of the feature table
+            rows: dict from entity key to a dict from feature name to raw value
+            ttl_seconds: if set, the written entities expire, with all their features, after this many seconds.
+                Otherwise their current expiration, if any, is kept.
+        """
+        pass
+
+    @abstractmethod
+    def delete_table(self, feature_table: str, max_keys_per_second: Optional[float] = None):
+        """Deletes all the entities of a feature table.
+
+        Args:
+            feature_table: the name of the feature table
+            max_keys_per_second: if set, the entities are deleted in batches, at most this many per second, so that
+                deleting a large table doesn't slow down the other clients. Ignored by the stores that delete a table
+                at once.
+        """
+        pass
+
+    @abstractmethod
+    def scan(self, feature_table: str, batch_size: int = 1000) -> Iterator[Tuple[str, Dict[str, bytes]]]:
+        """Iterates over all the entities of a feature table, in no particular order.
+
+        Args:
+            feature_table: the name of the feature table
+            batch_size: number of entities fetched at a time
+
+        Return:
+            An iterator of (key, dict from feature name to raw value).
+        """
+        pass
+
+    def scan_shards(self, feature_table: str,
+                    batch_size: int = 1000) -> List[Iterator[List[Tuple[str, Dict[str, bytes]]]]]:
+        """Splits the scan of a feature table into independent scans, e.g. one per node of a cluster, that can run in
+        parallel. Together they return each entity once, like `scan`.
+
+        Return:
+            A list of iterators, each of them yielding batches of up to `batch_size` (key, dict from feature name to
+            raw value).
+        """
+        def batches():
+            batch = []
+            for entity in self.scan(feature_table, batch_size):
+                batch.append(entity)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        return [batches()]
+
+    def batch_accumulate(self, feature_table: str, updates: Dict[str, Dict[str, Tuple[str, float]]],
+                         ttl_seconds: Optional[int] = None):
+        """Merges numbers into the stored partial aggregates of several entities, e.g. the sums and counts of the
+        time buckets of `feathr.online.OnlineWindowAggregator`. Each entity is updated atomically, so concurrent
+        writers don't lose each other's updates.
+
+        The aggregates are stored as decimal numbers, e.g. b"1.5". A missing aggregate is set to the merged value.
+
+        Args:
+            feature_table: the name of the feature table
+            updates: dict from entity key to a dict from field name to (operation, value). The operation is one of
+                `ACCUMULATE_OPERATIONS`: `sum` adds the value to the aggregate, `max` and `min` keep the larger or the
+                smaller of both.
+            ttl_seconds: if set, the updated entities expire after this many seconds
+        """
+        raise RuntimeError(f"{type(self).__name__} doesn't support accumulating aggregates.")
+
+    def update_entity(self, feature_table: str, key: str,
+                      update: Callable[[Dict[str, bytes]], Optional[Dict[str, bytes]]]) -> Dict[str, bytes]:
+        """Atomically reads all the stored features of an entity, and writes the features returned by `update` called
+        with them, e.g. to update metadata written by several clients at the same time. No other writer changes the
+        entity between the read and the write: if one did, `update` is called again with the new features, so it
+        must not have side effects. `update` returns None to write nothing, and can raise to abort the update.
+
+        Return:
+            The features of the entity the successful call of `update` got.
+        """
+        raise RuntimeError(f"{type(self).__name__} doesn't support atomic updates.")
+
+    def memory_usage(self, feature_table: str, keys: List[str]) -> List[Optional[int]]:
+        """Measures the memory taken by several entities of a feature table in the store, e.g. to calibrate the
+        estimates of `feathr.online.estimate_online_memory`.
+
+        Return:
+            The bytes taken by each key, in the same order as `keys`. None if the key doesn't exist, or if the store
+            can't measure it.
+        """
+        return [None] * len(keys)
+
+    def batch_get_rows(self, feature_table: str, keys: List[str]) -> List[Optional[bytes]]:
+        """Fetches the packed rows(see `feathr.online.packed`) of several entities of a packed feature table.
+
+        Return:
+            The packed row of each key, in the same order as `keys`. None if the key doesn't exist.
+        """
+        return [row[0] for row in self.batch_get([(feature_table, key, [PACKED_ROW_FIELD]) for key in keys])]
+
+    def batch_put_rows(self, feature_table: str, rows: Dict[str, bytes]):
+        """Writes the packed rows of several entities of a packed feature table, replacing their previous rows.
+
+        Args:
+            feature_table: the name of the feature table
+            rows: dict from entity key to packed row
+        """
+        self.batch_put(feature_table, {key: {PACKED_ROW_FIELD: row} for key, row in rows.items()})
+
+    def close(self):
+        """Releases the resources(e.g. connections) of the store."""
+        pass
@@ -0,0 +1,149 @@
+import json
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Layouts of an online feature table, set by `RedisSink(layout=...)`
+HASH_LAYOUT = "hash"
+PACKED_LAYOUT = "packed"
+LAYOUTS = [HASH_LAYOUT, PACKED_LAYOUT]
+
+# Header byte of a packed row, after the codec header bytes(see `feathr.online.codec`)
+PACKED_HEADER = 0x05
+# header byte, schema version and number of columns, followed by the end offset of each column
+_PACKED_PREFIX = struct.Struct("<BII")
+
+# Online table holding the schemas of the packed tables: key is the feature table, field is the schema version and
+# value is the JSON list of the feature names of the schema, in column order.
+SCHEMA_TABLE = "__feathr_packed_schemas__"
+
+# Seconds after which the client checks again whether a table is packed, and which schemas it has
+DEFAULT_SCHEMA_REFRESH_SECONDS = 60
+
+
+def schema_version(feature_names: Sequence[str]) -> int:
+    """Get the version of the schema with these columns. It only depends on the feature names and their order, so
+    the writers don't need to coordinate to version a schema."""
+    return zlib.crc32(_schema_json(feature_names).encode("ascii"))
+
+
+def schema_entry(feature_names: Sequence[str]) -> Dict[str, str]:
+    """Get the field of `SCHEMA_TABLE` to write for a schema, with `OnlineStore.batch_put(SCHEMA_TABLE, {table: ...})`."""
+    return {str(schema_version(feature_names)): _schema_json(feature_names)}
+
+
+def _schema_json(feature_names: Sequence[str]) -> str:
+    # the Spark writer(RedisOutputUtils.packedSchema) produces the same ASCII JSON, so both get the same versions
+    return json.dumps(list(feature_names), separators=(",", ":"), ensure_ascii=True)
+
+
+def pack_row(values: Sequence[Optional[bytes]], version: int) -> bytes:
+    """Pack the raw values of all the columns of a schema into one blob.
+
+    The layout is the header byte, the schema version(uint32), the number of columns(uint32), the end offset of each
+    column in the values(uint32), and the concatenated values. All the integers are little endian. A missing value is
+    an empty column.
+
+    Args:
+        values: the raw(encoded) value of each column of the schema, in column order. None if missing.
+        version: the version of the schema, see `schema_version`
+    """
+    values = [value or b"" for value in values]
+    ends = np.cumsum([len(value) for value in values], dtype=np.uint32) if values else np.zeros(0, dtype=np.uint32)
+    return _PACKED_PREFIX.pack(PACKED_HEADER, version, len(values)) + ends.astype("<u4").tobytes() + b"".join(values)
+
+
+def unpack_row(blob: bytes) -> Tuple[int, List[Optional[bytes]]]:
+    """Unpack a blob written by `pack_row`.
+
+    Return:
+        (schema version, raw value of each column, None if missing)
+    """
+    header, version, count = _PACKED_PREFIX.unpack_from(blob)
+    if header != PACKED_HEADER:
+        raise RuntimeError(f"The online value is not a packed row, its header is {header}.")
+    start = _PACKED_PREFIX.size + 4 * count
+    ends = np.frombuffer(blob, dtype="<u4", count=count, offset=_PACKED_PREFIX.size).tolist()
+    values = []
+    previous = 0
+    for end in ends:
+        values.append(blob[start + previous:start + end] if end > previous else None)
+        previous = end
+    return version, values
+
+
+class PackedSchemas(object):
+    """Cache of the schemas of the packed feature tables, used by the online clients.
+
+    A table is known to be packed once its schemas are loaded from `SCHEMA_TABLE`. They are reloaded every
+    `refresh_seconds`, and as soon as a row with an unknown schema version is read.
+
+    Attributes:
+        refresh_seconds: seconds after which the schemas of a table are loaded again
+    """
+    def __init__(self, refresh_seconds: float = DEFAULT_SCHEMA_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        # table -> (load time, {version: column index of each feature name})
+        self._schemas: Dict[str, Tuple[float, Dict[int, Dict[str, int]]]] = {}
+
+    def stale_tables(self, feature_tables: Sequence[str]) -> List[str]:
+        """Get the tables whose schemas must be loaded before reading them."""
+        now = time.monotonic()
+        with self._lock:
+            return [table for table in dict.fromkeys(feature_tables)
+                    if table not in self._schemas or now - self._schemas[table][0] > self.refresh_seconds]
+
+    def update(self, feature_table: str, schemas: Dict[str, bytes]):
+        """Set the schemas of a table, as stored in `SCHEMA_TABLE`. Empty for a table that is not packed."""
+        columns = {}
+        for version, feature_names in schemas.items():
+            if isinstance(feature_names, bytes):
+                feature_names = feature_names.decode()
+            columns[int(version)] = {name: index for index, name in enumerate(json.loads(feature_names))}
+        with self._lock:
+            self._schemas[feature_table] = (time.monotonic(), columns)
+
+    def invalidate(self, feature_table: str):
+        with self._lock:
+            self._schemas.pop(feature_table, None)
+
+    def is_packed(self, feature_table: str) -> bool:
+        with self._lock:
+            return bool(self._schemas.get(feature_table, (0, None))[1])
+
+    def has_version(self, feature_table: str, version: int) -> bool:
+        with self._lock:
+            return version in self._schemas.get(feature_table, (0, {}))[1]
+
+    def select(self, feature_table: str, blob: Optional[bytes], feature_names: List[str]) -> List[Optional[bytes]]:
+        """Get the raw values of some features from a packed row. Features that are not in its schema are None."""
+        if not blob:
+            return [None] * len(feature_names)
+        version, values = unpack_row(blob)
+        with self._lock:
+            columns = self._schemas.get(feature_table, (0, {}))[1].get(version)
+        if columns is None:
+            raise RuntimeError(f"Unknown schema version {version} of packed feature table {feature_table}.")
+        return [values[columns[name]] if name in columns else None for name in feature_names]
+
+    def select_all(self, feature_table: str, blob: Optional[bytes]) -> Dict[str, bytes]:
+        """Get the raw values of all the features of a packed row, by feature name. Missing values are left out."""
+        if not blob:
+            return {}
+        version, _ = unpack_row(blob)
+        with self._lock:
+            columns = self._schemas.get(feature_table, (0, {}))[1].get(version, {})
+        feature_names = list(columns)
+        return {name: value for name, value in zip(feature_names, self.select(feature_table, blob, feature_names))
+                if value is not None}
+
+
+def unknown_versions(blobs: Sequence[Optional[bytes]], feature_table: str, schemas: PackedSchemas) -> bool:
+    """Whether some of the packed rows of a table use a schema version that is not loaded yet."""
+    return any(blob and not schemas.has_version(feature_table, _PACKED_PREFIX.unpack_from(blob)[1])
+               for blob in blobs)
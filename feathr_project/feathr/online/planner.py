@@ -0,0 +1,367 @@
+import itertools
+import math
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from loguru import logger
+
+from feathr.constants import REDIS_KEY_SEPARATOR
+from feathr.definition.dtype import FeatureType, ValueType
+from feathr.online.codec import RAW_CODEC, ZSTD_CODEC, train_dictionary
+from feathr.online.decoder import _DENSE, _SCALAR, _layout_of
+from feathr.online.encoder import encode_feature_column, encode_feature_value
+from feathr.online.online_store import PACKED_ROW_FIELD, OnlineStore
+from feathr.online.packed import PACKED_LAYOUT
+
+# Redis defaults of `hash-max-listpack-entries` and `hash-max-listpack-value`: smaller hashes are stored as one
+# compact listpack, larger ones as a hash table with an allocation per field and per value.
+HASH_MAX_LISTPACK_ENTRIES = 128
+HASH_MAX_LISTPACK_VALUE = 64
+
+# Size of the Redis structures(64 bit builds), as counted by MEMORY USAGE
+_DICT_ENTRY = 24
+_REDIS_OBJECT = 16
+_DICT = 56
+_POINTER = 8
+# strings up to this length are stored in the same allocation as their Redis object(embstr)
+_EMBSTR_MAX_LENGTH = 44
+# listpack header(total bytes and number of entries) and end byte
+_LISTPACK_OVERHEAD = 7
+# packed row prefix, see `feathr.online.packed.pack_row`, and end offset of each column
+_PACKED_PREFIX_SIZE = 9
+_PACKED_OFFSET_SIZE = 4
+
+# Compressed size / serialized size assumed for the zstd codec when there is no sample to compress, and the size of
+# the zstd frame header
+_ASSUMED_ZSTD_RATIO = 0.6
+_ZSTD_FRAME_HEADER = 6
+
+# values of the synthetic features, when there is no sample. Ints take 3 bytes as varints.
+_SYNTHETIC_SCALARS = {
+    ValueType.BOOL: True,
+    ValueType.INT32: 1000000,
+    ValueType.INT64: 1000000,
+    ValueType.FLOAT: 0.5,
+    ValueType.DOUBLE: 0.5,
+}
+
+
+class MemoryEstimate(object):
+    """Predicted Redis memory footprint of an online feature table, see `estimate_online_memory`.
+
+    Attributes:
+        table_name: the name of the feature table
+        layout: `hash` or `packed`, see `RedisSink`
+        value_codec: the codec of the values, see `RedisSink`
+        encoding: how Redis stores most entities: `listpack`(small hashes), `hashtable` or `string`(packed rows)
+        num_entities: number of entities of the table, i.e. its key cardinality
+        value_bytes: mean bytes of the stored value of each feature, when it's present
+        entity_bytes: mean bytes taken by an entity, including its key and the Redis overhead
+        total_bytes: bytes taken by the whole table
+        calibration: factor applied to the modeled size of the entities, measured on existing tables
+    """
+    def __init__(self, table_name: str, layout: str, value_codec: str, encoding: str, num_entities: int,
+                 value_bytes: Dict[str, float], entity_bytes: float, calibration: float = 1.0):
+        self.table_name = table_name
+        self.layout = layout
+        self.value_codec = value_codec
+        self.encoding = encoding
+        self.num_entities = num_entities
+        self.value_bytes = value_bytes
+        self.entity_bytes = entity_bytes
+        self.calibration = calibration
+        # the buckets of the keyspace are allocated by powers of two
+        self.total_bytes = int(num_entities * entity_bytes) + _POINTER * _next_power_of_two(num_entities)
+
+    def __repr__(self):
+        return (f"MemoryEstimate(table_name={self.table_name!r}, num_entities={self.num_entities}, "
+                f"entity_bytes={self.entity_bytes:.1f}, total={_format_bytes(self.total_bytes)}, "
+                f"encoding={self.encoding!r}, value_codec={self.value_codec!r})")
+
+
+def estimate_online_memory(settings, feature_types: Dict[str, FeatureType],
+                           num_rows: Optional[int] = None, sample=None,
+                           key_column: Union[str, List[str], None] = None, num_entities: Optional[int] = None,
+                           avg_key_length: int = 16, array_length: int = 16, string_length: int = 16,
+                           calibration: float = 1.0) -> List[MemoryEstimate]:
+    """Predicts the Redis memory taken by the online feature tables of a materialization, before running it, e.g. to
+    size the cluster or to compare the value codecs, quantizations and layouts of `RedisSink`.
+
+    The size of each entity is modeled from the Redis encodings: the key, the listpack or hash table of the fields
+    and their values, or the packed row, with the allocator size classes. With a sample of the materialized data, the
+    values of the sample are encoded(and compressed for zstd) like the materialization job does. Otherwise a value of
+    each feature is made up from its FeatureType, `array_length` and `string_length`, and zstd is assumed to compress
+    the values to 60% of their size. `calibrate_memory_model` measures the error of the model on existing tables.
+
+    Args:
+        settings: the `MaterializationSettings`. An estimate is made for each of its `RedisSink`s.
+        feature_types: mapping from feature name to FeatureType, for the features that are not in the sample
+        num_rows: estimated number of rows materialized per backfill step. Defaults to the number of rows of the
+            sample.
+        sample: optional pandas DataFrame or pyarrow Table of materialized rows, with the key columns and some or all
+            the features
+        key_column: the key column of the sample, or a list of columns for a compound key
+        num_entities: the number of distinct keys, if known. Otherwise it's `num_rows` scaled by the ratio of
+            distinct keys in the sample, which assumes a uniform sample.
+        avg_key_length: mean length of the keys, when there is no sample of them
+        array_length: number of values of the array features, when there is no sample of them
+        string_length: length of the string features, when there is no sample of them
+        calibration: factor applied to the modeled size of the entities, see `calibrate_memory_model`
+
+    Return:
+        The estimate of each Redis sink of the settings.
+    """
+    # the sinks depend on the codecs of this package, so they are imported here
+    from feathr.definition.sink import RedisSink
+    sinks = [sink for sink in settings.sinks if isinstance(sink, RedisSink)]
+    if not sinks:
+        raise RuntimeError(f"Materialization {settings.name} has no RedisSink to estimate the memory of.")
+    if sample is not None and not isinstance(sample, pa.Table):
+        sample = pa.Table.from_pandas(sample, preserve_index=False)
+    key_columns = [] if key_column is None else [key_column] if isinstance(key_column, str) else list(key_column)
+    sampled_features = [name for name in settings.feature_names
+                        if sample is not None and name in sample.column_names]
+    for name in settings.feature_names:
+        if name not in sampled_features and name not in feature_types:
+            raise RuntimeError(f"The type of feature {name} is unknown. Pass its FeatureType, or a sample with it.")
+    if sample is not None:
+        missing_columns = [column for column in key_columns if column not in sample.column_names]
+        if missing_columns:
+            raise RuntimeError(f"Key columns {missing_columns} are missing from the sample.")
+    if num_entities is None and num_rows is None and sample is None:
+        raise RuntimeError("Either num_rows, num_entities or a sample is required to estimate the memory.")
+
+    keys = _sample_keys(sample, key_columns) if sample is not None and key_columns else None
+    estimates = []
+    for sink in sinks:
+        # the quantized arrays are stored as they are, without the codec
+        compressed = _zstd_lengths(sample, [name for name in sampled_features if name not in sink.quantization],
+                                   feature_types) if sink.value_codec == ZSTD_CODEC else {}
+        lengths = {name: compressed[name] if name in compressed else
+                   _sampled_lengths(sample.column(name), feature_types.get(name), sink.value_codec,
+                                    sink.quantization.get(name))
+                   for name in sampled_features}
+        synthetic = {name: _synthetic_length(feature_types[name], sink.value_codec, sink.quantization.get(name),
+                                             array_length, string_length)
+                     for name in settings.feature_names if name not in lengths}
+        rows = sample.num_rows if sample is not None else 1
+        key_length = len(sink.table_name) + len(REDIS_KEY_SEPARATOR)
+        sizes = []
+        encodings = Counter()
+        written_keys = set()
+        for row in range(rows):
+            values = [(name, lengths[name][row] if name in lengths else synthetic[name])
+                      for name in settings.feature_names]
+            if all(length is None for _, length in values):
+                # the entities without any feature are not written
+                continue
+            redis_key_length = key_length + (len(keys[row].encode()) if keys is not None else avg_key_length)
+            if sink.layout == PACKED_LAYOUT:
+                size, encoding = _packed_entity_bytes(redis_key_length, [length for _, length in values])
+            else:
+                size, encoding = _hash_entity_bytes(redis_key_length, [(len(name.encode()), length)
+                                                                      for name, length in values
+                                                                      if length is not None])
+            sizes.append(size)
+            encodings[encoding] += 1
+            if keys is not None:
+                written_keys.add(keys[row])
+        if num_entities is not None:
+            entities = num_entities
+        else:
+            total_rows = num_rows if num_rows is not None else sample.num_rows
+            # the ratio of the sampled rows that are written, to distinct entities
+            written = len(written_keys) if keys is not None else len(sizes)
+            entities = round(total_rows * written / rows) if rows else 0
+        value_bytes = {}
+        for name in settings.feature_names:
+            present = [length for length in lengths[name] if length is not None] if name in lengths \
+                else [synthetic[name]]
+            value_bytes[name] = sum(present) / len(present) if present else 0.0
+        entity_bytes = calibration * sum(sizes) / len(sizes) if sizes else 0.0
+        estimates.append(MemoryEstimate(sink.table_name, sink.layout, sink.value_codec,
+                                        encodings.most_common(1)[0][0] if encodings else "listpack", entities,
+                                        value_bytes, entity_bytes, calibration))
+    return estimates
+
+
+def calibrate_memory_model(online_store: OnlineStore, feature_tables: List[str],
+                           sample_size: int = 100) -> Optional[float]:
+    """Measures the error of the memory model of `estimate_online_memory` on existing online feature tables: the
+    MEMORY USAGE reported by Redis for a sample of the entities of each table, divided by the modeled size of the same
+    entities. Pass it as the `calibration` of the estimates, so that they account for the Redis version and config.
+
+    Args:
+        online_store: the store of the tables. The store must be able to measure its memory, like Redis.
+        feature_tables: the tables to sample, e.g. the tables of a previous run of the materialization
+        sample_size: number of entities measured per table
+
+    Return:
+        The calibration factor, or None if the tables are empty or the store can't measure them.
+    """
+    key_separator = getattr(online_store, "key_separator", REDIS_KEY_SEPARATOR)
+    measured = 0
+    modeled = 0
+    for feature_table in feature_tables:
+        entities = list(itertools.islice(online_store.scan(feature_table, batch_size=sample_size), sample_size))
+        if not entities:
+            continue
+        usages = online_store.memory_usage(feature_table, [key for key, _ in entities])
+        for (key, values), usage in zip(entities, usages):
+            if usage is None or not values:
+                continue
+            redis_key_length = len((feature_table + key_separator + key).encode())
+            if set(values) == {PACKED_ROW_FIELD}:
+                size, _ = _string_entity_bytes(redis_key_length, len(values[PACKED_ROW_FIELD]))
+            else:
+                size, _ = _hash_entity_bytes(redis_key_length, [(len(name.encode()), len(value))
+                                                                for name, value in values.items()])
+            measured += usage
+            modeled += size
+    if not modeled:
+        return None
+    logger.info("Calibrated the online memory model on {}: the tables take {:.2f}x the modeled memory.",
+                feature_tables, measured / modeled)
+    return measured / modeled
+
+
+def _sample_keys(sample: pa.Table, key_columns: List[str]) -> List[str]:
+    key_values = [sample.column(column).to_pylist() for column in key_columns]
+    return ["#".join(str(value) for value in values) for values in zip(*key_values)]
+
+
+def _sampled_lengths(column, feature_type: Optional[FeatureType], value_codec: str,
+                     quantization: Optional[str]) -> List[Optional[int]]:
+    """Get the stored length of each value of a sampled feature, None if it's missing."""
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    if quantization is not None and pa.types.is_list(column.type):
+        return [None if count is None else _quantized_length(count, quantization)
+                for count in pc.list_value_length(column).to_pylist()]
+    return [None if serialized is None else _encoded_length(len(serialized), value_codec)
+            for serialized in encode_feature_column(column, feature_type)]
+
+
+def _zstd_lengths(sample: pa.Table, feature_names: List[str],
+                  feature_types: Dict[str, FeatureType]) -> Dict[str, List[Optional[int]]]:
+    """Compress the sampled values with a dictionary trained on them, like the materialization job does."""
+    if not feature_names:
+        return {}
+    serialized = {name: encode_feature_column(sample.column(name), feature_types.get(name)) for name in feature_names}
+    try:
+        import zstandard
+    except ImportError:
+        return {name: [None if value is None else _encoded_length(len(value), ZSTD_CODEC) for value in values]
+                for name, values in serialized.items()}
+    samples = [value for values in serialized.values() for value in values if value]
+    try:
+        dictionary = zstandard.ZstdCompressionDict(train_dictionary(samples))
+    except RuntimeError:
+        # too few or too small values to train a dictionary
+        dictionary = None
+    compressor = zstandard.ZstdCompressor(dict_data=dictionary)
+    return {name: [None if value is None else 1 + len(compressor.compress(value)) for value in values]
+            for name, values in serialized.items()}
+
+
+def _synthetic_length(feature_type: FeatureType, value_codec: str, quantization: Optional[str], array_length: int,
+                      string_length: int) -> int:
+    """Get the stored length of a value made up from the type of a feature."""
+    layout = _layout_of(feature_type)
+    if quantization is not None and layout == _DENSE:
+        return _quantized_length(array_length, quantization)
+    value = _synthetic_value(feature_type.val_type, string_length)
+    if layout == _DENSE:
+        value = [value] * array_length
+    elif layout != _SCALAR:
+        value = (list(range(array_length)), [value] * array_length)
+    serialized = encode_feature_value(value, feature_type).SerializeToString()
+    return _encoded_length(len(serialized), value_codec)
+
+
+def _synthetic_value(value_type: ValueType, string_length: int) -> Any:
+    if value_type == ValueType.STRING:
+        return "x" * string_length
+    if value_type == ValueType.BYTES:
+        return b"x" * string_length
+    if value_type not in _SYNTHETIC_SCALARS:
+        raise RuntimeError(f"Can't estimate the size of features of value type {value_type}.")
+    return _SYNTHETIC_SCALARS[value_type]
+
+
+def _encoded_length(serialized_length: int, value_codec: str) -> int:
+    """Get the length of a serialized FeatureValue encoded with a codec, see `feathr.online.codec.ValueEncoder`."""
+    if value_codec == RAW_CODEC:
+        return 1 + serialized_length
+    if value_codec == ZSTD_CODEC:
+        return 1 + _ZSTD_FRAME_HEADER + math.ceil(serialized_length * _ASSUMED_ZSTD_RATIO)
+    return 4 * math.ceil(serialized_length / 3)
+
+
+def _quantized_length(count: int, quantization: str) -> int:
+    """Get the length of a quantized array of `count` values, see `feathr.online.codec.quantize`."""
+    return 2 + 2 * count if quantization == "float16" else 6 + count
+
+
+def _hash_entity_bytes(redis_key_length: int, fields: Sequence[Tuple[int, int]]) -> Tuple[int, str]:
+    """Get the bytes MEMORY USAGE reports for an entity stored as a hash, from the length of its key and of the name
+    and value of each field."""
+    key_bytes = _DICT_ENTRY + _sds_size(redis_key_length)
+    if len(fields) <= HASH_MAX_LISTPACK_ENTRIES and all(name <= HASH_MAX_LISTPACK_VALUE and
+                                                       value <= HASH_MAX_LISTPACK_VALUE for name, value in fields):
+        listpack = _LISTPACK_OVERHEAD + sum(_listpack_entry_size(name) + _listpack_entry_size(value)
+                                            for name, value in fields)
+        return key_bytes + _REDIS_OBJECT + _allocation_size(listpack), "listpack"
+    table = _DICT + _POINTER * _next_power_of_two(len(fields)) + \
+        sum(_DICT_ENTRY + _sds_size(name) + _sds_size(value) for name, value in fields)
+    return key_bytes + _REDIS_OBJECT + table, "hashtable"
+
+
+def _packed_entity_bytes(redis_key_length: int, lengths: Sequence[Optional[int]]) -> Tuple[int, str]:
+    """Get the bytes of an entity stored as a packed row, from the stored length of each of its columns."""
+    row = _PACKED_PREFIX_SIZE + _PACKED_OFFSET_SIZE * len(lengths) + sum(length or 0 for length in lengths)
+    return _string_entity_bytes(redis_key_length, row)
+
+
+def _string_entity_bytes(redis_key_length: int, length: int) -> Tuple[int, str]:
+    key_bytes = _DICT_ENTRY + _sds_size(redis_key_length)
+    if length <= _EMBSTR_MAX_LENGTH:
+        return key_bytes + _allocation_size(_REDIS_OBJECT + 3 + length + 1), "string"
+    return key_bytes + _REDIS_OBJECT + _sds_size(length), "string"
+
+
+def _listpack_entry_size(length: int) -> int:
+    """Bytes of a string entry of a listpack: encoding, data and back length."""
+    data = (1 if length < 64 else 2 if length < 4096 else 5) + length
+    return data + (1 if data < 128 else 2 if data < 16384 else 3)
+
+
+def _sds_size(length: int) -> int:
+    """Allocated bytes of a Redis string(sds) of `length` bytes: header, data and terminating null."""
+    header = 1 if length < 32 else 3 if length < 256 else 5 if length < 65536 else 9
+    return _allocation_size(header + length + 1)
+
+
+def _allocation_size(size: int) -> int:
+    """Round a size up to the jemalloc size class it's allocated from: multiples of 16 up to 128 bytes, then 4 size
+    classes per power of two."""
+    if size <= 8:
+        return 8
+    if size <= 128:
+        return (size + 15) // 16 * 16
+    step = 1 << ((size - 1).bit_length() - 3)
+    return (size + step - 1) // step * step
+
+
+def _next_power_of_two(count: int) -> int:
+    return 1 << max(count - 1, 0).bit_length() if count > 0 else 0
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
@@ -0,0 +1,145 @@
+from typing import Any, Generator, Iterable, List, Optional, Tuple
+
+from feathr.online.codec import DICTIONARY_FIELD, DICTIONARY_TABLE, missing_dictionary_ids, register_dictionary
+from feathr.online.online_store import FeatureRequest, OnlineStore
+from feathr.online.packed import SCHEMA_TABLE, PackedSchemas, unknown_versions
+from feathr.online.versions import ALIAS_TABLE, TableAliases
+
+# A read of the online store: the name of an `OnlineStore` read method(`batch_get`, `batch_get_all` or
+# `batch_get_rows`) and its arguments
+StoreRead = Tuple[str, tuple]
+# A read plan yields lists of reads, which can be sent together, and is sent back the result of each read. It returns
+# its result once it needs no more reads, see `OnlineReader`.
+ReadPlan = Generator[List[StoreRead], List[Any], Any]
+
+
+class OnlineReader(object):
+    """Reads the raw(encoded) values of online features from an online store. It resolves the aliases of the
+    versioned tables, reads the packed tables one packed row per entity, and loads the zstd dictionaries the values
+    were compressed with. The aliases and packed-row schemas are cached, and loaded again a while after.
+
+    It's the read path of `FeathrClient`, and of the per-process readers of `OnlineLookupHandle`. Each method can read
+    from another `online_store` than the default one, e.g. a replica, metadata included.
+
+    The logic of each read is a read plan(the `plan_*` methods), which yields the reads of the online store it needs
+    and doesn't do any I/O itself. The other methods run the plans on an `OnlineStore`, and
+    `AsyncFeathrOnlineClient` runs the same plans on a `redis.asyncio` client.
+
+    Attributes:
+        online_store: the store read by default. None for a reader whose plans are only run by another client.
+        packed_schemas: schemas of the feature tables with the packed-row layout, see `RedisSink(layout="packed")`
+        table_aliases: aliases of the versioned feature tables, see `RedisSink(versioned=True)`
+    """
+    def __init__(self, online_store: Optional[OnlineStore], packed_schemas: Optional[PackedSchemas] = None,
+                 table_aliases: Optional[TableAliases] = None):
+        self.online_store = online_store
+        self.packed_schemas = packed_schemas if packed_schemas is not None else PackedSchemas()
+        self.table_aliases = table_aliases if table_aliases is not None else TableAliases()
+
+    def fetch(self, requests: List[FeatureRequest],
+              online_store: Optional[OnlineStore] = None) -> List[List[Optional[bytes]]]:
+        """Fetches the raw values of each (feature_table, key, feature_names) request, ordered by its feature names.
+        The versioned tables are read from the physical table of their current version."""
+        return self.run(self.plan_fetch(requests), online_store)
+
+    def resolve(self, requests: List[FeatureRequest], online_store: Optional[OnlineStore] = None,
+                load: bool = True) -> List[FeatureRequest]:
+        """Replaces the versioned tables of the requests by the physical table of their current version. The stale
+        aliases are loaded first, unless `load` is False: the cached aliases are then used as they are."""
+        if load:
+            self.load_table_aliases([feature_table for feature_table, _, _ in requests], online_store)
+        return self.resolve_loaded(requests)
+
+    def read(self, requests: List[FeatureRequest],
+             online_store: Optional[OnlineStore] = None) -> List[List[Optional[bytes]]]:
+        """Fetches the raw values of each request on a physical table, see `resolve`. The features of packed tables
+        are fetched as one packed row per entity."""
+        return self.run(self.plan_read(requests), online_store)
+
+    def load_table_aliases(self, feature_tables: List[str], online_store: Optional[OnlineStore] = None):
+        """Loads the aliases of the tables that are not loaded, or were loaded a while ago."""
+        self.run(self.plan_load_table_aliases(feature_tables), online_store)
+
+    def load_packed_schemas(self, feature_tables: List[str], online_store: Optional[OnlineStore] = None):
+        """Loads the packed-row schemas of the tables that are not loaded, or were loaded a while ago."""
+        self.run(self.plan_load_packed_schemas(feature_tables), online_store)
+
+    def load_codec_dictionaries(self, rows: Iterable[Iterable[Optional[bytes]]],
+                                online_store: Optional[OnlineStore] = None):
+        """Loads the zstd dictionaries used by the fetched values that are not loaded yet, see `feathr.online.codec`."""
+        self.run(self.plan_load_codec_dictionaries(rows), online_store)
+
+    def run(self, plan: ReadPlan, online_store: Optional[OnlineStore] = None) -> Any:
+        """Runs a read plan on an online store, the default one if `online_store` is None, and returns its result."""
+        online_store = online_store or self.online_store
+        try:
+            reads = next(plan)
+            while True:
+                reads = plan.send([getattr(online_store, method)(*args) for method, args in reads])
+        except StopIteration as e:
+            return e.value
+
+    def resolve_loaded(self, requests: List[FeatureRequest]) -> List[FeatureRequest]:
+        """Replaces the versioned tables of the requests by the physical table of their cached current version."""
+        return [(self.table_aliases.resolve(feature_table), key, feature_names)
+                for feature_table, key, feature_names in requests]
+
+    def plan_fetch(self, requests: List[FeatureRequest]) -> ReadPlan:
+        """Plan of `fetch`."""
+        yield from self.plan_load_table_aliases([feature_table for feature_table, _, _ in requests])
+        return (yield from self.plan_read(self.resolve_loaded(requests)))
+
+    def plan_read(self, requests: List[FeatureRequest]) -> ReadPlan:
+        """Plan of `read`. The hash and packed rows are read together."""
+        yield from self.plan_load_packed_schemas([feature_table for feature_table, _, _ in requests])
+        packed_requests = {}
+        hash_indices = []
+        for index, (feature_table, _, _) in enumerate(requests):
+            if self.packed_schemas.is_packed(feature_table):
+                packed_requests.setdefault(feature_table, []).append(index)
+            else:
+                hash_indices.append(index)
+        reads = [("batch_get_rows", (feature_table, [requests[i][1] for i in indices]))
+                 for feature_table, indices in packed_requests.items()]
+        if hash_indices:
+            reads.append(("batch_get", ([requests[i] for i in hash_indices],)))
+        results = (yield reads) if requests else []
+        rows: List[Optional[List[Optional[bytes]]]] = [None] * len(requests)
+        if hash_indices:
+            for index, row in zip(hash_indices, results[-1]):
+                rows[index] = row
+        for (feature_table, indices), blobs in zip(packed_requests.items(), results):
+            if unknown_versions(blobs, feature_table, self.packed_schemas):
+                # the table was materialized again with new columns since its schemas were loaded
+                self.packed_schemas.invalidate(feature_table)
+                yield from self.plan_load_packed_schemas([feature_table])
+            for index, blob in zip(indices, blobs):
+                rows[index] = self.packed_schemas.select(feature_table, blob, requests[index][2])
+        yield from self.plan_load_codec_dictionaries(rows)
+        return rows
+
+    def plan_load_table_aliases(self, feature_tables: List[str]) -> ReadPlan:
+        """Plan of `load_table_aliases`."""
+        stale_tables = self.table_aliases.stale_aliases(feature_tables)
+        if stale_tables:
+            (entries,) = yield [("batch_get_all", (ALIAS_TABLE, stale_tables))]
+            for feature_table, entry in zip(stale_tables, entries):
+                self.table_aliases.update(feature_table, entry)
+
+    def plan_load_packed_schemas(self, feature_tables: List[str]) -> ReadPlan:
+        """Plan of `load_packed_schemas`."""
+        stale_tables = self.packed_schemas.stale_tables(feature_tables)
+        if stale_tables:
+            (entries,) = yield [("batch_get_all", (SCHEMA_TABLE, stale_tables))]
+            for feature_table, schemas in zip(stale_tables, entries):
+                self.packed_schemas.update(feature_table, schemas)
+
+    def plan_load_codec_dictionaries(self, rows: Iterable[Iterable[Optional[bytes]]]) -> ReadPlan:
+        """Plan of `load_codec_dictionaries`."""
+        dict_ids = missing_dictionary_ids(rows)
+        if dict_ids:
+            (dictionaries,) = yield [("batch_get", ([(DICTIONARY_TABLE, str(dict_id), [DICTIONARY_FIELD])
+                                                     for dict_id in dict_ids],))]
+            for (dictionary,) in dictionaries:
+                if dictionary:
+                    register_dictionary(dictionary)
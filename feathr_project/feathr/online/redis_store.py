@@ -0,0 +1,213 @@
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import redis
+
+from feathr.constants import REDIS_KEY_SEPARATOR
+from feathr.online._cluster import _cluster_hmget_many
+from feathr.online._rate_limit import _TokenBucket
+from feathr.online.online_store import PACKED_ROW_FIELD, FeatureRequest, OnlineStore
+
+# Merges (field, operation, value) triples into the partial aggregates of a hash, see `batch_accumulate`. ARGV[1] is
+# the TTL in seconds, 0 to keep the current expiration.
+_ACCUMULATE_SCRIPT = """
+for i = 2, #ARGV, 3 do
+    local field, operation, value = ARGV[i], ARGV[i + 1], ARGV[i + 2]
+    if operation == "sum" then
+        redis.call("HINCRBYFLOAT", KEYS[1], field, value)
+    else
+        local current = tonumber(redis.call("HGET", KEYS[1], field))
+        local number = tonumber(value)
+        if current == nil or (operation == "max" and number > current) or (operation == "min" and number < current) then
+            redis.call("HSET", KEYS[1], field, value)
+        end
+    end
+end
+local ttl = tonumber(ARGV[1])
+if ttl > 0 then
+    redis.call("EXPIRE", KEYS[1], ttl)
+end
+"""
+
+
+class RedisOnlineStore(OnlineStore):
+    """Online store backed by Redis, where the materialization jobs write the features.
+
+    Each entity is a Redis hash at key `<feature_table><key_separator><key>`, with one field per feature, or a string
+    holding its packed row for the tables with the packed-row layout. Batches of requests are sent in one pipelined
+    round trip. On a Redis Cluster, the requests are grouped by node and the nodes
+    are queried in parallel.
+
+    Attributes:
+        redis_client: a `redis.Redis` or `redis.cluster.RedisCluster` client
+        key_separator: separator between the feature table and the key in the Redis keys
+    """
+    def __init__(self, redis_client, key_separator: str = REDIS_KEY_SEPARATOR):
+        self.redis_client = redis_client
+        self.key_separator = key_separator
+        self._accumulate_script = None
+
+    def batch_get(self, requests: List[FeatureRequest]) -> List[List[Optional[bytes]]]:
+        if self._is_cluster():
+            return _cluster_hmget_many(self.redis_client,
+                                       [(self._construct_redis_key(feature_table, key), feature_names)
+                                        for feature_table, key, feature_names in requests],
+                                       read_from_replicas=self.redis_client.read_from_replicas)
+        if len(requests) == 1:
+            feature_table, key, feature_names = requests[0]
+            return [self.redis_client.hmget(self._construct_redis_key(feature_table, key), *feature_names)]
+        with self.redis_client.pipeline() as redis_pipeline:
+            for feature_table, key, feature_names in requests:
+                redis_pipeline.hmget(self._construct_redis_key(feature_table, key), *feature_names)
+            return redis_pipeline.execute()
+
+    def batch_get_all(self, feature_table: str, keys: List[str]) -> List[Dict[str, bytes]]:
+        with self.redis_client.pipeline() as redis_pipeline:
+            for key in keys:
+                redis_pipeline.hgetall(self._construct_redis_key(feature_table, key))
+            results = redis_pipeline.execute(raise_on_error=False)
+        # the entities of packed tables are strings, which HGETALL rejects
+        packed = [index for index, values in enumerate(results) if isinstance(values, redis.ResponseError)]
+        if packed:
+            rows = self.batch_get_rows(feature_table, [keys[index] for index in packed])
+            for index, row in zip(packed, rows):
+                results[index] = {PACKED_ROW_FIELD: row} if row is not None else {}
+        return [self._decode_field_names(values) for values in results]
+
+    def batch_get_rows(self, feature_table: str, keys: List[str]) -> List[Optional[bytes]]:
+        with self.redis_client.pipeline() as redis_pipeline:
+            for key in keys:
+                redis_pipeline.get(self._construct_redis_key(feature_table, key))
+            return redis_pipeline.execute()
+
+    def batch_put_rows(self, feature_table: str, rows: Dict[str, bytes]):
+        with self.redis_client.pipeline() as redis_pipeline:
+            for key, row in rows.items():
+                redis_pipeline.set(self._construct_redis_key(feature_table, key), row)
+            redis_pipeline.execute()
+
+    def batch_put(self, feature_table: str, rows: Dict[str, Dict[str, bytes]], ttl_seconds: Optional[int] = None):
+        with self.redis_client.pipeline() as redis_pipeline:
+            for key, values in rows.items():
+                if values:
+                    redis_key = self._construct_redis_key(feature_table, key)
+                    redis_pipeline.hset(redis_key, mapping=values)
+                    if ttl_seconds is not None:
+                        redis_pipeline.expire(redis_key, int(ttl_seconds))
+            redis_pipeline.execute()
+
+    def batch_accumulate(self, feature_table: str, updates: Dict[str, Dict[str, Tuple[str, float]]],
+                         ttl_seconds: Optional[int] = None):
+        if self._accumulate_script is None:
+            self._accumulate_script = self.redis_client.register_script(_ACCUMULATE_SCRIPT)
+        with self.redis_client.pipeline(transaction=False) as redis_pipeline:
+            # one script call per entity, so that the entities of a cluster can be on different nodes
+            for key, fields in updates.items():
+                args = [int(ttl_seconds or 0)]
+                for field, (operation, value) in fields.items():
+                    args.extend([field, operation, repr(float(value))])
+                self._accumulate_script(keys=[self._construct_redis_key(feature_table, key)], args=args,
+                                        client=redis_pipeline)
+            redis_pipeline.execute()
+
+    def update_entity(self, feature_table: str, key: str,
+                      update: Callable[[Dict[str, bytes]], Optional[Dict[str, bytes]]]) -> Dict[str, bytes]:
+        redis_key = self._construct_redis_key(feature_table, key)
+        redis_client = self.redis_client
+        if self._is_cluster():
+            # WATCH needs the connection of the node holding the key
+            redis_client = redis_client.get_redis_connection(redis_client.get_node_from_key(redis_key))
+        with redis_client.pipeline() as redis_pipeline:
+            while True:
+                try:
+                    redis_pipeline.watch(redis_key)
+                    entity = self._decode_field_names(redis_pipeline.hgetall(redis_key))
+                    values = update(entity)
+                    redis_pipeline.multi()
+                    if values:
+                        redis_pipeline.hset(redis_key, mapping=values)
+                    # EXEC fails if the entity changed since WATCH, even when nothing is written
+                    redis_pipeline.execute()
+                    return entity
+                except redis.WatchError:
+                    continue
+
+    def delete_table(self, feature_table: str, max_keys_per_second: Optional[float] = None):
+        # 5000 count at a scan seems reasonable faster for large tables
+        batch_size = 5000
+        rate_limit = None
+        if max_keys_per_second:
+            batch_size = max(1, min(batch_size, int(max_keys_per_second)))
+            rate_limit = _TokenBucket(max_keys_per_second, burst=batch_size)
+        batch = []
+        for redis_key in self.redis_client.scan_iter(match=self._table_pattern(feature_table), count=batch_size):
+            batch.append(redis_key)
+            if len(batch) == batch_size:
+                self._unlink(batch, rate_limit)
+                batch = []
+        if batch:
+            self._unlink(batch, rate_limit)
+
+    def scan(self, feature_table: str, batch_size: int = 1000) -> Iterator[Tuple[str, Dict[str, bytes]]]:
+        for batch in self._scan_batches(feature_table, batch_size):
+            yield from batch
+
+    def scan_shards(self, feature_table: str,
+                    batch_size: int = 1000) -> List[Iterator[List[Tuple[str, Dict[str, bytes]]]]]:
+        if not self._is_cluster():
+            return [self._scan_batches(feature_table, batch_size)]
+        # one SCAN cursor per primary node, each fetching the keys of its node from that node
+        return [RedisOnlineStore(self.redis_client.get_redis_connection(node), self.key_separator)
+                ._scan_batches(feature_table, batch_size) for node in self.redis_client.get_primaries()]
+
+    def memory_usage(self, feature_table: str, keys: List[str]) -> List[Optional[int]]:
+        # SAMPLES 0 measures all the fields of the hashes, rather than extrapolating from the first 5 of them
+        with self.redis_client.pipeline(transaction=False) as redis_pipeline:
+            for key in keys:
+                redis_pipeline.memory_usage(self._construct_redis_key(feature_table, key), samples=0)
+            try:
+                return redis_pipeline.execute()
+            except redis.ResponseError:
+                # e.g. the MEMORY command is disabled, or not supported by a Redis compatible server
+                return [None] * len(keys)
+
+    def close(self):
+        self.redis_client.close()
+
+    def _scan_batches(self, feature_table: str, batch_size: int) -> Iterator[List[Tuple[str, Dict[str, bytes]]]]:
+        """Scans the keys of a table with a SCAN cursor, and fetches the values of each batch of keys in one pipelined
+        round trip. SCAN only walks `batch_size` keys per call, so it doesn't block the other clients."""
+        prefix_length = len(feature_table) + len(self.key_separator)
+        batch = []
+        for redis_key in self.redis_client.scan_iter(match=self._table_pattern(feature_table), count=batch_size):
+            if isinstance(redis_key, bytes):
+                redis_key = redis_key.decode()
+            batch.append(redis_key[prefix_length:])
+            if len(batch) == batch_size:
+                yield list(zip(batch, self.batch_get_all(feature_table, batch)))
+                batch = []
+        if batch:
+            yield list(zip(batch, self.batch_get_all(feature_table, batch)))
+
+    def _construct_redis_key(self, feature_table: str, key: str) -> str:
+        return feature_table + self.key_separator + key
+
+    def _table_pattern(self, feature_table: str) -> str:
+        # escape the glob characters of the table name, so that only the keys of this table match
+        escaped = "".join("\\" + c if c in "*?[]\\" else c for c in feature_table + self.key_separator)
+        return escaped + "*"
+
+    def _unlink(self, redis_keys: List, rate_limit: Optional[_TokenBucket] = None):
+        if rate_limit is not None:
+            rate_limit.acquire(len(redis_keys))
+        with self.redis_client.pipeline() as redis_pipeline:
+            # keys of a cluster can be on different nodes, so unlink them one by one in the pipeline
+            for redis_key in redis_keys:
+                redis_pipeline.unlink(redis_key)
+            redis_pipeline.execute()
+
+    def _is_cluster(self) -> bool:
+        return isinstance(self.redis_client, redis.cluster.RedisCluster)
+
+    @staticmethod
+    def _decode_field_names(values: Dict) -> Dict[str, bytes]:
+        return {name.decode() if isinstance(name, bytes) else name: value for name, value in values.items()}
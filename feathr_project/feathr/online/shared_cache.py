@@ -0,0 +1,379 @@
+import base64
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from feathr.online.codec import RAW_HEADER, ZSTD_HEADER, decode_value, is_quantized
+
+# File header: magic, layout version, number of slots, slots per bucket, max key bytes, max value bytes
+_HEADER = struct.Struct("<8sIIIII")
+_MAGIC = b"FTHRCACH"
+_LAYOUT_VERSION = 2
+# Slot header: sequence number, hash of the cache key, expiration(unix seconds), key length, value length, flags,
+# index of the generation of its feature table, generation of the cache and of the table when it was written.
+# The sequence number is odd while the slot is being written, see `SharedOnlineFeatureCache`.
+_SLOT = struct.Struct("<IQdHHBHQ")
+_SEQUENCE = struct.Struct("<I")
+# The header is followed by one lock byte per stripe, locked with fcntl. Byte 0 locks the header itself.
+_NUM_STRIPES = 64
+# generation of the whole cache, then the generations of the feature tables: a table's generation is at the index of
+# the hash of its name, so the tables sharing an index are invalidated together
+_GENERATION = struct.Struct("<I")
+_GLOBAL_GENERATION_OFFSET = 128
+_NUM_TABLE_GENERATIONS = 256
+_TABLE_GENERATIONS_OFFSET = 256
+# number of entries of the buckets of each stripe, updated with the stripe locked
+_COUNT = struct.Struct("<q")
+_COUNTS_OFFSET = _TABLE_GENERATIONS_OFFSET + _NUM_TABLE_GENERATIONS * _GENERATION.size
+_SLOTS_OFFSET = 4096
+
+# flags of a slot
+_EMPTY = 0
+_VALUE = 1
+# the feature or the key doesn't exist in the online store
+_MISSING = 2
+
+# feature name of the entry caching that a key doesn't exist at all, for all its features
+_ALL_FEATURES = ""
+
+# times a read retries a slot that is being written before treating it as a miss
+_READ_RETRIES = 3
+
+
+class SharedOnlineFeatureCache(object):
+    """Online feature cache shared by all the processes of a host, e.g. the pre-forked workers of a model server, so
+    that each hot entity is cached and warmed up once rather than once per worker. It has the interface of
+    `OnlineFeatureCache`, and also returns values of the online store, so cached and fetched values are decoded the
+    same way.
+
+    The base64 and zstd values are cached decoded, in the raw codec(see `feathr.online.codec`): the float and double
+    scalars and dense arrays are then stored as their fixed-width little-endian values behind a short protobuf
+    header, which `decode_feature_columns` reads with a numpy view, and a hit skips the base64 and zstd decoding. The
+    other types are stored as their serialized protobuf bytes. Raw and quantized values are cached as they are, and so
+    are the values that would not fit in a slot once decoded.
+
+    The cache is a hash table in a memory-mapped file, by default in `/dev/shm`, so it's held in shared memory. It has
+    `max_size` fixed-width slots of `max_key_bytes + max_value_bytes`, grouped in buckets of `ways` slots: a cache key
+    is always stored in the same bucket, and a full bucket evicts its entry closest to expiry. Values larger than
+    `max_value_bytes`, e.g. large embeddings, are not cached. Entries expire `ttl_seconds` after they are loaded.
+
+    Reads take no lock: each slot has a sequence number that writers make odd while they write it, and a read that
+    sees it change retries the slot(a seqlock). Writers lock one of 64 stripes of the buckets, with a `fcntl` lock on
+    the file, so writes to different buckets don't wait for each other. The hit and miss counters are per process.
+
+    `invalidate` doesn't scan the slots: each slot records the generation of the cache and of its feature table when
+    it was written, and invalidating bumps the generation, so the older slots are misses and are reused as free
+    slots. The number of entries is counted per stripe as the slots are written, so `len` doesn't scan them either.
+
+    Processes open the same cache by `name`. The first one creates the file with its settings, and the others use the
+    settings of the file. The file stays until `unlink` is called, so the cache survives the restart of the workers.
+
+    Attributes:
+        name: name of the cache, shared by the processes using it
+        max_size: number of slots, i.e. max number of cached feature values
+        ttl_seconds: seconds a fetched value is cached
+        negative_ttl_seconds: seconds a missing value is cached. 0 to disable negative caching.
+        max_key_bytes: max bytes of a cache key, i.e. of the feature table, the key and the feature name
+        max_value_bytes: max bytes of a cached value
+        ways: number of slots of a bucket
+        path: path of the memory-mapped file. Defaults to `/dev/shm/feathr_online_cache_<name>`.
+    """
+    def __init__(self, name: str, max_size: int = 100000, ttl_seconds: float = 300, negative_ttl_seconds: float = 30,
+                 max_key_bytes: int = 128, max_value_bytes: int = 256, ways: int = 8, path: Optional[str] = None):
+        import fcntl
+        if max_size <= 0:
+            raise RuntimeError("max_size of the online feature cache must be positive.")
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self.path = path or os.path.join(shm_dir, f"feathr_online_cache_{name}")
+        self._fcntl = fcntl
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        # lock byte 0 while the file is initialized, so the processes starting together agree on its settings
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                num_slots = -(-max_size // ways) * ways
+                slot_size = _SLOT.size + max_key_bytes + max_value_bytes
+                os.ftruncate(self._fd, _SLOTS_OFFSET + num_slots * slot_size)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, _LAYOUT_VERSION, num_slots, ways, max_key_bytes,
+                                                 max_value_bytes), 0)
+            magic, version, num_slots, ways, max_key_bytes, max_value_bytes = _HEADER.unpack(
+                os.pread(self._fd, _HEADER.size, 0))
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+        if magic != _MAGIC or version != _LAYOUT_VERSION:
+            os.close(self._fd)
+            raise RuntimeError(f"{self.path} is not a Feathr online feature cache of layout version {_LAYOUT_VERSION}.")
+        self.max_size = num_slots
+        self.ways = ways
+        self.max_key_bytes = max_key_bytes
+        self.max_value_bytes = max_value_bytes
+        self._num_buckets = num_slots // ways
+        self._slot_size = _SLOT.size + max_key_bytes + max_value_bytes
+        self._map = mmap.mmap(self._fd, _SLOTS_OFFSET + num_slots * self._slot_size)
+        # fcntl locks are held by the process, so the threads of a process also take a lock of their own
+        self._thread_locks = [threading.Lock() for _ in range(_NUM_STRIPES)]
+        self._header_lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, feature_table: str, key: str, feature_names: List[str]) -> Tuple[List[Optional[bytes]], List[str]]:
+        """Look up the cached values of the features of an entity, like `OnlineFeatureCache.get`."""
+        values = []
+        uncached = []
+        now = time.time()
+        generation = self._generation(_generation_index(feature_table))
+        missing_key = self._lookup(feature_table, key, _ALL_FEATURES, now, generation) is not None
+        for feature_name in feature_names:
+            entry = None if missing_key else self._lookup(feature_table, key, feature_name, now, generation)
+            if missing_key or entry is not None:
+                # a cached missing value is b""
+                values.append(entry or None)
+            else:
+                values.append(None)
+                uncached.append(feature_name)
+        with self._counters_lock:
+            self.hits += len(feature_names) - len(uncached)
+            self.misses += len(uncached)
+        return values, uncached
+
+    def put(self, feature_table: str, key: str, feature_names: List[str], values: List[Optional[bytes]]):
+        """Cache the raw values of the features of an entity, as returned by the online store."""
+        now = time.time()
+        if any(values):
+            self._remove(feature_table, key, _ALL_FEATURES)
+        for feature_name, value in zip(feature_names, values):
+            self._store(feature_table, key, feature_name, value, now)
+
+    def put_key(self, feature_table: str, key: str, values: Dict[str, bytes]):
+        """Cache all the stored features of an entity, like `OnlineFeatureCache.put_key`."""
+        now = time.time()
+        if values:
+            self._remove(feature_table, key, _ALL_FEATURES)
+        else:
+            self._store(feature_table, key, _ALL_FEATURES, None, now)
+        for feature_name, value in values.items():
+            if isinstance(feature_name, bytes):
+                feature_name = feature_name.decode()
+            self._store(feature_table, key, feature_name, value, now)
+
+    def invalidate(self, feature_table: Optional[str] = None):
+        """Remove the cached values of a feature table, or of all tables if `feature_table` is None, for all the
+        processes, by bumping the generation of the table or of the cache. The tables whose generation shares the
+        index of `feature_table` are invalidated too."""
+        if feature_table is None:
+            # the stripes are locked in order, so that the counters are reset with no write in flight
+            stripes = [_StripeLock(self, stripe) for stripe in range(_NUM_STRIPES)]
+            for stripe in stripes:
+                stripe.__enter__()
+            try:
+                self._bump_generation(_GLOBAL_GENERATION_OFFSET)
+                for stripe in range(_NUM_STRIPES):
+                    _COUNT.pack_into(self._map, _COUNTS_OFFSET + stripe * _COUNT.size, 0)
+            finally:
+                for stripe in reversed(stripes):
+                    stripe.__exit__(None, None, None)
+        else:
+            self._bump_generation(_TABLE_GENERATIONS_OFFSET + _generation_index(feature_table) * _GENERATION.size)
+
+    def stats(self) -> Dict[str, float]:
+        """Get the hit and miss counters of this process, and the number of entries of the cache."""
+        with self._counters_lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "hit_ratio": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions,
+                    "size": len(self)}
+
+    def close(self):
+        """Unmaps the cache from this process. The cached values stay for the other processes."""
+        self._map.close()
+        os.close(self._fd)
+
+    def unlink(self):
+        """Deletes the file of the cache, e.g. when the server shuts down. The processes that have it open keep using
+        it, but a new process creates a new cache."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __len__(self):
+        """Get the approximate number of entries: the entries that expired, and those of the feature tables
+        invalidated since they were written, are counted until their slot is reused."""
+        return max(0, sum(_COUNT.unpack_from(self._map, _COUNTS_OFFSET + stripe * _COUNT.size)[0]
+                          for stripe in range(_NUM_STRIPES)))
+
+    def _lookup(self, feature_table: str, key: str, feature_name: str, now: float,
+                generation: int) -> Optional[bytes]:
+        """Get the cached value of a feature: the stored value, b"" for a cached missing value, or None if not cached."""
+        cache_key = _cache_key(feature_table, key, feature_name)
+        key_hash = _hash(cache_key)
+        for offset in self._bucket_offsets(key_hash % self._num_buckets):
+            for _ in range(_READ_RETRIES):
+                sequence, slot_hash, expire_at, key_length, value_length, flags, _, slot_generation = \
+                    _SLOT.unpack_from(self._map, offset)
+                if slot_hash != key_hash or flags == _EMPTY or slot_generation != generation:
+                    break
+                start = offset + _SLOT.size
+                slot_key = self._map[start:start + key_length]
+                value = self._map[start + self.max_key_bytes:start + self.max_key_bytes + value_length]
+                if sequence % 2 or _SEQUENCE.unpack_from(self._map, offset)[0] != sequence:
+                    # the slot is being written
+                    continue
+                if slot_key != cache_key or expire_at <= now:
+                    break
+                return value if flags == _VALUE else b""
+        return None
+
+    def _store(self, feature_table: str, key: str, feature_name: str, value: Optional[bytes], now: float):
+        ttl = self.ttl_seconds if value else self.negative_ttl_seconds
+        if ttl <= 0:
+            return
+        if value:
+            value = _decoded(value, self.max_value_bytes)
+        cache_key = _cache_key(feature_table, key, feature_name)
+        if len(cache_key) > self.max_key_bytes:
+            return
+        if value and len(value) > self.max_value_bytes:
+            # don't keep serving the previous value of the feature
+            self._remove(feature_table, key, feature_name)
+            return
+        key_hash = _hash(cache_key)
+        bucket = key_hash % self._num_buckets
+        generation_index = _generation_index(feature_table)
+        with self._stripe(bucket):
+            # read with the stripe locked, so that a write isn't counted in the generation before an `invalidate()`
+            generation = self._generation(generation_index)
+            offset = self._find_slot(bucket, key_hash, cache_key, now)
+            self._write_slot(offset, key_hash, now + ttl, cache_key, value or b"", _VALUE if value else _MISSING,
+                             generation_index, generation)
+
+    def _remove(self, feature_table: str, key: str, feature_name: str):
+        cache_key = _cache_key(feature_table, key, feature_name)
+        key_hash = _hash(cache_key)
+        bucket = key_hash % self._num_buckets
+        with self._stripe(bucket):
+            for offset in self._bucket_offsets(bucket):
+                _, slot_hash, _, key_length, _, flags, _, _ = _SLOT.unpack_from(self._map, offset)
+                if flags != _EMPTY and slot_hash == key_hash and \
+                        self._map[offset + _SLOT.size:offset + _SLOT.size + key_length] == cache_key:
+                    self._write_slot(offset, 0, 0.0, b"", b"", _EMPTY, 0, 0)
+
+    def _find_slot(self, bucket: int, key_hash: int, cache_key: bytes, now: float) -> int:
+        """Get the slot of a cache key in its bucket: its current slot, else a free, expired or invalidated slot, else
+        the slot closest to expiry, which is evicted."""
+        free = None
+        evicted = None
+        evicted_expire_at = None
+        for offset in self._bucket_offsets(bucket):
+            _, slot_hash, expire_at, key_length, _, flags, generation_index, generation = \
+                _SLOT.unpack_from(self._map, offset)
+            if flags == _EMPTY or expire_at <= now or generation != self._generation(generation_index):
+                free = free if free is not None else offset
+            elif slot_hash == key_hash and self._map[offset + _SLOT.size:offset + _SLOT.size + key_length] == cache_key:
+                return offset
+            elif evicted is None or expire_at < evicted_expire_at:
+                evicted, evicted_expire_at = offset, expire_at
+        if free is not None:
+            return free
+        with self._counters_lock:
+            self.evictions += 1
+        return evicted
+
+    def _write_slot(self, offset: int, key_hash: int, expire_at: float, cache_key: bytes, value: bytes, flags: int,
+                    generation_index: int, generation: int):
+        """Write a slot, with the stripe of its bucket locked, and count the entry in the stripe."""
+        sequence, _, _, _, _, previous_flags, _, previous_generation = _SLOT.unpack_from(self._map, offset)
+        global_generation = _GENERATION.unpack_from(self._map, _GLOBAL_GENERATION_OFFSET)[0]
+        # the entries written before the last `invalidate()` were not counted since
+        counted = previous_flags != _EMPTY and previous_generation >> 32 == global_generation
+        if counted != (flags != _EMPTY):
+            count_offset = _COUNTS_OFFSET + self._stripe_of(offset) * _COUNT.size
+            _COUNT.pack_into(self._map, count_offset,
+                             _COUNT.unpack_from(self._map, count_offset)[0] + (-1 if counted else 1))
+        _SEQUENCE.pack_into(self._map, offset, (sequence + 1) & 0xFFFFFFFF)
+        start = offset + _SLOT.size
+        self._map[start:start + len(cache_key)] = cache_key
+        self._map[start + self.max_key_bytes:start + self.max_key_bytes + len(value)] = value
+        _SLOT.pack_into(self._map, offset, (sequence + 1) & 0xFFFFFFFF, key_hash, expire_at, len(cache_key),
+                        len(value), flags, generation_index, generation)
+        _SEQUENCE.pack_into(self._map, offset, (sequence + 2) & 0xFFFFFFFF)
+
+    def _generation(self, generation_index: int) -> int:
+        """Get the generation of the cache and of the feature tables of an index, as stored in the slots."""
+        global_generation = _GENERATION.unpack_from(self._map, _GLOBAL_GENERATION_OFFSET)[0]
+        table_generation = _GENERATION.unpack_from(
+            self._map, _TABLE_GENERATIONS_OFFSET + generation_index * _GENERATION.size)[0]
+        return global_generation << 32 | table_generation
+
+    def _bump_generation(self, offset: int):
+        with self._header_lock:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX, 1, 0)
+            try:
+                generation = _GENERATION.unpack_from(self._map, offset)[0]
+                _GENERATION.pack_into(self._map, offset, (generation + 1) & 0xFFFFFFFF)
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, 1, 0)
+
+    def _stripe_of(self, offset: int) -> int:
+        return (offset - _SLOTS_OFFSET) // (self.ways * self._slot_size) % _NUM_STRIPES
+
+    def _bucket_offsets(self, bucket: int) -> range:
+        first = _SLOTS_OFFSET + bucket * self.ways * self._slot_size
+        return range(first, first + self.ways * self._slot_size, self._slot_size)
+
+    def _stripe(self, bucket: int) -> "_StripeLock":
+        return _StripeLock(self, bucket % _NUM_STRIPES)
+
+
+class _StripeLock(object):
+    """Locks a stripe of the buckets of a `SharedOnlineFeatureCache` for the threads of this process and for the other
+    processes."""
+    def __init__(self, cache: SharedOnlineFeatureCache, stripe: int):
+        self._cache = cache
+        self._stripe = stripe
+
+    def __enter__(self):
+        self._cache._thread_locks[self._stripe].acquire()
+        self._cache._fcntl.lockf(self._cache._fd, self._cache._fcntl.LOCK_EX, 1, _HEADER.size + self._stripe)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._cache._fcntl.lockf(self._cache._fd, self._cache._fcntl.LOCK_UN, 1, _HEADER.size + self._stripe)
+        self._cache._thread_locks[self._stripe].release()
+
+
+def _decoded(value: bytes, max_value_bytes: int) -> bytes:
+    """Get the raw codec form of a base64 or zstd value, or the value itself if it can't be decoded or is larger
+    than `max_value_bytes` once decoded."""
+    if value[0] == RAW_HEADER or is_quantized(value):
+        return value
+    try:
+        serialized = decode_value(value) if value[0] == ZSTD_HEADER else base64.b64decode(value, validate=True)
+    except Exception:
+        # e.g. not a value of the online store, or a zstd dictionary that isn't loaded
+        return value
+    return bytes((RAW_HEADER,)) + serialized if len(serialized) < max_value_bytes else value
+
+
+def _cache_key(feature_table: str, key: str, feature_name: str) -> bytes:
+    return f"{feature_table}\0{key}\0{feature_name}".encode()
+
+
+def _generation_index(feature_table: str) -> int:
+    return _hash(feature_table.encode()) % _NUM_TABLE_GENERATIONS
+
+
+def _hash(cache_key: bytes) -> int:
+    # a hash that is the same in all the processes, unlike `hash` of str
+    return int.from_bytes(hashlib.blake2b(cache_key, digest_size=8).digest(), "little")
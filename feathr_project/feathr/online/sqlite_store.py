@@ -0,0 +1,212 @@
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from feathr.online.online_store import FeatureRequest, OnlineStore
+
+# max number of bound parameters per statement, below the SQLITE_MAX_VARIABLE_NUMBER of older SQLite versions
+_MAX_VARIABLES = 900
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS feathr_online_features (
+    feature_table TEXT NOT NULL,
+    entity_key TEXT NOT NULL,
+    feature_name TEXT NOT NULL,
+    value BLOB,
+    PRIMARY KEY (feature_table, entity_key, feature_name)
+) WITHOUT ROWID
+"""
+
+# expiration time(unix seconds) of the entities written with a TTL
+_CREATE_EXPIRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS feathr_online_expirations (
+    feature_table TEXT NOT NULL,
+    entity_key TEXT NOT NULL,
+    expire_at REAL NOT NULL,
+    PRIMARY KEY (feature_table, entity_key)
+) WITHOUT ROWID
+"""
+
+# filters out the features of the expired entities
+_NOT_EXPIRED = ("NOT EXISTS (SELECT 1 FROM feathr_online_expirations e WHERE e.feature_table = f.feature_table "
+                "AND e.entity_key = f.entity_key AND e.expire_at <= ?)")
+
+
+class SqliteOnlineStore(OnlineStore):
+    """Embedded online store backed by a local SQLite database file, so features are served in-process with no network
+    hop. It suits small, read-heavy feature tables, and running the online path in tests without a Redis server.
+
+    The database file is memory-mapped(`mmap_size`), so hot pages are read straight from the page cache without a
+    copy into the SQLite buffers, and it uses WAL journaling so writers don't block the readers. Each thread gets its
+    own connection. The values are stored as they are written, so the decoding is the same as with Redis.
+
+    Entities written with a TTL are hidden from the reads once they expire, and deleted by the next write to their
+    feature table.
+
+    Attributes:
+        path: path of the database file. `:memory:` for an in-memory store, shared by all the threads of the process.
+        mmap_size: max bytes of the database file that are memory-mapped
+        read_only: open the database file in read-only mode, e.g. when it is built by another process
+    """
+    def __init__(self, path: str = ":memory:", mmap_size: int = 256 * 1024 * 1024, read_only: bool = False):
+        self.path = path
+        self.mmap_size = mmap_size
+        self.read_only = read_only
+        if path == ":memory:":
+            # a named in-memory database with shared cache, so all the connections of the store see the same data
+            self._uri = f"file:feathr_online_{uuid.uuid4().hex}?mode=memory&cache=shared"
+        else:
+            self._uri = f"file:{path}?mode=ro" if read_only else f"file:{path}"
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # also keeps an in-memory database alive as long as the store is open
+        connection = self._connection()
+        if not read_only:
+            with connection:
+                connection.execute(_CREATE_TABLE)
+                connection.execute(_CREATE_EXPIRATIONS_TABLE)
+        # database files built before the TTLs were supported don't have the expirations table
+        self._has_expirations = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'feathr_online_expirations'"
+        ).fetchone() is not None
+
+    def batch_get(self, requests: List[FeatureRequest]) -> List[List[Optional[bytes]]]:
+        # group the requests by table so each table is read with a few IN queries
+        keys_by_table: Dict[str, set] = {}
+        for feature_table, key, _ in requests:
+            keys_by_table.setdefault(feature_table, set()).add(key)
+        stored = {}
+        for feature_table, keys in keys_by_table.items():
+            for (key, feature_name), value in self._select(feature_table, list(keys)):
+                stored[(feature_table, key, feature_name)] = value
+        return [[stored.get((feature_table, key, feature_name)) for feature_name in feature_names]
+                for feature_table, key, feature_names in requests]
+
+    def batch_get_all(self, feature_table: str, keys: List[str]) -> List[Dict[str, bytes]]:
+        rows = {key: {} for key in keys}
+        for (key, feature_name), value in self._select(feature_table, list(set(keys))):
+            rows[key][feature_name] = value
+        return [rows[key] for key in keys]
+
+    def batch_put(self, feature_table: str, rows: Dict[str, Dict[str, bytes]], ttl_seconds: Optional[int] = None):
+        connection = self._connection()
+        with connection:
+            self._write(connection, feature_table, rows, ttl_seconds)
+
+    def batch_accumulate(self, feature_table: str, updates: Dict[str, Dict[str, Tuple[str, float]]],
+                         ttl_seconds: Optional[int] = None):
+        connection = self._connection()
+        with connection:
+            # lock the database before reading the current aggregates, so that no other writer updates them between
+            # the read and the write
+            connection.execute("BEGIN IMMEDIATE")
+            current = dict(zip(updates, self.batch_get_all(feature_table, list(updates))))
+            rows = {}
+            for key, fields in updates.items():
+                rows[key] = {}
+                for field, (operation, value) in fields.items():
+                    stored = current[key].get(field)
+                    if stored is not None:
+                        stored = float(stored)
+                        if operation == "sum":
+                            value = stored + value
+                        elif operation == "max":
+                            value = max(stored, value)
+                        elif operation == "min":
+                            value = min(stored, value)
+                    rows[key][field] = repr(float(value)).encode()
+            self._write(connection, feature_table, rows, ttl_seconds)
+
+    def update_entity(self, feature_table: str, key: str,
+                      update: Callable[[Dict[str, bytes]], Optional[Dict[str, bytes]]]) -> Dict[str, bytes]:
+        connection = self._connection()
+        with connection:
+            # lock the database before reading the entity, like `batch_accumulate`
+            connection.execute("BEGIN IMMEDIATE")
+            entity = self.batch_get_all(feature_table, [key])[0]
+            values = update(entity)
+            if values:
+                self._write(connection, feature_table, {key: values}, None)
+        return entity
+
+    def delete_table(self, feature_table: str, max_keys_per_second: Optional[float] = None):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM feathr_online_features WHERE feature_table = ?", (feature_table,))
+            connection.execute("DELETE FROM feathr_online_expirations WHERE feature_table = ?", (feature_table,))
+
+    def scan(self, feature_table: str, batch_size: int = 1000) -> Iterator[Tuple[str, Dict[str, bytes]]]:
+        last_key = None
+        while True:
+            # page by key so that the values of an entity are never split between two pages
+            query = "SELECT DISTINCT entity_key FROM feathr_online_features f WHERE feature_table = ?"
+            params = [feature_table]
+            if self._has_expirations:
+                query += f" AND {_NOT_EXPIRED}"
+                params.append(time.time())
+            if last_key is not None:
+                query += " AND entity_key > ?"
+                params.append(last_key)
+            query += " ORDER BY entity_key LIMIT ?"
+            params.append(batch_size)
+            keys = [row[0] for row in self._connection().execute(query, params)]
+            if not keys:
+                return
+            yield from zip(keys, self.batch_get_all(feature_table, keys))
+            last_key = keys[-1]
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def _write(self, connection: sqlite3.Connection, feature_table: str, rows: Dict[str, Dict[str, bytes]],
+               ttl_seconds: Optional[int]):
+        now = time.time()
+        # like Redis, an expired entity is gone, so writing to it again doesn't bring back its other features
+        connection.execute(
+            "DELETE FROM feathr_online_features WHERE feature_table = ? AND entity_key IN (SELECT entity_key FROM "
+            "feathr_online_expirations WHERE feature_table = ? AND expire_at <= ?)",
+            (feature_table, feature_table, now))
+        connection.execute("DELETE FROM feathr_online_expirations WHERE feature_table = ? AND expire_at <= ?",
+                           (feature_table, now))
+        connection.executemany(
+            "INSERT OR REPLACE INTO feathr_online_features VALUES (?, ?, ?, ?)",
+            ((feature_table, key, feature_name, value)
+             for key, values in rows.items() for feature_name, value in values.items()))
+        if ttl_seconds is not None:
+            connection.executemany(
+                "INSERT OR REPLACE INTO feathr_online_expirations VALUES (?, ?, ?)",
+                ((feature_table, key, now + ttl_seconds) for key, values in rows.items() if values))
+
+    def _select(self, feature_table: str, keys: List[str]) -> Iterator[Tuple[Tuple[str, str], bytes]]:
+        connection = self._connection()
+        for start in range(0, len(keys), _MAX_VARIABLES):
+            batch_keys = keys[start:start + _MAX_VARIABLES]
+            placeholders = ",".join("?" * len(batch_keys))
+            query = ("SELECT entity_key, feature_name, value FROM feathr_online_features f "
+                     f"WHERE feature_table = ? AND entity_key IN ({placeholders})")
+            params = [feature_table] + batch_keys
+            if self._has_expirations:
+                query += f" AND {_NOT_EXPIRED}"
+                params.append(time.time())
+            cursor = connection.execute(query, params)
+            for key, feature_name, value in cursor:
+                yield (key, feature_name), value
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+            if self.path != ":memory:" and not self.read_only:
+                connection.execute("PRAGMA journal_mode = WAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
@@ -0,0 +1,376 @@
+import io
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+import pandas as pd
+import pyarrow as pa
+from loguru import logger
+
+from feathr.definition.anchor import FeatureAnchor
+from feathr.definition.dtype import ValueType
+from feathr.definition.source import AvroJsonSchema, KafKaSource
+from feathr.online.assembler import _evaluate_expression
+from feathr.online.codec import BASE64_CODEC, RAW_CODEC, ValueEncoder
+from feathr.online.decoder import _ARROW_TYPES, _SCALAR, _layout_of
+from feathr.online.encoder import encode_feature_column
+from feathr.online.online_store import OnlineStore
+
+# creates a consumer from its config, with the interface of `confluent_kafka.Consumer`
+ConsumerFactory = Callable[[Dict[str, Any]], Any]
+
+_NUMERIC_TYPES = (ValueType.BOOL, ValueType.INT32, ValueType.INT64, ValueType.FLOAT, ValueType.DOUBLE)
+
+
+def _default_retryable_errors() -> Tuple[Type[Exception], ...]:
+    errors = [ConnectionError, TimeoutError]
+    try:
+        import redis
+        errors.extend([redis.exceptions.ConnectionError, redis.exceptions.TimeoutError])
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+# Errors of a micro-batch write that are retried, e.g. the online store is unreachable for a while. The others, e.g.
+# an expression that fails on the messages, fail the same way again, and stop the consumer.
+DEFAULT_RETRYABLE_ERRORS = _default_retryable_errors()
+
+
+def kafka_consumer_config(brokers: List[str], group_id: str,
+                          sasl_connection_string: Optional[str] = None) -> Dict[str, Any]:
+    """Get the config of the Kafka consumers of a `StreamingIngestionWorker`.
+
+    Args:
+        brokers: the brokers of the `KafkaConfig`
+        group_id: the consumer group. The partitions of the topics are balanced between the consumers of the group.
+        sasl_connection_string: the `KAFKA_SASL_JAAS_CONFIG` connection string, e.g. of Azure Event Hubs, if the
+            brokers require SASL authentication
+    """
+    config = {
+        "bootstrap.servers": ",".join(brokers),
+        "group.id": group_id,
+        # the offsets are committed after the values are written, so that no message is lost
+        "enable.auto.commit": False,
+        "auto.offset.reset": "latest",
+    }
+    if sasl_connection_string:
+        config.update({
+            "security.protocol": "SASL_SSL",
+            "sasl.mechanism": "PLAIN",
+            "sasl.username": "$ConnectionString",
+            "sasl.password": sasl_connection_string,
+        })
+    return config
+
+
+class StreamingIngestionMetrics(object):
+    """Counters of a `StreamingIngestionWorker`, updated by all its consumers.
+
+    Attributes:
+        messages: number of consumed messages
+        decode_errors: number of messages that couldn't be decoded with the schema, and were skipped
+        entities: number of entity updates written to the online store
+        flushes: number of micro-batches written
+        flush_seconds: total time spent decoding, transforming and writing the micro-batches
+        retries: number of micro-batch writes that failed with a retryable error, and were retried
+        lag: number of messages not consumed yet, by (topic, partition), as of the last flush of its consumer
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self.messages = 0
+        self.decode_errors = 0
+        self.entities = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.retries = 0
+        self.lag: Dict[Tuple[str, int], int] = {}
+
+    def record_flush(self, messages: int, decode_errors: int, entities: int, seconds: float):
+        with self._lock:
+            self.messages += messages
+            self.decode_errors += decode_errors
+            self.entities += entities
+            self.flushes += 1
+            self.flush_seconds += seconds
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_lag(self, lag: Dict[Tuple[str, int], int]):
+        with self._lock:
+            self.lag.update(lag)
+
+    @property
+    def total_lag(self) -> int:
+        with self._lock:
+            return sum(self.lag.values())
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get the counters, the consumed messages per second since the worker started, and the total lag."""
+        with self._lock:
+            elapsed = time.monotonic() - self._start
+            return {
+                "messages": self.messages,
+                "decode_errors": self.decode_errors,
+                "entities": self.entities,
+                "flushes": self.flushes,
+                "messages_per_second": self.messages / elapsed if elapsed > 0 else 0.0,
+                "avg_flush_seconds": self.flush_seconds / self.flushes if self.flushes else 0.0,
+                "retries": self.retries,
+                "total_lag": sum(self.lag.values()),
+            }
+
+
+class StreamingIngestionWorker(object):
+    """Ingests the features of a Kafka anchor into the online store, without a Spark streaming job.
+
+    Each consumer of the worker polls the topics of the `KafKaSource` of the anchor, decodes the messages with its
+    `AvroJsonSchema`(binary Avro records, like the Spark streaming job), evaluates the expressions of the features on
+    the whole micro-batch at once, and writes the feature values of its entities to the online store. A micro-batch is
+    flushed when it has `batch_size` messages or `flush_interval_seconds` after its first message. The offsets are
+    committed after the write, so each message is written at least once.
+
+    A micro-batch whose write fails with one of `retryable_errors`, e.g. the online store is unreachable, is retried
+    with an exponential backoff, and its offsets are only committed once it's written. Any other error stops the
+    consumer, without committing the micro-batch: `is_healthy()` is then False and `on_failure` is called, so that the
+    process can exit or restart the worker.
+
+    The consumers share a consumer group, so the partitions of the topics are balanced between them, and each one
+    writes its partitions in parallel with the others. Run several workers, e.g. one per host, to scale further.
+
+    Only `ExpressionTransformation`s are supported, evaluated like the online derived features(see
+    `OnlineFeatureAssembler`), so Spark SQL functions that have no pandas equivalent can't be used.
+
+    Attributes:
+        online_store: the store the features are written to
+        feature_table: the online feature table
+        anchor: the feature anchor, whose source must be a `KafKaSource`
+        consumer_config: the config of the consumers, see `kafka_consumer_config`
+        num_consumers: number of consumers, at most the number of partitions of the topics to be useful
+        batch_size: max number of messages of a micro-batch
+        flush_interval_seconds: max seconds a consumed message waits before being written
+        ttl_seconds: if set, the written entities expire after this many seconds
+        value_codec: how the values are encoded, `base64`(default) or `raw`, see `RedisSink`
+        consumer_factory: creates a consumer from `consumer_config`. Defaults to `confluent_kafka.Consumer`.
+        retryable_errors: the errors of a micro-batch write that are retried
+        retry_backoff_seconds: seconds before the first retry of a micro-batch, doubled at each retry
+        max_retry_backoff_seconds: max seconds between two retries
+        max_retries: if set, a consumer stops after this many retries of a micro-batch. Otherwise it retries until
+            the worker is stopped.
+        on_failure: called with the error, from the thread of the consumer, when a consumer stops on an error
+        metrics: the throughput and lag metrics of the worker
+    """
+    def __init__(self, online_store: OnlineStore, feature_table: str, anchor: FeatureAnchor,
+                 consumer_config: Dict[str, Any], num_consumers: int = 1, batch_size: int = 1000,
+                 flush_interval_seconds: float = 1.0, ttl_seconds: Optional[int] = None,
+                 value_codec: str = BASE64_CODEC, consumer_factory: Optional[ConsumerFactory] = None,
+                 retryable_errors: Tuple[Type[Exception], ...] = DEFAULT_RETRYABLE_ERRORS,
+                 retry_backoff_seconds: float = 0.5, max_retry_backoff_seconds: float = 30.0,
+                 max_retries: Optional[int] = None, on_failure: Optional[Callable[[Exception], None]] = None):
+        if not isinstance(anchor.source, KafKaSource):
+            raise RuntimeError(f"The source of anchor {anchor.name} must be a KafKaSource to be ingested, but it's "
+                               f"{type(anchor.source).__name__}.")
+        if not isinstance(anchor.source.config.schema, AvroJsonSchema):
+            raise RuntimeError(f"Only AvroJsonSchema is supported to decode the messages of anchor {anchor.name}.")
+        if value_codec not in (BASE64_CODEC, RAW_CODEC):
+            raise RuntimeError(f"Unsupported value codec {value_codec} for streamed features. "
+                               f"Supported ones are {[BASE64_CODEC, RAW_CODEC]}.")
+        self.online_store = online_store
+        self.feature_table = feature_table
+        self.anchor = anchor
+        self.consumer_config = consumer_config
+        self.num_consumers = num_consumers
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.ttl_seconds = ttl_seconds
+        self.value_codec = value_codec
+        self.consumer_factory = consumer_factory
+        self.retryable_errors = retryable_errors
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_retry_backoff_seconds = max_retry_backoff_seconds
+        self.max_retries = max_retries
+        self.on_failure = on_failure
+        self.metrics = StreamingIngestionMetrics()
+        self._encoder = ValueEncoder(value_codec)
+        self._key_columns = [typed_key.key_column for typed_key in anchor.features[0].key if typed_key]
+        if not self._key_columns:
+            raise RuntimeError(f"The features of anchor {anchor.name} must have a key to be ingested online.")
+        self._schema = self._parse_schema(anchor.source.config.schema.schemaStr)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._errors: List[Exception] = []
+
+    def start(self) -> "StreamingIngestionWorker":
+        """Starts the consumers, each in a background thread."""
+        if self._threads:
+            raise RuntimeError("The streaming ingestion worker is already started.")
+        self._stop.clear()
+        for index in range(self.num_consumers):
+            thread = threading.Thread(target=self._consume, name=f"feathr-ingestion-{self.feature_table}-{index}",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops the consumers after they flush their current micro-batch, and waits for them. A micro-batch still
+        being retried isn't committed, and is consumed again by the next consumers.
+
+        Raises:
+            RuntimeError: if a consumer failed
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise RuntimeError(f"Streaming ingestion of feature table {self.feature_table} failed: {errors[0]}")
+
+    def is_healthy(self) -> bool:
+        """Whether all the consumers are running. False once one of them stopped on an error, until `stop()`."""
+        return bool(self._threads) and not self._errors and all(thread.is_alive() for thread in self._threads)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def process_messages(self, values: List[bytes]) -> int:
+        """Decodes, transforms and writes one micro-batch of message values. The consumers call it for each of their
+        micro-batches, and it can also be used to ingest messages consumed by other means.
+
+        Return:
+            The number of entities written.
+        """
+        start = time.perf_counter()
+        records = []
+        decode_errors = 0
+        for value in values:
+            try:
+                records.append(self._decode(value))
+            except Exception as e:
+                decode_errors += 1
+                logger.warning("Skipping a message of feature table {} that can't be decoded: {}",
+                               self.feature_table, e)
+        rows = self._transform(records) if records else {}
+        if rows:
+            self.online_store.batch_put(self.feature_table, rows, ttl_seconds=self.ttl_seconds)
+        self.metrics.record_flush(len(values), decode_errors, len(rows), time.perf_counter() - start)
+        return len(rows)
+
+    def _consume(self):
+        consumer = self._create_consumer()
+        try:
+            consumer.subscribe(list(self.anchor.source.config.topics))
+            while not self._stop.is_set():
+                values = []
+                deadline = None
+                while len(values) < self.batch_size and not self._stop.is_set():
+                    timeout = self.flush_interval_seconds if deadline is None else deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    for message in consumer.consume(num_messages=self.batch_size - len(values), timeout=timeout):
+                        if message.error():
+                            # e.g. the end of a partition, the consumer recovers from the other errors by itself
+                            logger.debug("Kafka consumer error of feature table {}: {}", self.feature_table,
+                                         message.error())
+                            continue
+                        values.append(message.value())
+                    if values and deadline is None:
+                        deadline = time.monotonic() + self.flush_interval_seconds
+                if values:
+                    if not self._process_with_retries(values):
+                        # stopped before the micro-batch was written, it's consumed again by the next consumer
+                        break
+                    consumer.commit(asynchronous=False)
+                    self.metrics.record_lag(self._lag(consumer))
+        except Exception as e:
+            logger.error("Streaming ingestion of feature table {} failed: {}", self.feature_table, e)
+            self._errors.append(e)
+            if self.on_failure is not None:
+                try:
+                    self.on_failure(e)
+                except Exception as callback_error:
+                    logger.error("The failure callback of the streaming ingestion of feature table {} failed: {}",
+                                 self.feature_table, callback_error)
+        finally:
+            consumer.close()
+
+    def _process_with_retries(self, values: List[bytes]) -> bool:
+        """Processes a micro-batch, retrying the retryable errors with an exponential backoff.
+
+        Return:
+            Whether the micro-batch was written. False if the worker was stopped before.
+        """
+        backoff = self.retry_backoff_seconds
+        retries = 0
+        while True:
+            try:
+                self.process_messages(values)
+                return True
+            except self.retryable_errors as e:
+                if self.max_retries is not None and retries >= self.max_retries:
+                    raise
+                retries += 1
+                self.metrics.record_retry()
+                logger.warning("Failed to write a micro-batch of feature table {}, retrying in {} seconds: {}",
+                               self.feature_table, backoff, e)
+                if self._stop.wait(backoff):
+                    return False
+                backoff = min(backoff * 2, self.max_retry_backoff_seconds)
+
+    def _create_consumer(self):
+        if self.consumer_factory is not None:
+            return self.consumer_factory(dict(self.consumer_config))
+        try:
+            from confluent_kafka import Consumer
+        except ImportError:
+            raise RuntimeError("confluent_kafka is required to consume Kafka topics. Please install confluent-kafka.")
+        return Consumer(self.consumer_config)
+
+    @staticmethod
+    def _lag(consumer) -> Dict[Tuple[str, int], int]:
+        """Get the number of messages behind the high watermark of each assigned partition."""
+        lag = {}
+        for partition in consumer.position(consumer.assignment()):
+            _, high = consumer.get_watermark_offsets(partition, cached=True)
+            if high >= 0 and partition.offset >= 0:
+                lag[(partition.topic, partition.partition)] = max(high - partition.offset, 0)
+        return lag
+
+    @staticmethod
+    def _parse_schema(schema_str: str):
+        import fastavro
+        return fastavro.parse_schema(json.loads(schema_str))
+
+    def _decode(self, value: bytes) -> Dict[str, Any]:
+        import fastavro
+        return fastavro.schemaless_reader(io.BytesIO(value), self._schema)
+
+    def _transform(self, records: List[Dict[str, Any]]) -> Dict[str, Dict[str, bytes]]:
+        """Evaluate the features of the decoded records, and encode them by entity key. The last record of an entity
+        wins."""
+        inputs = pd.DataFrame.from_records(records)
+        missing_columns = [column for column in self._key_columns if column not in inputs.columns]
+        if missing_columns:
+            raise RuntimeError(f"Key columns {missing_columns} are missing from the messages of anchor "
+                               f"{self.anchor.name}.")
+        keys = ["#".join(str(value) for value in values)
+                for values in zip(*[inputs[column].tolist() for column in self._key_columns])]
+        rows = {key: {} for key in keys}
+        for feature in self.anchor.features:
+            column = pa.array(_evaluate_expression(feature, inputs), from_pandas=True)
+            feature_type = feature.feature_type
+            if _layout_of(feature_type) == _SCALAR and feature_type.val_type in _NUMERIC_TYPES:
+                # like Spark, cast the result of the expression to the type of the feature
+                column = column.cast(_ARROW_TYPES[feature_type.val_type], safe=False)
+            for key, serialized in zip(keys, encode_feature_column(column, feature_type)):
+                if serialized is not None:
+                    rows[key][feature.name] = self._encoder.encode(serialized)
+        return {key: values for key, values in rows.items() if values}
@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from feathr.online.online_store import OnlineStore
+
+# Online table holding the aliases of the versioned feature tables: key is the alias, i.e. the feature table name
+# the clients read, field `table` is the physical table of its current version, field `retired` the JSON list of
+# the physical tables of its previous versions, until they are reclaimed, and field `reclaiming` the JSON list of
+# the retired versions being deleted, which can't be made current again.
+ALIAS_TABLE = "__feathr_table_aliases__"
+ALIAS_FIELD = "table"
+RETIRED_FIELD = "retired"
+RECLAIMING_FIELD = "reclaiming"
+
+# Seconds after which the client checks again which version of a table is current
+DEFAULT_ALIAS_REFRESH_SECONDS = 10
+# Keys of the retired versions deleted per second by default, so that reclaiming them doesn't slow down Redis
+DEFAULT_RECLAIM_KEYS_PER_SECOND = 10000
+
+
+def new_table_version(alias: str) -> str:
+    """Get the name of a new physical table for a version of the feature table `alias`, e.g.
+    `nycTaxiDemoFeature__v1666000000000`. Versions are named by their creation time in milliseconds."""
+    return f"{alias}__v{int(time.time() * 1000)}"
+
+
+class TableAliases(object):
+    """Cache of the aliases of the versioned feature tables, used by the online clients to find the physical table of
+    the current version of a table.
+
+    A table without alias is its own physical table. The aliases are reloaded from `ALIAS_TABLE` every
+    `refresh_seconds`, so a client reads the new version of a table at most `refresh_seconds` after it's swapped in.
+
+    Attributes:
+        refresh_seconds: seconds after which the alias of a table is loaded again
+    """
+    def __init__(self, refresh_seconds: float = DEFAULT_ALIAS_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        # alias -> (load time, physical table of the current version, None if the table has no alias)
+        self._aliases: Dict[str, Tuple[float, Optional[str]]] = {}
+
+    def stale_aliases(self, feature_tables: Sequence[str]) -> List[str]:
+        """Get the tables whose alias must be loaded before reading them."""
+        now = time.monotonic()
+        with self._lock:
+            return [table for table in dict.fromkeys(feature_tables)
+                    if table not in self._aliases or now - self._aliases[table][0] > self.refresh_seconds]
+
+    def update(self, alias: str, entry: Dict[str, bytes]):
+        """Set the alias of a table, as stored in `ALIAS_TABLE`. Empty for a table that has no alias."""
+        with self._lock:
+            self._aliases[alias] = (time.monotonic(), _decode(entry.get(ALIAS_FIELD)))
+
+    def invalidate(self, alias: str):
+        with self._lock:
+            self._aliases.pop(alias, None)
+
+    def is_loaded(self, alias: str) -> bool:
+        """Whether the alias of a table was loaded, even if it's stale."""
+        with self._lock:
+            return alias in self._aliases
+
+    def resolve(self, feature_table: str) -> str:
+        """Get the physical table of the current version of a table."""
+        with self._lock:
+            return self._aliases.get(feature_table, (0, None))[1] or feature_table
+
+
+def swap_table_alias(online_store: OnlineStore, alias: str, table: str) -> str:
+    """Makes `table` the current version of the feature table `alias`, once all its entities are written.
+
+    The alias is switched with a single write, so the readers go from all the values of the previous version to all
+    the values of the new one, never a mix of both. The previous version, which is the table named `alias` itself
+    when the table wasn't versioned yet, is retired: it's kept until `reclaim_table_versions` deletes it. A retired
+    version can be made current again, e.g. to roll back, until its deletion starts.
+
+    The alias entry is read and written atomically(see `OnlineStore.update_entity`), so a concurrent swap or reclaim
+    of the same table never loses a retired version.
+
+    Return:
+        The physical table of the previous version.
+    """
+    def swap(entry: Dict[str, bytes]) -> Dict[str, bytes]:
+        if table in _tables(entry, RECLAIMING_FIELD):
+            raise RuntimeError(f"Table {table} is being reclaimed, it can't be made the current version of {alias}.")
+        previous = _decode(entry.get(ALIAS_FIELD)) or alias
+        retired = [retired_table for retired_table in _tables(entry, RETIRED_FIELD) + [previous]
+                   if retired_table != table]
+        return {ALIAS_FIELD: table, RETIRED_FIELD: json.dumps(list(dict.fromkeys(retired)))}
+
+    entry = online_store.update_entity(ALIAS_TABLE, alias, swap)
+    return _decode(entry.get(ALIAS_FIELD)) or alias
+
+
+def reclaim_table_versions(online_store: OnlineStore, alias: str,
+                           max_keys_per_second: Optional[float] = DEFAULT_RECLAIM_KEYS_PER_SECOND) -> List[str]:
+    """Deletes the retired versions of the feature table `alias`, see `swap_table_alias`.
+
+    The retired versions are first marked as being reclaimed, so that no swap makes them current during their
+    deletion. The versions whose deletion was interrupted, e.g. by the end of the process, are deleted again.
+
+    Args:
+        online_store: the store of the table
+        alias: the name of the feature table
+        max_keys_per_second: if set, limits the number of keys deleted per second
+
+    Return:
+        The physical tables that were deleted.
+    """
+    def start_reclaiming(entry: Dict[str, bytes]) -> Optional[Dict[str, bytes]]:
+        retired = _tables(entry, RETIRED_FIELD)
+        if not retired:
+            return None
+        current = _decode(entry.get(ALIAS_FIELD))
+        reclaiming = [retired_table for retired_table in _tables(entry, RECLAIMING_FIELD) + retired
+                      if retired_table != current]
+        return {RETIRED_FIELD: json.dumps([]), RECLAIMING_FIELD: json.dumps(list(dict.fromkeys(reclaiming)))}
+
+    reclaimed = []
+    entry = online_store.update_entity(ALIAS_TABLE, alias, start_reclaiming)
+    for table in dict.fromkeys(_tables(entry, RECLAIMING_FIELD) + _tables(entry, RETIRED_FIELD)):
+        # check again under the same guard that the table wasn't made current, e.g. by a client that doesn't know
+        # about the reclaimed versions
+        entry = online_store.update_entity(ALIAS_TABLE, alias, lambda entry: None)
+        if table == _decode(entry.get(ALIAS_FIELD)) or table not in _tables(entry, RECLAIMING_FIELD):
+            continue
+        online_store.delete_table(table, max_keys_per_second=max_keys_per_second)
+        reclaimed.append(table)
+        online_store.update_entity(ALIAS_TABLE, alias, lambda entry, table=table: {RECLAIMING_FIELD: json.dumps(
+            [reclaiming_table for reclaiming_table in _tables(entry, RECLAIMING_FIELD) if reclaiming_table != table])})
+    return reclaimed
+
+
+def start_reclaiming_table_versions(online_store: OnlineStore, alias: str,
+                                    max_keys_per_second: Optional[float] = DEFAULT_RECLAIM_KEYS_PER_SECOND,
+                                    delay_seconds: float = 2 * DEFAULT_ALIAS_REFRESH_SECONDS) -> threading.Thread:
+    """Reclaims the retired versions of a table in a background thread, see `reclaim_table_versions`.
+
+    The deletion starts after `delay_seconds`, so that the clients that still read the previous version, until they
+    refresh the alias, don't see its entities disappear. The thread is a daemon thread: if the process exits before
+    it's done, the versions that are not deleted yet stay retired, and are deleted by the next reclaim.
+
+    Return:
+        The started thread, e.g. to join it.
+    """
+    def reclaim():
+        time.sleep(delay_seconds)
+        try:
+            reclaimed = reclaim_table_versions(online_store, alias, max_keys_per_second)
+            if reclaimed:
+                logger.info("Reclaimed the retired versions {} of online feature table {}.", reclaimed, alias)
+        except Exception as e:
+            logger.warning("Failed to reclaim the retired versions of online feature table {}: {}", alias, e)
+
+    thread = threading.Thread(target=reclaim, daemon=True, name=f"feathr-reclaim-{alias}")
+    thread.start()
+    return thread
+
+
+def _tables(entry: Dict[str, bytes], field: str) -> List[str]:
+    tables = _decode(entry.get(field))
+    return json.loads(tables) if tables else []
+
+
+def _decode(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
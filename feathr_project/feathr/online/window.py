@@ -0,0 +1,215 @@
+import math
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from feathr.definition.anchor import FeatureAnchor
+from feathr.definition.transformation import WindowAggTransformation
+from feathr.online.assembler import _evaluate_column
+from feathr.online.online_store import OnlineStore
+
+# Aggregation functions of `WindowAggTransformation` that can be computed online
+WINDOW_AGG_FUNCTIONS = ("SUM", "COUNT", "MAX", "MIN", "AVG")
+
+# Separator between the entity key and the index of its time bucket in the keys of the bucket entities
+BUCKET_SEPARATOR = "@"
+
+# partial aggregates stored in the buckets for each aggregation function, and how they are merged
+_PARTIAL_AGGREGATES = {"SUM": ["sum"], "COUNT": ["count"], "AVG": ["sum", "count"], "MAX": ["max"], "MIN": ["min"]}
+_MERGE_OPERATIONS = {"sum": "sum", "count": "sum", "max": "max", "min": "min"}
+
+_WINDOW_UNITS = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+_WINDOW_PATTERN = re.compile(r"^\s*(\d+)\s*([dhms])\s*$")
+
+
+def parse_window(window: str) -> int:
+    """Get the length in seconds of the `window` of a `WindowAggTransformation`, e.g. 3600 for "1h"."""
+    match = _WINDOW_PATTERN.match(str(window))
+    if match is None or int(match.group(1)) == 0:
+        raise RuntimeError(f"Invalid window '{window}'. It must be a positive number of days(d), hours(h), "
+                           f"minutes(m) or seconds(s), e.g. '7d' or '5h'.")
+    return int(match.group(1)) * _WINDOW_UNITS[match.group(2)]
+
+
+class OnlineWindowAggregator(object):
+    """Serves the sliding-window aggregation features of an anchor(`WindowAggTransformation`s) from events appended
+    to the online store, so that they are as fresh as the last appended event rather than the last materialization.
+
+    The events are pre-aggregated into time buckets of `bucket_seconds` per entity: each bucket is an entity
+    `<key>@<bucket index>` of the online feature table, holding the partial aggregates of the features, e.g.
+    `f_amount_1h:sum` and `f_amount_1h:count` for an AVG. Appending a batch of events merges its partial aggregates
+    into the stored ones in one round trip, atomically, so several writers can append to the same entities. The
+    buckets expire once they are older than the longest window, so the memory used is bounded by the number of active
+    entities times the number of buckets of a window.
+
+    Reading an entity fetches the buckets of its longest window in one round trip, and merges them for all the keys at
+    once with numpy. A window covers its last `window / bucket_seconds` buckets, including the current one, so the
+    oldest events of a window are dropped a bucket at a time, rather than continuously like in the offline
+    aggregation. Smaller buckets are more accurate, but read more values.
+
+    Only the SUM, COUNT, MAX, MIN and AVG aggregation functions are supported, without `group_by` or `limit`. The
+    expressions and filters are evaluated like the online derived features(see `OnlineFeatureAssembler`).
+
+    Attributes:
+        online_store: the store the buckets are written to
+        feature_table: the online feature table of the buckets
+        anchor: the anchor of the window aggregation features
+        bucket_seconds: length of the time buckets. Defaults to 1/60 of the shortest window, at least a second.
+        clock: returns the current unix time in seconds, e.g. to read the features as of another time in tests
+    """
+    def __init__(self, online_store: OnlineStore, feature_table: str, anchor: FeatureAnchor,
+                 bucket_seconds: Optional[int] = None, clock: Callable[[], float] = time.time):
+        self.online_store = online_store
+        self.feature_table = feature_table
+        self.anchor = anchor
+        self.clock = clock
+        self.features = [feature for feature in anchor.features if isinstance(feature.transform,
+                                                                              WindowAggTransformation)]
+        if not self.features:
+            raise RuntimeError(f"Anchor {anchor.name} has no window aggregation features.")
+        for feature in self.features:
+            transform = feature.transform
+            if str(transform.agg_func).upper() not in WINDOW_AGG_FUNCTIONS:
+                raise RuntimeError(f"Aggregation function {transform.agg_func} of feature {feature.name} can't be "
+                                   f"computed online. Supported ones are {list(WINDOW_AGG_FUNCTIONS)}.")
+            if transform.group_by is not None or transform.limit is not None:
+                raise RuntimeError(f"Feature {feature.name} has a group_by or a limit, which can't be computed online.")
+        self._windows = {feature.name: parse_window(feature.transform.window) for feature in self.features}
+        self.bucket_seconds = bucket_seconds or max(1, min(self._windows.values()) // 60)
+        # keep the buckets until they are out of the longest window, plus a bucket for the clock skew of the writers
+        self.ttl_seconds = max(self._windows.values()) + 2 * self.bucket_seconds
+        self._key_columns = [typed_key.key_column for typed_key in self.features[0].key if typed_key]
+        if not self._key_columns:
+            raise RuntimeError(f"The features of anchor {anchor.name} must have a key to be aggregated online.")
+
+    def append(self, events: Union[pd.DataFrame, List[Dict[str, Any]]],
+               timestamp_column: Optional[str] = None) -> int:
+        """Adds events to the windows of their entities.
+
+        Args:
+            events: the events, with the key columns of the anchor and the columns used by the expressions of its
+                features
+            timestamp_column: column of the event times, as unix seconds or datetimes. Defaults to the
+                `event_timestamp_column` of the anchor source if the events have it, otherwise the events happen
+                now. Events that are already out of the window of a feature are ignored for that feature.
+
+        Return:
+            The number of updated buckets.
+        """
+        events = pd.DataFrame.from_records(events) if isinstance(events, list) else events
+        if events.empty:
+            return 0
+        missing_columns = [column for column in self._key_columns if column not in events.columns]
+        if missing_columns:
+            raise RuntimeError(f"Key columns {missing_columns} are missing from the events of anchor "
+                               f"{self.anchor.name}.")
+        now = self.clock()
+        timestamps = self._timestamps(events, timestamp_column, now)
+        keys = pd.Series(["#".join(str(value) for value in values)
+                          for values in zip(*[events[column].tolist() for column in self._key_columns])],
+                         index=events.index)
+        buckets = (timestamps // self.bucket_seconds).astype(np.int64)
+
+        updates: Dict[str, Dict[str, tuple]] = {}
+        for feature in self.features:
+            transform = feature.transform
+            values = pd.to_numeric(_evaluate_column(transform.def_expr, feature.name, events), errors="coerce")
+            selected = np.isfinite(values.to_numpy(dtype=np.float64, na_value=np.nan))
+            selected &= timestamps > now - self._windows[feature.name] - self.bucket_seconds
+            if transform.filter is not None:
+                selected &= _evaluate_column(transform.filter, feature.name, events).fillna(False).to_numpy(dtype=bool)
+            if not selected.any():
+                continue
+            frame = pd.DataFrame({"key": keys[selected], "bucket": buckets[selected],
+                                  "value": values[selected].astype(np.float64)})
+            partials = _PARTIAL_AGGREGATES[str(transform.agg_func).upper()]
+            aggregated = frame.groupby(["key", "bucket"])["value"].agg(partials)
+            for (key, bucket), row in zip(aggregated.index, aggregated.itertuples(index=False)):
+                fields = updates.setdefault(f"{key}{BUCKET_SEPARATOR}{bucket}", {})
+                for partial, value in zip(partials, row):
+                    fields[f"{feature.name}:{partial}"] = (_MERGE_OPERATIONS[partial], float(value))
+        if updates:
+            self.online_store.batch_accumulate(self.feature_table, updates, ttl_seconds=self.ttl_seconds)
+        return len(updates)
+
+    def get(self, keys: Sequence[str], feature_names: Optional[List[str]] = None,
+            now: Optional[float] = None) -> Dict[str, List[Any]]:
+        """Computes the window aggregation features of several entities from their buckets.
+
+        Args:
+            keys: the entity keys, like for `FeathrClient.multi_get_online_features`
+            feature_names: the features to compute. Defaults to all the window aggregation features of the anchor.
+            now: the end of the windows, as unix seconds. Defaults to the current time of `clock`.
+
+        Return:
+            A dict from key to the list of feature values, in the order of `feature_names`. The value is None when
+            the entity has no event in the window of the feature.
+        """
+        features = {feature.name: feature for feature in self.features}
+        feature_names = feature_names or list(features)
+        unknown = [feature_name for feature_name in feature_names if feature_name not in features]
+        if unknown:
+            raise RuntimeError(f"Features {unknown} are not window aggregation features of anchor {self.anchor.name}.")
+        keys = list(keys)
+        if not keys:
+            return {}
+        fields = list(dict.fromkeys(f"{feature_name}:{partial}" for feature_name in feature_names
+                                    for partial in _PARTIAL_AGGREGATES[str(features[feature_name].transform.agg_func)
+                                                                       .upper()]))
+        num_buckets = {feature_name: math.ceil(self._windows[feature_name] / self.bucket_seconds)
+                       for feature_name in feature_names}
+        current = int((self.clock() if now is None else now) // self.bucket_seconds)
+        # oldest bucket first, so that the window of each feature is the last buckets
+        buckets = range(current - max(num_buckets.values()) + 1, current + 1)
+        raw = self.online_store.batch_get([(self.feature_table, f"{key}{BUCKET_SEPARATOR}{bucket}", fields)
+                                           for key in keys for bucket in buckets])
+        # (keys, buckets, fields), NaN for the missing buckets
+        partials = np.array([[np.nan if value is None else float(value) for value in values] for values in raw],
+                            dtype=np.float64).reshape(len(keys), len(buckets), len(fields))
+
+        columns = []
+        for feature_name in feature_names:
+            window = partials[:, -num_buckets[feature_name]:, :]
+            agg_func = str(features[feature_name].transform.agg_func).upper()
+            merged = {partial: _merge(window[:, :, fields.index(f"{feature_name}:{partial}")], partial)
+                      for partial in _PARTIAL_AGGREGATES[agg_func]}
+            if agg_func == "AVG":
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    column = merged["sum"] / merged["count"]
+            else:
+                column = merged[_PARTIAL_AGGREGATES[agg_func][0]]
+            cast = int if agg_func == "COUNT" else float
+            columns.append([None if np.isnan(value) else cast(value) for value in column.tolist()])
+        return {key: [column[index] for column in columns] for index, key in enumerate(keys)}
+
+    def _timestamps(self, events: pd.DataFrame, timestamp_column: Optional[str], now: float) -> np.ndarray:
+        """Get the event times in unix seconds."""
+        if timestamp_column is None:
+            source_column = getattr(self.anchor.source, "event_timestamp_column", None)
+            timestamp_column = source_column if source_column in events.columns else None
+        if timestamp_column is None:
+            return np.full(len(events), now, dtype=np.float64)
+        column = events[timestamp_column]
+        if pd.api.types.is_numeric_dtype(column):
+            timestamps = column.to_numpy(dtype=np.float64)
+            if str(getattr(self.anchor.source, "timestamp_format", "")).lower() == "epoch_millis":
+                timestamps = timestamps / 1000
+            return timestamps
+        datetimes = pd.to_datetime(column, utc=True)
+        return (datetimes - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy(dtype=np.float64)
+
+
+def _merge(partials: np.ndarray, partial: str) -> np.ndarray:
+    """Merge the partial aggregates of the buckets of each key, i.e. each row. NaN if all of them are missing."""
+    missing = np.isnan(partials).all(axis=1)
+    with np.errstate(invalid="ignore"):
+        if partial == "max":
+            merged = np.nanmax(np.where(missing[:, None], 0, partials), axis=1)
+        elif partial == "min":
+            merged = np.nanmin(np.where(missing[:, None], 0, partials), axis=1)
+        else:
+            merged = np.nansum(partials, axis=1)
+    return np.where(missing, np.nan, merged)
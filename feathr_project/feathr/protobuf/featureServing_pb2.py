@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: featureServing.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from feathr.protobuf import featureValue_pb2 as featureValue__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14\x66\x65\x61tureServing.proto\x12\x08protobuf\x1a\x12\x66\x65\x61tureValue.proto\"S\n\x15OnlineFeaturesRequest\x12\x15\n\rfeature_table\x18\x01 \x01(\t\x12\x0c\n\x04keys\x18\x02 \x03(\t\x12\x15\n\rfeature_names\x18\x03 \x03(\t\"\xa0\x01\n\x0e\x45ntityFeatures\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x38\n\x08\x66\x65\x61tures\x18\x02 \x03(\x0b\x32&.protobuf.EntityFeatures.FeaturesEntry\x1aG\n\rFeaturesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12%\n\x05value\x18\x02 \x01(\x0b\x32\x16.protobuf.FeatureValue:\x02\x38\x01\"D\n\x16OnlineFeaturesResponse\x12*\n\x08\x65ntities\x18\x01 \x03(\x0b\x32\x18.protobuf.EntityFeaturesB+\n)com.linkedin.feathr.common.types.protobufb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'featureServing_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  DESCRIPTOR._serialized_options = b'\n)com.linkedin.feathr.common.types.protobuf'
+  _ENTITYFEATURES_FEATURESENTRY._options = None
+  _ENTITYFEATURES_FEATURESENTRY._serialized_options = b'8\001'
+  _ONLINEFEATURESREQUEST._serialized_start=54
+  _ONLINEFEATURESREQUEST._serialized_end=137
+  _ENTITYFEATURES._serialized_start=140
+  _ENTITYFEATURES._serialized_end=300
+  _ENTITYFEATURES_FEATURESENTRY._serialized_start=229
+  _ENTITYFEATURES_FEATURESENTRY._serialized_end=300
+  _ONLINEFEATURESRESPONSE._serialized_start=302
+  _ONLINEFEATURESRESPONSE._serialized_end=370
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,3 @@
+from .batcher import MicroBatcher
+from .metrics import ServingMetrics
+from .server import OnlineFeatureServer
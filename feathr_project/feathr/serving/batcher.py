@@ -0,0 +1,89 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Tuple
+
+from feathr.online.online_store import FeatureRequest
+from feathr.serving.metrics import ServingMetrics
+
+# fetches the raw values of a batch of requests, e.g. `FeathrClient._fetch_online_features`
+FetchFunction = Callable[[List[FeatureRequest]], List[List[Optional[bytes]]]]
+
+
+class MicroBatcher(object):
+    """Coalesces the online feature requests that arrive within a short window into one pipelined fetch.
+
+    The first request of a batch opens a window of `window_ms` milliseconds. All the requests that arrive until it
+    closes, or until the batch has `max_batch_size` entities, are fetched together with one call to `fetch`, on
+    `executor` so the event loop is never blocked. Each caller then gets the values of its own entities. This trades a
+    little latency for much fewer round trips per Redis connection under concurrent load.
+
+    Attributes:
+        fetch: function fetching the raw values of a list of (feature_table, key, feature_names) requests
+        window_ms: milliseconds to wait for more requests before fetching a batch. 0 to only batch the requests that
+            are already queued.
+        max_batch_size: max number of entities fetched in one batch
+        executor: executor running `fetch`. Defaults to the default executor of the event loop.
+        metrics: the batch size and fetch latency histograms
+    """
+    def __init__(self, fetch: FetchFunction, window_ms: float = 2, max_batch_size: int = 1000,
+                 executor: Optional[Executor] = None, metrics: Optional[ServingMetrics] = None):
+        if max_batch_size <= 0:
+            raise RuntimeError("max_batch_size must be positive.")
+        self.fetch = fetch
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.executor = executor
+        self.metrics = metrics or ServingMetrics()
+        self._pending: List[Tuple[List[FeatureRequest], asyncio.Future]] = []
+        self._pending_size = 0
+        self._flush_handle = None
+        # keep references to the running fetches, so they are not garbage collected before they are done
+        self._fetches = set()
+
+    async def submit(self, requests: List[FeatureRequest]) -> List[List[Optional[bytes]]]:
+        """Fetches the raw values of the requests as part of the next batch.
+
+        Return:
+            The raw values of each request, in the same order as `requests`.
+        """
+        if not requests:
+            return []
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((requests, future))
+        self._pending_size += len(requests)
+        if self._pending_size >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_ms / 1000.0, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending, self._pending_size = self._pending, [], 0
+        if pending:
+            fetch = asyncio.ensure_future(self._fetch_batch(pending))
+            self._fetches.add(fetch)
+            fetch.add_done_callback(self._fetches.discard)
+
+    async def _fetch_batch(self, pending: List[Tuple[List[FeatureRequest], asyncio.Future]]):
+        batch = [request for requests, _ in pending for request in requests]
+        self.metrics.batch_size.observe(len(batch))
+        start = time.perf_counter()
+        try:
+            rows = await asyncio.get_running_loop().run_in_executor(self.executor, self.fetch, batch)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.metrics.fetch_seconds.observe(time.perf_counter() - start)
+        offset = 0
+        for requests, future in pending:
+            if not future.done():
+                future.set_result(rows[offset:offset + len(requests)])
+            offset += len(requests)
@@ -0,0 +1,42 @@
+from feathr.online.metrics import _SECONDS_BUCKETS
+
+_BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class ServingMetrics(object):
+    """Prometheus metrics of the online feature serving service, with the same histograms as the online read metrics
+    of the client(see `PrometheusOnlineMetricsHook`).
+
+    Metrics:
+        <namespace>_request_seconds: histogram of the time to serve a request, including the wait for its batch
+        <namespace>_fetch_seconds: histogram of the time spent fetching a batch
+        <namespace>_batch_size: histogram of the number of entities fetched in a batch
+
+    Attributes:
+        registry: the Prometheus registry of the metrics, served at `GET /metrics`. Defaults to a registry of its own.
+            Pass it to `PrometheusOnlineMetricsHook` as well to serve the online read metrics of the client with them.
+        namespace: prefix of the metric names
+    """
+    def __init__(self, registry=None, namespace: str = "feathr_serving"):
+        try:
+            from prometheus_client import CollectorRegistry, Histogram
+        except ImportError:
+            raise RuntimeError("prometheus_client is required by the online feature serving service. "
+                               "Please install feathr[serving].")
+        self.registry = registry or CollectorRegistry()
+        self.namespace = namespace
+        self.request_seconds = Histogram(f"{namespace}_request_seconds", "Time to serve an online feature request",
+                                         buckets=_SECONDS_BUCKETS, registry=self.registry)
+        self.fetch_seconds = Histogram(f"{namespace}_fetch_seconds", "Time spent fetching a batch of online features",
+                                       buckets=_SECONDS_BUCKETS, registry=self.registry)
+        self.batch_size = Histogram(f"{namespace}_batch_size", "Number of entities fetched in a batch",
+                                    buckets=_BATCH_SIZE_BUCKETS, registry=self.registry)
+
+    def count(self, name: str) -> int:
+        """Get the number of observations of a histogram, e.g. `batch_size`."""
+        return int(self.registry.get_sample_value(f"{self.namespace}_{name}_count") or 0)
+
+    def exposition(self) -> bytes:
+        """Get the metrics in the Prometheus text format."""
+        from prometheus_client import generate_latest
+        return generate_latest(self.registry)
@@ -0,0 +1,148 @@
+import asyncio
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from feathr.online.decoder import _parse_feature_value, decode_feature_values
+from feathr.serving.batcher import FetchFunction, MicroBatcher
+from feathr.serving.metrics import ServingMetrics
+
+GRPC_SERVICE_NAME = "protobuf.FeathrOnlineFeatureService"
+
+
+class OnlineFeatureServer(object):
+    """Online feature serving service, so that model servers don't each need their own Feathr client and Redis
+    connections.
+
+    It serves online features over HTTP(FastAPI) and optionally gRPC, on top of the online read path of a
+    `FeathrClient`, including its online store and cache. Concurrent requests are coalesced by a `MicroBatcher`, so
+    one pipelined fetch serves all the requests that arrive within `window_ms`. The latency and batch size histograms
+    are served in the Prometheus format at `GET /metrics`, see `ServingMetrics`.
+
+    HTTP API:
+        POST /v1/online_features with {"feature_table": ..., "keys": [...], "feature_names": [...]} returns
+        {key: [feature values]} like `FeathrClient.multi_get_online_features`. Bytes values are base64 encoded.
+
+    gRPC API:
+        `protobuf.FeathrOnlineFeatureService/GetOnlineFeatures` takes an `OnlineFeaturesRequest` and returns an
+        `OnlineFeaturesResponse` with the `FeatureValue` protobuf of each feature(see `featureServing.proto`).
+
+    Attributes:
+        fetch: function fetching the raw values of a list of (feature_table, key, feature_names) requests, e.g.
+            `FeathrClient._fetch_online_features`
+        window_ms: milliseconds to wait for more requests before fetching a batch
+        max_batch_size: max number of entities fetched in one batch
+        max_workers: number of threads running the fetches
+        metrics: the Prometheus metrics of the service
+    """
+    def __init__(self, fetch: FetchFunction, window_ms: float = 2, max_batch_size: int = 1000, max_workers: int = 8,
+                 metrics: Optional[ServingMetrics] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="feathr-serving")
+        self.metrics = metrics or ServingMetrics()
+        self.batcher = MicroBatcher(fetch, window_ms, max_batch_size, self.executor, self.metrics)
+
+    @classmethod
+    def from_client(cls, client, **kwargs) -> "OnlineFeatureServer":
+        """Creates the server on the online read path of a `FeathrClient`."""
+        return cls(client._fetch_online_features, **kwargs)
+
+    async def get_raw_features(self, feature_table: str, keys: List[str],
+                               feature_names: List[str]) -> List[List[Optional[bytes]]]:
+        """Fetches the raw values of the features of the keys, as part of the next batch."""
+        start = time.perf_counter()
+        try:
+            return await self.batcher.submit([(feature_table, key, feature_names) for key in keys])
+        finally:
+            self.metrics.request_seconds.observe(time.perf_counter() - start)
+
+    async def get_online_features(self, feature_table: str, keys: List[str],
+                                  feature_names: List[str]) -> Dict[str, List[Any]]:
+        """Fetches the decoded values of the features of the keys, see `FeathrClient.multi_get_online_features`."""
+        rows = await self.get_raw_features(feature_table, keys, feature_names)
+        return dict(zip(keys, [decode_feature_values(row) for row in rows]))
+
+    def create_app(self):
+        """Creates the FastAPI app of the HTTP endpoint."""
+        from fastapi import FastAPI, Response
+        from prometheus_client import CONTENT_TYPE_LATEST
+        from pydantic import BaseModel
+
+        class OnlineFeaturesRequest(BaseModel):
+            feature_table: str
+            keys: List[str]
+            feature_names: List[str]
+
+        app = FastAPI(title="Feathr online feature serving")
+
+        @app.post("/v1/online_features")
+        async def online_features(request: OnlineFeaturesRequest):
+            result = await self.get_online_features(request.feature_table, request.keys, request.feature_names)
+            return {key: [_to_json_value(value) for value in values] for key, values in result.items()}
+
+        @app.get("/metrics")
+        async def metrics():
+            return Response(self.metrics.exposition(), media_type=CONTENT_TYPE_LATEST)
+
+        @app.get("/health")
+        async def health():
+            return {"status": "ok"}
+
+        return app
+
+    def create_grpc_server(self, port: int, host: str = "[::]"):
+        """Creates the asyncio gRPC server of the gRPC endpoint, listening on `host:port`. It must be started with
+        `await server.start()` on the event loop of the HTTP endpoint, so both endpoints share the same batches."""
+        import grpc
+        from feathr.protobuf.featureServing_pb2 import OnlineFeaturesRequest, OnlineFeaturesResponse
+
+        async def get_online_features(request, context):
+            rows = await self.get_raw_features(request.feature_table, list(request.keys),
+                                               list(request.feature_names))
+            return _to_grpc_response(request, rows, OnlineFeaturesResponse())
+
+        handler = grpc.method_handlers_generic_handler(GRPC_SERVICE_NAME, {
+            "GetOnlineFeatures": grpc.unary_unary_rpc_method_handler(
+                get_online_features,
+                request_deserializer=OnlineFeaturesRequest.FromString,
+                response_serializer=OnlineFeaturesResponse.SerializeToString)})
+        server = grpc.aio.server()
+        server.add_generic_rpc_handlers((handler,))
+        server.add_insecure_port(f"{host}:{port}")
+        return server
+
+    def serve(self, host: str = "0.0.0.0", port: int = 8000, grpc_port: Optional[int] = None):
+        """Runs the HTTP endpoint, and the gRPC endpoint if `grpc_port` is set, until the process is stopped."""
+        import uvicorn
+
+        async def run():
+            grpc_server = None
+            if grpc_port:
+                grpc_server = self.create_grpc_server(grpc_port)
+                await grpc_server.start()
+            try:
+                await uvicorn.Server(uvicorn.Config(self.create_app(), host=host, port=port)).serve()
+            finally:
+                if grpc_server is not None:
+                    await grpc_server.stop(grace=5)
+                self.executor.shutdown(wait=False)
+
+        asyncio.run(run())
+
+
+def _to_json_value(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    # the decoded arrays are protobuf repeated containers, and sparse features (indices, values) pairs of them
+    if isinstance(value, Iterable) and not isinstance(value, str):
+        return [_to_json_value(v) for v in value]
+    return value
+
+
+def _to_grpc_response(request, rows: List[List[Optional[bytes]]], response):
+    for key, row in zip(request.keys, rows):
+        entity = response.entities.add(key=key)
+        for feature_name, raw in zip(request.feature_names, row):
+            if raw:
+                _parse_feature_value(raw, entity.features[feature_name])
+    return response
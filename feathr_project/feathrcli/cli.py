@@ -236,3 +236,23 @@ def test(features):
 
     click.echo('\nFeature computation completed.')
     click.echo(stack_entry_point_result)
+
+
+@cli.command()
+@click.option('--host', default='0.0.0.0', help='Host to listen on.')
+@click.option('--port', default=8000, help='Port of the HTTP endpoint.')
+@click.option('--grpc-port', default=None, type=int, help='Port of the gRPC endpoint. It is disabled if not set.')
+@click.option('--window-ms', default=2.0, help='Milliseconds to wait for concurrent requests to fetch them together.')
+@click.option('--max-batch-size', default=1000, help='Max number of entities fetched in one batch.')
+@click.option('--config', 'config_path', default='./feathr_config.yaml', help='Path of the Feathr config.')
+def serve(host, port, grpc_port, window_ms, max_batch_size, config_path):
+    """
+    Serves the features of the online store over HTTP, and optionally gRPC. Concurrent requests are coalesced into
+    one pipelined fetch. Requires the `serving` extra: pip install "feathr[serving]".
+    """
+    from feathr.serving import OnlineFeatureServer
+
+    client = FeathrClient(config_path=config_path)
+    server = OnlineFeatureServer.from_client(client, window_ms=window_ms, max_batch_size=max_batch_size)
+    click.echo(click.style(f'Serving online features on {host}:{port}.', fg='green'))
+    server.serve(host=host, port=port, grpc_port=grpc_port)
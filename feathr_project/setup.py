@@ -27,7 +27,7 @@ setup(
         "py4j",
         "loguru",
         "pandas",
-        "redis",
+        "redis>=4.4.0",
         "requests",
         "pyapacheatlas",
         "pyhocon",
@@ -55,7 +55,15 @@ setup(
     ],
     tests_require=[
         'pytest',
+        'fakeredis',
     ],
+    extras_require={
+        # dependencies of the online feature serving service(`feathr serve`)
+        # featureServing_pb2 is generated by protoc 3.20+, and needs the protobuf runtime of the same version
+        'serving': ['fastapi', 'uvicorn', 'grpcio', 'protobuf>=3.20', 'prometheus_client'],
+        # Prometheus exporter of the online read metrics(`PrometheusOnlineMetricsHook`)
+        'prometheus': ['prometheus_client'],
+    },
     entry_points={
         'console_scripts': ['feathr=feathrcli.cli:cli']
     },
@@ -0,0 +1,49 @@
+"""Benchmark of the row based and the columnar decoding of online feature values.
+
+Usage: python benchmark_online_decode.py --entities 100000 --scalar-features 20 --vector-features 2 --vector-size 64
+"""
+import argparse
+import base64
+import random
+import time
+
+from feathr.online import decode_feature_columns, decode_feature_values
+from feathr.protobuf.featureValue_pb2 import FeatureValue
+
+
+def generate_rows(num_entities: int, num_scalar_features: int, num_vector_features: int, vector_size: int):
+    """Generate base64 encoded FeatureValues in the same layout as a Redis pipeline of HMGET."""
+    row = []
+    for _ in range(num_scalar_features):
+        row.append(base64.b64encode(FeatureValue(float_value=random.random()).SerializeToString()))
+    for _ in range(num_vector_features):
+        feature_value = FeatureValue()
+        feature_value.float_array.floats.extend(random.random() for _ in range(vector_size))
+        row.append(base64.b64encode(feature_value.SerializeToString()))
+    # values don't need to differ between entities to measure the decoding cost
+    return [list(row) for _ in range(num_entities)]
+
+
+def run(num_entities: int, num_scalar_features: int, num_vector_features: int, vector_size: int):
+    rows = generate_rows(num_entities, num_scalar_features, num_vector_features, vector_size)
+    feature_names = [f"f_{i}" for i in range(len(rows[0]))]
+    keys = [str(i) for i in range(num_entities)]
+
+    start = time.perf_counter()
+    dict(zip(keys, [decode_feature_values(row) for row in rows]))
+    print(f"row based decoding (current path): {time.perf_counter() - start:.3f}s")
+
+    for output_format in ["numpy", "arrow", "pandas"]:
+        start = time.perf_counter()
+        decode_feature_columns(rows, feature_names, output_format=output_format, keys=keys)
+        print(f"columnar decoding to {output_format}: {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark online feature decoding.")
+    parser.add_argument("--entities", type=int, default=100000)
+    parser.add_argument("--scalar-features", type=int, default=20)
+    parser.add_argument("--vector-features", type=int, default=2)
+    parser.add_argument("--vector-size", type=int, default=64)
+    args = parser.parse_args()
+    run(args.entities, args.scalar_features, args.vector_features, args.vector_size)
@@ -2,6 +2,7 @@ from feathr import AvroJsonSchema
 from feathr import KafKaSource
 from feathr import KafkaConfig
 from typing import List
+import base64
 import os
 import random
 from datetime import datetime, timedelta
@@ -10,6 +11,9 @@ from feathr import (BOOLEAN, FLOAT, INPUT_CONTEXT, INT32, STRING,
                     DerivedFeature, Feature, FeatureAnchor, HdfsSource,
                     TypedKey, ValueType, WindowAggTransformation)
 from feathr import FeathrClient
+from feathr.online.online_store import OnlineStore
+from feathr.online.redis_store import RedisOnlineStore
+from feathr.protobuf.featureValue_pb2 import FeatureValue
 from pyspark.sql import DataFrame
 
 
@@ -372,4 +376,49 @@ def registry_test_setup_append(config_path: str):
 def get_online_test_table_name(table_name: str):
     # use different time for testing to avoid write conflicts
     now = datetime.now()
-    return '_'.join([table_name, str(now.minute), str(now.second)])
\ No newline at end of file
+    return '_'.join([table_name, str(now.minute), str(now.second)])
+
+
+def online_store_test_setup(redis_client) -> FeathrClient:
+    """Create a FeathrClient that only talks to the given (fake) Redis client, or to the given OnlineStore, without
+    any Spark or registry resources. Only the online store APIs can be used with it."""
+    if not isinstance(redis_client, OnlineStore):
+        redis_client = RedisOnlineStore(redis_client)
+    return FeathrClient.from_online_store(redis_client)
+
+
+def encode(**kwargs) -> bytes:
+    """Encode a FeatureValue the way the materialization jobs write it to Redis, base64 encoded."""
+    return base64.b64encode(FeatureValue(**kwargs).SerializeToString())
+
+
+def counting_redis(**kwargs):
+    """Create a fake Redis client that records the names of the commands sent to it in `commands`, and counts its
+    round trips in `round_trips`: one per command sent on its own, and one per pipeline."""
+    import fakeredis
+
+    class CountingRedis(fakeredis.FakeRedis):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.commands = []
+            self.round_trips = 0
+
+        def execute_command(self, *args, **options):
+            self.commands.append(args[0])
+            self.round_trips += 1
+            return super().execute_command(*args, **options)
+
+        def pipeline(self, *args, **kwargs):
+            redis_pipeline = super().pipeline(*args, **kwargs)
+            execute = redis_pipeline.execute
+
+            def counting_execute(*execute_args, **execute_kwargs):
+                if redis_pipeline.command_stack:
+                    self.commands.extend(command[0][0] for command in redis_pipeline.command_stack)
+                    self.round_trips += 1
+                return execute(*execute_args, **execute_kwargs)
+
+            redis_pipeline.execute = counting_execute
+            return redis_pipeline
+
+    return CountingRedis(**kwargs)
@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from feathr.online import IvfIndex, ann
+from test_fixture import online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def clustered_vectors(count, dimension=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(10, dimension))
+    return (centers[rng.integers(0, 10, count)] + rng.normal(scale=0.1, size=(count, dimension))).astype(np.float32)
+
+
+def exact_neighbours(vectors, query, k):
+    similarities = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+    return [str(index) for index in np.argsort(-similarities, kind="stable")[:k]]
+
+
+def test_ivf_index(tmp_path):
+    vectors = clustered_vectors(1000)
+    keys = [str(i) for i in range(1000)]
+    index = IvfIndex.build(str(tmp_path), keys, vectors, num_lists=16, num_probes=4)
+    assert index.num_lists == 16 and index.offsets[-1] == 1000
+    assert isinstance(IvfIndex.load(str(tmp_path)).vectors, np.memmap)
+
+    query = vectors[42]
+    assert index.search(query, k=1)[0][0] == "42"
+    assert index.search(query, k=1)[0][1] == pytest.approx(1.0)
+    # probing all the lists is an exact search
+    assert [key for key, _ in index.search(query, k=10, num_probes=16)] == exact_neighbours(vectors, query, 10)
+
+    l2_index = IvfIndex.build(str(tmp_path / "l2"), keys, vectors, metric="l2", num_lists=16)
+    neighbours = l2_index.search(vectors[7] + 0.01, k=3, num_probes=16)
+    assert neighbours[0][0] == "7" and neighbours[0][1] == pytest.approx(0.01 * np.sqrt(8), rel=1e-3)
+    assert [distance for _, distance in neighbours] == sorted(distance for _, distance in neighbours)
+
+
+def test_index_versions(tmp_path, monkeypatch):
+    vectors = clustered_vectors(50)
+    keys = [str(i) for i in range(50)]
+    for _ in range(3):
+        IvfIndex.build(str(tmp_path), keys, vectors, num_lists=4)
+    # the replaced versions are kept during the grace period
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("v")]) == 3
+
+    monkeypatch.setattr(ann, "_VERSION_GRACE_SECONDS", 0)
+    index = IvfIndex.build(str(tmp_path), keys, vectors, num_lists=4)
+    # the previous version is always kept, for the readers that loaded it before the switch
+    versions = sorted(name for name in os.listdir(tmp_path) if name.startswith("v"))
+    assert len(versions) == 2 and open(tmp_path / "CURRENT").read() == versions[-1]
+    assert IvfIndex.load(str(tmp_path)).search(vectors[3], k=1)[0][0] == index.search(vectors[3], k=1)[0][0]
+
+
+def test_nearest_features_from_online_table(tmp_path):
+    client = online_store_test_setup(fakeredis.FakeRedis())
+    vectors = clustered_vectors(300)
+    client.push_online_features("items", [{"id": i, "f_embedding": vector.tolist()}
+                                          for i, vector in enumerate(vectors)] + [{"id": 999, "f_price": 1.0}], "id")
+    index = client.build_ann_index("items", "f_embedding", path=str(tmp_path / "index"), num_lists=8,
+                                   auto_refresh=True)
+    assert len(index.keys) == 300
+    assert client.nearest_features("items", "f_embedding", vectors[5], k=1)[0][0] == "5"
+
+    # loading new items rebuilds the index in the background, with the same clusters
+    dataset = tmp_path / "new_items"
+    dataset.mkdir()
+    pq.write_table(pa.Table.from_pandas(pd.DataFrame({"id": [1000], "f_embedding": [vectors[5] * 2]})),
+                   dataset / "part-0.parquet")
+    client.load_online_features("items", str(dataset), "id", progress=False)
+    for thread in list(client._ann_refreshes.values()):
+        thread.join()
+    rebuilt = client.ann_indexes[("items", "f_embedding")]
+    assert len(rebuilt.keys) == 301
+    assert np.array_equal(rebuilt.centroids, index.centroids)
+    assert {key for key, _ in client.nearest_features("items", "f_embedding", vectors[5], k=2)} == {"5", "1000"}
+
+    with pytest.raises(RuntimeError):
+        client.nearest_features("items", "f_other", vectors[5])
+
+    # without auto refresh, the index is only rebuilt on demand
+    client.build_ann_index("items", "f_embedding", path=str(tmp_path / "index"), num_lists=8)
+    client.push_online_features("items", [{"id": 1001, "f_embedding": (vectors[5] * 3).tolist()}], "id")
+    client.load_online_features("items", str(dataset), "id", progress=False)
+    assert not client._ann_refreshes and len(client.ann_indexes[("items", "f_embedding")].keys) == 301
+    assert len(client.refresh_ann_index("items", "f_embedding").keys) == 302
+
+
+def test_build_ann_index_from_dataset(tmp_path):
+    client = online_store_test_setup(fakeredis.FakeRedis())
+    vectors = clustered_vectors(200)
+    dataset = tmp_path / "dataset"
+    dataset.mkdir()
+    pq.write_table(pa.Table.from_pandas(pd.DataFrame({"user_id": range(200), "region": ["us"] * 200,
+                                                      "f_embedding": list(vectors)})), dataset / "part-0.parquet")
+    client.build_ann_index("users", "f_embedding", path=str(tmp_path / "index"), dataset_path=str(dataset),
+                           key_column=["user_id", "region"])
+    assert client.nearest_features("users", "f_embedding", vectors[9], k=1)[0][0] == "9#us"
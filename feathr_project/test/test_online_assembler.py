@@ -0,0 +1,64 @@
+import pytest
+
+from feathr import (BOOLEAN, FLOAT, INPUT_CONTEXT, INT32_VECTOR, Aggregation, DerivedFeature, Feature, FeatureAnchor,
+                    HdfsSource, LookupFeature, TypedKey, ValueType)
+from feathr.online import OnlineFeatureAssembler
+from feathr.protobuf.featureValue_pb2 import IntegerArray
+from test_fixture import counting_redis, encode, online_store_test_setup
+
+pytest.importorskip("fakeredis")
+
+
+def test_online_assembler():
+    """Derived, lookup and INPUT_CONTEXT features should be computed from the fetched base features"""
+    user_key = TypedKey(key_column="user_id", key_column_type=ValueType.INT32)
+    item_key = TypedKey(key_column="item_id", key_column_type=ValueType.INT32)
+    source = HdfsSource(name="users", path="wasbs://users.csv")
+    user_fare = Feature(name="f_user_fare", feature_type=FLOAT, key=user_key)
+    user_tip = Feature(name="f_user_tip", feature_type=FLOAT, key=user_key)
+    user_items = Feature(name="f_user_items", feature_type=INT32_VECTOR, key=user_key)
+    item_price = Feature(name="f_item_price", feature_type=FLOAT, key=item_key)
+    is_long_trip = Feature(name="f_is_long_trip", feature_type=BOOLEAN, transform="trip_distance > 30")
+    user_total = DerivedFeature(name="f_user_total", feature_type=FLOAT, key=user_key,
+                                input_features=[user_fare, user_tip], transform="f_user_fare + f_user_tip")
+    user_generous = DerivedFeature(name="f_user_generous", feature_type=BOOLEAN, key=user_key,
+                                   input_features=[user_total, user_tip],
+                                   transform="f_user_tip > 0.2 * f_user_total && f_user_total > 0")
+    avg_price = LookupFeature(name="f_user_avg_item_price", feature_type=FLOAT, key=user_key,
+                              base_feature=user_items, expansion_feature=item_price, aggregation=Aggregation.AVG)
+    max_price = LookupFeature(name="f_user_max_item_price", feature_type=FLOAT, key=user_key,
+                              base_feature=user_items, expansion_feature=item_price, aggregation=Aggregation.MAX)
+
+    redis_client = counting_redis()
+    redis_client.hset("users:1", mapping={"f_user_fare": encode(float_value=10.0),
+                                          "f_user_tip": encode(float_value=5.0),
+                                          "f_user_items": encode(int_array=IntegerArray(integers=[7, 8, 9]))})
+    redis_client.hset("users:2", mapping={"f_user_fare": encode(float_value=20.0),
+                                          "f_user_tip": encode(float_value=1.0)})
+    redis_client.hset("items:7", "f_item_price", encode(float_value=1.0))
+    redis_client.hset("items:8", "f_item_price", encode(float_value=3.0))
+    client = online_store_test_setup(redis_client)
+    assembler = OnlineFeatureAssembler(
+        client._fetch_online_features,
+        feature_tables={"f_user_fare": "users", "f_user_tip": "users", "f_user_items": "users",
+                        "f_item_price": "items"},
+        anchors=[FeatureAnchor(name="users", source=source, features=[user_fare, user_tip, user_items]),
+                 FeatureAnchor(name="request", source=INPUT_CONTEXT, features=[is_long_trip])],
+        derived_features=[user_total, user_generous, avg_price, max_price])
+
+    # the layouts and aliases of the tables are loaded once, and then cached
+    client.online_reader.load_packed_schemas(["users", "items"])
+    client.online_reader.load_table_aliases(["users", "items"])
+    redis_client.round_trips = 0
+    result = assembler.get_online_features(
+        ["1", "2", "3"],
+        ["f_user_total", "f_user_generous", "f_user_avg_item_price", "f_user_max_item_price", "f_is_long_trip"],
+        request_data={"trip_distance": [12.0, 45.0, 31.0]})
+    assert result == {"1": [15.0, True, 2.0, 3.0, False],
+                      "2": [21.0, False, None, None, True],
+                      "3": [None, None, None, None, True]}
+    # one round for the base features and one for the lookups
+    assert redis_client.round_trips == 2
+
+    with pytest.raises(RuntimeError):
+        assembler.get_online_features(["1"], ["f_unknown"])
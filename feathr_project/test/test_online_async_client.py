@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from feathr import AsyncFeathrOnlineClient
+from feathr.online import RedisOnlineStore, ValueEncoder, swap_table_alias, train_dictionary
+from feathr.online.codec import DICTIONARY_TABLE
+from feathr.online.packed import SCHEMA_TABLE, pack_row, schema_entry, schema_version
+from feathr.protobuf.featureValue_pb2 import FeatureValue
+from test_fixture import encode, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def prepare_online_store() -> "fakeredis.FakeServer":
+    server = fakeredis.FakeServer()
+    redis_client = fakeredis.FakeRedis(server=server)
+    redis_client.hset("trips:1", mapping={"f_distance": encode(float_value=1.5), "f_city": encode(string_value="sea")})
+    redis_client.hset("trips:2", mapping={"f_distance": encode(float_value=2.5)})
+    redis_client.hset("users:7", mapping={"f_age": encode(int_value=30)})
+    return server
+
+
+def test_async_online_client_get_features():
+    """Async client should fetch and decode features like the synchronous client"""
+    server = prepare_online_store()
+
+    async def run():
+        async with AsyncFeathrOnlineClient(redis_client=fakeredis.FakeAsyncRedis(server=server)) as client:
+            single = await client.get_online_features("trips", "1", ["f_distance", "f_city"])
+            multi = await client.multi_get_online_features("trips", ["1", "2", "3"], ["f_distance", "f_city"])
+            columnar = await client.multi_get_online_features("trips", ["1", "2"], ["f_distance"], output_format="numpy")
+            return single, multi, columnar
+
+    single, multi, columnar = asyncio.run(run())
+    assert single == [1.5, "sea"]
+    assert multi == {"1": [1.5, "sea"], "2": [2.5, None], "3": [None, None]}
+    assert list(columnar["f_distance"]) == [1.5, 2.5]
+
+
+def test_async_online_client_gather_tables():
+    """Async client should fetch several feature tables concurrently and keep the request order"""
+    server = prepare_online_store()
+
+    async def run():
+        client = AsyncFeathrOnlineClient(redis_client=fakeredis.FakeAsyncRedis(server=server))
+        try:
+            return await client.gather_online_features([("users", ["7"], ["f_age"]),
+                                                        ("trips", ["2"], ["f_distance"])])
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == [{"7": [30]}, {"2": [2.5]}]
+
+
+def test_async_online_client_metadata():
+    """Async client should resolve the aliases, read the packed rows and load the zstd dictionaries like the
+    synchronous client"""
+    pytest.importorskip("zstandard")
+    server = fakeredis.FakeServer()
+    store = RedisOnlineStore(fakeredis.FakeRedis(server=server))
+    encoder = ValueEncoder("zstd", dictionary=train_dictionary(
+        [FeatureValue(float_value=float(i)).SerializeToString() for i in range(2000)], 1024))
+    store.batch_put(SCHEMA_TABLE, {"rides__v1": schema_entry(["f_fare", "f_city"])})
+    store.batch_put_rows("rides__v1", {"1": pack_row(
+        [encoder.encode(FeatureValue(float_value=1.5).SerializeToString()), None], schema_version(["f_fare", "f_city"]))})
+    for key, row in encoder.dictionary_entry().items():
+        store.batch_put(DICTIONARY_TABLE, {key: row})
+    swap_table_alias(store, "rides", "rides__v1")
+    store.batch_put("trips", {"1": {"f_distance": encode(float_value=2.5)}})
+
+    async def run():
+        async with AsyncFeathrOnlineClient(redis_client=fakeredis.FakeAsyncRedis(server=server)) as client:
+            single = await client.get_online_features("rides", "1", ["f_city", "f_fare"])
+            merged = await client.multi_table_get_online_features([("rides", ["1", "2"], ["f_fare"]),
+                                                                   ("trips", ["1", "2"], ["f_distance"])])
+            return single, merged
+
+    single, merged = asyncio.run(run())
+    assert single == [None, 1.5] == online_store_test_setup(store).get_online_features("rides", "1",
+                                                                                       ["f_city", "f_fare"])
+    assert merged == {"1": [1.5, 2.5], "2": [None, None]}
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from feathr.online import OnlineFeatureCache, RedisOnlineStore, swap_table_alias
+from test_fixture import counting_redis, encode, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_online_cache_ttl_and_lru_eviction():
+    """Cache should expire entries after their TTL and evict the least recently used ones"""
+    cache = OnlineFeatureCache(max_size=2, ttl_seconds=60, negative_ttl_seconds=0.05)
+    cache.put("t", "1", ["a", "b"], [b"x", None])
+    values, uncached = cache.get("t", "1", ["a", "b", "c"])
+    assert values == [b"x", None, None]
+    assert uncached == ["c"]
+    time.sleep(0.06)
+    # the negative entry expired
+    assert cache.get("t", "1", ["b"])[1] == ["b"]
+    cache.put("t", "2", ["a"], [b"y"])
+    cache.get("t", "1", ["a"])
+    cache.put("t", "3", ["a"], [b"z"])
+    # ("t", "2", "a") is the least recently used entry
+    assert cache.get("t", "2", ["a"])[1] == ["a"]
+    assert cache.get("t", "1", ["a"])[0] == [b"x"]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] + stats["misses"] == 7
+
+
+def test_online_cache_in_client():
+    """Cached values should be served without going to Redis, including missing keys"""
+    redis_client = counting_redis()
+    redis_client.hset("trips:1", mapping={"f_distance": encode(float_value=1.5), "f_city": encode(string_value="sea")})
+    client = online_store_test_setup(redis_client)
+    cache = client.enable_online_cache()
+
+    assert client.get_online_features("trips", "1", ["f_distance"]) == [1.5]
+    assert client.multi_get_online_features("trips", ["1", "2"], ["f_distance", "f_city"]) == \
+        {"1": [1.5, "sea"], "2": [None, None]}
+    redis_client.commands.clear()
+    assert client.multi_get_online_features("trips", ["1", "2"], ["f_distance", "f_city"]) == \
+        {"1": [1.5, "sea"], "2": [None, None]}
+    assert redis_client.commands == []
+    assert cache.stats()["hits"] == 5
+
+
+def test_online_cache_warmup():
+    """Warmup should load all features of the keys and cache unknown keys as missing"""
+    redis_client = counting_redis()
+    redis_client.hset("trips:1", mapping={"f_distance": encode(float_value=1.5), "f_city": encode(string_value="sea")})
+    client = online_store_test_setup(redis_client)
+    with pytest.raises(RuntimeError):
+        client.warmup_online_cache("trips", ["1"])
+    client.enable_online_cache()
+    client.warmup_online_cache("trips", ["1", "2"])
+    redis_client.commands.clear()
+    assert client.multi_get_online_features("trips", ["1", "2"], ["f_city", "f_distance"]) == \
+        {"1": ["sea", 1.5], "2": [None, None]}
+    assert redis_client.commands == []
+
+
+def test_online_cache_warmup_versioned_table():
+    """Warmup of a versioned table should cache the values of its current version"""
+    store = RedisOnlineStore(fakeredis.FakeRedis())
+    client = online_store_test_setup(store)
+    client.push_online_features("trips__v2", [{"id": 1, "f_distance": 2.5}], "id")
+    swap_table_alias(store, "trips", "trips__v2")
+    cache = client.enable_online_cache()
+    client.warmup_online_cache("trips", ["1"])
+    assert cache.get("trips__v2", "1", ["f_distance"])[1] == []
+    assert client.get_online_features("trips", "1", ["f_distance"]) == [2.5]
@@ -0,0 +1,51 @@
+import threading
+import time
+
+import pytest
+
+from feathr.online._chunked import _map_chunks_in_order
+from test_fixture import encode, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_map_chunks_in_order_bounds_in_flight_chunks():
+    """Chunks should be yielded in order, with no more than `parallelism` chunks fetched ahead of the consumer"""
+    lock = threading.Lock()
+    started = []
+
+    def fetch_chunk(chunk):
+        with lock:
+            started.append(chunk[0])
+        # later chunks finish first
+        time.sleep(0.01 * (10 - chunk[0] // 3))
+        return list(chunk)
+
+    results = _map_chunks_in_order(fetch_chunk, list(range(30)), chunk_size=3, parallelism=2)
+    assert next(results) == [0, 1, 2]
+    assert len(started) <= 3
+    assert [x for chunk in results for x in chunk] == list(range(3, 30))
+    with pytest.raises(RuntimeError):
+        next(_map_chunks_in_order(fetch_chunk, [1], chunk_size=0, parallelism=2))
+
+
+def test_multi_get_online_features_iter():
+    """Chunked results should match the result of a single multi get"""
+    redis_client = fakeredis.FakeRedis()
+    keys = [str(i) for i in range(250)]
+    for key in keys[:200]:
+        redis_client.hset("trips:" + key, "f_distance", encode(double_value=float(key)))
+    client = online_store_test_setup(redis_client)
+
+    chunks = list(client.multi_get_online_features_iter("trips", keys, ["f_distance"], chunk_size=40, parallelism=3))
+    assert len(chunks) == 7
+    merged = {}
+    for chunk in chunks:
+        merged.update(chunk)
+    assert list(merged) == keys
+    assert merged == client.multi_get_online_features("trips", keys, ["f_distance"])
+
+    columns = list(client.multi_get_online_features_iter("trips", keys, ["f_distance"], chunk_size=100,
+                                                         output_format="numpy"))
+    assert [len(chunk["f_distance"]) for chunk in columns] == [100, 100, 50]
+    assert columns[1]["f_distance"][0] == 100.0
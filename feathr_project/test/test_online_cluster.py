@@ -0,0 +1,64 @@
+import pytest
+
+from feathr.online._cluster import _cluster_hmget_many, _parse_redis_startup_nodes
+from redis.exceptions import ConnectionError
+from test_fixture import encode
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class FakeNode:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeRedisCluster:
+    """Stand-in for `redis.cluster.RedisCluster` that shards the keys over fake Redis nodes by their last character"""
+    def __init__(self, num_nodes):
+        self.nodes = [FakeNode(f"node{i}:6379") for i in range(num_nodes)]
+        self.clients = {node.name: fakeredis.FakeRedis() for node in self.nodes}
+        self.failed_nodes = set()
+        self.fallbacks = 0
+
+    def get_node_from_key(self, key, replica=False):
+        return self.nodes[ord(key[-1]) % len(self.nodes)]
+
+    def get_redis_connection(self, node):
+        if node.name in self.failed_nodes:
+            raise ConnectionError("node is down")
+        return self.clients[node.name]
+
+    def pipeline(self):
+        self.fallbacks += 1
+        # the slots moved to the first node
+        return self.clients[self.nodes[0].name].pipeline()
+
+    def hset(self, key, field, value):
+        self.clients[self.get_node_from_key(key).name].hset(key, field, value)
+
+
+def test_parse_redis_startup_nodes():
+    assert _parse_redis_startup_nodes("myredis", 6380) == [("myredis", 6380)]
+    assert _parse_redis_startup_nodes("node1:7000, node2:7001,", 6380) == [("node1", 7000), ("node2", 7001)]
+    with pytest.raises(RuntimeError):
+        _parse_redis_startup_nodes(",", 6380)
+
+
+def test_cluster_hmget_many_merges_nodes_in_request_order():
+    """Keys should be fetched from the node that owns them, and the results merged in request order"""
+    cluster = FakeRedisCluster(num_nodes=3)
+    encoded = {}
+    for i in range(20):
+        encoded[i] = encode(int_value=i)
+        cluster.hset(f"trips:{i}", "f_count", encoded[i])
+    requests = [(f"trips:{i}", ["f_count", "f_unknown"]) for i in range(25)]
+    expected = [[encoded.get(i), None] for i in range(25)]
+    assert _cluster_hmget_many(cluster, requests) == expected
+    assert cluster.fallbacks == 0
+
+    # the keys of a failed node are retried with the cluster pipeline
+    cluster.failed_nodes.add("node1:6379")
+    results = _cluster_hmget_many(cluster, requests, parallelism=2)
+    assert cluster.fallbacks == 1
+    assert [results[i] for i in range(25) if cluster.get_node_from_key(f"trips:{i}").name != "node1:6379"] == \
+        [expected[i] for i in range(25) if cluster.get_node_from_key(f"trips:{i}").name != "node1:6379"]
@@ -0,0 +1,103 @@
+import base64
+
+import numpy as np
+import pytest
+
+from feathr import RedisSink
+from feathr.online.codec import (DICTIONARY_TABLE, RAW_HEADER, ZSTD_HEADER, ValueEncoder, decode_value, dequantize,
+                                 quantize, quantization_error, train_dictionary)
+from feathr.protobuf.featureValue_pb2 import FeatureValue, FloatArray
+from test_fixture import online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def embedding(i: int) -> bytes:
+    return FeatureValue(float_array=FloatArray(floats=[float(i % 7), 0.5, 0.25, 1.0] * 8)).SerializeToString()
+
+
+def test_codec_headers_are_not_base64():
+    alphabet = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+    assert RAW_HEADER not in alphabet and ZSTD_HEADER not in alphabet
+    serialized = FeatureValue(string_value="abc").SerializeToString()
+    for codec in ["base64", "raw"]:
+        assert decode_value(ValueEncoder(codec).encode(serialized)) == serialized
+    assert len(ValueEncoder("raw").encode(serialized)) < len(ValueEncoder("base64").encode(serialized))
+    with pytest.raises(RuntimeError):
+        ValueEncoder("gzip")
+    with pytest.raises(RuntimeError):
+        RedisSink("t", value_codec="gzip")
+    assert 'value_codec: "raw"' in RedisSink("t", value_codec="raw").to_feature_config()
+    assert "value_codec" not in RedisSink("t").to_feature_config()
+
+
+def test_online_codecs_are_detected_per_value():
+    """Tables written with different codecs, and old base64 tables, should be read the same way"""
+    pytest.importorskip("zstandard")
+    redis_client = fakeredis.FakeRedis()
+    zstd_encoder = ValueEncoder("zstd", dictionary=train_dictionary([embedding(i) for i in range(2000)], 4096))
+    for table, encoder in [("old", ValueEncoder("base64")), ("raw", ValueEncoder("raw")), ("zstd", zstd_encoder)]:
+        for i in range(3):
+            redis_client.hset(f"{table}:{i}", mapping={"f_embedding": encoder.encode(embedding(i)),
+                                                      "f_name": encoder.encode(
+                                                          FeatureValue(string_value=str(i)).SerializeToString())})
+    # the dictionary is stored next to the tables, and loaded by the client on first use
+    for key, row in zstd_encoder.dictionary_entry().items():
+        redis_client.hset(f"{DICTIONARY_TABLE}:{key}", mapping=row)
+    client = online_store_test_setup(redis_client)
+
+    expected = {str(i): [[float(i % 7), 0.5, 0.25, 1.0] * 8, str(i)] for i in range(3)}
+    for table in ["old", "raw", "zstd"]:
+        result = client.multi_get_online_features(table, ["0", "1", "2"], ["f_embedding", "f_name"])
+        assert {key: [list(values[0]), values[1]] for key, values in result.items()} == expected
+        columns = client.multi_get_online_features(table, ["0", "1", "2"], ["f_embedding"], output_format="numpy")
+        np.testing.assert_array_equal(columns["f_embedding"][:, 0], [0.0, 1.0, 2.0])
+    sizes = {table: redis_client.hstrlen(f"{table}:1", "f_embedding") for table in ["old", "raw", "zstd"]}
+    assert sizes["zstd"] < sizes["raw"] < sizes["old"]
+
+
+def test_quantized_embeddings():
+    """float16 and int8 embeddings should be dequantized by both the row and the columnar decoders"""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(4, 64)).astype(np.float32)
+    redis_client = fakeredis.FakeRedis()
+    for i, vector in enumerate(vectors):
+        redis_client.hset(f"embeddings:{i}", mapping={"f_half": quantize(vector, "float16"),
+                                                     "f_int8": quantize(vector, "int8"),
+                                                     "f_int8_double": quantize(vector, "int8", double=True)})
+    client = online_store_test_setup(redis_client)
+    keys = [str(i) for i in range(4)]
+    feature_names = ["f_half", "f_int8", "f_int8_double"]
+
+    rows = client.multi_get_online_features("embeddings", keys, feature_names)
+    columns = client.multi_get_online_features("embeddings", keys, feature_names, output_format="numpy")
+    assert columns["f_half"].dtype == np.float32 and columns["f_int8_double"].dtype == np.float64
+    np.testing.assert_allclose(columns["f_half"], vectors, rtol=1e-3, atol=1e-3)
+    int8_tolerance = np.abs(vectors).max(axis=1, keepdims=True) / 127 / 2 + 1e-6
+    assert (np.abs(columns["f_int8"] - vectors) <= int8_tolerance).all()
+    for i, key in enumerate(keys):
+        for index, feature_name in enumerate(feature_names):
+            np.testing.assert_allclose(rows[key][index], columns[feature_name][i], rtol=1e-6)
+    assert len(quantize(vectors[0], "int8")) < len(quantize(vectors[0], "float16")) < \
+        len(ValueEncoder("raw").encode(FeatureValue(float_array=FloatArray(floats=vectors[0])).SerializeToString()))
+
+    error = quantization_error(vectors, "int8")
+    assert 0 < error["mean_abs_error"] <= error["max_abs_error"] < 0.05
+    assert error["min_cosine_similarity"] > 0.99
+    with pytest.raises(RuntimeError):
+        quantize(vectors[0], "int4")
+
+
+def test_quantize_special_values():
+    """NaN and infinite values should not break the int8 scale, and the bytes should match the Spark writer"""
+    nan, inf = float("nan"), float("inf")
+    # the same values are checked by TestPushToRedisOutputProcessor.testQuantizeMatchesPython
+    assert quantize([1.0, -2.5, 0.5, 3.0, 5.0, nan, inf, -inf, 254.0], "int8", double=True).hex() == \
+        "04010000004000ff000202007f817f"
+    assert quantize([0.0, 0.0, 0.0], "int8").hex() == "04000000803f000000"
+    assert quantize([0.0, -0.0, 65520.0, 2.9802322387695312e-8, 3e-8, nan, -inf], "float16", double=True).hex() == \
+        "030100000080007c00000100007e00fc"
+    _, values = dequantize(quantize([2.0, nan, -inf], "int8"))
+    assert values[1] == 0 and values[2] == -values[0] and abs(values[0] - 2.0) < 1e-6
+    with pytest.raises(RuntimeError):
+        RedisSink("t", quantization={"f_half": "int4"})
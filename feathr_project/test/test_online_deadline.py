@@ -0,0 +1,208 @@
+import time
+
+import pytest
+
+from feathr.online import CircuitBreaker, DeadlineFetcher, RedisOnlineStore, ValueEncoder, swap_table_alias, train_dictionary
+from feathr.online.codec import DICTIONARY_TABLE
+from feathr.online.packed import SCHEMA_TABLE, pack_row, schema_entry, schema_version
+from feathr.online.versions import ALIAS_TABLE
+from feathr.protobuf.featureValue_pb2 import FeatureValue
+from test_fixture import encode, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class FlakyRedisOnlineStore(RedisOnlineStore):
+    """Redis store whose reads of some keys or tables are slow, or whose value reads fail, like a degraded node"""
+    def __init__(self, redis_client, delay_seconds=0.0, slow_keys=None, failing=False, slow_tables=None):
+        super().__init__(redis_client)
+        self.delay_seconds = delay_seconds
+        self.slow_keys = slow_keys
+        self.failing = failing
+        self.slow_tables = slow_tables
+        self.calls = 0
+
+    def batch_get(self, requests):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("node is down")
+        self._delay([table for table, _, _ in requests], [key for _, key, _ in requests])
+        return super().batch_get(requests)
+
+    def batch_get_all(self, feature_table, keys):
+        self._delay([feature_table], keys)
+        return super().batch_get_all(feature_table, keys)
+
+    def batch_get_rows(self, feature_table, keys):
+        self._delay([feature_table], keys)
+        return super().batch_get_rows(feature_table, keys)
+
+    def _delay(self, tables, keys):
+        if self.slow_tables is not None:
+            slow = any(table in self.slow_tables for table in tables)
+        else:
+            slow = self.slow_keys is None or any(key in self.slow_keys for key in keys)
+        if slow:
+            time.sleep(self.delay_seconds)
+
+
+def trips_redis():
+    redis_client = fakeredis.FakeRedis()
+    for i in range(10):
+        redis_client.hset(f"trips:{i}", mapping={"f_fare": encode(float_value=float(i))})
+    return redis_client
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure("primary")
+    assert breaker.allow("primary")
+    breaker.record_failure("primary")
+    assert breaker.state("primary") == "open" and not breaker.allow("primary")
+    time.sleep(0.06)
+    # a single trial request goes through
+    assert breaker.allow("primary") and not breaker.allow("primary")
+    breaker.record_failure("primary")
+    assert breaker.state("primary") == "open"
+    time.sleep(0.06)
+    assert breaker.allow("primary")
+    breaker.record_success("primary")
+    assert breaker.state("primary") == "closed" and breaker.allow("primary")
+
+
+def test_hedged_read_to_replica():
+    redis_client = trips_redis()
+    client = online_store_test_setup(FlakyRedisOnlineStore(redis_client, delay_seconds=0.5))
+    fetcher = client.configure_online_deadlines(replicas=[RedisOnlineStore(redis_client)], min_hedge_seconds=0.01)
+    start = time.monotonic()
+    result = client.multi_get_online_features_within("trips", ["1", "2", "42"], ["f_fare"], budget_seconds=0.3)
+    assert time.monotonic() - start < 0.3
+    assert result.complete and result.values == {"1": [1.0], "2": [2.0], "42": [None]}
+    # the alias of the table and the values were both read from the replica
+    assert fetcher.hedged == 2
+
+
+def test_partial_results_at_deadline():
+    client = online_store_test_setup(FlakyRedisOnlineStore(trips_redis(), delay_seconds=0.5, slow_keys={"3"}))
+    client.configure_online_deadlines(chunk_size=2)
+    client.enable_online_cache()
+    start = time.monotonic()
+    result = client.multi_get_online_features_within("trips", ["1", "2", "3", "4"], ["f_fare"], budget_seconds=0.1,
+                                                     defaults={"f_fare": -1.0})
+    assert time.monotonic() - start < 0.3
+    # the chunk of key 3 didn't arrive in time, the other one did
+    assert not result.complete and result.missing_keys == ["3", "4"]
+    assert result.values == {"1": [1.0], "2": [2.0], "3": [-1.0], "4": [-1.0]}
+    assert client.online_deadline_fetcher.timed_out == 2
+    # the values that arrived are cached, the missing ones are not
+    assert client.online_cache.get("trips", "3", ["f_fare"])[1] == ["f_fare"]
+    assert client.online_cache.get("trips", "1", ["f_fare"])[1] == []
+
+
+def test_circuit_breaker_skips_failing_primary():
+    redis_client = trips_redis()
+    primary = FlakyRedisOnlineStore(redis_client, failing=True)
+    client = online_store_test_setup(primary)
+    fetcher = client.configure_online_deadlines(replicas=[RedisOnlineStore(redis_client)], failure_threshold=2)
+    for _ in range(4):
+        # the failed fetches are retried on the replica at once
+        assert client.multi_get_online_features_within("trips", ["5"], ["f_fare"], budget_seconds=1).values == \
+            {"5": [5.0]}
+    assert primary.calls == 2 and fetcher.circuit_breaker.state("primary") == "open"
+
+    # no healthy endpoint: the keys are missing at once
+    client.configure_online_deadlines(failure_threshold=1)
+    client.multi_get_online_features_within("trips", ["5"], ["f_fare"], budget_seconds=1)
+    start = time.monotonic()
+    assert client.multi_get_online_features_within("trips", ["5"], ["f_fare"], budget_seconds=1).missing_keys == ["5"]
+    assert time.monotonic() - start < 0.5
+
+
+def test_metadata_reads_within_budget():
+    redis_client = trips_redis()
+    replica = RedisOnlineStore(redis_client)
+    # a versioned table with the packed-row layout
+    replica.batch_put(SCHEMA_TABLE, {"rides__v1": schema_entry(["f_fare"])})
+    replica.batch_put_rows("rides__v1", {"1": pack_row([ValueEncoder("raw").encode(
+        FeatureValue(float_value=1.5).SerializeToString())], schema_version(["f_fare"]))})
+    swap_table_alias(replica, "rides", "rides__v1")
+    # the primary hangs on the alias, schema and dictionary tables, but serves the values
+    primary = FlakyRedisOnlineStore(redis_client, delay_seconds=0.5,
+                                    slow_tables={ALIAS_TABLE, SCHEMA_TABLE, DICTIONARY_TABLE})
+    client = online_store_test_setup(primary)
+    fetcher = client.configure_online_deadlines(replicas=[replica], min_hedge_seconds=0.01)
+    start = time.monotonic()
+    result = client.multi_get_online_features_within("rides", ["1", "7"], ["f_fare"], budget_seconds=0.3)
+    assert time.monotonic() - start < 0.3
+    assert result.complete and result.values == {"1": [1.5], "7": [None]}
+    # the alias and the chunk that needed the schemas were both read from the replica
+    assert fetcher.hedged == 2
+
+    # without a replica, an alias that was never loaded can't be resolved in time
+    other = online_store_test_setup(primary)
+    other.configure_online_deadlines()
+    assert other.multi_get_online_features_within("trips", ["1"], ["f_fare"], budget_seconds=0.1).missing_keys == \
+        ["1"]
+
+
+def test_stale_aliases_within_budget():
+    redis_client = trips_redis()
+    replica = RedisOnlineStore(redis_client)
+    swap_table_alias(replica, "rides", "trips")
+    client = online_store_test_setup(FlakyRedisOnlineStore(redis_client, delay_seconds=0.5, slow_tables={ALIAS_TABLE}))
+    client.configure_online_deadlines()
+    client.online_reader.load_table_aliases(["rides"], replica)
+    client.table_aliases.refresh_seconds = 0
+    start = time.monotonic()
+    # the stale alias can't be refreshed in time, and is used as is
+    result = client.multi_get_online_features_within("rides", ["2"], ["f_fare"], budget_seconds=0.4)
+    assert time.monotonic() - start < 0.4
+    assert result.complete and result.values == {"2": [2.0]}
+
+
+def test_dictionary_reads_within_budget():
+    pytest.importorskip("zstandard")
+    redis_client = fakeredis.FakeRedis()
+    encoder = ValueEncoder("zstd", dictionary=train_dictionary(
+        [FeatureValue(float_value=float(i)).SerializeToString() for i in range(2000)], 1024))
+    redis_client.hset("trips:1", mapping={"f_fare": encoder.encode(FeatureValue(float_value=1.5).SerializeToString())})
+    for key, row in encoder.dictionary_entry().items():
+        redis_client.hset(f"{DICTIONARY_TABLE}:{key}", mapping=row)
+    primary = FlakyRedisOnlineStore(redis_client, delay_seconds=0.5, slow_tables={DICTIONARY_TABLE})
+    client = online_store_test_setup(primary)
+    client.configure_online_deadlines(replicas=[RedisOnlineStore(redis_client)], min_hedge_seconds=0.01)
+    start = time.monotonic()
+    result = client.multi_get_online_features_within("trips", ["1"], ["f_fare"], budget_seconds=0.3)
+    assert time.monotonic() - start < 0.3
+    assert result.complete and result.values == {"1": [1.5]}
+
+
+def test_late_replies():
+    def fetch(store, requests):
+        time.sleep(0.2)
+        if store == "failing":
+            raise ConnectionError("node is down")
+        return [[b"value"] for _ in requests]
+
+    fetcher = DeadlineFetcher(fetch, "slow", circuit_breaker=CircuitBreaker(failure_threshold=1))
+    assert fetcher.fetch_within([("trips", "1", ["f_fare"])], budget_seconds=0.05) == [None]
+    time.sleep(0.3)
+    # the reply missed its deadline but succeeded: the endpoint is slow, not failing
+    assert fetcher.missed_deadlines == {"primary": 1} and fetcher.circuit_breaker.state("primary") == "closed"
+
+    fetcher = DeadlineFetcher(fetch, "failing", circuit_breaker=CircuitBreaker(failure_threshold=1))
+    assert fetcher.fetch_within([("trips", "1", ["f_fare"])], budget_seconds=0.05) == [None]
+    time.sleep(0.3)
+    assert fetcher.missed_deadlines == {"primary": 1} and fetcher.circuit_breaker.state("primary") == "open"
+
+
+def test_latencies_exclude_queue_time():
+    def fetch(store, requests):
+        time.sleep(0.05)
+        return [[b"value"] for _ in requests]
+
+    # one fetch thread: the second chunk waits for the first one
+    fetcher = DeadlineFetcher(fetch, "primary", chunk_size=1, max_workers=1, min_hedge_seconds=1)
+    assert fetcher.fetch_within([("trips", "1", ["f_fare"]), ("trips", "2", ["f_fare"])], budget_seconds=1) == \
+        [[b"value"], [b"value"]]
+    assert len(fetcher._latencies) == 2 and max(fetcher._latencies) < 0.09
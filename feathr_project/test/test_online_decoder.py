@@ -0,0 +1,122 @@
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from feathr import FLOAT, FLOAT_VECTOR, INT32, STRING, FeatureType, ValueType
+from feathr.online import decode_feature_columns, decode_feature_values
+from feathr.protobuf.featureValue_pb2 import DoubleArray, FloatArray, SparseFloatArray
+from test_fixture import encode
+
+
+def sparse_float(indices, values) -> bytes:
+    return encode(sparse_float_array=SparseFloatArray(index_integers=indices, value_floats=values))
+
+
+def dense_float(values) -> bytes:
+    return encode(float_array=FloatArray(floats=values))
+
+
+ROWS = [
+    [encode(int_value=1), encode(string_value="a"), dense_float([1.0, 2.0]), sparse_float([0, 3], [0.5, 1.5])],
+    [None, encode(string_value="b"), None, None],
+    [encode(int_value=3), None, dense_float([3.0, 4.0]), sparse_float([1], [2.5])],
+]
+FEATURE_NAMES = ["f_int", "f_str", "f_dense", "f_sparse"]
+
+
+def test_decode_feature_values_row_based():
+    """Row based decoding should keep the semantic of the original client decoding"""
+    res = decode_feature_values(ROWS[0])
+    assert res[0] == 1
+    assert res[1] == "a"
+    assert list(res[2]) == [1.0, 2.0]
+    assert list(res[3][0]) == [0, 3]
+    assert list(res[3][1]) == [0.5, 1.5]
+    assert decode_feature_values(ROWS[1])[0] is None
+
+
+def test_decode_feature_columns_numpy():
+    """Columnar numpy decoding should produce 1-D, 2-D and CSR arrays"""
+    pytest.importorskip("scipy")
+    res = decode_feature_columns(ROWS, FEATURE_NAMES, output_format="numpy")
+    # int column with a missing value is promoted to float to hold NaN
+    assert res["f_int"].dtype == np.float64
+    assert res["f_int"][0] == 1 and np.isnan(res["f_int"][1]) and res["f_int"][2] == 3
+    assert list(res["f_str"]) == ["a", "b", None]
+    assert res["f_dense"].shape == (3, 2)
+    assert np.isnan(res["f_dense"][1]).all()
+    np.testing.assert_array_equal(res["f_dense"][2], [3.0, 4.0])
+    dense_sparse = res["f_sparse"].toarray()
+    assert dense_sparse.shape == (3, 4)
+    np.testing.assert_array_equal(dense_sparse[0], [0.5, 0, 0, 1.5])
+    np.testing.assert_array_equal(dense_sparse[1], [0, 0, 0, 0])
+
+
+def test_decode_feature_columns_with_registered_types():
+    """Registered feature types should decide the dtype of the columns, even if all values are missing"""
+    feature_types = {"f_int": INT32, "f_str": STRING, "f_dense": FLOAT_VECTOR, "f_missing": FLOAT}
+    rows = [[encode(int_value=1), encode(string_value="a"), dense_float([1.0]), None],
+            [encode(int_value=2), encode(string_value="b"), dense_float([2.0]), None]]
+    res = decode_feature_columns(rows, ["f_int", "f_str", "f_dense", "f_missing"], feature_types, "numpy")
+    assert res["f_int"].dtype == np.int32
+    assert res["f_dense"].dtype == np.float32
+    assert res["f_missing"].dtype == np.float32
+    assert np.isnan(res["f_missing"]).all()
+
+
+def test_decode_feature_columns_type_mismatch():
+    """Values that don't match the registered feature type should fail with a clear error"""
+    rows = [[encode(int_value=1)], [encode(int_value=2)]]
+    with pytest.raises(RuntimeError, match="f.*dense FLOAT.*scalar INT32"):
+        decode_feature_columns(rows, ["f"], {"f": FLOAT_VECTOR}, "numpy")
+    with pytest.raises(RuntimeError, match="f_str.*scalar STRING.*scalar INT32"):
+        decode_feature_columns(rows, ["f_str"], {"f_str": STRING}, "arrow")
+    with pytest.raises(RuntimeError, match="first stored as a scalar INT32"):
+        decode_feature_columns([[encode(int_value=1)], [dense_float([1.0])]], ["f"], output_format="numpy")
+    # numeric values are converted to the registered type
+    assert decode_feature_columns(rows, ["f"], {"f": FLOAT}, "numpy")["f"].tolist() == [1.0, 2.0]
+    # without a value type, the type is inferred from the values
+    unspecified = FeatureType(val_type=ValueType.UNSPECIFIED, dimension_type=[])
+    assert decode_feature_columns(rows, ["f"], {"f": unspecified}, "numpy")["f"].dtype == np.int32
+
+
+def test_decode_feature_columns_arrow_and_pandas():
+    """Arrow and pandas decoding should keep missing values as nulls and rows aligned with keys"""
+    sparse_type = FeatureType(val_type=ValueType.FLOAT, dimension_type=[ValueType.INT32], tensor_category="SPARSE")
+    table = decode_feature_columns(ROWS, FEATURE_NAMES, {"f_sparse": sparse_type}, "arrow")
+    assert isinstance(table, pa.Table)
+    assert table.column("f_int").to_pylist() == [1, None, 3]
+    assert table.column("f_dense").to_pylist() == [[1.0, 2.0], None, [3.0, 4.0]]
+    assert table.column("f_sparse").to_pylist()[2] == {"indices": [1], "values": [2.5]}
+
+    df = decode_feature_columns(ROWS, FEATURE_NAMES, output_format="pandas", keys=["1", "2", "3"])
+    assert list(df.index) == ["1", "2", "3"]
+    assert df.loc["2", "f_str"] == "b"
+    assert list(df.loc["3", "f_dense"]) == [3.0, 4.0]
+
+
+def test_decode_feature_columns_unsupported_format():
+    with pytest.raises(RuntimeError):
+        decode_feature_columns(ROWS, FEATURE_NAMES, output_format="csv")
+
+
+def test_decode_feature_columns_fixed_width_values():
+    """Float and double values with a fixed width encoding should decode the same as parsing every message"""
+    rows = []
+    for i in range(5):
+        rows.append([encode(float_value=i + 0.25), encode(double_value=i * 3.3),
+                     encode(double_array=DoubleArray(doubles=[i * 0.5, i * 1.5, -i * 1.0]))])
+    rows.append([None, None, None])
+    res = decode_feature_columns(rows, ["f_float", "f_double", "f_double_array"], output_format="numpy")
+    assert res["f_float"].dtype == np.float32
+    np.testing.assert_array_equal(res["f_float"][:5], [i + 0.25 for i in range(5)])
+    np.testing.assert_array_almost_equal(res["f_double"][:5], [i * 3.3 for i in range(5)])
+    assert res["f_double_array"].shape == (6, 3)
+    np.testing.assert_array_equal(res["f_double_array"][4], [2.0, 6.0, -4.0])
+    assert np.isnan(res["f_double_array"][5]).all()
+
+    # arrays of different lengths fall back to the message parser and can't be stacked into a 2-D array
+    ragged = [[dense_float([1.0])], [dense_float([1.0, 2.0])]]
+    res = decode_feature_columns(ragged, ["f_dense"], output_format="numpy")
+    assert res["f_dense"].dtype == object
+    assert list(res["f_dense"][1]) == [1.0, 2.0]
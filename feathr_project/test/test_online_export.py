@@ -0,0 +1,52 @@
+import time
+
+import pyarrow.parquet as pq
+import pytest
+
+from feathr import INT64, SqliteOnlineStore
+from feathr.online import RedisOnlineStore
+from feathr.online._rate_limit import _TokenBucket
+from test_online_packed import write_packed_table
+from test_fixture import online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def read_export(path):
+    table = pq.ParquetDataset(sorted(str(file) for file in path.glob("*.parquet"))).read()
+    return {row["key"]: row for row in table.to_pylist()}
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_export_online_features(tmp_path, backend):
+    store = RedisOnlineStore(fakeredis.FakeRedis()) if backend == "redis" else SqliteOnlineStore()
+    client = online_store_test_setup(store)
+    client.push_online_features("trips", [{"id": i, "f_fare": i * 1.5, "f_tags": ["a", str(i)]} for i in range(25)] +
+                                [{"id": 99, "f_fare": None, "f_tags": ["z"]}], "id")
+
+    assert client.export_online_features("trips", str(tmp_path), batch_size=10, rows_per_file=8,
+                                         progress=False) == 26
+    assert len(list(tmp_path.glob("*.parquet"))) == 4
+    exported = read_export(tmp_path)
+    assert len(exported) == 26
+    assert exported["3"] == {"key": "3", "f_fare": 4.5, "f_tags": ["a", "3"]}
+    assert exported["99"]["f_fare"] is None
+
+
+def test_export_packed_table(tmp_path):
+    store = RedisOnlineStore(fakeredis.FakeRedis())
+    write_packed_table(store)
+    client = online_store_test_setup(store)
+    assert client.export_online_features("wide", str(tmp_path), feature_names=["f_0", "f_1", "f_299"],
+                                         feature_types={"f_0": INT64}, progress=False) == 3
+    exported = read_export(tmp_path)
+    assert exported["2"] == {"key": "2", "f_0": 2000, "f_1": None, "f_299": 2299.0}
+
+
+def test_token_bucket():
+    bucket = _TokenBucket(rate=100, burst=10)
+    start = time.monotonic()
+    bucket.acquire(10)
+    assert time.monotonic() - start < 0.05
+    bucket.acquire(20)
+    assert time.monotonic() - start >= 0.19
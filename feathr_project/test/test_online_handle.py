@@ -0,0 +1,65 @@
+import multiprocessing
+import pickle
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from feathr import FLOAT, FLOAT_VECTOR, SqliteOnlineStore
+from feathr.online import OnlineLookupHandle, RedisOnlineStore, swap_table_alias
+from test_fixture import online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+FAKE_SERVER = fakeredis.FakeServer()
+FEATURE_TYPES = {"f_fare": FLOAT, "f_embedding": FLOAT_VECTOR}
+
+
+def fake_online_store():
+    return RedisOnlineStore(fakeredis.FakeRedis(server=FAKE_SERVER))
+
+
+def lookup_in_worker(handle):
+    # runs in another process, with the unpickled handle
+    return handle.multi_get("trips", ["1", "2"], ["f_fare"])
+
+
+def test_lookup_batches_from_sqlite(tmp_path):
+    path = str(tmp_path / "features.db")
+    store = SqliteOnlineStore(path)
+    client = online_store_test_setup(store)
+    client.push_online_features("trips", [{"id": i, "f_fare": i * 1.5, "f_embedding": [float(i)] * 3}
+                                          for i in range(5)], "id", feature_types=FEATURE_TYPES)
+    store.close()
+
+    handle = pickle.loads(pickle.dumps(OnlineLookupHandle(sqlite_path=path, feature_types=FEATURE_TYPES)))
+    batch = pa.RecordBatch.from_pydict({"id": [1, 7, 3], "label": [0, 1, 0]})
+    result = handle.lookup_batch(batch, "trips", "id", ["f_fare", "f_embedding"])
+    assert isinstance(result, pa.RecordBatch)
+    assert result.schema.names == ["id", "label", "f_fare", "f_embedding"]
+    assert result.column("f_fare").to_pylist() == [1.5, None, 4.5]
+    assert result.column("f_embedding").to_pylist() == [[1.0] * 3, None, [3.0] * 3]
+
+    frame = pd.DataFrame({"id": [4, 2]}, index=[10, 11])
+    [first, second] = handle.lookup_batches(iter([frame]), "trips", "id", ["f_fare"], batch_size=1)
+    assert first.loc[10, "f_fare"] == 6.0 and second.loc[11, "f_fare"] == 3.0
+
+    with multiprocessing.get_context("fork").Pool(2) as pool:
+        assert pool.map(lookup_in_worker, [handle] * 2) == [{"1": [1.5], "2": [3.0]}] * 2
+    handle.close()
+
+
+def test_handle_shares_its_reader():
+    store = fake_online_store()
+    online_store_test_setup(store).push_online_features("trips__v2", [{"id": 1, "f_fare": 2.5}], "id")
+    swap_table_alias(store, "trips", "trips__v2")
+
+    handle = OnlineLookupHandle(online_store_factory=fake_online_store)
+    # the versioned table is read through its alias
+    assert handle.multi_get("trips", ["1"], ["f_fare"]) == {"1": [2.5]}
+    copy = pickle.loads(pickle.dumps(handle))
+    assert copy._reader() is handle._reader()
+    assert copy.multi_get("trips", ["1", "9"], ["f_fare"], output_format="pandas")["f_fare"].tolist()[0] == 2.5
+
+    with pytest.raises(RuntimeError):
+        OnlineLookupHandle()
@@ -0,0 +1,75 @@
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from feathr import FLOAT, SqliteOnlineStore
+from feathr.online import RedisOnlineStore, arrow_feature_type, encode_feature_column, encode_feature_value, \
+    load_online_table
+from test_fixture import online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_encode_feature_column():
+    """The vectorized encodings should be the same as encoding the values one by one"""
+    columns = [pa.array([1.5, None, 0.0]), pa.array([True, False, None]), pa.array([1, None, 3]),
+               pa.array([[1.0, 2.0], None, [3.0, 4.5]], pa.list_(pa.float32())), pa.array([[1.0], [2.0, 3.0]]),
+               pa.array(["a", None])]
+    for column in columns:
+        feature_type = arrow_feature_type(column.type)
+        assert encode_feature_column(column) == [
+            None if value is None else encode_feature_value(value, feature_type).SerializeToString()
+            for value in column.to_pylist()]
+    assert encode_feature_column(pa.array([1.5]), FLOAT) == [encode_feature_value(1.5, FLOAT).SerializeToString()]
+
+
+def write_dataset(tmp_path, format):
+    df = pd.DataFrame({"id": np.arange(10), "region": ["us", "eu"] * 5,
+                       "f_fare": np.arange(10) * 1.5, "f_count": np.arange(10, dtype=np.int32),
+                       "f_embedding": [np.full(3, i, dtype=np.float32) for i in range(10)]})
+    df.loc[3, "f_fare"] = None
+    path = tmp_path / format
+    path.mkdir()
+    if format == "parquet":
+        pq.write_table(pa.Table.from_pandas(df.iloc[:6], preserve_index=False), path / "part-0.parquet")
+        pq.write_table(pa.Table.from_pandas(df.iloc[6:], preserve_index=False), path / "part-1.parquet")
+    elif format == "avro":
+        pandavro = pytest.importorskip("pandavro")
+        df["f_embedding"] = df["f_embedding"].apply(list)
+        pandavro.to_avro(str(path / "part-0.avro"), df)
+    else:
+        deltalake = pytest.importorskip("deltalake")
+        deltalake.write_deltalake(str(path), pa.Table.from_pandas(df, preserve_index=False), mode="overwrite")
+    return str(path)
+
+
+@pytest.mark.parametrize("format", ["parquet", "avro", "delta"])
+def test_load_online_table(tmp_path, format):
+    path = write_dataset(tmp_path, format)
+    redis_client = fakeredis.FakeRedis()
+    loaded = load_online_table(RedisOnlineStore(redis_client), "trips", path, ["id", "region"], format=format,
+                               batch_size=4, chunk_size=3, progress=False)
+    assert loaded == 10
+    client = online_store_test_setup(redis_client)
+    result = client.multi_get_online_features("trips", ["2#us", "3#eu", "9#eu"], ["f_fare", "f_count", "f_embedding"])
+    assert result["2#us"][:2] == [3.0, 2] and result["3#eu"][0] is None and result["9#eu"][1] == 9
+    assert list(result["9#eu"][2]) == [9.0, 9.0, 9.0]
+
+
+def test_load_online_features(tmp_path):
+    path = write_dataset(tmp_path, "parquet")
+    store = SqliteOnlineStore()
+    client = online_store_test_setup(store)
+    client.enable_online_cache()
+    assert client.get_online_features("trips", "1", ["f_fare"]) == [None]
+    assert client.load_online_features("trips", path, "id", feature_names=["f_fare"], feature_types={"f_fare": FLOAT},
+                                       value_codec="raw", progress=False) == 10
+    assert client.get_online_features("trips", "1", ["f_fare", "f_count"]) == [1.5, None]
+    assert store.batch_get([("trips", "1", ["f_fare"])])[0][0][0] == 0x01
+    with pytest.raises(RuntimeError):
+        client.load_online_features("trips", path, "id", format="csv")
+    with pytest.raises(RuntimeError):
+        client.load_online_features("trips", path, "trip_id", progress=False)
@@ -0,0 +1,61 @@
+import pytest
+
+from feathr.online import OnlineMetricsHook, PrometheusOnlineMetricsHook, SlowRequestLogHook
+from test_fixture import encode, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class RecordingHook(OnlineMetricsHook):
+    def __init__(self):
+        self.requests = []
+
+    def on_request(self, metrics):
+        self.requests.append(metrics)
+
+
+class FailingHook(OnlineMetricsHook):
+    def on_request(self, metrics):
+        raise ValueError("broken hook")
+
+
+def prepare_client():
+    redis_client = fakeredis.FakeRedis()
+    value = encode(float_value=1.5)
+    redis_client.hset("trips:1", mapping={"f_fare": value, "f_tip": value})
+    redis_client.hset("trips:2", mapping={"f_fare": value})
+    return online_store_test_setup(redis_client), len(value)
+
+
+def test_online_metrics_hooks():
+    client, value_size = prepare_client()
+    hook = RecordingHook()
+    client.add_online_metrics_hook(FailingHook())
+    client.add_online_metrics_hook(hook)
+
+    assert client.multi_get_online_features("trips", ["1", "2", "3"], ["f_fare", "f_tip"]) == {
+        "1": [1.5, 1.5], "2": [1.5, None], "3": [None, None]}
+    client.get_online_features("trips", "1", ["f_fare"])
+    multi_get, get = hook.requests
+    assert (multi_get.api, multi_get.feature_table, multi_get.num_keys, multi_get.num_fields) == \
+        ("multi_get_online_features", "trips", 3, 6)
+    assert (multi_get.payload_bytes, multi_get.missing_keys, multi_get.missing_fields) == (3 * value_size, 1, 3)
+    assert multi_get.fetch_seconds > 0 and multi_get.decode_seconds > 0
+    assert (get.api, get.num_keys, get.missing_keys, get.payload_bytes) == ("get_online_features", 1, 0, value_size)
+
+
+def test_prometheus_and_slow_log_hooks():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    client, _ = prepare_client()
+    registry = prometheus_client.CollectorRegistry()
+    client.add_online_metrics_hook(PrometheusOnlineMetricsHook(registry=registry))
+    slow_log = SlowRequestLogHook(threshold_ms=0)
+    client.add_online_metrics_hook(slow_log)
+
+    client.multi_get_online_features("trips", ["1", "3"], ["f_fare", "f_tip"])
+    labels = {"api": "multi_get_online_features", "feature_table": "trips"}
+    assert registry.get_sample_value("feathr_online_keys_total", labels) == 2
+    assert registry.get_sample_value("feathr_online_missing_keys_total", labels) == 1
+    assert registry.get_sample_value("feathr_online_missing_fields_total", labels) == 2
+    assert registry.get_sample_value("feathr_online_fetch_seconds_count", labels) == 1
+    assert registry.get_sample_value("feathr_online_payload_bytes_sum", labels) > 0
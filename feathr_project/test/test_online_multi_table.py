@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from feathr import AsyncFeathrOnlineClient, FeatureQuery
+from test_fixture import encode, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def prepare_online_store(redis_client):
+    redis_client.hset("trips:265", mapping={"f_trip_count": encode(int_value=12)})
+    redis_client.hset("locations:265", mapping={"f_avg_fare": encode(float_value=9.5)})
+    redis_client.hset("locations:266", mapping={"f_avg_fare": encode(float_value=7.25)})
+
+
+REQUESTS = [("trips", ["265", "266"], ["f_trip_count"]),
+            ("locations", ["265", "266", "267"], FeatureQuery(feature_list=["f_avg_fare", "f_max_fare"]))]
+
+
+def test_multi_table_get_online_features():
+    """Features from several tables should be fetched in one round trip and merged per entity with defaults"""
+    server = fakeredis.FakeServer()
+    redis_client = fakeredis.FakeRedis(server=server)
+    prepare_online_store(redis_client)
+    client = online_store_test_setup(redis_client)
+    defaults = {"f_trip_count": 0, "f_max_fare": -1.0}
+    assert client.multi_table_get_online_features(REQUESTS, defaults) == \
+        {"265": [12, 9.5, -1.0], "266": [0, 7.25, -1.0], "267": [0, None, -1.0]}
+
+    async def run():
+        async with AsyncFeathrOnlineClient(redis_client=fakeredis.FakeAsyncRedis(server=server)) as async_client:
+            return await async_client.multi_table_get_online_features(REQUESTS, defaults)
+    assert asyncio.run(run()) == client.multi_table_get_online_features(REQUESTS, defaults)
+
+
+def test_multi_table_get_online_features_duplicated_feature():
+    """The same feature name can't be requested from two tables"""
+    client = online_store_test_setup(fakeredis.FakeRedis())
+    with pytest.raises(RuntimeError):
+        client.multi_table_get_online_features([("t1", ["1"], ["f"]), ("t2", ["1"], ["f"])])
@@ -0,0 +1,79 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from feathr import RedisSink
+from feathr.online import AsyncFeathrOnlineClient, RedisOnlineStore, SqliteOnlineStore
+from feathr.online.codec import ValueEncoder, quantize
+from feathr.online.packed import SCHEMA_TABLE, pack_row, schema_entry, schema_version, unpack_row
+from feathr.protobuf.featureValue_pb2 import FeatureValue
+from test_fixture import counting_redis, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+FEATURE_NAMES = [f"f_{i}" for i in range(300)]
+
+
+def write_packed_table(store, feature_names=FEATURE_NAMES):
+    encoder = ValueEncoder("raw")
+    store.batch_put(SCHEMA_TABLE, {"wide": schema_entry(feature_names)})
+    rows = {}
+    for key in range(3):
+        values = [encoder.encode(FeatureValue(float_value=key * 1000 + i).SerializeToString())
+                  for i in range(len(feature_names))]
+        values[1] = None
+        rows[str(key)] = pack_row(values, schema_version(feature_names))
+    store.batch_put_rows("wide", rows)
+
+
+def test_pack_row_round_trip():
+    values = [b"\x01abc", None, b"", quantize([1.0, 2.0], "float16")]
+    version, unpacked = unpack_row(pack_row(values, 7))
+    assert version == 7
+    assert unpacked == [b"\x01abc", None, None, values[3]]
+    assert schema_version(["a", "b"]) != schema_version(["b", "a"])
+    # the Spark writer checks the same values, see TestPushToRedisOutputProcessor.testPackedRowsMatchPython
+    assert schema_version(["f_fare", "f_embedding"]) == 578227407
+    assert schema_entry(["f_prix_\u00e9", "\u540d\u524d", 'a"b\\c', "tab\there\x7f"]) == \
+        {"1669885475": '["f_prix_\\u00e9","\\u540d\\u524d","a\\"b\\\\c","tab\\there\\u007f"]'}
+    assert pack_row([b"\x01ab", None, b"\x01c"], schema_version(["f_fare", "f_embedding", "f_city"])).hex() == \
+        "05b494b1d4030000000300000003000000050000000161620163"
+    assert 'layout: "packed"' in RedisSink("wide", layout="packed").to_feature_config()
+    with pytest.raises(RuntimeError):
+        RedisSink("wide", layout="columnar")
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_packed_table_reads(backend):
+    """Packed rows should be fetched with one GET per entity and decoded like hash tables"""
+    redis_client = counting_redis()
+    store = RedisOnlineStore(redis_client) if backend == "redis" else SqliteOnlineStore()
+    write_packed_table(store)
+    client = online_store_test_setup(store)
+
+    assert client.get_online_features("wide", "1", ["f_0", "f_1", "f_299", "f_unknown"]) == [1000.0, None, 1299.0,
+                                                                                            None]
+    if backend == "redis":
+        redis_client.commands.clear()
+        client.multi_get_online_features("wide", ["0", "1", "2"], FEATURE_NAMES)
+        assert redis_client.commands == ["GET"] * 3
+    result = client.multi_get_online_features("wide", ["0", "2", "3"], ["f_2", "f_1"], output_format="numpy")
+    np.testing.assert_array_equal(result["f_2"], [2.0, 2002.0, np.nan])
+    # rewriting the table with another schema is picked up without waiting for the schemas to be refreshed
+    write_packed_table(store, ["f_new"] + FEATURE_NAMES)
+    assert client.multi_get_online_features("wide", ["2"], ["f_new", "f_2"]) == {"2": [2000.0, 2003.0]}
+    assert dict(store.scan("wide"))["2"]
+
+
+def test_packed_table_async_reads():
+    server = fakeredis.FakeServer()
+    write_packed_table(RedisOnlineStore(fakeredis.FakeRedis(server=server)))
+
+    async def run():
+        async with AsyncFeathrOnlineClient(redis_client=fakeredis.FakeAsyncRedis(server=server)) as client:
+            assert await client.get_online_features("wide", "1", ["f_0", "f_1"]) == [1000.0, None]
+            result = await client.multi_get_online_features("wide", ["0", "2"], ["f_299"])
+            assert result == {"0": [299.0], "2": [2299.0]}
+
+    asyncio.run(run())
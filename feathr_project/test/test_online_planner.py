@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+
+from feathr import FLOAT_VECTOR, FLOAT, INT64, STRING, MaterializationSettings, RedisSink
+from feathr.online import RedisOnlineStore, calibrate_memory_model, estimate_online_memory
+from feathr.online.planner import _allocation_size, _hash_entity_bytes
+from test_fixture import online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+FEATURE_TYPES = {"f_fare": FLOAT, "f_count": INT64, "f_city": STRING, "f_embedding": FLOAT_VECTOR}
+
+
+def settings(*sinks):
+    return MaterializationSettings("trips_job", sinks=list(sinks), feature_names=list(FEATURE_TYPES))
+
+
+class MeasuredRedisOnlineStore(RedisOnlineStore):
+    """fakeredis doesn't support MEMORY USAGE, so each entity takes 1000 bytes here."""
+    def memory_usage(self, feature_table, keys):
+        return [1000] * len(keys)
+
+
+def test_allocation_size():
+    assert [_allocation_size(size) for size in [1, 9, 24, 128, 129, 161, 1000]] == [8, 16, 32, 128, 160, 192, 1024]
+
+
+def test_estimate_without_sample():
+    base64, raw, quantized, packed = estimate_online_memory(
+        settings(RedisSink("t_base64"), RedisSink("t_raw", value_codec="raw"),
+                 RedisSink("t_quantized", value_codec="raw", quantization={"f_embedding": "float16"}),
+                 RedisSink("t_packed", value_codec="raw", layout="packed")),
+        FEATURE_TYPES, num_rows=1000000, array_length=32)
+    assert base64.num_entities == 1000000
+    assert base64.value_bytes["f_fare"] == 8 and raw.value_bytes["f_fare"] == 6
+    # 32 floats, the tags and lengths of the array and of its packed floats, and the header
+    assert raw.value_bytes["f_embedding"] == 128 + 6 + 1 and quantized.value_bytes["f_embedding"] == 2 + 64
+    # the embedding is too large for a listpack
+    assert base64.encoding == raw.encoding == "hashtable"
+    assert quantized.encoding == "hashtable" and packed.encoding == "string"
+    assert base64.total_bytes > raw.total_bytes > quantized.total_bytes
+    assert packed.total_bytes < raw.total_bytes
+    assert raw.total_bytes == int(1000000 * raw.entity_bytes) + 8 * 2 ** 20
+
+
+def test_estimate_with_sample():
+    sample = pd.DataFrame({"id": [1, 2, 3, 3, 4, 5, 6, 7],
+                           "f_fare": [1.5, None, 2.5, 3.5, 4.5, None, 6.5, 7.5],
+                           "f_count": [1, 2, 3, 4, 5, 6, 7, 8]})
+    [estimate] = estimate_online_memory(settings(RedisSink("trips", value_codec="raw")),
+                                        {"f_city": STRING, "f_embedding": FLOAT_VECTOR}, num_rows=800,
+                                        sample=sample, key_column="id", array_length=4, string_length=8)
+    # 7 distinct keys out of 8 rows
+    assert estimate.num_entities == 700
+    # the types of the sampled features are the types of their columns, here double and int64
+    assert estimate.value_bytes["f_fare"] == 1 + 9 and estimate.value_bytes["f_count"] == 1 + 2
+    assert estimate.value_bytes["f_city"] == 1 + 10
+    assert estimate.encoding == "listpack"
+
+    with pytest.raises(RuntimeError):
+        estimate_online_memory(settings(RedisSink("trips")), {}, sample=sample, key_column="id")
+
+
+def test_calibrate_memory_model():
+    store = MeasuredRedisOnlineStore(fakeredis.FakeRedis())
+    client = online_store_test_setup(store)
+    client.push_online_features("trips", [{"id": i, "f_fare": i * 0.5} for i in range(10)], "id")
+    modeled = _hash_entity_bytes(len("trips:0"), [(len("f_fare"), 12)])[0]
+    assert calibrate_memory_model(store, ["trips"]) == pytest.approx(1000 / modeled)
+    assert calibrate_memory_model(store, ["missing"]) is None
+    # fakeredis can't measure the memory
+    assert calibrate_memory_model(RedisOnlineStore(store.redis_client), ["trips"]) is None
+
+    uncalibrated, calibrated = [
+        estimate_online_memory(settings(RedisSink("trips")), FEATURE_TYPES, num_rows=10, calibration=calibration)[0]
+        for calibration in (1.0, 1000 / modeled)]
+    [estimate] = client.estimate_online_memory(settings(RedisSink("trips")), num_rows=10,
+                                               feature_types=FEATURE_TYPES)
+    assert estimate.calibration == pytest.approx(1000 / modeled)
+    assert estimate.entity_bytes == pytest.approx(calibrated.entity_bytes)
+    assert calibrated.entity_bytes == pytest.approx(uncalibrated.entity_bytes * 1000 / modeled)
@@ -0,0 +1,73 @@
+import base64
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from feathr import FLOAT, INT32, FLOAT_VECTOR, SqliteOnlineStore
+from feathr.online import RedisOnlineStore, decode_feature_values, encode_feature_value
+from feathr.online.packed import SCHEMA_TABLE, schema_entry
+from feathr.protobuf.featureValue_pb2 import FeatureValue
+from test_fixture import online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_encode_feature_value():
+    values = [True, 3, np.int32(4), 2.5, np.float32(1.5), "a", b"\x00\x01", [1.0, 2.0], np.array([1, 2]),
+              ([0, 5], ["x", "y"])]
+    decoded = decode_feature_values([base64.b64encode(encode_feature_value(value).SerializeToString())
+                                     for value in values])
+    assert decoded[:7] == [True, 3, 4, 2.5, 1.5, "a", [b"\x00\x01"]]
+    assert decoded[7] == [1.0, 2.0] and list(decoded[8]) == [1, 2]
+    assert [list(part) for part in decoded[9]] == [[0, 5], ["x", "y"]]
+    assert encode_feature_value(3, INT32) == FeatureValue(int_value=3)
+    assert encode_feature_value([1, 2], FLOAT_VECTOR).WhichOneof("FeatureValueOneOf") == "float_array"
+    with pytest.raises(RuntimeError):
+        encode_feature_value("abc", FLOAT)
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_push_online_features(backend):
+    store = RedisOnlineStore(fakeredis.FakeRedis()) if backend == "redis" else SqliteOnlineStore()
+    client = online_store_test_setup(store)
+    client.enable_online_cache()
+    assert client.multi_get_online_features("trips", ["1"], ["f_fare"]) == {"1": [None]}
+
+    records = pd.DataFrame({"id": [1, 2, 3], "f_fare": [1.5, np.nan, 3.5], "f_count": [1, 2, 3],
+                            "f_embedding": [[0.5, 1.0], [0.0, 0.0], [1.0, 2.0]]})
+    assert client.push_online_features("trips", records, "id", feature_types={"f_count": INT32}, chunk_size=2) == 3
+    # the pushed values are written through the cache
+    assert client.multi_get_online_features("trips", ["1", "2"], ["f_fare", "f_count", "f_embedding"]) == {
+        "1": [1.5, 1, [0.5, 1.0]], "2": [None, 2, [0.0, 0.0]]}
+    client.disable_online_cache()
+    assert client.get_online_features("trips", "3", ["f_fare", "f_count"]) == [3.5, 3]
+
+    # pushing some features of an entity keeps its other features
+    client.push_online_features("trips", [{"id": 3, "f_fare": 4.5}], "id", value_codec="raw")
+    assert client.get_online_features("trips", "3", ["f_fare", "f_count"]) == [4.5, 3]
+
+    client.push_online_features("sessions", [{"user": "u", "day": 1, "f_clicks": 7}], ["user", "day"], ttl_seconds=1)
+    assert client.get_online_features("sessions", "u#1", ["f_clicks"]) == [7]
+    if backend == "redis":
+        assert 0 < store.redis_client.ttl("sessions:u#1") <= 1
+    else:
+        time.sleep(1.1)
+        assert client.get_online_features("sessions", "u#1", ["f_clicks"]) == [None]
+        assert list(store.scan("sessions")) == []
+        # an expired entity doesn't come back when it's written again
+        client.push_online_features("sessions", [{"user": "u", "day": 1, "f_views": 2}], ["user", "day"])
+        assert client.get_online_features("sessions", "u#1", ["f_clicks", "f_views"]) == [None, 2]
+
+
+def test_push_online_features_errors():
+    store = RedisOnlineStore(fakeredis.FakeRedis())
+    client = online_store_test_setup(store)
+    with pytest.raises(RuntimeError):
+        client.push_online_features("trips", [{"f_fare": 1.0}], "id")
+    with pytest.raises(RuntimeError):
+        client.push_online_features("trips", [{"id": 1, "f_fare": 1.0}], "id", value_codec="zstd")
+    store.batch_put(SCHEMA_TABLE, {"wide": schema_entry(["f_fare"])})
+    with pytest.raises(RuntimeError):
+        client.push_online_features("wide", [{"id": 1, "f_fare": 1.0}], "id")
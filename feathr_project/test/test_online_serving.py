@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import pytest
+
+from feathr.online.decoder import decode_feature_values
+from feathr.serving import MicroBatcher, OnlineFeatureServer, ServingMetrics
+from feathr.serving.server import _to_json_value
+from test_fixture import encode, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("prometheus_client")
+
+
+def test_serving_metrics():
+    metrics = ServingMetrics(namespace="test_serving")
+    for value in [0.0002, 0.003, 0.003]:
+        metrics.request_seconds.observe(value)
+    assert metrics.count("request_seconds") == 3 and metrics.count("batch_size") == 0
+    exposition = metrics.exposition().decode()
+    assert 'test_serving_request_seconds_bucket{le="0.0005"} 1.0' in exposition
+    assert 'test_serving_request_seconds_bucket{le="0.005"} 3.0' in exposition
+    # each service has a registry of its own by default
+    assert ServingMetrics(namespace="test_serving").count("request_seconds") == 0
+
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    """Concurrent requests should be fetched in one call, and each caller gets its own rows"""
+    batches = []
+
+    def fetch(requests):
+        batches.append(list(requests))
+        return [[key.encode()] for _, key, _ in requests]
+
+    async def run():
+        batcher = MicroBatcher(fetch, window_ms=20, max_batch_size=100)
+        results = await asyncio.gather(*[batcher.submit([("t", f"{i}a", ["f"]), ("t", f"{i}b", ["f"])])
+                                         for i in range(10)])
+        assert results[3] == [[b"3a"], [b"3b"]]
+        assert len(batches) == 1
+        # a full batch is fetched without waiting for the window
+        batcher.window_ms = 10000
+        await asyncio.wait_for(batcher.submit([("t", str(i), ["f"]) for i in range(100)]), timeout=5)
+        assert len(batches) == 2
+        assert batcher.metrics.count("batch_size") == 2 and batcher.metrics.count("fetch_seconds") == 2
+
+    asyncio.run(run())
+
+
+def test_micro_batcher_propagates_errors():
+    def fetch(requests):
+        raise RuntimeError("Redis is down")
+
+    async def run():
+        batcher = MicroBatcher(fetch, window_ms=1)
+        with pytest.raises(RuntimeError):
+            await batcher.submit([("t", "1", ["f"])])
+
+    asyncio.run(run())
+
+
+def test_json_values():
+    values = decode_feature_values([encode(float_array={"floats": [0.5, 2.0]}),
+                                    encode(sparse_float_array={"index_integers": [3], "value_floats": [1.5]}),
+                                    encode(byte_array={"bytes": [b"ab", b"c"]}), None])
+    # the decoded arrays are protobuf containers, which json can't serialize as is
+    assert json.loads(json.dumps([_to_json_value(value) for value in values])) == \
+        [[0.5, 2.0], [[3], [1.5]], ["YWI=", "Yw=="], None]
+
+
+def test_online_feature_server_http():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    redis_client = fakeredis.FakeRedis()
+    redis_client.hset("trips:1", mapping={
+        "f_distance": encode(float_value=1.5), "f_city": encode(string_value="sea"),
+        "f_route": encode(float_array={"floats": [0.5, 2.0]}),
+        "f_zones": encode(sparse_float_array={"index_integers": [1, 4], "value_floats": [0.25, 1.0]})})
+    server = OnlineFeatureServer.from_client(online_store_test_setup(redis_client), window_ms=1)
+    with TestClient(server.create_app()) as http_client:
+        response = http_client.post("/v1/online_features", json={
+            "feature_table": "trips", "keys": ["1", "2"],
+            "feature_names": ["f_distance", "f_city", "f_route", "f_zones"]})
+        assert response.status_code == 200
+        assert response.json() == {"1": [1.5, "sea", [0.5, 2.0], [[1, 4], [0.25, 1.0]]],
+                                   "2": [None, None, None, None]}
+        metrics = http_client.get("/metrics").text
+        assert "feathr_serving_request_seconds_count 1.0" in metrics
+        assert "feathr_serving_batch_size_count 1.0" in metrics
+
+
+def test_online_feature_server_grpc():
+    grpc = pytest.importorskip("grpc")
+    from feathr.protobuf.featureServing_pb2 import OnlineFeaturesRequest, OnlineFeaturesResponse
+
+    redis_client = fakeredis.FakeRedis()
+    redis_client.hset("trips:1", mapping={"f_distance": encode(float_value=1.5)})
+    server = OnlineFeatureServer.from_client(online_store_test_setup(redis_client), window_ms=1)
+
+    async def run():
+        grpc_server = server.create_grpc_server(port=0, host="localhost")
+        port = grpc_server.add_insecure_port("localhost:0")
+        await grpc_server.start()
+        try:
+            async with grpc.aio.insecure_channel(f"localhost:{port}") as channel:
+                get_online_features = channel.unary_unary(
+                    "/protobuf.FeathrOnlineFeatureService/GetOnlineFeatures",
+                    request_serializer=OnlineFeaturesRequest.SerializeToString,
+                    response_deserializer=OnlineFeaturesResponse.FromString)
+                response = await get_online_features(OnlineFeaturesRequest(
+                    feature_table="trips", keys=["1", "2"], feature_names=["f_distance"]))
+        finally:
+            await grpc_server.stop(grace=None)
+        assert [entity.key for entity in response.entities] == ["1", "2"]
+        assert response.entities[0].features["f_distance"].float_value == 1.5
+        assert len(response.entities[1].features) == 0
+
+    asyncio.run(run())
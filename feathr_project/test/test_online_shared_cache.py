@@ -0,0 +1,136 @@
+import multiprocessing
+import time
+import uuid
+
+import numpy as np
+import pytest
+
+from feathr.online import SharedOnlineFeatureCache, decode_feature_columns, decode_feature_values
+from feathr.online.codec import RAW_HEADER
+from feathr.protobuf.featureValue_pb2 import FloatArray
+from test_fixture import encode, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def write_entities(path, worker, count):
+    cache = SharedOnlineFeatureCache("test", path=path)
+    for i in range(count):
+        # each value repeats its key, so that a torn read would be detected
+        key = f"{worker}-{i % 50}"
+        cache.put("t", key, ["a"], [((key + ":") * (i % 20 + 1)).encode()])
+    cache.close()
+
+
+def test_shared_cache(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = SharedOnlineFeatureCache("test", max_size=64, ttl_seconds=60, negative_ttl_seconds=0.05, path=path)
+    # another process opening the cache gets the settings of the file
+    other = SharedOnlineFeatureCache("test", max_size=1000, path=path)
+    assert other.max_size == 64 and other.max_value_bytes == 256
+
+    cache.put("t", "1", ["a", "b"], [b"x", None])
+    assert other.get("t", "1", ["a", "b", "c"]) == ([b"x", None, None], ["c"])
+    time.sleep(0.06)
+    # the negative entry expired
+    assert other.get("t", "1", ["b"])[1] == ["b"]
+
+    other.put_key("t", "2", {})
+    assert cache.get("t", "2", ["a", "b"]) == ([None, None], [])
+    other.put("t", "2", ["a"], [b"y"])
+    assert cache.get("t", "2", ["a", "b"]) == ([b"y", None], ["b"])
+
+    # values larger than the slots are not cached, and don't leave the previous value behind
+    cache.put("t", "1", ["a"], [b"z" * 257])
+    assert cache.get("t", "1", ["a"])[1] == ["a"]
+
+    cache.invalidate("t")
+    assert other.get("t", "2", ["a"])[1] == ["a"]
+    # the counters are per process
+    assert cache.stats()["hits"] == 2 + 1
+
+
+def test_shared_cache_invalidation(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = SharedOnlineFeatureCache("test", max_size=16, ways=16, path=path)
+    other = SharedOnlineFeatureCache("test", path=path)
+    cache.put("t", "1", ["a", "b"], [b"x", b"y"])
+    cache.put("u", "1", ["a"], [b"z"])
+    assert len(other) == 3
+
+    other.invalidate("t")
+    assert cache.get("t", "1", ["a", "b"])[1] == ["a", "b"] and cache.get("u", "1", ["a"])[0] == [b"z"]
+    # the invalidated entries are counted until their slots are reused
+    cache.put("t", "1", ["a"], [b"x2"])
+    assert cache.get("t", "1", ["a"])[0] == [b"x2"] and len(cache) == 3
+    cache.put("t", "2", ["a"], [b"w"])
+    assert len(cache) == 3
+    # their slots are free: writing a full bucket of entries evicts none of the current ones
+    cache.put("v", "1", [str(i) for i in range(13)], [b"v"] * 13)
+    assert cache.stats()["evictions"] == 0 and cache.get("u", "1", ["a"])[0] == [b"z"]
+
+    other.invalidate()
+    assert len(cache) == 0 and cache.get("u", "1", ["a"])[1] == ["a"]
+    cache.put("u", "1", ["a"], [b"z"])
+    assert len(other) == 1 and other.get("u", "1", ["a"])[0] == [b"z"]
+
+
+def test_shared_cache_decodes_values(tmp_path):
+    cache = SharedOnlineFeatureCache("test", max_value_bytes=64, path=str(tmp_path / "cache"))
+    embedding = encode(float_array=FloatArray(floats=[0.5] * 8))
+    long_embedding = encode(float_array=FloatArray(floats=[0.5] * 16))
+    cache.put("t", "1", ["a", "b", "c"], [encode(double_value=2.5), embedding, long_embedding])
+    values, uncached = cache.get("t", "1", ["a", "b", "c"])
+    # base64 values are cached in the raw codec, and the values too large for a slot are not cached
+    assert uncached == ["c"] and all(value[0] == RAW_HEADER for value in values[:2])
+    assert decode_feature_values(values[:2]) == [2.5, [0.5] * 8]
+    columns = decode_feature_columns([values[1:2]] * 2, ["b"], {}, "numpy")
+    np.testing.assert_array_equal(columns["b"], np.full((2, 8), 0.5, dtype=np.float32))
+
+
+def test_shared_cache_eviction(tmp_path):
+    cache = SharedOnlineFeatureCache("test", max_size=2, ways=2, path=str(tmp_path / "cache"))
+    cache.put("t", "1", ["a"], [b"x"])
+    time.sleep(0.01)
+    cache.put("t", "2", ["a"], [b"y"])
+    cache.put("t", "3", ["a"], [b"z"])
+    # the entry closest to expiry is evicted
+    assert cache.get("t", "1", ["a"])[1] == ["a"]
+    assert cache.get("t", "3", ["a"])[0] == [b"z"]
+    assert cache.stats()["evictions"] == 1 and len(cache) == 2
+
+
+def test_shared_cache_across_processes(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = SharedOnlineFeatureCache("test", max_size=256, path=path)
+    context = multiprocessing.get_context("fork")
+    writers = [context.Process(target=write_entities, args=(path, worker, 2000)) for worker in range(3)]
+    for writer in writers:
+        writer.start()
+    while any(writer.is_alive() for writer in writers):
+        for worker in range(3):
+            key = f"{worker}-{7}"
+            [value], _ = cache.get("t", key, ["a"])
+            assert value is None or set(value.decode().split(":")[:-1]) == {key}
+    for writer in writers:
+        writer.join()
+        assert writer.exitcode == 0
+    assert cache.get("t", "2-49", ["a"])[0] == [b"2-49:" * 20]
+
+
+def test_shared_cache_in_client():
+    redis_client = fakeredis.FakeRedis()
+    redis_client.hset("trips:1", mapping={"f_distance": encode(float_value=1.5)})
+    client = online_store_test_setup(redis_client)
+    other = online_store_test_setup(redis_client)
+    name = uuid.uuid4().hex
+    cache = client.enable_shared_online_cache(name)
+    try:
+        other.enable_shared_online_cache(name)
+        assert client.multi_get_online_features("trips", ["1", "2"], ["f_distance"]) == {"1": [1.5], "2": [None]}
+        redis_client.delete("trips:1")
+        # served from the values cached by the other client
+        assert other.multi_get_online_features("trips", ["1", "2"], ["f_distance"]) == {"1": [1.5], "2": [None]}
+        assert other.online_cache.stats()["hits"] == 2
+    finally:
+        cache.unlink()
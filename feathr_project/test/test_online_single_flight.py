@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from feathr.online import AsyncFeathrOnlineClient, AsyncSingleFlight, SingleFlight
+from test_fixture import encode, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class SlowCountingRedis(fakeredis.FakeRedis):
+    """Fake Redis that counts the HMGET commands, and takes a while to answer them"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hmget_count = 0
+
+    def hmget(self, *args, **kwargs):
+        self.hmget_count += 1
+        time.sleep(0.1)
+        return super().hmget(*args, **kwargs)
+
+
+def test_single_flight_shares_results_and_errors():
+    single_flight = SingleFlight()
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def slow_fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return "value"
+
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(single_flight.do("key", slow_fetch))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    assert single_flight.deduplicated == 7
+
+    def failing_fetch():
+        raise RuntimeError("Redis is down")
+
+    with pytest.raises(RuntimeError):
+        single_flight.do("key", failing_fetch)
+    # nothing is cached once the call is done
+    assert single_flight.do("key", lambda: "new value") == "new value"
+
+
+def test_get_online_features_single_flight():
+    """Concurrent threads asking for the same entity should send one HMGET"""
+    redis_client = SlowCountingRedis()
+    redis_client.hset("trips:1", "f_distance", encode(float_value=1.5))
+    client = online_store_test_setup(redis_client)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        client.get_online_features("trips", "1", ["f_distance"]))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [[1.5]] * 10
+    assert redis_client.hmget_count < 10
+
+
+def test_async_get_online_features_single_flight():
+    server = fakeredis.FakeServer()
+    fakeredis.FakeRedis(server=server).hset("trips:1", "f_distance", encode(float_value=1.5))
+
+    async def run():
+        client = AsyncFeathrOnlineClient(redis_client=fakeredis.FakeAsyncRedis(server=server))
+        results = await asyncio.gather(*[client.get_online_features("trips", "1", ["f_distance"]) for _ in range(10)],
+                                       client.get_online_features("trips", "2", ["f_distance"]))
+        assert results == [[1.5]] * 10 + [[None]]
+        assert client.single_flight.deduplicated == 9
+
+        # a cancelled caller doesn't cancel the shared call
+        single_flight = AsyncSingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "value"
+
+        first = asyncio.ensure_future(single_flight.do("key", slow))
+        second = asyncio.ensure_future(single_flight.do("key", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "value"
+
+    asyncio.run(run())
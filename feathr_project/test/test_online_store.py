@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+
+from feathr.online import RedisOnlineStore, SqliteOnlineStore
+from test_fixture import encode, online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.mark.parametrize("store_type", ["redis", "sqlite_memory", "sqlite_file"])
+def test_online_store_contract(store_type, tmp_path):
+    """All the online stores should behave the same for get, put, scan and delete"""
+    if store_type == "redis":
+        store = RedisOnlineStore(fakeredis.FakeRedis())
+    elif store_type == "sqlite_memory":
+        store = SqliteOnlineStore()
+    else:
+        store = SqliteOnlineStore(str(tmp_path / "online.db"))
+
+    store.batch_put("trips", {str(i): {"f_count": encode(int_value=i), "f_city": encode(string_value="sea")}
+                              for i in range(1500)})
+    store.batch_put("trips*", {"1": {"f_count": encode(int_value=-1)}})
+    store.batch_put("trips", {"1": {"f_count": encode(int_value=100)}})
+
+    assert store.batch_get([("trips", "1", ["f_count", "f_unknown", "f_city"]), ("trips", "unknown", ["f_count"]),
+                            ("trips*", "1", ["f_count"])]) == \
+        [[encode(int_value=100), None, encode(string_value="sea")], [None], [encode(int_value=-1)]]
+    assert store.batch_get_all("trips", ["2", "unknown"]) == \
+        [{"f_count": encode(int_value=2), "f_city": encode(string_value="sea")}, {}]
+    scanned = dict(store.scan("trips", batch_size=400))
+    assert len(scanned) == 1500
+    assert scanned["7"]["f_count"] == encode(int_value=7)
+
+    store.delete_table("trips")
+    assert list(store.scan("trips")) == []
+    assert dict(store.scan("trips*")) == {"1": {"f_count": encode(int_value=-1)}}
+    store.close()
+
+
+def test_sqlite_online_store_in_client(tmp_path):
+    """The online APIs of the client should work on the embedded store, from several threads"""
+    path = str(tmp_path / "online.db")
+    writer = SqliteOnlineStore(path)
+    writer.batch_put("trips", {str(i): {"f_distance": encode(float_value=i * 0.5)} for i in range(100)})
+    writer.close()
+
+    client = online_store_test_setup(SqliteOnlineStore(path, read_only=True))
+    assert client.get_online_features("trips", "3", ["f_distance"]) == [1.5]
+    keys = [str(i) for i in range(120)]
+    chunks = list(client.multi_get_online_features_iter("trips", keys, ["f_distance"], chunk_size=10, parallelism=4))
+    merged = {key: values for chunk in chunks for key, values in chunk.items()}
+    assert merged["99"] == [49.5]
+    assert merged["110"] == [None]
+    with pytest.raises(sqlite3.OperationalError):
+        client.online_store.batch_put("trips", {"1": {"f_distance": encode(float_value=1.0)}})
@@ -0,0 +1,205 @@
+import io
+import json
+import threading
+import time
+
+import fastavro
+import pytest
+
+from feathr import (INT32, FLOAT, AvroJsonSchema, Feature, FeatureAnchor, HdfsSource, KafkaConfig, KafKaSource,
+                    TypedKey, ValueType)
+from feathr.online import RedisOnlineStore, StreamingIngestionWorker, kafka_consumer_config
+from test_fixture import online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+SCHEMA = {
+    "type": "record",
+    "name": "DriverTrips",
+    "fields": [
+        {"name": "driver_id", "type": "long"},
+        {"name": "trips_today", "type": "int"},
+        {"name": "distance", "type": ["null", "double"]},
+    ]
+}
+
+
+class InMemoryMessage(object):
+    def __init__(self, topic, partition, offset, value):
+        self._topic, self._partition, self._offset, self._value = topic, partition, offset, value
+
+    def error(self):
+        return None
+
+    def value(self):
+        return self._value
+
+
+class InMemoryPartition(object):
+    def __init__(self, topic, partition, offset=-1001):
+        self.topic, self.partition, self.offset = topic, partition, offset
+
+
+class InMemoryBroker(object):
+    """Stand-in for a Kafka cluster with one consumer group: the partitions are split between the subscribed
+    consumers, and each one resumes from the committed offsets."""
+    def __init__(self, topic, num_partitions):
+        self.topic = topic
+        self.partitions = [[] for _ in range(num_partitions)]
+        self.committed = [0] * num_partitions
+        self.consumers = []
+        self.lock = threading.Lock()
+
+    def produce(self, key, record):
+        buffer = io.BytesIO()
+        fastavro.schemaless_writer(buffer, fastavro.parse_schema(SCHEMA), record)
+        with self.lock:
+            self.partitions[hash(key) % len(self.partitions)].append(buffer.getvalue())
+
+    def consumer(self, config):
+        assert config["enable.auto.commit"] is False
+        return InMemoryConsumer(self)
+
+
+class InMemoryConsumer(object):
+    def __init__(self, broker):
+        self.broker = broker
+        self.positions = {}
+
+    def subscribe(self, topics):
+        assert topics == [self.broker.topic]
+        with self.broker.lock:
+            self.broker.consumers.append(self)
+
+    def assignment(self):
+        with self.broker.lock:
+            index = self.broker.consumers.index(self)
+            count = len(self.broker.consumers)
+        return [InMemoryPartition(self.broker.topic, p) for p in range(len(self.broker.partitions)) if p % count == index]
+
+    def consume(self, num_messages, timeout):
+        messages = []
+        for partition in self.assignment():
+            p = partition.partition
+            with self.broker.lock:
+                position = self.positions.setdefault(p, self.broker.committed[p])
+                values = self.broker.partitions[p][position:position + num_messages - len(messages)]
+            messages.extend(InMemoryMessage(self.broker.topic, p, position + i, v) for i, v in enumerate(values))
+            self.positions[p] = position + len(values)
+        if not messages:
+            time.sleep(min(timeout, 0.01))
+        return messages
+
+    def commit(self, asynchronous=True):
+        with self.broker.lock:
+            for p, position in self.positions.items():
+                self.broker.committed[p] = max(self.broker.committed[p], position)
+
+    def position(self, partitions):
+        return [InMemoryPartition(tp.topic, tp.partition, self.positions.get(tp.partition, -1001))
+                for tp in partitions]
+
+    def get_watermark_offsets(self, partition, cached=False):
+        with self.broker.lock:
+            return 0, len(self.broker.partitions[partition.partition])
+
+    def close(self):
+        with self.broker.lock:
+            self.broker.consumers.remove(self)
+
+
+def kafka_anchor():
+    source = KafKaSource(name="driverTrips", kafkaConfig=KafkaConfig(
+        brokers=["localhost:9092"], topics=["driver_trips"], schema=AvroJsonSchema(schemaStr=json.dumps(SCHEMA))))
+    driver_id = TypedKey(key_column="driver_id", key_column_type=ValueType.INT64)
+    return FeatureAnchor(name="driverTripsAnchor", source=source, features=[
+        Feature(name="f_trips_today", feature_type=INT32, key=driver_id, transform="trips_today + 1"),
+        Feature(name="f_distance_per_trip", feature_type=FLOAT, key=driver_id, transform="distance / trips_today"),
+    ])
+
+
+def test_streaming_ingestion_worker():
+    broker = InMemoryBroker("driver_trips", num_partitions=4)
+    redis_client = fakeredis.FakeRedis()
+    worker = StreamingIngestionWorker(RedisOnlineStore(redis_client), "driver_trips", kafka_anchor(),
+                                      kafka_consumer_config(["localhost:9092"], "ingestion"), num_consumers=2,
+                                      batch_size=16, flush_interval_seconds=0.05, consumer_factory=broker.consumer)
+    with worker:
+        for trips in range(1, 4):
+            for driver_id in range(50):
+                broker.produce(driver_id, {"driver_id": driver_id, "trips_today": trips,
+                                           "distance": None if driver_id == 7 else 2.0 * trips})
+        broker.partitions[0].append(b"\xff")
+        deadline = time.monotonic() + 10
+        while sum(broker.committed) < 151 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    snapshot = worker.metrics.snapshot()
+    assert snapshot["messages"] >= 151 and snapshot["decode_errors"] == 1 and snapshot["total_lag"] == 0
+    assert snapshot["messages_per_second"] > 0
+    client = online_store_test_setup(redis_client)
+    result = client.multi_get_online_features("driver_trips", ["3", "7"], ["f_trips_today", "f_distance_per_trip"])
+    assert result == {"3": [4, 2.0], "7": [4, None]}
+
+
+def test_process_messages():
+    redis_client = fakeredis.FakeRedis()
+    worker = StreamingIngestionWorker(RedisOnlineStore(redis_client), "driver_trips", kafka_anchor(), {})
+    broker = InMemoryBroker("driver_trips", num_partitions=1)
+    broker.produce(1, {"driver_id": 1, "trips_today": 2, "distance": 3.0})
+    assert worker.process_messages(broker.partitions[0]) == 1
+    assert online_store_test_setup(redis_client).get_online_features("driver_trips", "1", ["f_trips_today"]) == [3]
+    assert kafka_consumer_config(["a:9093"], "g", "Endpoint=sb://x")["sasl.username"] == "$ConnectionString"
+    batch_anchor = FeatureAnchor(name="batch", source=HdfsSource(name="trips", path="trips.csv"),
+                                 features=[Feature(name="f_x", feature_type=INT32, transform="x",
+                                                   key=TypedKey(key_column="id", key_column_type=ValueType.INT64))])
+    with pytest.raises(RuntimeError):
+        StreamingIngestionWorker(RedisOnlineStore(redis_client), "driver_trips", batch_anchor, {})
+
+
+class FlakyOnlineStore(RedisOnlineStore):
+    """Fails the first writes with the given error."""
+    def __init__(self, redis_client, error, failures):
+        super().__init__(redis_client)
+        self.error, self.failures = error, failures
+
+    def batch_put(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        return super().batch_put(*args, **kwargs)
+
+
+def test_streaming_ingestion_retries():
+    broker = InMemoryBroker("driver_trips", num_partitions=1)
+    redis_client = fakeredis.FakeRedis()
+    store = FlakyOnlineStore(redis_client, ConnectionError("Redis is unreachable"), failures=3)
+    worker = StreamingIngestionWorker(store, "driver_trips", kafka_anchor(), {"enable.auto.commit": False},
+                                      flush_interval_seconds=0.01, consumer_factory=broker.consumer,
+                                      retry_backoff_seconds=0.01)
+    broker.produce(1, {"driver_id": 1, "trips_today": 2, "distance": 3.0})
+    with worker:
+        deadline = time.monotonic() + 10
+        while broker.committed[0] < 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        assert worker.is_healthy()
+    assert worker.metrics.snapshot()["retries"] == 3 and broker.committed == [1]
+    assert online_store_test_setup(redis_client).get_online_features("driver_trips", "1", ["f_trips_today"]) == [3]
+
+
+def test_streaming_ingestion_failure():
+    broker = InMemoryBroker("driver_trips", num_partitions=1)
+    failures = []
+    store = FlakyOnlineStore(fakeredis.FakeRedis(), ValueError("bad value"), failures=1)
+    worker = StreamingIngestionWorker(store, "driver_trips", kafka_anchor(), {"enable.auto.commit": False},
+                                      flush_interval_seconds=0.01, consumer_factory=broker.consumer,
+                                      retry_backoff_seconds=0.01, on_failure=failures.append)
+    broker.produce(1, {"driver_id": 1, "trips_today": 2, "distance": 3.0})
+    worker.start()
+    deadline = time.monotonic() + 10
+    while worker.is_healthy() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert not worker.is_healthy() and isinstance(failures[0], ValueError)
+    assert broker.committed == [0] and worker.metrics.snapshot()["retries"] == 0
+    with pytest.raises(RuntimeError, match="bad value"):
+        worker.stop()
@@ -0,0 +1,116 @@
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from feathr import RedisSink, SqliteOnlineStore
+from feathr.online import RedisOnlineStore, new_table_version, reclaim_table_versions, swap_table_alias
+from feathr.online.versions import ALIAS_FIELD, ALIAS_TABLE, RECLAIMING_FIELD, RETIRED_FIELD
+from test_fixture import online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_versioned_load(tmp_path):
+    redis_client = fakeredis.FakeRedis()
+    client = online_store_test_setup(redis_client)
+    client.table_aliases.refresh_seconds = 0
+    client.push_online_features("trips", [{"id": i, "f_fare": float(i)} for i in range(5)], "id")
+    pq.write_table(pa.Table.from_pandas(pd.DataFrame({"id": [0, 1, 2], "f_fare": [10.0, 11.0, 12.0]})),
+                   tmp_path / "part-0.parquet")
+
+    assert client.load_online_features("trips", str(tmp_path), "id", versioned=True, progress=False) == 3
+    # the entities of the previous version are gone at once, not mixed with the new ones
+    assert client.multi_get_online_features("trips", ["0", "2", "4"], ["f_fare"]) == {
+        "0": [10.0], "2": [12.0], "4": [None]}
+    # the table written in place before the first version is reclaimed in the background
+    deadline = time.monotonic() + 5
+    while redis_client.keys("trips:*") and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert redis_client.keys("trips:*") == []
+    assert client.get_online_features("trips", "1", ["f_fare"]) == [11.0]
+    # pushes go to the current version
+    client.push_online_features("trips", [{"id": 7, "f_fare": 17.0}], "id")
+    assert client.get_online_features("trips", "7", ["f_fare"]) == [17.0]
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_swap_and_reclaim(backend):
+    store = RedisOnlineStore(fakeredis.FakeRedis()) if backend == "redis" else SqliteOnlineStore()
+    writer = online_store_test_setup(store)
+    reader = online_store_test_setup(store)
+    first, second = "trips__v1", "trips__v2"
+    store.batch_put(first, {str(i): {"f_fare": b"first"} for i in range(30)})
+    store.batch_put(second, {str(i): {"f_fare": b"second"} for i in range(10)})
+
+    assert writer.swap_online_table_version("trips", first, reclaim=False) is None
+    assert reader._fetch_online_features([("trips", "3", ["f_fare"])]) == [[b"first"]]
+    assert swap_table_alias(store, "trips", second) == first
+    # the reader keeps the version it resolved until it refreshes the alias
+    assert reader._fetch_online_features([("trips", "3", ["f_fare"])]) == [[b"first"]]
+    reader.table_aliases.refresh_seconds = 0
+    assert reader._fetch_online_features([("trips", "3", ["f_fare"])]) == [[b"second"]]
+
+    assert reclaim_table_versions(store, "trips", max_keys_per_second=1000) == ["trips", first]
+    assert list(store.scan(first)) == []
+    assert len(list(store.scan(second))) == 10
+    assert store.batch_get_all(ALIAS_TABLE, ["trips"])[0][RETIRED_FIELD] in ("[]", b"[]")
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_swap_during_reclaim(backend, monkeypatch):
+    store = RedisOnlineStore(fakeredis.FakeRedis()) if backend == "redis" else SqliteOnlineStore()
+    for table in ["trips", "trips__v1", "trips__v2", "trips__v3"]:
+        store.batch_put(table, {"1": {"f_fare": table.encode()}})
+    swap_table_alias(store, "trips", "trips__v1")
+    swap_table_alias(store, "trips", "trips__v2")
+
+    delete_table = store.delete_table
+
+    def swap_while_deleting(feature_table, max_keys_per_second=None):
+        if feature_table == "trips":
+            # a new version is swapped in while the reclaim deletes the retired ones
+            assert swap_table_alias(store, "trips", "trips__v3") == "trips__v2"
+            # and the versions being deleted can't be rolled back to
+            with pytest.raises(RuntimeError):
+                swap_table_alias(store, "trips", "trips__v1")
+        delete_table(feature_table, max_keys_per_second)
+    monkeypatch.setattr(store, "delete_table", swap_while_deleting)
+
+    assert reclaim_table_versions(store, "trips") == ["trips", "trips__v1"]
+    entry = {name: value.decode() if isinstance(value, bytes) else value
+             for name, value in store.batch_get_all(ALIAS_TABLE, ["trips"])[0].items()}
+    # the version retired during the reclaim is kept for the next one
+    assert entry[ALIAS_FIELD] == "trips__v3" and entry[RETIRED_FIELD] == '["trips__v2"]'
+    assert entry[RECLAIMING_FIELD] == "[]"
+    assert reclaim_table_versions(store, "trips") == ["trips__v2"]
+    assert store.batch_get([("trips__v3", "1", ["f_fare"]), ("trips__v2", "1", ["f_fare"])]) == \
+        [[b"trips__v3"], [None]]
+
+
+def test_redis_update_entity_retries():
+    server = fakeredis.FakeServer()
+    store = RedisOnlineStore(fakeredis.FakeRedis(server=server))
+    calls = []
+
+    def update(entity):
+        calls.append(entity)
+        if len(calls) == 1:
+            # another client writes the entity between the read and the write
+            fakeredis.FakeRedis(server=server).hset("meta:1", "other", b"1")
+        return {"count": str(len(entity)).encode()}
+
+    assert store.update_entity("meta", "1", update) == {"other": b"1"}
+    assert calls == [{}, {"other": b"1"}]
+    assert store.batch_get_all("meta", ["1"]) == [{"other": b"1", "count": b"1"}]
+
+
+def test_versioned_sink():
+    sink = RedisSink("trips", versioned=True)
+    assert 'table_name: "trips"' in sink.to_feature_config()
+    sink.table_version = new_table_version("trips")
+    assert f'table_name: "{sink.table_version}"' in sink.to_feature_config()
+    with pytest.raises(RuntimeError):
+        RedisSink("trips", streaming=True, versioned=True)
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+from feathr import FLOAT, INT32, Feature, FeatureAnchor, HdfsSource, TypedKey, ValueType, WindowAggTransformation
+from feathr.online import OnlineWindowAggregator, RedisOnlineStore, SqliteOnlineStore, parse_window
+from test_fixture import online_store_test_setup
+
+fakeredis = pytest.importorskip("fakeredis")
+
+NOW = 1666000000.0
+
+
+def window_features(*aggregations):
+    key = TypedKey(key_column="user_id", key_column_type=ValueType.INT64)
+    return [Feature(name=name, key=key, feature_type=INT32 if agg_func == "COUNT" else FLOAT,
+                    transform=WindowAggTransformation(agg_expr=expr, agg_func=agg_func, window=window, filter=filter))
+            for name, expr, agg_func, window, filter in aggregations]
+
+
+def transactions_anchor(*aggregations):
+    source = HdfsSource(name="transactions", path="transactions.parquet", event_timestamp_column="timestamp")
+    return FeatureAnchor(name="transaction_windows", source=source, features=window_features(*aggregations))
+
+
+ANCHOR = transactions_anchor(("f_amount_sum_1h", "amount", "SUM", "1h", None),
+                             ("f_count_1h", "1", "COUNT", "1h", None),
+                             ("f_amount_avg_10m", "amount", "AVG", "10m", None),
+                             ("f_amount_max_1h", "amount * 2", "MAX", "1h", None),
+                             ("f_refund_min_1h", "amount", "MIN", "1h", "amount < 0"))
+
+
+def test_parse_window():
+    assert [parse_window(window) for window in ["7d", "5h", "3m", "1s"]] == [604800, 18000, 180, 1]
+    with pytest.raises(RuntimeError):
+        parse_window("1w")
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_window_aggregation(backend):
+    store = RedisOnlineStore(fakeredis.FakeRedis()) if backend == "redis" else SqliteOnlineStore()
+    aggregator = OnlineWindowAggregator(store, "transaction_windows", ANCHOR, clock=lambda: NOW)
+    assert aggregator.bucket_seconds == 10 and aggregator.ttl_seconds == 3620
+
+    events = pd.DataFrame({"user_id": [1, 1, 1, 2, 2, 3],
+                           "amount": [10.0, 20.0, -5.0, 7.0, 3.0, 100.0],
+                           "timestamp": [NOW - 5, NOW - 1200, NOW - 30, NOW - 60, NOW - 7000, NOW - 2]})
+    # user 2's second event is already out of all the windows
+    assert aggregator.append(events) == 5
+    # appending again merges into the same buckets
+    aggregator.append([{"user_id": 1, "amount": 30.0, "timestamp": NOW}])
+
+    assert aggregator.get(["1", "2", "4"]) == {
+        "1": [55.0, 4, pytest.approx(35.0 / 3), 60.0, -5.0],
+        "2": [7.0, 1, 7.0, 14.0, None],
+        "4": [None, None, None, None, None],
+    }
+    assert aggregator.get(["3"], ["f_count_1h", "f_amount_sum_1h"]) == {"3": [1, 100.0]}
+    # 40 minutes later, only user 1's event of 20 minutes ago is out of the 1h window
+    assert aggregator.get(["1"], ["f_amount_sum_1h", "f_amount_avg_10m"], now=NOW + 2400) == {"1": [35.0, None]}
+    with pytest.raises(RuntimeError):
+        aggregator.get(["1"], ["f_unknown"])
+
+
+def test_buckets_expire():
+    redis_client = fakeredis.FakeRedis()
+    client = online_store_test_setup(redis_client)
+    aggregator = client.online_window_aggregator(ANCHOR, "transaction_windows", bucket_seconds=60)
+    aggregator.append([{"user_id": 1, "amount": 1.5}, {"user_id": 1, "amount": 2.5}])
+    [bucket_key] = redis_client.keys("transaction_windows:*")
+    assert 0 < redis_client.ttl(bucket_key) <= 3600 + 120
+    assert redis_client.hget(bucket_key, "f_amount_sum_1h:sum") == b"4"
+    assert aggregator.get(["1"], ["f_amount_sum_1h", "f_count_1h"]) == {"1": [4.0, 2]}
+
+
+def test_unsupported_aggregations():
+    with pytest.raises(RuntimeError):
+        OnlineWindowAggregator(SqliteOnlineStore(), "t", transactions_anchor(("f_latest", "amount", "LATEST", "1h",
+                                                                             None)))
+    source = HdfsSource(name="transactions", path="transactions.parquet")
+    key = TypedKey(key_column="user_id", key_column_type=ValueType.INT64)
+    grouped = Feature(name="f_grouped", key=key, feature_type=FLOAT,
+                      transform=WindowAggTransformation(agg_expr="amount", agg_func="SUM", window="1h",
+                                                        group_by="category"))
+    with pytest.raises(RuntimeError):
+        OnlineWindowAggregator(SqliteOnlineStore(), "t", FeatureAnchor(name="grouped", source=source,
+                                                                      features=[grouped]))
@@ -7,21 +7,45 @@ private[feathr]  class RedisResourceInfoSetter extends ResourceInfoSetter() {
   val REDIS_PORT = "REDIS_PORT"
   val REDIS_SSL_ENABLED = "REDIS_SSL_ENABLED"
   val REDIS_PASSWORD = "REDIS_PASSWORD"
+  val REDIS_CLUSTER_ENABLED = "REDIS_CLUSTER_ENABLED"
 
-  override val params = List(REDIS_HOST, REDIS_PORT, REDIS_SSL_ENABLED, REDIS_PASSWORD)
+  override val params = List(REDIS_HOST, REDIS_PORT, REDIS_SSL_ENABLED, REDIS_PASSWORD, REDIS_CLUSTER_ENABLED)
 
   def setupSparkConf(sparkConf: SparkConf, context: Option[DataSourceConfig], resource: Option[Resource]): Unit = {
     val host = getAuthStr(REDIS_HOST, context, resource)
     val port = getAuthStr(REDIS_PORT, context, resource)
     val sslEnabled = getAuthStr(REDIS_SSL_ENABLED, context, resource)
     val auth = getAuthStr(REDIS_PASSWORD, context, resource)
+    val clusterEnabled = getAuthStr(REDIS_CLUSTER_ENABLED, context, resource)
 
-    sparkConf.set("spark.redis.host", host)
-    sparkConf.set("spark.redis.port", port)
+    // For Redis Cluster, the host can be a comma separated list of host:port endpoints. spark-redis only needs one
+    // of them: it detects the cluster mode and discovers the other nodes from it, and writes each partition to the
+    // nodes that own its keys, so the writes are spread across all the shards.
+    val (initialHost, initialPort) = if (clusterEnabled.equalsIgnoreCase("true")) {
+      getClusterInitialNode(host, port)
+    } else {
+      (host, port)
+    }
+    sparkConf.set("spark.redis.host", initialHost)
+    sparkConf.set("spark.redis.port", initialPort)
     sparkConf.set("spark.redis.ssl", sslEnabled)
     sparkConf.set("spark.redis.auth", auth)
   }
 
+  /**
+   * Gets the host and port of the first endpoint of a Redis Cluster host, e.g. `host1:7000,host2:7000`. An endpoint
+   * without port uses `port`. The whitespace around the endpoints, hosts and ports is ignored.
+   */
+  private[feathr] def getClusterInitialNode(host: String, port: String): (String, String) = {
+    val endpoint = host.split(",").map(_.trim).find(_.nonEmpty).getOrElse(host.trim)
+    val separatorIndex = endpoint.lastIndexOf(":")
+    if (separatorIndex > 0) {
+      (endpoint.substring(0, separatorIndex).trim, endpoint.substring(separatorIndex + 1).trim)
+    } else {
+      (endpoint, port.trim)
+    }
+  }
+
   def getAuthFromConfig(str: String, resource: Resource): String = {
     str match {
       case REDIS_HOST => resource.azureResource.redisHost
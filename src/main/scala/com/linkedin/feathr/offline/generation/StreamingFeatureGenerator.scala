@@ -5,7 +5,7 @@ import com.google.common.collect.Lists
 import com.linkedin.feathr.common.JoiningFeatureParams
 import com.linkedin.feathr.offline.config.location.KafkaEndpoint
 import com.linkedin.feathr.offline.generation.outputProcessor.PushToRedisOutputProcessor.TABLE_PARAM_CONFIG_NAME
-import com.linkedin.feathr.offline.generation.outputProcessor.RedisOutputUtils
+import com.linkedin.feathr.offline.generation.outputProcessor.{PushToRedisOutputProcessor, RedisOutputUtils}
 import com.linkedin.feathr.offline.job.FeatureTransformation.getFeatureJoinKey
 import com.linkedin.feathr.offline.job.{FeatureGenSpec, FeatureTransformation}
 import com.linkedin.feathr.offline.logical.FeatureGroups
@@ -118,7 +118,9 @@ class StreamingFeatureGenerator(dataPathHandlers: List[DataPathHandler]) {
           val resultFDS: DataFrame = PostGenPruner().standardizeColumns(outputJoinKeyColumnNames, keyColumnNames, cleanedDF)
           val tableName = outputConfig.getParams.getString(TABLE_PARAM_CONFIG_NAME)
           val allFeatureCols = resultFDS.columns.diff(keyColumnNames).toSet
-          RedisOutputUtils.writeToRedis(ss, resultFDS, tableName, keyColumnNames, allFeatureCols, SaveMode.Append)
+          RedisOutputUtils.writeToRedis(ss, resultFDS, tableName, keyColumnNames, allFeatureCols, SaveMode.Append,
+            PushToRedisOutputProcessor.getValueCodec(outputConfig), PushToRedisOutputProcessor.getQuantization(outputConfig),
+            PushToRedisOutputProcessor.getLayout(outputConfig))
         }
         .start()
         .awaitTermination(timeoutMs)
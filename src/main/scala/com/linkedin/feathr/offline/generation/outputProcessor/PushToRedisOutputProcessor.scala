@@ -3,9 +3,11 @@ package com.linkedin.feathr.offline.generation.outputProcessor
 import com.linkedin.feathr.common.Header
 import com.linkedin.feathr.common.configObj.generation.OutputProcessorConfig
 import com.linkedin.feathr.offline.generation.FeatureGenUtils
-import com.linkedin.feathr.offline.generation.outputProcessor.PushToRedisOutputProcessor.TABLE_PARAM_CONFIG_NAME
+import com.linkedin.feathr.offline.generation.outputProcessor.PushToRedisOutputProcessor.{TABLE_PARAM_CONFIG_NAME, getLayout, getQuantization, getValueCodec}
 import org.apache.spark.sql.{DataFrame, SaveMode, SparkSession}
 
+import scala.collection.JavaConverters._
+
 /**
  * feature generation output processor used to push data to Redis store
  * @param config config object of output processor, built from the feature generation config
@@ -26,7 +28,8 @@ private[offline] class PushToRedisOutputProcessor(config: OutputProcessorConfig,
 
     val tableName = config.getParams.getString(TABLE_PARAM_CONFIG_NAME)
     val allFeatureCols = header.featureInfoMap.map(x => (x._2.columnName)).toSet
-    RedisOutputUtils.writeToRedis(ss, df, tableName, keyColumns, allFeatureCols, SaveMode.Overwrite)
+    RedisOutputUtils.writeToRedis(ss, df, tableName, keyColumns, allFeatureCols, SaveMode.Overwrite, getValueCodec(config),
+      getQuantization(config), getLayout(config))
     (df, header)
   }
 }
@@ -34,4 +37,43 @@ private[offline] class PushToRedisOutputProcessor(config: OutputProcessorConfig,
 object PushToRedisOutputProcessor {
   // Parameter name in Redis output processor config for table name
   val TABLE_PARAM_CONFIG_NAME = "table_name"
+  // Parameter name in Redis output processor config for the codec of the feature values, see RedisOutputUtils
+  val VALUE_CODEC_PARAM_CONFIG_NAME = "value_codec"
+
+  def getValueCodec(config: OutputProcessorConfig): String = {
+    if (config.getParams.hasPath(VALUE_CODEC_PARAM_CONFIG_NAME)) {
+      config.getParams.getString(VALUE_CODEC_PARAM_CONFIG_NAME)
+    } else {
+      RedisOutputUtils.BASE64_CODEC
+    }
+  }
+
+  // Parameter name in Redis output processor config for the quantization of each dense array feature
+  val QUANTIZATION_PARAM_CONFIG_NAME = "quantization"
+
+  def getQuantization(config: OutputProcessorConfig): Map[String, String] = {
+    if (config.getParams.hasPath(QUANTIZATION_PARAM_CONFIG_NAME)) {
+      config.getParams.getObject(QUANTIZATION_PARAM_CONFIG_NAME).unwrapped().asScala.map {
+        case (featureName, quantization) => featureName -> quantization.toString
+      }.toMap
+    } else {
+      Map()
+    }
+  }
+
+  // Parameter name in Redis output processor config for the layout of the table, see RedisOutputUtils
+  val LAYOUT_PARAM_CONFIG_NAME = "layout"
+
+  def getLayout(config: OutputProcessorConfig): String = {
+    val layout = if (config.getParams.hasPath(LAYOUT_PARAM_CONFIG_NAME)) {
+      config.getParams.getString(LAYOUT_PARAM_CONFIG_NAME)
+    } else {
+      RedisOutputUtils.HASH_LAYOUT
+    }
+    if (layout != RedisOutputUtils.HASH_LAYOUT && layout != RedisOutputUtils.PACKED_LAYOUT) {
+      throw new RuntimeException(s"Unsupported Redis table layout ${layout}. Supported layouts are " +
+        s"${RedisOutputUtils.HASH_LAYOUT} and ${RedisOutputUtils.PACKED_LAYOUT}.")
+    }
+    layout
+  }
 }
\ No newline at end of file
@@ -1,27 +1,70 @@
 package com.linkedin.feathr.offline.generation.outputProcessor
 
+import com.github.luben.zstd.{Zstd, ZstdDictCompress}
 import com.linkedin.feathr.common.types.protobuf.FeatureValueOuterClass
+import com.redislabs.provider.redis.{RedisConfig, RedisEndpoint}
 import org.apache.spark.sql.catalyst.encoders.RowEncoder
 import org.apache.spark.sql.catalyst.expressions.GenericRowWithSchema
 import org.apache.spark.sql.functions.{concat_ws, expr, when}
 import org.apache.spark.sql.types._
 import org.apache.spark.sql.{DataFrame, Row, SaveMode, SparkSession}
 
+import java.nio.charset.StandardCharsets
+import java.nio.{ByteBuffer, ByteOrder}
 import java.util.Base64
+import java.util.zip.CRC32
 import scala.collection.JavaConverters._
 import scala.collection.mutable
 
 object RedisOutputUtils {
-  def writeToRedis(ss: SparkSession, df: DataFrame, tableName: String, keyColumns: Seq[String], allFeatureCols: Set[String], saveMode: SaveMode): Unit = {
+  // Codecs of the feature values, see feathr/online/codec.py in the Python client
+  val BASE64_CODEC = "base64"
+  val RAW_CODEC = "raw"
+  val ZSTD_CODEC = "zstd"
+  // Header bytes of the binary codecs, outside of the base64 alphabet so that the readers can detect the codec
+  val RAW_HEADER: Byte = 0x01
+  val ZSTD_HEADER: Byte = 0x02
+  // Quantizations of dense float/double array features, see `quantize`
+  val FLOAT16_QUANTIZATION = "float16"
+  val INT8_QUANTIZATION = "int8"
+  val FLOAT16_HEADER: Byte = 0x03
+  val INT8_HEADER: Byte = 0x04
+  // Layouts of the feature tables: one hash field per feature, or one packed row per entity
+  val HASH_LAYOUT = "hash"
+  val PACKED_LAYOUT = "packed"
+  val PACKED_HEADER: Byte = 0x05
+  // Redis hash holding the schemas of each packed table, keyed by schema version
+  val SCHEMA_TABLE = "__feathr_packed_schemas__"
+  // Redis hash holding the zstd dictionaries, keyed by dictionary id
+  val DICTIONARY_TABLE = "__feathr_codec_dictionaries__"
+  val DICTIONARY_FIELD = "dictionary"
+  val DICTIONARY_SIZE: Int = 16 * 1024
+  val DICTIONARY_SAMPLE_ROWS = 10000
+  val ZSTD_LEVEL = 3
+  // number of rows written in each pipeline by the binary codecs
+  val WRITE_BATCH_SIZE = 1000
+
+  private val base64Encode: Array[Byte] => Any = bytes => Base64.getEncoder.encodeToString(bytes)
+
+  def writeToRedis(ss: SparkSession, df: DataFrame, tableName: String, keyColumns: Seq[String], allFeatureCols: Set[String],
+                   saveMode: SaveMode, valueCodec: String = BASE64_CODEC,
+                   quantization: Map[String, String] = Map(), layout: String = HASH_LAYOUT): Unit = {
     val nullElementGuardString = "_null_"
     val newColExpr = concat_ws("#", keyColumns.map(c => {
       val casted = expr(s"CAST (${c} as string)")
       // If any key in the keys is null, replace with special value and remove the row later
       when(casted.isNull, nullElementGuardString).otherwise(casted)
     }): _*)
+    val outputKeyColumnName = "feature_key"
+    if (valueCodec != BASE64_CODEC || quantization.nonEmpty || layout != HASH_LAYOUT) {
+      val rawDf = encodeDataFrame(allFeatureCols, df, bytes => bytes, BinaryType, quantization)
+      val decoratedRawDf = rawDf.withColumn(outputKeyColumnName, newColExpr).drop(keyColumns: _*)
+      writeBinaryToRedis(ss, decoratedRawDf, tableName, outputKeyColumnName, valueCodec, quantization.keySet,
+        layout)
+      return
+    }
     val encodedDf = encodeDataFrame(allFeatureCols, df)
 
-    val outputKeyColumnName = "feature_key"
     val decoratedDf = encodedDf.withColumn(outputKeyColumnName, newColExpr)
       .drop(keyColumns: _*)
 
@@ -39,12 +82,196 @@ object RedisOutputUtils {
       .save()
   }
 
-  private[feathr] def encodeDataFrame(allFeatureCols: Set[String], df: DataFrame): DataFrame = {
+  /**
+   * Writes the serialized features with a binary codec(raw or zstd). spark-redis only writes string values, so the
+   * hashes are written directly with a pipeline per Redis node. With the zstd codec, a dictionary is trained on a
+   * sample of the values and stored in the DICTIONARY_TABLE hash, so that the readers can decompress the values.
+   * The rows are upserted: with SaveMode.Overwrite, the features of the existing keys are replaced, but keys that are
+   * not in the dataframe are not deleted. The quantized features are already encoded, and are written as is.
+   * With the packed layout, each entity is a string holding all its features in the column order of the schema,
+   * which is stored once per table in the SCHEMA_TABLE hash.
+   */
+  private def writeBinaryToRedis(ss: SparkSession, df: DataFrame, tableName: String, keyColumnName: String,
+                                 valueCodec: String, quantizedCols: Set[String], layout: String): Unit = {
+    val redisConfig = new RedisConfig(RedisEndpoint(
+      host = ss.conf.get("spark.redis.host"),
+      port = ss.conf.get("spark.redis.port").toInt,
+      auth = ss.conf.get("spark.redis.auth"),
+      ssl = ss.conf.get("spark.redis.ssl").toBoolean))
+    val featureCols = df.columns.filter(_ != keyColumnName)
+    val keyIndex = df.schema.fieldIndex(keyColumnName)
+    val featureIndices = featureCols.map(df.schema.fieldIndex)
+
+    val packed = layout == PACKED_LAYOUT
+    val schemaVersion = if (packed) {
+      val (schemaJson, version) = packedSchema(featureCols)
+      val schemaKey = SCHEMA_TABLE + ":" + tableName
+      val conn = redisConfig.connectionForKey(schemaKey)
+      try {
+        conn.hset(schemaKey, version.toString, schemaJson)
+      } finally {
+        conn.close()
+      }
+      version
+    } else {
+      0L
+    }
+    val codecCols = featureCols.filterNot(quantizedCols.contains)
+    val dictionary: Option[Array[Byte]] = valueCodec match {
+      case BASE64_CODEC | RAW_CODEC => None
+      case ZSTD_CODEC if codecCols.isEmpty => None
+      case ZSTD_CODEC =>
+        val samples = df.select(codecCols.head, codecCols.tail: _*).limit(DICTIONARY_SAMPLE_ROWS).collect()
+          .flatMap(row => row.toSeq.filter(_ != null).map(_.asInstanceOf[Array[Byte]]))
+        val trained = trainDictionary(samples)
+        trained.foreach(storeDictionary(_, redisConfig))
+        trained
+      case _ => throw new RuntimeException(s"Unsupported value codec ${valueCodec}. Supported codecs are " +
+        s"${Seq(BASE64_CODEC, RAW_CODEC, ZSTD_CODEC)}.")
+    }
+
+    df.foreachPartition { rows: Iterator[Row] =>
+      val encodeValue = valueEncoder(valueCodec, dictionary)
+      rows.grouped(WRITE_BATCH_SIZE).foreach { batch =>
+        val entities = batch.map { row =>
+          val values = featureCols.indices.map { i =>
+            if (row.isNullAt(featureIndices(i))) {
+              None
+            } else {
+              val value = row.getAs[Array[Byte]](featureIndices(i))
+              Some(if (quantizedCols.contains(featureCols(i))) value else encodeValue(value))
+            }
+          }
+          (tableName + ":" + row.getString(keyIndex), values)
+        }.filter(_._2.exists(_.isDefined))
+        entities.groupBy { case (key, _) => redisConfig.getHost(key) }.foreach { case (node, nodeEntities) =>
+          val conn = node.endpoint.connect()
+          try {
+            val pipeline = conn.pipelined()
+            nodeEntities.foreach { case (key, values) =>
+              val redisKey = key.getBytes(StandardCharsets.UTF_8)
+              if (packed) {
+                pipeline.set(redisKey, packRow(values, schemaVersion))
+              } else {
+                val fields = featureCols.zip(values).collect {
+                  case (featureCol, Some(value)) => featureCol.getBytes(StandardCharsets.UTF_8) -> value
+                }.toMap
+                pipeline.hset(redisKey, fields.asJava)
+              }
+            }
+            pipeline.sync()
+          } finally {
+            conn.close()
+          }
+        }
+      }
+    }
+  }
+
+  /**
+   * Gets the JSON list of the feature names of a packed-row schema, and its version(the CRC32 of the JSON), as
+   * computed by feathr/online/packed.py in the Python client. The JSON must be the same bytes as Python's
+   * `json.dumps(names, separators=(",", ":"))`, see `jsonString`.
+   */
+  private[feathr] def packedSchema(featureCols: Seq[String]): (String, Long) = {
+    val json = featureCols.map(jsonString).mkString("[", ",", "]")
+    val crc = new CRC32()
+    crc.update(json.getBytes(StandardCharsets.US_ASCII))
+    (json, crc.getValue)
+  }
+
+  /**
+   * Encodes a string as a JSON string the way Python's json module does with `ensure_ascii=True`: the characters
+   * outside of the printable ASCII range are escaped as their UTF-16 code units in lowercase hex, so the JSON is
+   * ASCII.
+   */
+  private[feathr] def jsonString(value: String): String = {
+    val builder = new StringBuilder("\"")
+    value.foreach {
+      case '"' => builder.append("\\\"")
+      case '\\' => builder.append("\\\\")
+      case '\b' => builder.append("\\b")
+      case '\f' => builder.append("\\f")
+      case '\n' => builder.append("\\n")
+      case '\r' => builder.append("\\r")
+      case '\t' => builder.append("\\t")
+      case c if c < ' ' || c > '~' => builder.append("\\u%04x".format(c.toInt))
+      case c => builder.append(c)
+    }
+    builder.append('"').toString
+  }
+
+  /**
+   * Packs the encoded values of all the columns of an entity into one blob: header byte, schema version(uint32),
+   * number of columns(uint32), end offset of each column(uint32), and the concatenated values, all little endian.
+   * Missing values are empty columns.
+   */
+  private[feathr] def packRow(values: Seq[Option[Array[Byte]]], schemaVersion: Long): Array[Byte] = {
+    val valuesLength = values.map(_.map(_.length).getOrElse(0)).sum
+    val buffer = ByteBuffer.allocate(9 + 4 * values.size + valuesLength).order(ByteOrder.LITTLE_ENDIAN)
+    buffer.put(PACKED_HEADER).putInt(schemaVersion.toInt).putInt(values.size)
+    var end = 0
+    values.foreach { value =>
+      end += value.map(_.length).getOrElse(0)
+      buffer.putInt(end)
+    }
+    values.foreach(_.foreach(value => buffer.put(value)))
+    buffer.array()
+  }
+
+  /**
+   * Gets the function encoding the serialized features with a codec, as read by feathr/online/codec.py in the Python
+   * client: the base64 protobuf, the raw codec header followed by the protobuf, or the zstd codec header followed by a
+   * zstd frame, compressed with `dictionary` if set. The frames hold their content size and dictionary id, which
+   * the readers need to decompress them.
+   */
+  private[feathr] def valueEncoder(valueCodec: String, dictionary: Option[Array[Byte]]): Array[Byte] => Array[Byte] = {
+    valueCodec match {
+      case BASE64_CODEC => bytes => Base64.getEncoder.encode(bytes)
+      case RAW_CODEC => bytes => RAW_HEADER +: bytes
+      case _ =>
+        val dictCompress = dictionary.map(new ZstdDictCompress(_, ZSTD_LEVEL))
+        bytes => ZSTD_HEADER +: dictCompress.map(Zstd.compress(bytes, _)).getOrElse(Zstd.compress(bytes, ZSTD_LEVEL))
+    }
+  }
+
+  /**
+   * Trains a zstd dictionary on a sample of the serialized feature values. Returns None, to compress without
+   * dictionary, if there are too few values to train one.
+   */
+  private[feathr] def trainDictionary(samples: Array[Array[Byte]]): Option[Array[Byte]] = {
+    val dictBuffer = new Array[Byte](DICTIONARY_SIZE)
+    val dictSize = try Zstd.trainFromBuffer(samples, dictBuffer) catch { case _: Exception => 0L }
+    if (dictSize <= 0 || Zstd.isError(dictSize)) {
+      None
+    } else {
+      Some(dictBuffer.take(dictSize.toInt))
+    }
+  }
+
+  /**
+   * Stores a zstd dictionary in the DICTIONARY_TABLE hash, keyed by its dictionary id, so that the readers can
+   * decompress the values.
+   */
+  private def storeDictionary(dictionary: Array[Byte], redisConfig: RedisConfig): Unit = {
+    val dictKey = DICTIONARY_TABLE + ":" + Zstd.getDictIdFromDict(dictionary)
+    val conn = redisConfig.connectionForKey(dictKey)
+    try {
+      conn.hset(dictKey.getBytes(StandardCharsets.UTF_8), DICTIONARY_FIELD.getBytes(StandardCharsets.UTF_8), dictionary)
+    } finally {
+      conn.close()
+    }
+  }
+
+  private[feathr] def encodeDataFrame(allFeatureCols: Set[String], df: DataFrame,
+                                      encodeValue: Array[Byte] => Any = base64Encode,
+                                      featureDataType: DataType = StringType,
+                                      quantization: Map[String, String] = Map()): DataFrame = {
     val schema = df.schema
-    val newStructType = getRedisSparkSchema(allFeatureCols, schema)
+    val newStructType = getRedisSparkSchema(allFeatureCols, schema, featureDataType)
     val encoder = RowEncoder(newStructType)
 
-    val mappingFunc = getConversionFunction(schema, allFeatureCols)
+    val mappingFunc = getConversionFunction(schema, allFeatureCols, encodeValue) ++ getQuantizationFunction(schema, quantization)
     val encodedDf = df.map(row => {
       Row.fromSeq(schema.indices.map { i =>
       {
@@ -57,19 +284,116 @@ object RedisOutputUtils {
     encodedDf
   }
 
+  /**
+   * Gets the functions that quantize the dense float/double array features of `quantization`(feature name to
+   * quantization), by schema index. See `quantize`.
+   */
+  private[feathr] def getQuantizationFunction(dfSchema: StructType, quantization: Map[String, String]): Map[Int, Any => Any] = {
+    quantization.map { case (fieldName, quantizationType) =>
+      if (!dfSchema.fieldNames.contains(fieldName)) {
+        throw new RuntimeException(s"Feature ${fieldName} to quantize is not in the output of the materialization.")
+      }
+      if (quantizationType != FLOAT16_QUANTIZATION && quantizationType != INT8_QUANTIZATION) {
+        throw new RuntimeException(s"Unsupported quantization ${quantizationType} of feature ${fieldName}. " +
+          s"Supported ones are ${FLOAT16_QUANTIZATION} and ${INT8_QUANTIZATION}.")
+      }
+      val index = dfSchema.fieldIndex(fieldName)
+      val func: Any => Any = dfSchema.fields(index).dataType match {
+        case ArrayType(FloatType, _) =>
+          (rowData: Any) => quantize(rowData.asInstanceOf[mutable.WrappedArray[java.lang.Float]].map(_.doubleValue()),
+            quantizationType, double = false)
+        case ArrayType(DoubleType, _) =>
+          (rowData: Any) => quantize(rowData.asInstanceOf[mutable.WrappedArray[java.lang.Double]].map(_.doubleValue()),
+            quantizationType, double = true)
+        case dataType =>
+          throw new RuntimeException(s"Only dense float and double array features can be quantized, but feature " +
+            s"${fieldName} is ${dataType}.")
+      }
+      (index, func)
+    }
+  }
+
+  /**
+   * Encodes a dense float/double array with reduced precision. The layout is the one read by
+   * feathr/online/codec.py in the Python client, and the bytes are the same as its `quantize`:
+   * - float16: header byte, value type byte(1 for double arrays), little endian float16 values
+   * - int8: header byte, value type byte, little endian float32 scale, int8 values. Each value is scale * int8 value,
+   *   and the scale is the max absolute finite value of the array / 127. The values are rounded half to even, NaN
+   *   values are 0, and infinite values +/-127.
+   */
+  private[feathr] def quantize(values: Seq[Double], quantizationType: String, double: Boolean): Array[Byte] = {
+    val valueType: Byte = if (double) 1 else 0
+    quantizationType match {
+      case FLOAT16_QUANTIZATION =>
+        val buffer = ByteBuffer.allocate(2 + 2 * values.size).order(ByteOrder.LITTLE_ENDIAN)
+        buffer.put(FLOAT16_HEADER).put(valueType)
+        values.foreach(value => buffer.putShort(doubleToHalf(value)))
+        buffer.array()
+      case INT8_QUANTIZATION =>
+        val finite = values.filterNot(value => value.isNaN || value.isInfinite)
+        val maxAbs = if (finite.isEmpty) 0.0 else finite.map(math.abs).max
+        // the values are rounded with the float32 scale the readers multiply them with
+        val floatScale = (maxAbs / 127).toFloat
+        val scale = if (floatScale > 0) floatScale else 1.0f
+        val buffer = ByteBuffer.allocate(6 + values.size).order(ByteOrder.LITTLE_ENDIAN)
+        buffer.put(INT8_HEADER).put(valueType).putFloat(scale)
+        values.foreach { value =>
+          val scaled = math.rint(value / scale)
+          buffer.put((if (scaled.isNaN) 0.0 else math.max(-127.0, math.min(127.0, scaled))).toByte)
+        }
+        buffer.array()
+    }
+  }
+
+  /**
+   * Converts a double into the bits of the nearest IEEE 754 half precision float(round half to even), like numpy's
+   * `astype("<f2")`. The double is rounded once, not through a float, which could round it twice.
+   */
+  private[feathr] def doubleToHalf(value: Double): Short = {
+    val bits = java.lang.Double.doubleToRawLongBits(value)
+    val sign = ((bits >>> 48) & 0x8000).toInt
+    val exponent = ((bits >>> 52) & 0x7ff).toInt
+    val mantissa = bits & 0xfffffffffffffL
+    if (exponent == 0x7ff) {
+      // infinity, or NaN keeping the high bits of its payload
+      val payload = (mantissa >>> 42).toInt
+      return (sign | 0x7c00 | (if (mantissa != 0 && payload == 0) 1 else payload)).toShort
+    }
+    val halfExponent = exponent - 1023 + 15
+    if (halfExponent >= 0x1f) {
+      return (sign | 0x7c00).toShort
+    }
+    // the half mantissa and the position of the first dropped bit, for normal and subnormal halves
+    val (half, fullMantissa, roundBit) = if (halfExponent <= 0) {
+      if (halfExponent < -10) {
+        return sign.toShort
+      }
+      val shift = 43 - halfExponent
+      val full = mantissa | (1L << 52)
+      (sign | (full >>> shift).toInt, full, 1L << (shift - 1))
+    } else {
+      (sign | (halfExponent << 10) | (mantissa >>> 42).toInt, mantissa, 1L << 41)
+    }
+    // round up if the dropped bits are above half, or exactly half and the last kept bit is odd. Rounding up the
+    // largest half gives infinity.
+    val roundUp = (fullMantissa & roundBit) != 0 && (fullMantissa & (3 * roundBit - 1)) != 0
+    (if (roundUp) half + 1 else half).toShort
+  }
+
   /**
    * Gets the new dataframe schema after protobuf encoding.
    */
   private[feathr] def getRedisSparkSchema(
                                            allFeatureCols: Set[String] = Set(), // feature column name to feature type
-                                           dfSchema: StructType
+                                           dfSchema: StructType,
+                                           featureDataType: DataType = StringType
                                          ): StructType = {
     val newDfSchemaFields: Array[StructField] = dfSchema.indices.map {
       i => {
         val structField = dfSchema.fields(i)
         if (allFeatureCols.contains(structField.name)) {
-          // we use protobuf byte string representation, so for feature, it's always StringType
-          StructField(structField.name, StringType, structField.nullable, structField.metadata)
+          // we use protobuf byte string representation, so for feature, it's StringType(base64) or BinaryType
+          StructField(structField.name, featureDataType, structField.nullable, structField.metadata)
         } else {
           structField
         }
@@ -87,7 +411,8 @@ object RedisOutputUtils {
    * 3. sparse 1-dimension tensor from integer to various types. Mostly support embedding use cases.
    * (more types can be added if there are actual popular use cases)
    */
-  private[feathr] def getConversionFunction(dfSchema: StructType, allFeatureCols: Set[String] = Set()): Map[Int, Any => Any] = {
+  private[feathr] def getConversionFunction(dfSchema: StructType, allFeatureCols: Set[String] = Set(),
+                                            encodeValue: Array[Byte] => Any = base64Encode): Map[Int, Any => Any] = {
     dfSchema.indices.map(index => {
       val field = dfSchema.fields(index)
       val fieldName = field.name
@@ -97,37 +422,37 @@ object RedisOutputUtils {
             (rowData: Any) => {
               val stringFeature = rowData.asInstanceOf[Float]
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setFloatValue(stringFeature).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case DoubleType =>
             (rowData: Any) => {
               val stringFeature = rowData.asInstanceOf[Double]
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setDoubleValue(stringFeature).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case StringType =>
             (rowData: Any) => {
               val stringFeature = rowData.asInstanceOf[String]
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setStringValue(stringFeature).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case BooleanType =>
             (rowData: Any) => {
               val stringFeature = rowData.asInstanceOf[Boolean]
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setBooleanValue(stringFeature).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case IntegerType =>
             (rowData: Any) => {
               val stringFeature = rowData.asInstanceOf[Integer]
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setIntValue(stringFeature).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case LongType =>
             (rowData: Any) => {
               val stringFeature = rowData.asInstanceOf[Long]
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setLongValue(stringFeature).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case ArrayType(IntegerType, _) =>
             (rowData: Any) => {
@@ -135,7 +460,7 @@ object RedisOutputUtils {
               val allElements = genericRow.asJava
               val protoStringArray = FeatureValueOuterClass.IntegerArray.newBuilder().addAllIntegers(allElements)
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setIntArray(protoStringArray).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case ArrayType(FloatType, _) =>
             (rowData: Any) => {
@@ -143,7 +468,7 @@ object RedisOutputUtils {
               val allElements = genericRow.asJava
               val protoStringArray = FeatureValueOuterClass.FloatArray.newBuilder().addAllFloats(allElements)
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setFloatArray(protoStringArray).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case ArrayType(DoubleType, _) =>
             (rowData: Any) => {
@@ -151,7 +476,7 @@ object RedisOutputUtils {
               val allElements = genericRow.asJava
               val protoStringArray = FeatureValueOuterClass.DoubleArray.newBuilder().addAllDoubles(allElements)
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setDoubleArray(protoStringArray).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case ArrayType(StringType, _) =>
             (rowData: Any) => {
@@ -159,7 +484,7 @@ object RedisOutputUtils {
               val allElements = genericRow.asJava
               val protoStringArray = FeatureValueOuterClass.StringArray.newBuilder().addAllStrings(allElements)
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setStringArray(protoStringArray).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case ArrayType(BooleanType, _) =>
             (rowData: Any) => {
@@ -167,7 +492,7 @@ object RedisOutputUtils {
               val allElements = genericRow.asJava
               val protoStringArray = FeatureValueOuterClass.BooleanArray.newBuilder().addAllBooleans(allElements)
               val res = FeatureValueOuterClass.FeatureValue.newBuilder().setBooleanArray(protoStringArray).build()
-              Base64.getEncoder.encodeToString(res.toByteArray)
+              encodeValue(res.toByteArray)
             }
           case StructType(Array(StructField("indices0", ArrayType(IntegerType, _), _, _), StructField("values", ArrayType(StringType, _), _, _)))=>
             (rowData: Any) => {
@@ -179,7 +504,7 @@ object RedisOutputUtils {
                 .addAllValueStrings(valueArray.asJava).build()
               val proto = FeatureValueOuterClass.FeatureValue.newBuilder()
                 .setSparseStringArray(protoStringArray).build()
-              Base64.getEncoder.encodeToString(proto.toByteArray)
+              encodeValue(proto.toByteArray)
             }
           case StructType(Array(StructField("indices0", ArrayType(IntegerType, _), _, _), StructField("values", ArrayType(BooleanType, _), _, _)))=>
             (rowData: Any) => {
@@ -191,7 +516,7 @@ object RedisOutputUtils {
                 .addAllValueBooleans(valueArray.asJava).build()
               val proto = FeatureValueOuterClass.FeatureValue.newBuilder()
                 .setSparseBoolArray(protoBoolArray).build()
-              Base64.getEncoder.encodeToString(proto.toByteArray)
+              encodeValue(proto.toByteArray)
             }
           case StructType(Array(StructField("indices0", ArrayType(IntegerType, _), _, _), StructField("values", ArrayType(DoubleType, _), _, _)))=>
             (rowData: Any) => {
@@ -203,7 +528,7 @@ object RedisOutputUtils {
                 .addAllValueDoubles(valueArray.asJava).build()
               val proto = FeatureValueOuterClass.FeatureValue.newBuilder()
                 .setSparseDoubleArray(protoArray).build()
-              Base64.getEncoder.encodeToString(proto.toByteArray)
+              encodeValue(proto.toByteArray)
             }
           case StructType(Array(StructField("indices0", ArrayType(IntegerType, _), _, _), StructField("values", ArrayType(FloatType, _), _, _)))=>
             (rowData: Any) => {
@@ -215,7 +540,7 @@ object RedisOutputUtils {
                 .addAllValueFloats(valueArray.asJava).build()
               val proto = FeatureValueOuterClass.FeatureValue.newBuilder()
                 .setSparseFloatArray(protoArray).build()
-              Base64.getEncoder.encodeToString(proto.toByteArray)
+              encodeValue(proto.toByteArray)
             }
           case StructType(Array(StructField("indices0", ArrayType(IntegerType, _), _, _), StructField("values", ArrayType(IntegerType, _), _, _)))=>
             (rowData: Any) => {
@@ -227,7 +552,7 @@ object RedisOutputUtils {
                 .addAllValueIntegers(valueArray.asJava).build()
               val proto = FeatureValueOuterClass.FeatureValue.newBuilder()
                 .setSparseIntegerArray(protoArray).build()
-              Base64.getEncoder.encodeToString(proto.toByteArray)
+              encodeValue(proto.toByteArray)
             }
           case StructType(Array(StructField("indices0", ArrayType(IntegerType, _), _, _), StructField("values", ArrayType(LongType, _), _, _)))=>
             (rowData: Any) => {
@@ -239,7 +564,7 @@ object RedisOutputUtils {
                 .addAllValueLongs(valueArray.asJava).build()
               val proto = FeatureValueOuterClass.FeatureValue.newBuilder()
                 .setSparseLongArray(protoArray).build()
-              Base64.getEncoder.encodeToString(proto.toByteArray)
+              encodeValue(proto.toByteArray)
             }
           case _ =>
             (rowData: Any) => {
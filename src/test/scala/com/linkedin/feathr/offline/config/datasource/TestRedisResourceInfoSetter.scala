@@ -0,0 +1,23 @@
+package com.linkedin.feathr.offline.config.datasource
+
+import org.scalatest.FunSuite
+
+class TestRedisResourceInfoSetter extends FunSuite {
+  private val setter = new RedisResourceInfoSetter()
+
+  test("getClusterInitialNode uses the first host:port endpoint") {
+    assert(setter.getClusterInitialNode("node1.redis:7000,node2.redis:7001", "6379") == ("node1.redis", "7000"))
+    assert(setter.getClusterInitialNode("node1.redis:7000", "6379") == ("node1.redis", "7000"))
+  }
+
+  test("getClusterInitialNode uses the configured port for a bare host") {
+    assert(setter.getClusterInitialNode("node1.redis", "6380") == ("node1.redis", "6380"))
+    assert(setter.getClusterInitialNode("node1.redis,node2.redis:7001", "6380") == ("node1.redis", "6380"))
+  }
+
+  test("getClusterInitialNode ignores whitespace and empty endpoints") {
+    assert(setter.getClusterInitialNode(" node1.redis:7000 , node2.redis:7001 ", "6379") == ("node1.redis", "7000"))
+    assert(setter.getClusterInitialNode(" , node2.redis : 7001", "6379") == ("node2.redis", "7001"))
+    assert(setter.getClusterInitialNode(" node1.redis ", " 6380 ") == ("node1.redis", "6380"))
+  }
+}
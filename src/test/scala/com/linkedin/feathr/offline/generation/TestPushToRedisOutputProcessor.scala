@@ -1,13 +1,15 @@
 package com.linkedin.feathr.offline.generation
 
+import com.github.luben.zstd.{Zstd, ZstdDictDecompress}
 import com.linkedin.feathr.common.types.protobuf.FeatureValueOuterClass
 import com.linkedin.feathr.common.{FeatureInfo, FeatureTypes, Header, TaggedFeatureName}
 import com.linkedin.feathr.offline.generation.outputProcessor.RedisOutputUtils
 import com.linkedin.feathr.offline.{AssertFeatureUtils, TestFeathr}
 import org.apache.spark.sql.Row
 import org.apache.spark.sql.catalyst.encoders.RowEncoder
-import org.apache.spark.sql.types.{ArrayType, BooleanType, FloatType, IntegerType, StringType, StructField, StructType}
+import org.apache.spark.sql.types.{ArrayType, BinaryType, BooleanType, FloatType, IntegerType, StringType, StructField, StructType}
 import org.scalatest.mockito.MockitoSugar
+import org.testng.Assert.{assertEquals, assertTrue}
 import org.testng.annotations.Test
 
 import java.util.Base64
@@ -144,4 +146,99 @@ class TestPushToRedisOutputProcessor extends TestFeathr with MockitoSugar {
     val encoded = RedisOutputUtils.encodeDataFrame(allFeatureCols, rawDf)
     encoded.show()
   }
+
+  /**
+   * The packed-row schemas and rows must be the same bytes as the ones of feathr/online/packed.py. The expected values
+   * are generated by the Python client, e.g. `schema_version(["f_fare", "f_embedding"])`.
+   */
+  @Test
+  def testPackedRowsMatchPython(): Unit = {
+    assertEquals(RedisOutputUtils.packedSchema(Seq("f_fare", "f_embedding")), ("[\"f_fare\",\"f_embedding\"]", 578227407L))
+    // non-ASCII, quotes, backslashes and control characters are escaped like json.dumps(ensure_ascii=True)
+    val (json, version) = RedisOutputUtils.packedSchema(Seq("f_prix_\u00e9", "\u540d\u524d", "a\"b\\c", "tab\there\u007f"))
+    assertEquals(json, "[\"f_prix_\\u00e9\",\"\\u540d\\u524d\",\"a\\\"b\\\\c\",\"tab\\there\\u007f\"]")
+    assertEquals(version, 1669885475L)
+
+    val (_, rowVersion) = RedisOutputUtils.packedSchema(Seq("f_fare", "f_embedding", "f_city"))
+    assertEquals(rowVersion, 3568407732L)
+    // pack_row([b"\x01ab", None, b"\x01c"], schema_version(["f_fare", "f_embedding", "f_city"]))
+    val row = RedisOutputUtils.packRow(Seq(Some(Array[Byte](1, 97, 98)), None, Some(Array[Byte](1, 99))), rowVersion)
+    assertEquals(toHex(row), "05b494b1d4030000000300000003000000050000000161620163")
+    assertEquals(toHex(RedisOutputUtils.packRow(Seq(), 7L)), "050700000000000000")
+  }
+
+  /**
+   * The quantized arrays must be the same bytes as feathr.online.codec.quantize, which uses numpy's astype("<f2") for
+   * float16. The expected values are generated by the Python client.
+   */
+  @Test
+  def testQuantizeMatchesPython(): Unit = {
+    val nan = Double.NaN
+    val inf = Double.PositiveInfinity
+    // zeros, rounding, the largest half, overflow to inf, subnormals, half of the smallest subnormal, NaN and -inf
+    assertEquals(toHex(RedisOutputUtils.quantize(Seq(0.0, -0.0, 1.0 / 3, 65504.0, 65520.0, 1e6, 6e-8,
+      2.9802322387695312e-8, 3e-8, 1e-5, nan, -inf), "float16", double = true)),
+      "0301000000805535ff7b007c007c010000000100a800007e00fc")
+    assertEquals(toHex(RedisOutputUtils.quantize(Seq(0.1f, 1e-7f, -70000f).map(_.toDouble), "float16", double = false)),
+      "0300662e020000fc")
+    assertEquals(toHex(RedisOutputUtils.quantize(Seq(), "float16", double = false)), "0300")
+    // rounded half to even, NaN is 0 and the infinite values are +/-127
+    assertEquals(toHex(RedisOutputUtils.quantize(Seq(1.0, -2.5, 0.5, 3.0, 5.0, nan, inf, -inf, 254.0), "int8",
+      double = true)), "04010000004000ff000202007f817f")
+    // all-zero and empty arrays, and a scale below the smallest float32, are scaled by 1
+    assertEquals(toHex(RedisOutputUtils.quantize(Seq(0.0, 0.0, 0.0), "int8", double = false)), "04000000803f000000")
+    assertEquals(toHex(RedisOutputUtils.quantize(Seq(), "int8", double = false)), "04000000803f")
+    assertEquals(toHex(RedisOutputUtils.quantize(Seq(1e-44, -1e-45), "int8", double = true)), "04010000803f0000")
+  }
+
+  /**
+   * The values written with the raw and zstd codecs must be decodable by feathr.online.codec.decode_value in the
+   * Python client: the codec header, then the protobuf, or a zstd frame holding its content size and the id of its
+   * dictionary.
+   */
+  @Test
+  def testBinaryCodecsRoundTrip(): Unit = {
+    val schema = StructType(List(
+      StructField("key0", IntegerType, nullable = false),
+      StructField("f", FloatType, nullable = false),
+      StructField("g", StringType, nullable = true)))
+    val rawDf = ss.createDataFrame(ss.sparkContext.parallelize(Seq(Row(1, 1.5f, "sea"), Row(2, -1.5f, "lake"))), schema)
+    val serialized = RedisOutputUtils.encodeDataFrame(Set("f", "g"), rawDf, bytes => bytes, BinaryType).collect()
+      .flatMap(row => Seq(row.getAs[Array[Byte]]("f"), row.getAs[Array[Byte]]("g")))
+
+    // the same bytes as ValueEncoder("raw").encode(FeatureValue(float_value=1.5).SerializeToString()) in Python
+    val raw = RedisOutputUtils.valueEncoder(RedisOutputUtils.RAW_CODEC, None)
+    assertEquals(toHex(raw(serialized(0))), "011d0000c03f")
+    assertEquals(toHex(raw(serialized(1))), "011203736561")
+    serialized.foreach { value =>
+      val encoded = raw(value)
+      assertEquals(encoded(0), RedisOutputUtils.RAW_HEADER)
+      assertEquals(FeatureValueOuterClass.FeatureValue.parseFrom(encoded.drop(1)).toByteArray, value)
+    }
+
+    val samples = (0 until 5000).map(i => FeatureValueOuterClass.FeatureValue.newBuilder()
+      .setStringValue(s"city_${i % 50}_neighbourhood_${i % 7}").build().toByteArray).toArray
+    val dictionary = RedisOutputUtils.trainDictionary(samples)
+    assertTrue(dictionary.isDefined)
+    assertEquals(RedisOutputUtils.trainDictionary(samples.take(1)), None)
+    Seq(None -> 0L, dictionary -> Zstd.getDictIdFromDict(dictionary.get)).foreach { case (dict, dictId) =>
+      val zstd = RedisOutputUtils.valueEncoder(RedisOutputUtils.ZSTD_CODEC, dict)
+      (serialized ++ samples.take(10)).foreach { value =>
+        val encoded = zstd(value)
+        assertEquals(encoded(0), RedisOutputUtils.ZSTD_HEADER)
+        val frame = encoded.drop(1)
+        // the Python decoder needs the content size, and loads the dictionary by the id in the frame
+        assertEquals(Zstd.decompressedSize(frame), value.length.toLong)
+        assertEquals(Zstd.getDictIdFromFrame(frame), dictId)
+        val decompressed = dict.map(d => Zstd.decompress(frame, new ZstdDictDecompress(d), value.length))
+          .getOrElse(Zstd.decompress(frame, value.length))
+        assertEquals(decompressed, value)
+      }
+    }
+    // a value written by ValueEncoder("zstd") in Python is read back the same way
+    val pythonFrame = "28b52ffd20052900001203736561".grouped(2).map(Integer.parseInt(_, 16).toByte).toArray
+    assertEquals(Zstd.decompress(pythonFrame, Zstd.decompressedSize(pythonFrame).toInt), serialized(1))
+  }
+
+  private def toHex(bytes: Array[Byte]): String = bytes.map("%02x".format(_)).mkString
 }